@@ -11,6 +11,8 @@ from datetime import datetime
 from pathlib import Path
 import time
 
+from learnings_store import LearningStore
+
 os.environ['TZ'] = 'Asia/Bangkok'
 try:
     time.tzset()
@@ -69,33 +71,15 @@ def update_working_memory(agent_id: str, task_id: str = None,
     return True
 
 def add_learning(agent_id: str, learning: str):
-    """Add a learning to agent's context"""
+    """Add a learning to agent's context (duplicates only refresh the existing entry)"""
     conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    
-    # Get existing learnings
-    cursor.execute('SELECT learnings FROM agent_context WHERE agent_id = ?', (agent_id,))
-    row = cursor.fetchone()
-    existing = row[0] if row else ""
+    store = LearningStore(conn)
     
-    # Prepend new learning with timestamp
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M')
-    new_entry = f"[{timestamp}] {learning}"
-    
-    if existing:
-        updated = f"{new_entry}\n{existing}"
-    else:
-        updated = new_entry
-    
-    # Keep only last 50 entries
-    lines = [l for l in updated.split('\n') if l.strip()][:50]
-    updated = '\n'.join(lines)
-    
-    cursor.execute('''
-        UPDATE agent_context 
-        SET learnings = ?, last_updated = datetime('now', 'localtime')
-        WHERE agent_id = ?
-    ''', (updated, agent_id))
+    if not store.add(agent_id, learning):
+        conn.close()
+        print("❌ Empty learning")
+        return False
+    store.refresh_context([agent_id])
     
     conn.commit()
     conn.close()
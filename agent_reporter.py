@@ -7,71 +7,48 @@ Allow subagents to report their status back to the main system
 import sqlite3
 import json
 import argparse
-import re
 from datetime import datetime
 from pathlib import Path
 
-DB_PATH = Path(__file__).parent / "team.db"
-
-
-def reject_to_todo(conn, task_id: str, agent_id: str, reason: str, old_status: str = None):
-    """Return task to todo (high priority) for validation failures, not blocked."""
-    cursor = conn.cursor()
-    if old_status is None:
-        row = cursor.execute('SELECT status FROM tasks WHERE id = ?', (task_id,)).fetchone()
-        old_status = row[0] if row else 'todo'
-
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'todo',
-            priority = 'high',
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            started_at = NULL,
-            completed_at = NULL,
-            review_at = NULL,
-            reviewing_at = NULL,
-            done_at = NULL,
-            review_feedback = ?,
-            review_feedback_at = datetime('now', 'localtime'),
-            todo_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (reason, task_id))
+from checklist_store import ChecklistStore
+from heartbeat_collector import send_heartbeat
+from task_state import TaskStateMachine
 
-    cursor.execute('''
-        UPDATE agents
-        SET status = 'idle', current_task_id = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (agent_id,))
+DB_PATH = Path(__file__).parent / "team.db"
 
-    cursor.execute('''
-        INSERT INTO task_history (task_id, agent_id, action, old_status, new_status, notes)
-        VALUES (?, ?, 'rejected', ?, 'todo', ?)
-    ''', (task_id, agent_id, old_status, reason))
 
 def report_status(agent_id: str, status: str, message: str = ""):
     """Report agent status to database"""
+    # Liveness goes through the coalescing heartbeat collector
+    send_heartbeat(agent_id, DB_PATH)
+
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
-    
-    # Update agent status
-    cursor.execute('''
-        UPDATE agents 
-        SET status = ?,
-            current_task_id = CASE WHEN ? = 'idle' THEN NULL ELSE current_task_id END,
-            last_heartbeat = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (status, status, agent_id))
-    
-    # Log the report
-    cursor.execute('''
-        INSERT INTO task_history (agent_id, action, notes)
-        VALUES (?, 'status_update', ?)
-    ''', (agent_id, f"Status: {status} - {message}"))
-    
-    conn.commit()
+    row = cursor.execute('SELECT status, current_task_id FROM agents WHERE id = ?', (agent_id,)).fetchone()
+    if not row:
+        conn.close()
+        print(f"❌ Agent {agent_id} not found")
+        return
+    old_status, current_task_id = row
+
+    # Repeated reports of the same status are heartbeats only: no write transaction
+    if old_status != status:
+        cursor.execute('''
+            UPDATE agents 
+            SET status = ?,
+                current_task_id = CASE WHEN ? = 'idle' THEN NULL ELSE current_task_id END,
+                updated_at = datetime('now', 'localtime')
+            WHERE id = ?
+        ''', (status, status, agent_id))
+        
+        # Log the change against the agent's current task (task_history requires a task)
+        if current_task_id:
+            cursor.execute('''
+                INSERT INTO task_history (task_id, agent_id, action, notes)
+                VALUES (?, ?, 'updated', ?)
+            ''', (current_task_id, agent_id, f"Status: {old_status} -> {status} - {message}"))
+        
+        conn.commit()
     # Status updates do not imply task status changes; no sprint status sync here.
     conn.close()
     print(f"✅ Reported status: {status}")
@@ -110,153 +87,48 @@ def report_progress(task_id: str, progress: int, notes: str = ""):
 def report_start(agent_id: str, task_id: str):
     """Report that agent has started working"""
     conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
     # Note: Do not gate start on prerequisites. The agent must verify prerequisites first,
     # and requeue with a detailed reason if any prerequisite cannot be satisfied.
-    
-    # Update agent
-    cursor.execute('''
-        UPDATE agents 
-        SET status = 'active',
-            current_task_id = ?,
-            last_heartbeat = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (task_id, agent_id))
-    
-    # Update task
-    cursor.execute('''
-        UPDATE tasks 
-        SET status = 'in_progress',
-            started_at = datetime('now', 'localtime'),
-            in_progress_at = datetime('now', 'localtime'),
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (task_id,))
-    
-    # Log
-    cursor.execute('''
-        INSERT INTO task_history (task_id, agent_id, action, notes)
-        VALUES (?, ?, 'started', 'Agent started working on task')
-    ''', (task_id, agent_id))
-
-    # Auto-bootstrap working memory to prevent immediate review-gate failure.
-    cursor.execute('''
-        UPDATE agent_working_memory
-        SET current_task_id = ?,
-            working_notes = CASE
-                WHEN working_notes IS NULL OR trim(working_notes) = '' THEN 'Auto-init: task started'
-                ELSE working_notes
-            END,
-            blockers = COALESCE(blockers, ''),
-            next_steps = CASE
-                WHEN next_steps IS NULL OR trim(next_steps) = '' THEN 'Begin work and post first progress update'
-                ELSE next_steps
-            END,
-            last_updated = datetime('now', 'localtime')
-        WHERE agent_id = ?
-    ''', (task_id, agent_id))
-    if cursor.rowcount == 0:
-        cursor.execute('''
-            INSERT INTO agent_working_memory
-            (agent_id, current_task_id, working_notes, blockers, next_steps, last_updated)
-            VALUES (?, ?, 'Auto-init: task started', '', 'Begin work and post first progress update', datetime('now', 'localtime'))
-        ''', (agent_id, task_id))
-    
-    conn.commit()
+    # Agent active + task in_progress + working memory bootstrap in one transaction
+    result = TaskStateMachine(conn).apply(task_id, 'start', agent=agent_id, actor=agent_id,
+                                          notes='Agent started working on task')
     conn.close()
+    if result is None:
+        print(f"⚠️ Task {task_id} cannot be started (missing or not startable)")
+        return
     print(f"✅ Reported start: {agent_id} working on {task_id}")
 
 def report_complete(agent_id: str, task_id: str, summary: str = ""):
     """Report task completion"""
     conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
+    states = TaskStateMachine(conn)
 
-    cursor.execute('SELECT status FROM tasks WHERE id = ?', (task_id,))
-    row = cursor.fetchone()
+    row = conn.execute('SELECT status, prerequisites FROM tasks WHERE id = ?', (task_id,)).fetchone()
     current_status = row[0] if row else None
+    reason = None
     if current_status != 'in_progress':
         reason = f"Cannot complete task: status is {current_status} (must be in_progress)"
-        reject_to_todo(conn, task_id, agent_id, reason, old_status=current_status or 'todo')
-        conn.commit()
+    elif (row[1] or '').strip():
+        # Prerequisites must be checked before completion/review.
+        total, unchecked = ChecklistStore(conn).gate(task_id, 'prerequisites')
+        if not total:
+            reason = "Prerequisites must be a checklist (- [ ] item)."
+        elif unchecked:
+            reason = "Cannot complete task: prerequisites not checked -> " + "; ".join(unchecked)
+    if reason:
+        states.apply(task_id, 'reject', agent=agent_id, actor=agent_id, reason=reason)
         conn.close()
         print(f"⚠️ Task {task_id} rejected: {reason}")
         return
 
-    # Prerequisites must be checked before completion/review.
-    cursor.execute('SELECT prerequisites FROM tasks WHERE id = ?', (task_id,))
-    row = cursor.fetchone()
-    prerequisites = (row[0] or '') if row else ''
-    if prerequisites.strip():
-        items = []
-        for line in prerequisites.splitlines():
-            m = re.match(r'^\s*[-*]\s+\[(x| )\]\s+(.*)$', line, re.IGNORECASE)
-            if not m:
-                continue
-            items.append((m.group(1).lower() == 'x', m.group(2).strip()))
-        if not items:
-            reason = "Prerequisites must be a checklist (- [ ] item)."
-            reject_to_todo(conn, task_id, agent_id, reason, old_status='in_progress')
-            conn.commit()
-            conn.close()
-            print(f"⚠️ Task {task_id} rejected: {reason}")
-            return
-        unchecked = [text for checked, text in items if not checked]
-        if unchecked:
-            reason = "Cannot complete task: prerequisites not checked -> " + "; ".join(unchecked)
-            reject_to_todo(conn, task_id, agent_id, reason, old_status='in_progress')
-            conn.commit()
-            conn.close()
-            print(f"⚠️ Task {task_id} rejected: {reason}")
-            return
-    
-    # Update agent
-    cursor.execute('''
-        UPDATE agents 
-        SET status = 'idle',
-            current_task_id = NULL,
-            total_tasks_completed = total_tasks_completed + 1,
-            last_heartbeat = datetime('now')
-        WHERE id = ?
-    ''', (agent_id,))
-    
-    # Update task
-    cursor.execute('''
-        UPDATE tasks 
-        SET status = 'review',
-            progress = 100,
-            completed_at = datetime('now', 'localtime'),
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            review_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (task_id,))
-    
-    # Log
-    cursor.execute('''
-        INSERT INTO task_history (task_id, agent_id, action, notes)
-        VALUES (?, ?, 'completed', ?)
-    ''', (task_id, agent_id, summary or 'Task completed'))
-    
-    conn.commit()
+    # Task -> review, agent released
+    states.apply(task_id, 'complete', agent=agent_id, actor=agent_id, notes=summary or 'Task completed')
     conn.close()
     print(f"✅ Reported completion: {task_id}")
 
 def heartbeat(agent_id: str):
     """Send heartbeat to show agent is still alive"""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE agents 
-        SET last_heartbeat = datetime('now')
-        WHERE id = ?
-    ''', (agent_id,))
-    
-    conn.commit()
-    conn.close()
+    send_heartbeat(agent_id, DB_PATH)
     print(f"💓 Heartbeat: {agent_id}")
 
 def main():
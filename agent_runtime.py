@@ -4,14 +4,17 @@ Agent runtime adapter.
 Supports multiple execution backends (OpenClaw, Claude Code) behind one API.
 """
 
+import ctypes
+import ctypes.util
 import json
 import os
 import shlex
+import struct
 import subprocess
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Set, Tuple
 
 OPENCLAW_STATE_DIR = Path.home() / ".openclaw"
 RUNTIME_OVERRIDE_PATH = Path(__file__).with_name("runtime.override")
@@ -66,11 +69,8 @@ def get_active_sessions(active_minutes: int = 60) -> Dict[str, datetime]:
         return {}
 
 
-def get_openclaw_session_last_seen(agent_id: str) -> Optional[datetime]:
-    """Get latest OpenClaw session timestamp for an agent."""
-    path = OPENCLAW_STATE_DIR / "agents" / agent_id / "sessions" / "sessions.json"
-    if not path.exists():
-        return None
+def _parse_sessions_last_seen(path: Path) -> Optional[datetime]:
+    """Latest updatedAt across all sessions in one sessions.json file."""
     try:
         data = json.loads(path.read_text())
     except Exception:
@@ -90,6 +90,140 @@ def get_openclaw_session_last_seen(agent_id: str) -> Optional[datetime]:
     return datetime.fromtimestamp(latest_ms / 1000)
 
 
+class SessionLivenessCache:
+    """
+    Per-agent OpenClaw session last-seen, keyed on sessions.json (mtime_ns, size).
+    Files are only re-parsed when their stat changes. With inotify enabled
+    (Linux), unchanged agents are not even stat'ed: only directories that
+    reported an event are re-checked.
+    """
+
+    # inotify_event: int wd; uint32 mask, cookie, len; char name[len]
+    _EVENT = struct.Struct("iIII")
+    _WATCH_MASK = 0x00000008 | 0x00000080 | 0x00000100 | 0x00000200  # CLOSE_WRITE|MOVED_TO|CREATE|DELETE
+
+    def __init__(self, state_dir: Path = OPENCLAW_STATE_DIR):
+        self.agents_dir = state_dir / "agents"
+        self._entries: Dict[str, Tuple[int, int, Optional[datetime]]] = {}
+        self._inotify_fd: Optional[int] = None
+        self._watches: Dict[int, str] = {}
+        self._dirty: Set[str] = set()
+        self.parses = 0
+
+    def _path(self, agent_id: str) -> Path:
+        return self.agents_dir / agent_id / "sessions" / "sessions.json"
+
+    def invalidate(self, agent_id: str):
+        """Force the next lookup for agent_id to re-stat its sessions file."""
+        self._dirty.add(agent_id)
+
+    def last_seen(self, agent_id: str) -> Optional[datetime]:
+        """Cached last session activity for one agent."""
+        self._drain_events()
+        return self._refresh(agent_id)
+
+    def last_seen_all(self) -> Dict[str, datetime]:
+        """Last session activity for every agent with a sessions file."""
+        self._drain_events()
+        try:
+            agent_ids = [e.name for e in os.scandir(self.agents_dir) if e.is_dir()]
+        except OSError:
+            return {}
+        result = {}
+        for agent_id in agent_ids:
+            seen = self._refresh(agent_id)
+            if seen is not None:
+                result[agent_id] = seen
+        return result
+
+    def _refresh(self, agent_id: str) -> Optional[datetime]:
+        cached = self._entries.get(agent_id)
+        if cached is not None and self._inotify_fd is not None and agent_id not in self._dirty:
+            return cached[2]
+        self._dirty.discard(agent_id)
+        path = self._path(agent_id)
+        try:
+            st = path.stat()
+        except OSError:
+            self._entries.pop(agent_id, None)
+            self._watch(agent_id)
+            return None
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        self.parses += 1
+        seen = _parse_sessions_last_seen(path)
+        self._entries[agent_id] = (st.st_mtime_ns, st.st_size, seen)
+        self._watch(agent_id)
+        return seen
+
+    # ========== inotify ==========
+
+    def enable_inotify(self) -> bool:
+        """Watch session directories via inotify; False if unavailable (stat polling is used)."""
+        if self._inotify_fd is not None:
+            return True
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            return False
+        self._libc = libc
+        self._inotify_fd = fd
+        # Everything cached so far was stat-validated without a watch
+        self._dirty.update(self._entries)
+        return True
+
+    def _watch(self, agent_id: str):
+        if self._inotify_fd is None or agent_id in self._watches.values():
+            return
+        sessions_dir = str(self.agents_dir / agent_id / "sessions").encode()
+        wd = self._libc.inotify_add_watch(self._inotify_fd, sessions_dir, self._WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = agent_id
+        else:
+            # Directory missing: keep polling this agent until it appears
+            self._dirty.add(agent_id)
+
+    def _drain_events(self):
+        if self._inotify_fd is None:
+            return
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            except OSError:
+                return
+            offset = 0
+            while offset + self._EVENT.size <= len(data):
+                wd, _mask, _cookie, name_len = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size + name_len
+                agent_id = self._watches.get(wd)
+                if agent_id:
+                    self._dirty.add(agent_id)
+
+    def close(self):
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+            self._watches.clear()
+
+
+session_cache = SessionLivenessCache()
+
+
+def get_openclaw_session_last_seen(agent_id: str) -> Optional[datetime]:
+    """Get latest OpenClaw session timestamp for an agent."""
+    return session_cache.last_seen(agent_id)
+
+
+def get_openclaw_sessions_last_seen() -> Dict[str, datetime]:
+    """Latest OpenClaw session timestamp for all agents (one pass, cached parses)."""
+    return session_cache.last_seen_all()
+
+
 def _build_spawn_request(message: str, label: str, working_dir: str, task_id: str, agent_id: str) -> str:
     return f"""[AI-TEAM TASK]
 LABEL: {label}
@@ -7,8 +7,10 @@ Periodic sync to ensure database matches actual agent states
 import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from audit_log import AuditLogger
-from agent_runtime import get_openclaw_session_last_seen, runtime_supports_sessions
+from agent_runtime import get_openclaw_sessions_last_seen, runtime_supports_sessions
+from task_state import TaskStateMachine
 
 DB_PATH = Path(__file__).parent / "team.db"
 audit = AuditLogger()
@@ -24,14 +26,37 @@ def parse_sqlite_dt(value: str):
     except Exception:
         return None
 
-def check_stale_agents():
+def session_snapshot() -> Optional[Dict[str, datetime]]:
+    """Last-seen map for all agents, or None when the runtime has no session API."""
+    if not runtime_supports_sessions():
+        return None
+    return get_openclaw_sessions_last_seen()
+
+
+def is_recent(dt: Optional[datetime], now: datetime) -> bool:
+    return dt is not None and now - dt <= timedelta(minutes=SESSION_ACTIVE_MINUTES)
+
+
+def runtime_active(last_hb: Optional[str], last_seen: Optional[datetime],
+                   sessions: Optional[Dict[str, datetime]], now: datetime) -> bool:
+    """OpenClaw mode: active session OR recent heartbeat. Other runtimes: heartbeat only."""
+    heartbeat_active = is_recent(parse_sqlite_dt(last_hb), now)
+    if sessions is None:
+        return heartbeat_active
+    return is_recent(last_seen, now) or heartbeat_active
+
+
+def check_stale_agents(sessions: Optional[Dict[str, datetime]] = None):
     """Find agents that are active but have no recent session activity."""
+    if sessions is None:
+        sessions = session_snapshot()
     conn = sqlite3.connect(str(DB_PATH), timeout=10)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT a.id, a.name, a.current_task_id, a.last_heartbeat, a.status, t.status as task_status
         FROM agents a
         LEFT JOIN tasks t ON t.id = a.current_task_id
+        WHERE a.status = 'active'
     ''')
     agents = cursor.fetchall()
     conn.close()
@@ -39,93 +64,47 @@ def check_stale_agents():
     stale = []
     now = datetime.now()
     for agent_id, name, task_id, last_hb, status, task_status in agents:
-        hb_dt = parse_sqlite_dt(last_hb)
-        heartbeat_active = (
-            hb_dt is not None and
-            now - hb_dt <= timedelta(minutes=SESSION_ACTIVE_MINUTES)
-        )
-
-        last_seen = get_openclaw_session_last_seen(agent_id) if runtime_supports_sessions() else None
-        session_active = (
-            last_seen is not None and
-            now - last_seen <= timedelta(minutes=SESSION_ACTIVE_MINUTES)
-        ) if runtime_supports_sessions() else False
-
-        # OpenClaw mode: require active session OR recent heartbeat.
-        # Other runtimes: rely on heartbeat only.
-        runtime_active = (session_active or heartbeat_active) if runtime_supports_sessions() else heartbeat_active
-        if status == 'active' and not runtime_active:
+        last_seen = sessions.get(agent_id) if sessions is not None else None
+        if not runtime_active(last_hb, last_seen, sessions, now):
             stale.append((agent_id, name, task_id, last_hb, last_seen))
     return stale
 
-def reset_stale_agent(agent_id: str, task_id: str = None, reason: str = "No active session"):
-    """Reset stale agent to idle and return task to appropriate queue."""
+def reset_stale_agents(stale: List[Tuple[str, Optional[str]]], reason: str = "No active session") -> int:
+    """
+    Reset stale agents (agent_id, task_id) to idle and return their tasks to the
+    appropriate queue (in_progress -> todo, reviewing -> review), all in one transaction.
+    """
+    if not stale:
+        return 0
+    agent_ids = [agent_id for agent_id, _ in stale]
     conn = sqlite3.connect(str(DB_PATH), timeout=10)
-    cursor = conn.cursor()
-    
-    # Get old status for audit
-    cursor.execute('SELECT status FROM agents WHERE id = ?', (agent_id,))
-    row = cursor.fetchone()
-    old_status = row[0] if row else 'unknown'
-    
-    # Reset agent
-    cursor.execute('''
-        UPDATE agents 
-        SET status = 'idle',
-            current_task_id = NULL
-        WHERE id = ?
-    ''', (agent_id,))
-    
-    task_transition = None
-
-    # If has task, move back to queue based on current stage
-    if task_id:
-        cursor.execute('SELECT status FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        task_status = row[0] if row else None
-        if task_status == 'in_progress':
-            cursor.execute('''
-                UPDATE tasks 
-                SET status = 'todo',
-                    started_at = NULL,
-                    blocked_reason = NULL,
-                    blocked_at = NULL,
-                    todo_at = datetime('now', 'localtime'),
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (task_id,))
-            
-            cursor.execute('''
-                INSERT INTO task_history (task_id, agent_id, action, old_status, new_status, notes)
-                VALUES (?, ?, 'updated', 'in_progress', 'todo', ?)
-            ''', (task_id, agent_id, f"Auto-reset: {reason}"))
-            task_transition = ('in_progress', 'todo')
-        elif task_status == 'reviewing':
-            cursor.execute('''
-                UPDATE tasks
-                SET status = 'review',
-                    blocked_reason = NULL,
-                    blocked_at = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (task_id,))
-
-            cursor.execute('''
-                INSERT INTO task_history (task_id, agent_id, action, old_status, new_status, notes)
-                VALUES (?, ?, 'updated', 'reviewing', 'review', ?)
-            ''', (task_id, agent_id, f"Auto-reset reviewer: {reason}"))
-            task_transition = ('reviewing', 'review')
-    
-    conn.commit()
-    conn.close()
-    
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        # Old statuses for audit
+        old_status = dict(conn.execute(
+            f"SELECT id, status FROM agents WHERE id IN ({','.join('?' * len(agent_ids))})", agent_ids).fetchall())
+        conn.executemany("UPDATE agents SET status = 'idle', current_task_id = NULL WHERE id = ?",
+                         [(agent_id,) for agent_id in agent_ids])
+        moves = [(task_id, ('reset_stale', 'wait_review'),
+                  {'agent': agent_id, 'actor': agent_id, 'notes': f"Auto-reset: {reason}"})
+                 for agent_id, task_id in stale if task_id]
+        results = TaskStateMachine(conn).apply_many(moves)
+    finally:
+        conn.close()
+
     # Audit log (after closing connection to avoid locks)
-    audit.log_stale_detection(agent_id, task_id, reason)
-    audit.log_status_change(agent_id, old_status, 'idle', 'Auto-reset due to timeout')
-    if task_id and task_transition:
-        audit.log_task_update(task_id, agent_id, task_transition[0], task_transition[1], reason)
-    
-    print(f"✅ Reset stale agent: {agent_id}")
+    moved = {r['task_id']: r for r in results}
+    for agent_id, task_id in stale:
+        audit.log_stale_detection(agent_id, task_id, reason)
+        audit.log_status_change(agent_id, old_status.get(agent_id, 'unknown'), 'idle', 'Auto-reset due to timeout')
+        if task_id in moved:
+            audit.log_task_update(task_id, agent_id, moved[task_id]['old_status'], moved[task_id]['new_status'], reason)
+        print(f"✅ Reset stale agent: {agent_id}")
+    return len(stale)
+
+def reset_stale_agent(agent_id: str, task_id: str = None, reason: str = "No active session"):
+    """Reset stale agent to idle and return task to appropriate queue."""
+    reset_stale_agents([(agent_id, task_id)], reason)
 
 def sync_agent_states():
     """Main sync function"""
@@ -135,14 +114,17 @@ def sync_agent_states():
     print(f"Time: {datetime.now()}")
     print()
     
+    # One session scan per pass; every check below reads from this map
+    sessions = session_snapshot()
+
     # Check for stale agents (no active sessions)
-    stale = check_stale_agents()
+    stale = check_stale_agents(sessions)
     if stale:
         print(f"⚠️  Found {len(stale)} stale agents:")
         for agent in stale:
             agent_id, name, task_id, last_hb, last_seen = agent
             print(f"  - {name} ({agent_id}): Last session {last_seen} | Last heartbeat {last_hb}")
-            reset_stale_agent(agent_id, task_id, reason="No active agent session")
+        reset_stale_agents([(agent[0], agent[2]) for agent in stale], reason="No active agent session")
     else:
         print("✅ No stale agents found")
 
@@ -150,48 +132,25 @@ def sync_agent_states():
     conn = sqlite3.connect(str(DB_PATH), timeout=10)
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT t.id, t.assignee_id, t.updated_at, a.status
+        SELECT t.id, t.assignee_id, t.updated_at, a.last_heartbeat
         FROM tasks t
         JOIN agents a ON t.assignee_id = a.id
         WHERE t.status = 'in_progress'
     ''')
     orphaned = []
     now = datetime.now()
-    for task_id, agent_id, updated_at, agent_status in cursor.fetchall():
-        hb_row = cursor.execute('SELECT last_heartbeat FROM agents WHERE id = ?', (agent_id,)).fetchone()
-        hb_dt = parse_sqlite_dt(hb_row[0]) if hb_row else None
-        heartbeat_active = (
-            hb_dt is not None and
-            now - hb_dt <= timedelta(minutes=SESSION_ACTIVE_MINUTES)
-        )
-        last_seen = get_openclaw_session_last_seen(agent_id) if runtime_supports_sessions() else None
-        session_active = (
-            last_seen is not None and
-            now - last_seen <= timedelta(minutes=SESSION_ACTIVE_MINUTES)
-        ) if runtime_supports_sessions() else False
-        runtime_active = (session_active or heartbeat_active) if runtime_supports_sessions() else heartbeat_active
-        last_update = parse_sqlite_dt(updated_at)
-        stale_update = (last_update is None) or (now - last_update > timedelta(minutes=SESSION_ACTIVE_MINUTES))
-        if (not runtime_active) and stale_update:
+    for task_id, agent_id, updated_at, last_hb in cursor.fetchall():
+        last_seen = sessions.get(agent_id) if sessions is not None else None
+        stale_update = not is_recent(parse_sqlite_dt(updated_at), now)
+        if not runtime_active(last_hb, last_seen, sessions, now) and stale_update:
             orphaned.append((task_id, agent_id))
 
-    for task_id, agent_id in orphaned:
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'todo',
-                started_at = NULL,
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id,))
-        cursor.execute('''
-            INSERT INTO task_history (task_id, agent_id, action, old_status, new_status, notes)
-            VALUES (?, ?, 'updated', 'in_progress', 'todo', 'Auto-reset: no active agent session')
-        ''', (task_id, agent_id))
-
-    conn.commit()
+    # Release the agents and requeue in one commit
+    TaskStateMachine(conn).apply_many([
+        (task_id, 'reset_stale', {'agent': agent_id, 'actor': agent_id,
+                                  'notes': 'Auto-reset: no active agent session'})
+        for task_id, agent_id in orphaned
+    ])
     conn.close()
 
     # Summarize active sessions
@@ -201,18 +160,12 @@ def sync_agent_states():
     agents = cursor.fetchall()
     conn.close()
     now = datetime.now()
-    active_count = 0
-    for agent_id, status, last_hb in agents:
-        if runtime_supports_sessions():
-            last_seen = get_openclaw_session_last_seen(agent_id)
-            if last_seen and now - last_seen <= timedelta(minutes=SESSION_ACTIVE_MINUTES):
-                active_count += 1
-        else:
-            # Runtime without session API: use DB heartbeat as liveness proxy.
-            hb_dt = parse_sqlite_dt(last_hb)
-            if hb_dt and now - hb_dt <= timedelta(minutes=SESSION_ACTIVE_MINUTES):
-                active_count += 1
-    metric = "sessions" if runtime_supports_sessions() else "heartbeats"
+    if sessions is not None:
+        active_count = sum(1 for agent_id, _, _ in agents if is_recent(sessions.get(agent_id), now))
+    else:
+        # Runtime without session API: use DB heartbeat as liveness proxy.
+        active_count = sum(1 for _, _, last_hb in agents if is_recent(parse_sqlite_dt(last_hb), now))
+    metric = "sessions" if sessions is not None else "heartbeats"
     print(f"\n📊 Active agent {metric} (last {SESSION_ACTIVE_MINUTES}m): {active_count}")
     
     print("\n" + "=" * 60)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+AI Team Alert Store
+Single alert deduplication store keyed by (alert_type, entity_id).
+Tracks first_seen / last_seen / last_alert / resolved_at, re-alerts with
+exponential backoff while a condition persists, and auto-resolves conditions
+that are no longer reported. Each reconcile is one read + one write batch.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from health_rules import THRESHOLDS
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+AlertKey = Tuple[str, str]
+
+
+class AlertStore:
+    """Deduplicated alert state with batched upserts and re-alert backoff"""
+
+    def __init__(self, conn: sqlite3.Connection,
+                 base_backoff_minutes: int = THRESHOLDS['alert_cooldown_minutes'],
+                 max_backoff_minutes: int = THRESHOLDS['alert_backoff_max_minutes']):
+        self.conn = conn
+        self.base_backoff_minutes = base_backoff_minutes
+        self.max_backoff_minutes = max_backoff_minutes
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        """Create alert_history or add columns missing from older versions"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                alert_type TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_alert DATETIME DEFAULT CURRENT_TIMESTAMP,
+                resolved BOOLEAN DEFAULT FALSE,
+                last_seen DATETIME,
+                resolved_at DATETIME,
+                alert_count INTEGER DEFAULT 1,
+                UNIQUE(alert_type, entity_id)
+            )
+        ''')
+        cursor.execute("PRAGMA table_info(alert_history)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'last_seen' not in columns:
+            cursor.execute("ALTER TABLE alert_history ADD COLUMN last_seen DATETIME")
+        if 'resolved_at' not in columns:
+            cursor.execute("ALTER TABLE alert_history ADD COLUMN resolved_at DATETIME")
+        if 'alert_count' not in columns:
+            cursor.execute("ALTER TABLE alert_history ADD COLUMN alert_count INTEGER DEFAULT 1")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alert_history_open
+            ON alert_history(resolved, alert_type)
+        ''')
+        self.conn.commit()
+
+    def backoff(self, alert_count: int) -> timedelta:
+        """Delay before re-alerting a condition already alerted alert_count times"""
+        minutes = self.base_backoff_minutes * (2 ** max((alert_count or 1) - 1, 0))
+        return timedelta(minutes=min(minutes, self.max_backoff_minutes))
+
+    def reconcile(self, active: Iterable[AlertKey], alert_types: Optional[Iterable[str]] = None,
+                  now: Optional[datetime] = None) -> Set[AlertKey]:
+        """
+        Record the currently active conditions and return the keys that are due
+        for an alert (new, re-opened, or past their backoff). Unresolved alerts of
+        `alert_types` that are no longer active are marked resolved.
+        """
+        now = now or datetime.now()
+        now_str = now.strftime(TS_FORMAT)
+        active = set(active)
+        scope = set(alert_types) if alert_types is not None else {k[0] for k in active}
+        types = scope | {k[0] for k in active}
+        if not types:
+            return set()
+
+        cursor = self.conn.cursor()
+        placeholders = ",".join(["?"] * len(types))
+        cursor.execute(f'''
+            SELECT alert_type, entity_id, last_alert, resolved, alert_count
+            FROM alert_history
+            WHERE alert_type IN ({placeholders})
+        ''', list(types))
+        existing = {(row[0], row[1]): row for row in cursor.fetchall()}
+
+        due: Set[AlertKey] = set()
+        upserts = []
+        for key in active:
+            row = existing.get(key)
+            if row is None or row[3]:
+                due.add(key)
+                upserts.append((key[0], key[1], now_str, now_str, now_str, 1, 1))
+                continue
+            alert_count = row[4] or 1
+            last_alert = _parse_ts(row[2])
+            if last_alert is None or now - last_alert >= self.backoff(alert_count):
+                due.add(key)
+                upserts.append((key[0], key[1], now_str, now_str, now_str, alert_count + 1, 0))
+            else:
+                upserts.append((key[0], key[1], now_str, now_str, row[2], alert_count, 0))
+
+        resolves = [
+            (now_str, key[0], key[1])
+            for key, row in existing.items()
+            if not row[3] and key not in active and key[0] in scope
+        ]
+
+        self._write(upserts, resolves)
+        return due
+
+    def _write(self, upserts: List[Tuple], resolves: List[Tuple]):
+        if not upserts and not resolves:
+            return
+        cursor = self.conn.cursor()
+        if upserts:
+            # Params: type, entity, first_seen, last_seen, last_alert, alert_count, reopened
+            cursor.executemany('''
+                INSERT INTO alert_history
+                    (alert_type, entity_id, first_seen, last_seen, last_alert, alert_count, resolved, resolved_at)
+                VALUES (?1, ?2, ?3, ?4, ?5, ?6, FALSE, NULL)
+                ON CONFLICT(alert_type, entity_id) DO UPDATE SET
+                    first_seen = CASE WHEN ?7 THEN excluded.first_seen ELSE alert_history.first_seen END,
+                    last_seen = excluded.last_seen,
+                    last_alert = excluded.last_alert,
+                    alert_count = excluded.alert_count,
+                    resolved = FALSE,
+                    resolved_at = NULL
+            ''', upserts)
+        if resolves:
+            cursor.executemany('''
+                UPDATE alert_history
+                SET resolved = TRUE, resolved_at = ?
+                WHERE alert_type = ? AND entity_id = ? AND resolved = FALSE
+            ''', resolves)
+        self.conn.commit()
+
+    def resolve(self, alert_type: str, entity_id: str):
+        """Mark a single alert as resolved"""
+        self._write([], [(datetime.now().strftime(TS_FORMAT), alert_type, entity_id)])
+
+    def cleanup(self, hours: int = 24) -> int:
+        """Remove resolved alerts older than N hours"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).strftime(TS_FORMAT)
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            DELETE FROM alert_history
+            WHERE resolved = TRUE
+            AND COALESCE(resolved_at, last_alert) < ?
+        ''', (cutoff,))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def recent(self, hours: int = 24) -> List[Dict]:
+        """Alerts sent within the last N hours, newest first"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).strftime(TS_FORMAT)
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT alert_type, entity_id, first_seen, last_seen, last_alert,
+                   resolved, resolved_at, alert_count
+            FROM alert_history
+            WHERE last_alert > ?
+            ORDER BY last_alert DESC
+        ''', (cutoff,))
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Alert Store')
+    parser.add_argument('--recent', type=int, nargs='?', const=24, help='Show alerts from the last N hours')
+    parser.add_argument('--cleanup', type=int, nargs='?', const=24, help='Delete resolved alerts older than N hours')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    store = AlertStore(conn)
+    try:
+        if args.cleanup is not None:
+            print(f"🧹 Removed {store.cleanup(args.cleanup)} resolved alerts")
+        else:
+            hours = args.recent or 24
+            alerts = store.recent(hours)
+            print(f"🚨 Alerts ({hours}h): {len(alerts)}")
+            for alert in alerts:
+                state = "✅ resolved" if alert['resolved'] else "🔴 open"
+                print(f"  {alert['last_alert']} | {alert['alert_type']}:{alert['entity_id']} "
+                      f"x{alert['alert_count']} | {state}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,234 @@
 #!/usr/bin/env python3
 """
 AI Team Audit Log
-Log all significant system events for debugging and compliance
+Log all significant system events for debugging and compliance.
+Events are stored in monthly partitions (audit_log_YYYYMM, by UTC timestamp)
+indexed on (agent_id, timestamp) and (task_id, timestamp); the original
+audit_log table is kept as the oldest partition. Queries only touch the
+partitions that overlap the requested date range, newest first.
 """
 
-import sqlite3
+import atexit
 import json
-from datetime import datetime
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Optional, Union
 
 DB_PATH = Path(__file__).parent / "team.db"
 AUDIT_LOG_FILE = Path(__file__).parent / "logs" / "audit.log"
+AUDIT_BATCH_SIZE = int(os.getenv("AI_TEAM_AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AI_TEAM_AUDIT_FLUSH_SECONDS", "2"))
+LEGACY_TABLE = "audit_log"
+PARTITION_PREFIX = "audit_log_"
+AUDIT_COLUMNS = ("timestamp", "event_type", "agent_id", "task_id", "details",
+                 "before_state", "after_state", "session_key")
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+TimeBound = Union[str, datetime, None]
+
+
+def partition_name(timestamp: str) -> str:
+    """audit_log_YYYYMM for a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+    return f"{PARTITION_PREFIX}{timestamp[:4]}{timestamp[5:7]}"
+
+
+def ensure_partition(conn: sqlite3.Connection, table: str):
+    """Create one audit partition (same columns as audit_log) and its indexes"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            event_type TEXT NOT NULL,
+            agent_id TEXT,
+            task_id TEXT,
+            details TEXT,
+            before_state TEXT,
+            after_state TEXT,
+            ip_address TEXT,
+            session_key TEXT
+        )
+    ''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_agent ON {table}(agent_id, timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_task ON {table}(task_id, timestamp)")
+
+
+def _utc_bound(value: TimeBound) -> Optional[str]:
+    """Normalize a range bound to the stored UTC text format (naive datetimes are local time)"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.astimezone(timezone.utc).strftime(TS_FORMAT)
+
+
+class AuditPipeline:
+    """
+    Buffers audit events in memory and writes them in batches: one executemany
+    transaction for the DB and one buffered write for the text log. Flushes
+    when the buffer reaches batch_size, every flush_interval seconds from a
+    background thread, on read, and at interpreter exit.
+    """
+
+    def __init__(self, db_path: Path, log_file: Path,
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.log_file = log_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows: List[tuple] = []
+        self._lines: List[str] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self.init_table()
+        atexit.register(self.flush)
+
+    def init_table(self):
+        """Create the legacy table and indexes; load the partition list"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            ensure_partition(conn, LEGACY_TABLE)
+            self.partitions = {
+                row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                    (PARTITION_PREFIX + "[0-9][0-9][0-9][0-9][0-9][0-9]",))
+            }
+            # Legacy rows are never appended to any more, so its range is fixed
+            self.legacy_max = conn.execute(f"SELECT MAX(timestamp) FROM {LEGACY_TABLE}").fetchone()[0]
+            self._refresh_view(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _refresh_view(self, conn: sqlite3.Connection):
+        """audit_events: UNION ALL over every partition for ad-hoc SQL"""
+        columns = ", ".join(AUDIT_COLUMNS)
+        selects = [f"SELECT id, {columns} FROM {t}" for t in [LEGACY_TABLE, *sorted(self.partitions)]]
+        sql = "CREATE VIEW audit_events AS " + " UNION ALL ".join(selects)
+        current = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'audit_events'").fetchone()
+        if current and current[0] == sql:
+            # Unchanged: skip the schema write (it would invalidate other connections' statements)
+            return
+        conn.execute("DROP VIEW IF EXISTS audit_events")
+        conn.execute(sql)
+
+    def tables_for_range(self, start: Optional[str], end: Optional[str]) -> List[str]:
+        """Partitions overlapping [start, end], newest first; legacy table last"""
+        low = partition_name(start) if start else None
+        high = partition_name(end) if end else None
+        tables = [
+            t for t in sorted(self.partitions, reverse=True)
+            if (low is None or t >= low) and (high is None or t <= high)
+        ]
+        if self.legacy_max is not None and (start is None or self.legacy_max >= start):
+            tables.append(LEGACY_TABLE)
+        return tables
+
+    def append(self, row: tuple, line: str):
+        with self._lock:
+            self._rows.append(row)
+            self._lines.append(line)
+            pending = len(self._rows)
+        if pending >= self.batch_size:
+            self._wake.set()
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered events; returns number of events flushed"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                lines, self._lines = self._lines, []
+            if not rows:
+                return 0
+            try:
+                conn = sqlite3.connect(str(self.db_path), timeout=10)
+                try:
+                    by_partition: Dict[str, List[tuple]] = {}
+                    for row in rows:
+                        by_partition.setdefault(partition_name(row[0]), []).append(row)
+                    new_partitions = set(by_partition) - self.partitions
+                    for table in new_partitions:
+                        ensure_partition(conn, table)
+                    for table, batch in by_partition.items():
+                        conn.executemany(f'''
+                            INSERT INTO {table} ({", ".join(AUDIT_COLUMNS)})
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', batch)
+                    if new_partitions:
+                        self.partitions |= new_partitions
+                        self._refresh_view(conn)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                # Keep events for the next attempt rather than dropping them
+                with self._lock:
+                    self._rows[:0] = rows
+                print(f"[Audit Error] Flush failed: {e}")
+            self._write_lines(lines)
+            return len(rows)
+
+    def _write_lines(self, lines: List[str]):
+        try:
+            if self._file is None:
+                self.log_file.parent.mkdir(exist_ok=True)
+                self._file = open(self.log_file, 'a', buffering=64 * 1024)
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+        except OSError as e:
+            print(f"[Audit Error] Log file write failed: {e}")
+
+
+_pipelines: Dict[tuple, AuditPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(db_path: Path = DB_PATH, log_file: Path = AUDIT_LOG_FILE) -> AuditPipeline:
+    """Shared pipeline per (db, log file): schema setup runs once per process"""
+    key = (str(db_path), str(log_file))
+    with _pipelines_lock:
+        pipeline = _pipelines.get(key)
+        if pipeline is None:
+            pipeline = _pipelines[key] = AuditPipeline(db_path, log_file)
+        return pipeline
+
 
 class AuditLogger:
     """Centralized audit logging for AI Team System"""
     
-    def __init__(self):
-        self.db_path = DB_PATH
-        self.log_file = AUDIT_LOG_FILE
-        self.log_file.parent.mkdir(exist_ok=True)
-        self.init_table()
-    
-    def init_table(self):
-        """Create audit log table if not exists"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                event_type TEXT NOT NULL,
-                agent_id TEXT,
-                task_id TEXT,
-                details TEXT,
-                before_state TEXT,
-                after_state TEXT,
-                ip_address TEXT,
-                session_key TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    def __init__(self, db_path: Path = DB_PATH, log_file: Path = AUDIT_LOG_FILE):
+        self.db_path = db_path
+        self.log_file = log_file
+        self.pipeline = get_pipeline(db_path, log_file)
     
     def log(self, event_type: str, agent_id: str = None, task_id: str = None,
             details: str = "", before_state: dict = None, after_state: dict = None,
             session_key: str = None):
-        """Log an audit event"""
-        
-        # Log to database with timeout
-        conn = sqlite3.connect(str(self.db_path), timeout=10)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO audit_log 
-            (event_type, agent_id, task_id, details, before_state, after_state, session_key)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        """Log an audit event (buffered; written by the pipeline)"""
+        now = time.time()
+        row = (
+            # Same UTC format as the column's CURRENT_TIMESTAMP default
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now)),
             event_type,
             agent_id,
             task_id,
@@ -63,23 +236,21 @@ class AuditLogger:
             json.dumps(before_state) if before_state else None,
             json.dumps(after_state) if after_state else None,
             session_key
-        ))
-        
-        conn.commit()
-        conn.close()
-        
-        # Also log to file
-        timestamp = datetime.now().isoformat()
-        log_entry = f"[{timestamp}] {event_type}"
+        )
+
+        log_entry = f"[{datetime.fromtimestamp(now).isoformat()}] {event_type}"
         if agent_id:
             log_entry += f" | Agent: {agent_id}"
         if task_id:
             log_entry += f" | Task: {task_id}"
         if details:
             log_entry += f" | {details}"
-        
-        with open(self.log_file, 'a') as f:
-            f.write(log_entry + '\n')
+
+        self.pipeline.append(row, log_entry)
+
+    def flush(self) -> int:
+        """Write buffered events now"""
+        return self.pipeline.flush()
     
     def log_spawn(self, agent_id: str, task_id: str, success: bool, session_key: str = None, error: str = None):
         """Log agent spawn event"""
@@ -137,44 +308,73 @@ class AuditLogger:
             details=f"Operation: {operation}, Queue ID: {queue_id}, Attempt: {retry_count}, Success: {success}"
         )
     
+    def query(self, start: TimeBound = None, end: TimeBound = None, agent_id: str = None,
+              task_id: str = None, event_types: List[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        Newest-first events in [start, end] (UTC text or datetime). Only partitions
+        overlapping the range are read, and reading stops once `limit` is reached.
+        """
+        self.flush()
+        start, end = _utc_bound(start), _utc_bound(end)
+        where, params = [], []
+        if start:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp <= ?")
+            params.append(end)
+        if agent_id:
+            where.append("agent_id = ?")
+            params.append(agent_id)
+        if task_id:
+            where.append("task_id = ?")
+            params.append(task_id)
+        if event_types:
+            where.append(f"event_type IN ({','.join(['?'] * len(event_types))})")
+            params.extend(event_types)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        events: List[Dict] = []
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            for table in self.pipeline.tables_for_range(start, end):
+                remaining = limit - len(events)
+                if remaining <= 0:
+                    break
+                rows = conn.execute(f'''
+                    SELECT {", ".join(AUDIT_COLUMNS)}
+                    FROM {table}
+                    {clause}
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                ''', params + [remaining]).fetchall()
+                events.extend(dict(row) for row in rows)
+        finally:
+            conn.close()
+        return events
+
     def get_recent_events(self, limit: int = 50):
         """Get recent audit events"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT timestamp, event_type, agent_id, task_id, details
-            FROM audit_log
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (limit,))
-        
-        events = cursor.fetchall()
-        conn.close()
-        return events
-    
+        return [(e['timestamp'], e['event_type'], e['agent_id'], e['task_id'], e['details'])
+                for e in self.query(limit=limit)]
+
     def get_agent_activity(self, agent_id: str, limit: int = 20):
         """Get activity for specific agent"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT timestamp, event_type, task_id, details
-            FROM audit_log
-            WHERE agent_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (agent_id, limit))
-        
-        events = cursor.fetchall()
-        conn.close()
-        return events
+        return [(e['timestamp'], e['event_type'], e['task_id'], e['details'])
+                for e in self.query(agent_id=agent_id, limit=limit)]
+
+    def get_task_activity(self, task_id: str, limit: int = 20):
+        """Get activity for specific task"""
+        return [(e['timestamp'], e['event_type'], e['agent_id'], e['details'])
+                for e in self.query(task_id=task_id, limit=limit)]
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='AI Team Audit Log')
     parser.add_argument('--recent', type=int, help='Show recent events')
     parser.add_argument('--agent', help='Show activity for specific agent')
+    parser.add_argument('--task', help='Show activity for specific task')
     
     args = parser.parse_args()
     
@@ -185,6 +385,11 @@ def main():
         print(f"Activity for {args.agent}:")
         for event in events:
             print(f"  {event[0]} | {event[1]} | Task: {event[2]} | {event[3]}")
+    elif args.task:
+        events = logger.get_task_activity(args.task, args.recent or 20)
+        print(f"Activity for {args.task}:")
+        for event in events:
+            print(f"  {event[0]} | {event[1]} | Agent: {event[2]} | {event[3]}")
     elif args.recent:
         events = logger.get_recent_events(args.recent)
         print("Recent events:")
@@ -194,6 +399,7 @@ def main():
         print("Usage:")
         print("  audit_log.py --recent 20")
         print("  audit_log.py --agent pm --recent 10")
+        print("  audit_log.py --task T-20260205-001")
 
 if __name__ == '__main__':
     main()
@@ -11,6 +11,9 @@ from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 from agent_runtime import spawn_agent, get_runtime
+from context_retrieval import retrieve_cached
+from prompt_builder import PromptTemplate
+from task_dag import READY_SQL, ensure_schema as ensure_dag_schema
 import time
 
 os.environ['TZ'] = 'Asia/Bangkok'
@@ -41,11 +44,84 @@ ROLE_MATCH = {
     'review': ['qa', 'qa-2', 'qa-3', 'qa-4'],
 }
 
+TASK_ASSIGNMENT = PromptTemplate('task_assignment', """## Task Assignment
+
+**Agent:** {agent_name} ({agent_role})
+**Task:** {task_id} - {title}
+
+### 📁 WORKING DIRECTORY (REQUIRED)
+**You MUST work in:** `{working_dir}`
+
+**Before doing ANYTHING:**
+```bash
+cd {working_dir}
+```
+
+**NEVER create files outside this directory!**
+
+### Your Context
+{context}
+
+### Your Learnings
+{learnings}
+
+### Related Past Work
+{related}
+
+### Task Details
+- **Description:** {description}
+- **Priority:** {priority}
+- **Expected Outcome:** {expected_outcome}
+
+### 📌 Last Review Feedback (if any)
+{review_feedback}
+
+**Feedback Time:** {review_feedback_at}
+
+### ✅ Prerequisites (must check 1-by-1 BEFORE starting)
+{prerequisites}
+
+If prerequisites are a checklist, mark each item:
+```bash
+python3 {base_dir}/team_db.py task check {task_id} --field prerequisites --index <n> --done
+```
+**HUMAN-only prerequisites** are marked with `@human` / `HUMAN:` / `🔒`.
+Do **NOT** check those as an agent. Instead, requeue the task and ask for the missing info.
+
+If any prerequisite is NOT met, stop work and send back to todo with clear reason:
+```bash
+python3 {base_dir}/team_db.py task requeue {task_id} --reason "Prerequisite not met: <reason (include exact detail)>"
+```
+
+### ✅ Acceptance Criteria (review will require all checked)
+{acceptance_criteria}
+
+### Prerequisites (Check before starting)
+{prerequisites_spec}
+
+### Acceptance Criteria (Must complete all)
+{acceptance_criteria_spec}
+
+### Instructions
+1. **cd {working_dir}** - Go to working directory FIRST
+2. Review prerequisites - ensure all are met
+3. Start task: python3 {base_dir}/team_db.py task start {task_id}
+4. Work on the task using your expertise
+5. Update progress regularly
+6. When done: python3 {base_dir}/team_db.py task done {task_id}
+7. Document learnings in your context
+
+**Remember:** You are {agent_name}. Use your expertise and context to complete this task effectively.
+**CRITICAL:** Always work in `{working_dir}` - never anywhere else!
+""")
+
+
 class AutoAssign:
     def __init__(self, db_path: Path = DB_PATH):
         self.db_path = db_path
         self.conn = sqlite3.connect(str(db_path))
         self.conn.row_factory = sqlite3.Row
+        ensure_dag_schema(self.conn)
         
     def close(self):
         self.conn.close()
@@ -124,9 +200,9 @@ class AutoAssign:
         return len(agent_ids)
 
     def get_assigned_todo_tasks_for_idle_agents(self) -> List[Dict]:
-        """Get todo tasks already assigned to idle agents (needs (re)spawn)."""
+        """Get todo tasks already assigned to idle agents (needs (re)spawn), dependencies done."""
         cursor = self.conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT t.id, t.title, t.description, t.priority, t.project_id,
                    t.prerequisites, t.acceptance_criteria, t.expected_outcome, t.working_dir,
                    t.review_feedback, t.review_feedback_at,
@@ -138,6 +214,7 @@ class AutoAssign:
             JOIN agents a ON t.assignee_id = a.id
             LEFT JOIN agent_context ac ON a.id = ac.agent_id
             WHERE t.status = 'todo'
+              AND {READY_SQL}
               AND a.status = 'idle'
               AND (t.updated_at IS NULL OR t.updated_at < datetime('now', 'localtime', '-15 seconds'))
             ORDER BY
@@ -152,14 +229,15 @@ class AutoAssign:
         return [dict(row) for row in cursor.fetchall()]
 
     def get_unassigned_todo_tasks(self) -> List[Dict]:
-        """Get todo tasks without assignee, sorted by priority"""
+        """Get ready todo tasks (dependencies done) without assignee, sorted by priority"""
         cursor = self.conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT t.id, t.title, t.description, t.priority, t.project_id,
                    t.prerequisites, t.acceptance_criteria, t.expected_outcome, t.working_dir,
                    t.review_feedback, t.review_feedback_at
             FROM tasks t
             WHERE t.status = 'todo'
+            AND {READY_SQL}
             AND (t.assignee_id IS NULL OR t.assignee_id = '')
             ORDER BY 
                 CASE t.priority 
@@ -247,79 +325,30 @@ class AutoAssign:
     def spawn_subagent(self, task: Dict, agent: Dict) -> bool:
         """Spawn subagent via openclaw with full context"""
         try:
-            # Build context-aware task message
-            context = agent.get('context', '')
-            learnings = agent.get('learnings', '')
+            # Build context-aware task message (only the context relevant to this task)
+            relevant = retrieve_cached(self.conn, agent['id'], task, scope=str(self.db_path))
             working_dir = task.get('working_dir', '/Users/ngs/clawd')
-            base_dir = str(Path(__file__).parent)
-            
-            task_message = f"""## Task Assignment
-
-**Agent:** {agent['name']} ({agent['role']})
-**Task:** {task['id']} - {task['title']}
-
-### 📁 WORKING DIRECTORY (REQUIRED)
-**You MUST work in:** `{working_dir}`
-
-**Before doing ANYTHING:**
-```bash
-cd {working_dir}
-```
-
-**NEVER create files outside this directory!**
-
-### Your Context
-{context}
-
-### Your Learnings
-{learnings}
-
-### Task Details
-- **Description:** {task.get('description', 'N/A')}
-- **Priority:** {task['priority']}
-- **Expected Outcome:** {task.get('expected_outcome', 'N/A')}
-
-### 📌 Last Review Feedback (if any)
-{task.get('review_feedback') or 'N/A'}
-
-**Feedback Time:** {task.get('review_feedback_at') or 'N/A'}
-
-### ✅ Prerequisites (must check 1-by-1 BEFORE starting)
-{task.get('prerequisites') or 'N/A'}
-
-If prerequisites are a checklist, mark each item:
-```bash
-python3 {base_dir}/team_db.py task check {task['id']} --field prerequisites --index <n> --done
-```
-**HUMAN-only prerequisites** are marked with `@human` / `HUMAN:` / `🔒`.
-Do **NOT** check those as an agent. Instead, requeue the task and ask for the missing info.
-
-If any prerequisite is NOT met, stop work and send back to todo with clear reason:
-```bash
-python3 {base_dir}/team_db.py task requeue {task['id']} --reason "Prerequisite not met: <reason (include exact detail)>"
-```
-
-### ✅ Acceptance Criteria (review will require all checked)
-{task.get('acceptance_criteria') or 'N/A'}
-
-### Prerequisites (Check before starting)
-{task.get('prerequisites', 'None specified')}
-
-### Acceptance Criteria (Must complete all)
-{task.get('acceptance_criteria', 'None specified')}
-
-### Instructions
-1. **cd {working_dir}** - Go to working directory FIRST
-2. Review prerequisites - ensure all are met
-3. Start task: python3 {base_dir}/team_db.py task start {task['id']}
-4. Work on the task using your expertise
-5. Update progress regularly
-6. When done: python3 {base_dir}/team_db.py task done {task['id']}
-7. Document learnings in your context
-
-**Remember:** You are {agent['name']}. Use your expertise and context to complete this task effectively.
-**CRITICAL:** Always work in `{working_dir}` - never anywhere else!
-"""
+            task_message = TASK_ASSIGNMENT.render(
+                cache_key=(task['id'], agent['id']),
+                agent_name=agent['name'],
+                agent_role=agent['role'],
+                task_id=task['id'],
+                title=task['title'],
+                priority=task['priority'],
+                working_dir=working_dir,
+                base_dir=str(Path(__file__).parent),
+                context=relevant['context'],
+                learnings=relevant['learnings'],
+                related=relevant['related'] or 'N/A',
+                description=task.get('description', 'N/A'),
+                expected_outcome=task.get('expected_outcome', 'N/A'),
+                review_feedback=task.get('review_feedback') or 'N/A',
+                review_feedback_at=task.get('review_feedback_at') or 'N/A',
+                prerequisites=task.get('prerequisites') or 'N/A',
+                acceptance_criteria=task.get('acceptance_criteria') or 'N/A',
+                prerequisites_spec=task.get('prerequisites', 'None specified'),
+                acceptance_criteria_spec=task.get('acceptance_criteria', 'None specified'),
+            )
 
             # Spawn subagent via configured runtime (detached)
             import time
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+AI Team Checklist Store
+Prerequisites / acceptance criteria compiled once into rows
+(task_id, field, idx, text, checked, human_only) instead of regex-parsing the
+markdown on every transition. The markdown columns on tasks stay the source
+people edit and the rendered view: a trigger drops a field's compiled rows
+whenever its text changes, and they are recompiled on next use. Gates are
+indexed count queries; review gating for every task in a status is one query.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+FIELDS = ('prerequisites', 'acceptance_criteria')
+CHECKLIST_RE = re.compile(r'^\s*[-*]\s+\[(x| )\]\s+(.*)$', re.IGNORECASE)
+BOX_RE = re.compile(r'\[[xX ]\]')
+
+
+def is_human_only(label: str) -> bool:
+    """Marker for prerequisites that only a human can satisfy/check."""
+    if not label:
+        return False
+    s = label.lower()
+    return ("@human" in s) or ("human-only" in s) or ("🔒" in label) or s.startswith("human:")
+
+
+def parse_checklist(text: str) -> List[Dict]:
+    """Markdown `- [ ] item` / `- [x] item` lines in order (index is 1-based)"""
+    items = []
+    if not text:
+        return items
+    for idx, line in enumerate(text.splitlines()):
+        m = CHECKLIST_RE.match(line)
+        if not m:
+            continue
+        items.append({
+            'index': len(items) + 1,
+            'checked': m.group(1).lower() == 'x',
+            'text': m.group(2).strip(),
+            'line_idx': idx,
+            'line': line
+        })
+    return items
+
+
+def unchecked_labels(text: str) -> List[str]:
+    return [i['text'] for i in parse_checklist(text) if not i['checked']]
+
+
+def render_checked(text: str, line_idx: int, checked: bool) -> str:
+    """The markdown with one item's box flipped"""
+    lines = text.splitlines()
+    lines[line_idx] = BOX_RE.sub("[x]" if checked else "[ ]", lines[line_idx], count=1)
+    return "\n".join(lines)
+
+
+class ChecklistStore:
+    """Compiled checklist rows with lazy (re)compilation from the markdown columns"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        existing = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        if 'tr_checklist_task_deleted' in existing:
+            return
+        # One marker row per compiled (task, field); absent = needs compiling
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS task_checklists (
+                task_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                item_count INTEGER NOT NULL,
+                compiled_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (task_id, field)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS task_checklist_items (
+                task_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                checked INTEGER NOT NULL DEFAULT 0,
+                human_only INTEGER NOT NULL DEFAULT 0,
+                line_idx INTEGER NOT NULL,
+                PRIMARY KEY (task_id, field, idx)
+            ) WITHOUT ROWID
+        ''')
+        # Batch gates look up open items by field across many tasks
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_checklist_items_open
+            ON task_checklist_items(field, task_id) WHERE checked = 0
+        ''')
+        for field in FIELDS:
+            self.conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS tr_checklist_{field}_changed
+                AFTER UPDATE OF {field} ON tasks
+                WHEN NEW.{field} IS NOT OLD.{field}
+                BEGIN
+                    DELETE FROM task_checklist_items WHERE task_id = NEW.id AND field = '{field}';
+                    DELETE FROM task_checklists WHERE task_id = NEW.id AND field = '{field}';
+                END
+            ''')
+        self.conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS tr_checklist_task_deleted
+            AFTER DELETE ON tasks
+            BEGIN
+                DELETE FROM task_checklist_items WHERE task_id = OLD.id;
+                DELETE FROM task_checklists WHERE task_id = OLD.id;
+            END
+        ''')
+        self.conn.commit()
+
+    # ========== Compilation ==========
+
+    def compile(self, task_ids: Optional[Iterable[str]] = None, status: Optional[Iterable[str]] = None) -> int:
+        """
+        Compile fields that have no rows yet (new tasks, edited text), limited to
+        task_ids or tasks in the given statuses. Joins the caller's transaction.
+        Returns fields compiled.
+        """
+        where, params = [], []
+        if task_ids is not None:
+            ids = list(task_ids)
+            if not ids:
+                return 0
+            where.append(f"t.id IN ({','.join('?' * len(ids))})")
+            params += ids
+        if status:
+            statuses = list(status)
+            where.append(f"t.status IN ({','.join('?' * len(statuses))})")
+            params += statuses
+        selects = [f'''
+            SELECT t.id, '{field}', t.{field} FROM tasks t
+            WHERE {' AND '.join(where + [f"NOT EXISTS (SELECT 1 FROM task_checklists c WHERE c.task_id = t.id AND c.field = '{field}')"])}
+        ''' for field in FIELDS]
+        stale = self.conn.execute(' UNION ALL '.join(selects), params * len(FIELDS)).fetchall()
+        if not stale:
+            return 0
+        items, markers = [], []
+        for task_id, field, text in stale:
+            parsed = parse_checklist(text or '')
+            markers.append((task_id, field, len(parsed)))
+            items += [(task_id, field, i['index'], i['text'], int(i['checked']),
+                       int(is_human_only(i['text'])), i['line_idx']) for i in parsed]
+        self.conn.executemany('''
+            INSERT OR REPLACE INTO task_checklist_items
+            (task_id, field, idx, text, checked, human_only, line_idx) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', items)
+        self.conn.executemany('''
+            INSERT OR REPLACE INTO task_checklists (task_id, field, item_count) VALUES (?, ?, ?)
+        ''', markers)
+        return len(markers)
+
+    # ========== Gates ==========
+
+    def gate(self, task_id: str, field: str) -> Tuple[int, List[str]]:
+        """(item count, unchecked labels) for one field; compiled on first use"""
+        row = self.conn.execute(
+            "SELECT item_count FROM task_checklists WHERE task_id = ? AND field = ?", (task_id, field)).fetchone()
+        if row is None:
+            own = not self.conn.in_transaction
+            self.compile([task_id])
+            if own:
+                self.conn.commit()
+            row = self.conn.execute(
+                "SELECT item_count FROM task_checklists WHERE task_id = ? AND field = ?", (task_id, field)).fetchone()
+        if not row or not row[0]:
+            return 0, []
+        unchecked = [r[0] for r in self.conn.execute('''
+            SELECT text FROM task_checklist_items
+            WHERE task_id = ? AND field = ? AND checked = 0
+            ORDER BY idx
+        ''', (task_id, field))]
+        return row[0], unchecked
+
+    def items(self, task_id: str, field: str) -> List[Dict]:
+        self.gate(task_id, field)
+        cursor = self.conn.execute('''
+            SELECT idx AS "index", text, checked, human_only, line_idx FROM task_checklist_items
+            WHERE task_id = ? AND field = ? ORDER BY idx
+        ''', (task_id, field))
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def open_items(self, statuses: Iterable[str] = ('review', 'reviewing'),
+                   field: str = 'prerequisites') -> Dict[str, List[Dict]]:
+        """
+        Unchecked items of `field` for every task in the given statuses, in one
+        query (stale tasks among them are compiled first). Tasks with everything
+        checked, or without a checklist, are absent.
+        """
+        statuses = list(statuses)
+        self.compile(status=statuses)
+        self.conn.commit()
+        result: Dict[str, List[Dict]] = {}
+        for task_id, text, human_only in self.conn.execute(f'''
+            SELECT i.task_id, i.text, i.human_only
+            FROM task_checklist_items i
+            JOIN tasks t ON t.id = i.task_id
+            WHERE i.field = ? AND i.checked = 0
+              AND t.status IN ({','.join('?' * len(statuses))})
+            ORDER BY i.task_id, i.idx
+        ''', [field] + statuses):
+            result.setdefault(task_id, []).append({'text': text, 'human_only': bool(human_only)})
+        return result
+
+    def malformed(self, task_ids: List[str]) -> List[Tuple[str, str]]:
+        """(task_id, field) whose text is set but holds no checklist items"""
+        if not task_ids:
+            return []
+        self.compile(task_ids)
+        self.conn.commit()
+        return [(row[0], row[1]) for row in self.conn.execute(f'''
+            SELECT c.task_id, c.field FROM task_checklists c
+            JOIN tasks t ON t.id = c.task_id
+            WHERE c.item_count = 0 AND c.task_id IN ({','.join('?' * len(task_ids))})
+              AND TRIM(COALESCE(CASE c.field WHEN 'prerequisites' THEN t.prerequisites
+                                             ELSE t.acceptance_criteria END, '')) != ''
+            ORDER BY c.task_id
+        ''', task_ids)]
+
+    # ========== Updates ==========
+
+    def set_checked(self, task_id: str, field: str, index: int, checked: bool) -> Dict:
+        """
+        Tick/untick one item: rewrites that line of the markdown and the item row
+        (caller commits). Returns the item; ValueError if out of range.
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown checklist field: {field}")
+        row = self.conn.execute(f"SELECT {field} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Task {task_id} not found")
+        text = row[0] or ''
+        if not text:
+            raise ValueError("Checklist text is empty")
+        total, _ = self.gate(task_id, field)
+        if index < 1 or index > total:
+            raise ValueError(f"Checklist index out of range: {index}")
+        item = self.conn.execute('''
+            SELECT idx, text, checked, human_only, line_idx FROM task_checklist_items
+            WHERE task_id = ? AND field = ? AND idx = ?
+        ''', (task_id, field, index)).fetchone()
+        rendered = render_checked(text, item[4], checked)
+        # The text trigger drops the compiled rows; write them back unchanged but this item
+        self.conn.execute(f'''
+            UPDATE tasks SET {field} = ?, updated_at = datetime('now', 'localtime') WHERE id = ?
+        ''', (rendered, task_id))
+        self.compile([task_id])
+        return {'index': item[0], 'text': item[1], 'checked': checked, 'human_only': bool(item[3])}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Checklist Store')
+    sub = parser.add_subparsers(dest='command')
+    show = sub.add_parser('show', help='Compiled checklist of a task')
+    show.add_argument('task_id')
+    sub.add_parser('compile', help='Compile every task that has no rows yet')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        store = ChecklistStore(conn)
+        if args.command == 'show':
+            for field in FIELDS:
+                print(f"📋 {field}:")
+                for item in store.items(args.task_id, field):
+                    print(f"  {item['index']}. [{'x' if item['checked'] else ' '}] {item['text']}"
+                          f"{' 🔒' if item['human_only'] else ''}")
+            conn.commit()
+        elif args.command == 'compile':
+            n = store.compile()
+            conn.commit()
+            print(f"✅ {n} checklists compiled")
+        else:
+            parser.print_help()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
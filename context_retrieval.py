@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+AI Team Context Retrieval
+Picks the parts of an agent's memory that matter for one task instead of
+pasting the whole context/learnings blob into every spawn prompt. Learnings,
+past task outcomes and review feedback come from the FTS5 search index
+(BM25 against the task's own text); everything is packed under a token budget.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from learnings_store import LearningStore
+from search_index import SearchIndex, to_match_query
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+TOKEN_BUDGET = int(os.getenv("AI_TEAM_CONTEXT_TOKEN_BUDGET", "1200"))
+# Budget shares: context first, related work reserved last, learnings get the rest
+# (anything a section leaves unused rolls over to the next one)
+CONTEXT_SHARE = 0.35
+RELATED_SHARE = 0.25
+MAX_QUERY_TERMS = 24
+CANDIDATES = 30
+# Seconds a retrieved context stays valid for re-dispatch of the same task revision
+CACHE_TTL = int(os.getenv("AI_TEAM_CONTEXT_CACHE_TTL", "600"))
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'into', 'are', 'was', 'will',
+    'all', 'any', 'use', 'using', 'should', 'must', 'can', 'not', 'per', 'each', 'via',
+    'task', 'tasks', 'create', 'add', 'update', 'make', 'new', 'n/a',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token for Latin text, ~1 per Thai syllable run)"""
+    if not text:
+        return 0
+    thai = len(re.findall(r'[\u0e00-\u0e7f]', text))
+    return (len(text) - thai) // 4 + thai // 2 + 1
+
+
+def task_terms(task: Dict) -> List[str]:
+    """Distinct, non-trivial words from the task's title and details, title first"""
+    seen, terms = set(), []
+    for field in ('title', 'description', 'expected_outcome', 'acceptance_criteria'):
+        for word in re.findall(r'\w+', task.get(field) or '', re.UNICODE):
+            key = word.lower()
+            if len(key) < 3 or key.isdigit() or key in STOPWORDS or key in seen:
+                continue
+            seen.add(key)
+            terms.append(word)
+            if len(terms) >= MAX_QUERY_TERMS:
+                return terms
+    return terms
+
+
+def _pack(lines: List[str], budget: int) -> Tuple[List[str], int]:
+    """Greedily keep lines (already in priority order) that fit the budget"""
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            continue
+        kept.append(line)
+        used += cost
+    return kept, used
+
+
+class ContextRetriever:
+    """Top-K relevant context, learnings and related work for a task under a token budget"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.learnings = LearningStore(conn)
+        self.index = SearchIndex(conn)
+
+    def _context_sections(self, agent_id: str) -> List[str]:
+        row = self.conn.execute(
+            "SELECT context FROM agent_context WHERE agent_id = ?", (agent_id,)).fetchone()
+        text = (row[0] if row else '') or ''
+        # Older rows were stored with literal "\n" sequences
+        text = text.replace('\\n', '\n')
+        return [s.strip() for s in re.split(r'\n(?=#)|\n\s*\n', text) if s.strip()]
+
+    def _rank_sections(self, sections: List[str], terms: List[str]) -> List[str]:
+        """Order by query-term hits, keeping the first (identity) section on top"""
+        if len(sections) <= 1:
+            return sections
+        keys = {t.lower() for t in terms}
+
+        def hits(section: str) -> int:
+            return sum(1 for w in re.findall(r'\w+', section.lower(), re.UNICODE) if w in keys)
+
+        rest = sorted(sections[1:], key=hits, reverse=True)
+        return [sections[0]] + rest
+
+    def retrieve(self, agent_id: str, task: Dict, budget: int = TOKEN_BUDGET) -> Dict[str, str]:
+        """
+        Returns {'context', 'learnings', 'related'} as prompt-ready text.
+        Learnings that make it into the prompt are counted as used (feeds their ranking).
+        """
+        terms = task_terms(task)
+        match = to_match_query(' '.join(terms), any_term=True) if terms else ''
+
+        # Context: role header always first, other sections by relevance, original order kept
+        sections = self._context_sections(agent_id)
+        ranked = self._rank_sections(sections, terms)
+        kept, used = _pack(ranked, int(budget * CONTEXT_SHARE))
+        context = '\n\n'.join(s for s in sections if s in kept)
+        remaining = budget - used
+
+        # Learnings: BM25 matches first, then the store's recency/usage ranking
+        learning_ids = []
+        if match:
+            for hit in self.index.search(match, kinds=['learning'], agent_id=agent_id,
+                                         limit=CANDIDATES, raw=True):
+                learning_ids.append(hit['ref'])
+        ranked_ids = set(learning_ids)
+        for row in self.learnings.top(agent_id, CANDIDATES):
+            if row['id'] not in ranked_ids:
+                learning_ids.append(row['id'])
+                ranked_ids.add(row['id'])
+        # Skip the "Completed: ..." learning recorded for this very task
+        contents = {row[0]: row[1] for row in self.conn.execute(f'''
+            SELECT id, content FROM agent_learnings
+            WHERE id IN ({','.join('?' * len(learning_ids))}) AND COALESCE(task_id, '') != ?
+        ''', learning_ids + [task.get('id') or ''])} if learning_ids else {}
+        candidates = [(i, f"- {contents[i]}") for i in learning_ids if i in contents]
+        kept, used = _pack([line for _, line in candidates], remaining - int(budget * RELATED_SHARE))
+        kept_set = set(kept)
+        used_ids = [i for i, line in candidates if line in kept_set]
+        self.learnings.mark_used(used_ids)
+        learnings = '\n'.join(kept)
+        remaining -= used
+
+        # Related work: other tasks' outcomes/feedback and history notes matching this task
+        related_lines = []
+        if match:
+            seen_tasks = {task.get('id')}
+            for hit in self.index.search(match, kinds=['task', 'history'], limit=CANDIDATES, raw=True,
+                                         highlight=('', '')):
+                if hit['task_id'] in seen_tasks:
+                    continue
+                seen_tasks.add(hit['task_id'])
+                label = hit['title'] if hit['kind'] == 'task' else f"{hit['task_id']} {hit['title']}"
+                related_lines.append(f"- [{hit['kind']}] {label}: {hit['snippet']}")
+        related, _ = _pack(related_lines, remaining)
+
+        return {
+            'context': context,
+            'learnings': learnings,
+            'related': '\n'.join(related),
+        }
+
+
+_cache: Dict[Tuple, Tuple[float, Dict[str, str]]] = {}
+_cache_lock = threading.Lock()
+
+
+def task_revision(task: Dict) -> str:
+    """Digest of the task fields retrieval depends on"""
+    text = '\x1f'.join(str(task.get(f) or '') for f in
+                       ('title', 'description', 'expected_outcome', 'acceptance_criteria'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _cached(key: Tuple) -> Optional[Dict[str, str]]:
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and time.monotonic() - cached[0] < CACHE_TTL:
+            return cached[1]
+    return None
+
+
+def retrieve_cached(conn: sqlite3.Connection, agent_id: str, task: Dict,
+                    budget: int = TOKEN_BUDGET, scope: str = '') -> Dict[str, str]:
+    """retrieve() memoized per (agent, task revision, budget) for CACHE_TTL seconds"""
+    key = (scope, agent_id, task.get('id'), task_revision(task), budget)
+    result = _cached(key)
+    if result is None:
+        result = ContextRetriever(conn).retrieve(agent_id, task, budget)
+        now = time.monotonic()
+        with _cache_lock:
+            for stale in [k for k, (at, _) in _cache.items() if now - at >= CACHE_TTL]:
+                del _cache[stale]
+            _cache[key] = (now, result)
+    return result
+
+
+def retrieve_context(agent_id: str, task: Dict, budget: int = TOKEN_BUDGET,
+                     db_path: Path = DB_PATH) -> Dict[str, str]:
+    """Cached retrieval; only opens a connection on a cache miss"""
+    result = _cached((str(db_path), agent_id, task.get('id'), task_revision(task), budget))
+    if result is not None:
+        return result
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return retrieve_cached(conn, agent_id, task, budget, scope=str(db_path))
+    finally:
+        conn.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Context Retrieval')
+    parser.add_argument('task_id', help='Task to build context for')
+    parser.add_argument('--agent', help='Agent (defaults to the task assignee)')
+    parser.add_argument('--budget', type=int, default=TOKEN_BUDGET, help='Token budget')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM tasks WHERE id = ?", (args.task_id,)).fetchone()
+        if not row:
+            print(f"❌ Task {args.task_id} not found")
+            return
+        task = dict(row)
+        agent_id = args.agent or task.get('assignee_id')
+        result = ContextRetriever(conn).retrieve(agent_id, task, args.budget)
+        for section, text in result.items():
+            print(f"### {section} (~{estimate_tokens(text)} tokens)\n{text or '-'}\n")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
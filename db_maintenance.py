@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+AI Team DB Maintenance
+Keeps team.db compact and well-planned: tracks freelist bloat, WAL checkpoint
+lag and table statistics drift, and schedules incremental_vacuum, ANALYZE,
+PRAGMA optimize and wal_checkpoint. Heavy steps only run in quiet windows:
+a 'maintenance' shift, or no shift/agent activity right now.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+
+# WAL frames before a checkpoint is worth doing
+CHECKPOINT_FRAMES = int(os.getenv("AI_TEAM_MAINT_CHECKPOINT_FRAMES", "1000"))
+# Free pages (and % of file) before vacuuming
+VACUUM_MIN_PAGES = int(os.getenv("AI_TEAM_MAINT_VACUUM_MIN_PAGES", "256"))
+VACUUM_MIN_BLOAT_PCT = float(os.getenv("AI_TEAM_MAINT_VACUUM_MIN_BLOAT_PCT", "10"))
+# Pages released per incremental_vacuum step (keeps each write lock short)
+VACUUM_STEP_PAGES = int(os.getenv("AI_TEAM_MAINT_VACUUM_STEP_PAGES", "500"))
+# Row count change since last ANALYZE that makes statistics stale
+ANALYZE_DRIFT_PCT = float(os.getenv("AI_TEAM_MAINT_ANALYZE_DRIFT_PCT", "20"))
+# History writes in the last N minutes that still count as "quiet"
+QUIET_WINDOW_MINUTES = int(os.getenv("AI_TEAM_MAINT_QUIET_MINUTES", "15"))
+QUIET_MAX_WRITES = int(os.getenv("AI_TEAM_MAINT_QUIET_MAX_WRITES", "5"))
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+class DBMaintenance:
+    """Metrics and quiet-window scheduling for SQLite housekeeping"""
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(str(db_path), timeout=30)
+        self.ensure_schema()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ensure_schema(self):
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS db_maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                step TEXT NOT NULL,
+                detail TEXT,
+                duration_ms INTEGER,
+                ran_at DATETIME DEFAULT (datetime('now', 'localtime'))
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS db_table_stats (
+                table_name TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL,
+                analyzed_at DATETIME DEFAULT (datetime('now', 'localtime'))
+            )
+        ''')
+        self.conn.commit()
+
+    def _pragma(self, name: str):
+        return self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    # ========== Metrics ==========
+
+    def metrics(self) -> Dict:
+        """Bloat, WAL/checkpoint lag and last-run info"""
+        page_size = self._pragma('page_size')
+        page_count = self._pragma('page_count')
+        freelist = self._pragma('freelist_count')
+        wal_path = Path(str(self.db_path) + "-wal")
+        wal_bytes = wal_path.stat().st_size if wal_path.exists() else 0
+        # WAL = 32-byte header + frames of (24-byte header + page)
+        wal_frames = max(wal_bytes - 32, 0) // (page_size + 24) if wal_bytes else 0
+        last_runs = dict(self.conn.execute('''
+            SELECT step, MAX(ran_at) FROM db_maintenance_log GROUP BY step
+        ''').fetchall())
+        return {
+            'db_bytes': page_size * page_count,
+            'page_count': page_count,
+            'freelist_pages': freelist,
+            'bloat_pct': round(100.0 * freelist / page_count, 2) if page_count else 0.0,
+            'auto_vacuum': AUTO_VACUUM_MODES.get(self._pragma('auto_vacuum'), 'unknown'),
+            'journal_mode': self._pragma('journal_mode'),
+            'wal_bytes': wal_bytes,
+            'wal_frames': wal_frames,
+            'stale_stats_tables': self.stale_tables(),
+            'last_runs': last_runs,
+        }
+
+    def _row_counts(self) -> Dict[str, int]:
+        tables = [row[0] for row in self.conn.execute('''
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+              AND name NOT IN ('db_maintenance_log', 'db_table_stats')
+        ''')]
+        return {t: self.conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+
+    def stale_tables(self, counts: Optional[Dict[str, int]] = None) -> List[str]:
+        """Tables whose row count drifted past ANALYZE_DRIFT_PCT since their last ANALYZE"""
+        counts = counts if counts is not None else self._row_counts()
+        analyzed = dict(self.conn.execute("SELECT table_name, row_count FROM db_table_stats").fetchall())
+        stale = []
+        for table, count in counts.items():
+            before = analyzed.get(table)
+            if before is None:
+                if count > 0:
+                    stale.append(table)
+            elif abs(count - before) * 100.0 > ANALYZE_DRIFT_PCT * max(before, 1):
+                stale.append(table)
+        return stale
+
+    # ========== Scheduling ==========
+
+    def quiet_window(self) -> Optional[str]:
+        """Reason string if now is a quiet window, else None"""
+        now = datetime.now()
+        today, clock = now.strftime('%Y-%m-%d'), now.strftime('%H:%M')
+        shifts = dict(self.conn.execute('''
+            SELECT shift_type, COUNT(*) FROM shifts
+            WHERE is_active = 1 AND shift_date = ? AND start_time <= ? AND end_time > ?
+            GROUP BY shift_type
+        ''', (today, clock, clock)).fetchall()) if self._has_table('shifts') else {}
+        if shifts.get('maintenance'):
+            return "maintenance shift"
+
+        active_agents = self.conn.execute(
+            "SELECT COUNT(*) FROM agents WHERE status = 'active'").fetchone()[0]
+        recent_writes = self.conn.execute(f'''
+            SELECT COUNT(*) FROM task_history
+            WHERE timestamp > datetime('now', 'localtime', '-{QUIET_WINDOW_MINUTES} minutes')
+        ''').fetchone()[0]
+        working = sum(n for shift_type, n in shifts.items() if shift_type != 'maintenance')
+        if not working and active_agents == 0 and recent_writes <= QUIET_MAX_WRITES:
+            return f"no active shifts/agents, {recent_writes} writes in {QUIET_WINDOW_MINUTES}m"
+        return None
+
+    def _has_table(self, name: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def plan(self, force: bool = False) -> List[str]:
+        """Steps worth running now: cheap ones always, heavy ones only when quiet (or forced)"""
+        m = self.metrics()
+        quiet = force or self.quiet_window() is not None
+        steps = []
+        if m['journal_mode'] == 'wal' and m['wal_frames'] >= CHECKPOINT_FRAMES:
+            steps.append('checkpoint_truncate' if quiet else 'checkpoint_passive')
+        bloated = m['freelist_pages'] >= VACUUM_MIN_PAGES and m['bloat_pct'] >= VACUUM_MIN_BLOAT_PCT
+        if bloated and quiet:
+            # auto_vacuum=NONE can only reclaim pages with one full VACUUM, which also
+            # switches the file to incremental mode for all later runs
+            steps.append('incremental_vacuum' if m['auto_vacuum'] == 'incremental' else 'convert_incremental')
+        if quiet and m['stale_stats_tables']:
+            steps.append('analyze')
+        steps.append('optimize')
+        return steps
+
+    # ========== Steps ==========
+
+    def _log(self, step: str, detail: str, started: float):
+        self.conn.execute('''
+            INSERT INTO db_maintenance_log (step, detail, duration_ms) VALUES (?, ?, ?)
+        ''', (step, detail, int((time.perf_counter() - started) * 1000)))
+        self.conn.commit()
+
+    def checkpoint(self, mode: str = 'PASSIVE') -> str:
+        busy, log_frames, checkpointed = self.conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        return f"{mode}: {checkpointed}/{log_frames} frames" + (" (busy)" if busy else "")
+
+    def incremental_vacuum(self) -> str:
+        freed = 0
+        while True:
+            before = self._pragma('freelist_count')
+            if before == 0:
+                break
+            # Each step is its own short write transaction
+            self.conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+            self.conn.commit()
+            after = self._pragma('freelist_count')
+            if after >= before:
+                break
+            freed += before - after
+        return f"freed {freed} pages"
+
+    def convert_incremental(self) -> str:
+        before = self._pragma('page_count')
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.conn.execute("VACUUM")
+        return f"VACUUM {before} → {self._pragma('page_count')} pages, auto_vacuum=incremental"
+
+    def analyze(self) -> str:
+        counts = self._row_counts()
+        stale = self.stale_tables(counts)
+        for table in stale:
+            self.conn.execute(f'ANALYZE "{table}"')
+        self.conn.executemany('''
+            INSERT INTO db_table_stats (table_name, row_count, analyzed_at)
+            VALUES (?, ?, datetime('now', 'localtime'))
+            ON CONFLICT(table_name) DO UPDATE SET
+                row_count = excluded.row_count, analyzed_at = excluded.analyzed_at
+        ''', [(t, counts[t]) for t in stale])
+        self.conn.commit()
+        return f"{len(stale)} tables: {', '.join(stale)}"
+
+    def optimize(self) -> str:
+        self.conn.execute("PRAGMA analysis_limit = 400")
+        self.conn.execute("PRAGMA optimize").fetchall()
+        return "ok"
+
+    def run(self, force: bool = False) -> Dict[str, str]:
+        """Run the planned steps; returns step -> detail"""
+        actions = {
+            'checkpoint_passive': lambda: self.checkpoint('PASSIVE'),
+            'checkpoint_truncate': lambda: self.checkpoint('TRUNCATE'),
+            'incremental_vacuum': self.incremental_vacuum,
+            'convert_incremental': self.convert_incremental,
+            'analyze': self.analyze,
+            'optimize': self.optimize,
+        }
+        results = {}
+        for step in self.plan(force):
+            started = time.perf_counter()
+            try:
+                results[step] = actions[step]()
+            except sqlite3.Error as e:
+                results[step] = f"error: {e}"
+            self._log(step, results[step], started)
+        return results
+
+
+def print_metrics(m: Dict, quiet: Optional[str]):
+    print("🗄️  DB Maintenance Status")
+    print(f"  Size: {m['db_bytes'] // 1024} KB ({m['page_count']} pages)")
+    print(f"  Bloat: {m['freelist_pages']} free pages ({m['bloat_pct']}%) | auto_vacuum={m['auto_vacuum']}")
+    print(f"  WAL: {m['wal_bytes'] // 1024} KB (~{m['wal_frames']} frames not checkpointed)")
+    print(f"  Stale statistics: {', '.join(m['stale_stats_tables']) or 'none'}")
+    print(f"  Quiet window: {quiet or 'no'}")
+    for step, ran_at in sorted(m['last_runs'].items()):
+        print(f"  Last {step}: {ran_at}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team DB Maintenance')
+    parser.add_argument('--run', action='store_true', help='Run scheduled maintenance')
+    parser.add_argument('--force', action='store_true', help='Treat now as a quiet window')
+    args = parser.parse_args()
+
+    with DBMaintenance() as maint:
+        if args.run:
+            results = maint.run(force=args.force)
+            for step, detail in results.items():
+                print(f"🔧 {step}: {detail}")
+        else:
+            print_metrics(maint.metrics(), maint.quiet_window())
+
+
+if __name__ == '__main__':
+    main()
@@ -23,11 +23,27 @@ except AttributeError:
 DB_PATH = Path(__file__).parent / "team.db"
 TELEGRAM_CHANNEL = "1268858185"
 
-# Health thresholds (in minutes)
-STALE_THRESHOLD = 30       # > 30 min = stale
-OFFLINE_THRESHOLD = 60     # > 60 min = offline
-TASK_STUCK_THRESHOLD = 120 # > 2 hours in progress with no update = stuck
-ALERT_COOLDOWN = 30        # Don't send same alert within 30 minutes
+from health_rules import (
+    THRESHOLDS, FIX_LOOP_LIMIT, FIX_LOOP_WARNING,
+    HealthRuleEngine, RuleContext, new_changes, plan_auto_block,
+)
+from alert_store import AlertStore
+from liveness_store import LivenessStore
+from task_state import TaskStateMachine
+
+# Health thresholds (in minutes) - configured in health_rules.THRESHOLDS
+STALE_THRESHOLD = THRESHOLDS['stale_minutes']
+OFFLINE_THRESHOLD = THRESHOLDS['offline_minutes']
+TASK_STUCK_THRESHOLD = THRESHOLDS['stuck_minutes']
+ALERT_COOLDOWN = THRESHOLDS['alert_cooldown_minutes']
+
+# Alert types (alert_store keys) each check is authoritative for
+CHECK_ALERT_TYPES = {
+    'heartbeat': ('agent_health:critical', 'agent_health:warning', 'agent_flapping:warning'),
+    'stuck': ('stuck_task:warning',),
+    'sessions': ('long_running_session:warning',),
+    'fix_loops': ('fix_loop_exceeded:critical', 'fix_loop_warning:warning'),
+}
 
 class HealthMonitor:
     def __init__(self, db_path: Path = DB_PATH):
@@ -35,6 +51,12 @@ class HealthMonitor:
         self.conn = sqlite3.connect(str(db_path))
         self.conn.row_factory = sqlite3.Row
         self.alerts_sent = []
+        self.rules = HealthRuleEngine()
+        self.rule_timings = []
+        self.alerts = AlertStore(self.conn)
+        self.states = TaskStateMachine(self.conn)
+        LivenessStore.ensure_schema(self.conn)
+        self.conn.commit()
         
     def close(self):
         self.conn.close()
@@ -46,21 +68,7 @@ class HealthMonitor:
         self.close()
 
     def _send_telegram_alert(self, message: str, alert_type: str = "general") -> bool:
-        """Send alert to Telegram with cooldown to prevent spam"""
-        # Check if we recently sent this type of alert
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT last_alert_sent, health_status 
-            FROM agents 
-            WHERE last_alert_type = ? 
-            AND last_alert_sent > datetime('now', '-30 minutes')
-            LIMIT 1
-        ''', (alert_type,))
-        
-        if cursor.fetchone():
-            # Alert recently sent, skip
-            return False
-        
+        """Send alert to Telegram (dedup/backoff is decided by the alert store)"""
         try:
             result = subprocess.run(
                 ["openclaw", "message", "send", "--channel", "telegram", 
@@ -106,280 +114,103 @@ class HealthMonitor:
             
         self.conn.commit()
 
-    def check_agent_heartbeats(self) -> List[Dict]:
-        """Check all agents for stale/offline status based on heartbeat"""
+    # ========== Rule Engine ==========
+
+    def load_snapshot(self, checks: Optional[set] = None) -> Dict:
+        """Load every row the health rules need in one read transaction"""
+        if self.conn.in_transaction:
+            self.conn.commit()
         cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                a.id,
-                a.name,
-                a.role,
-                a.status as agent_status,
-                a.last_heartbeat,
-                a.health_status,
-                a.last_alert_sent,
-                a.last_alert_type,
-                ROUND((strftime('%s', 'now') - strftime('%s', a.last_heartbeat)) / 60.0, 1) as minutes_since_heartbeat,
-                t.id as current_task_id,
-                t.title as current_task_title,
-                t.status as task_status
-            FROM agents a
-            LEFT JOIN tasks t ON a.current_task_id = t.id
-            ORDER BY a.last_heartbeat DESC
-        ''')
-        
-        agents = [dict(row) for row in cursor.fetchall()]
-        issues = []
-        
-        for agent in agents:
-            minutes_since = agent['minutes_since_heartbeat'] or 9999
-            old_health = agent['health_status'] or 'unknown'
-            new_health = old_health
-            
-            # Determine health status
-            if agent['last_heartbeat'] is None:
-                new_health = 'unknown'
-            elif minutes_since > OFFLINE_THRESHOLD:
-                new_health = 'offline'
-            elif minutes_since > STALE_THRESHOLD:
-                new_health = 'stale'
-            else:
-                new_health = 'healthy'
-            
-            # Update health status in DB
-            if new_health != old_health:
-                cursor.execute('''
+        cursor.execute('BEGIN')
+        try:
+            rows = self.rules.load(cursor, checks)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%subagent%'")
+            has_subagent_table = cursor.fetchone() is not None
+        finally:
+            self.conn.commit()
+
+        return {'rows': rows, 'has_subagent_table': has_subagent_table}
+
+    def evaluate(self, checks: Optional[set] = None) -> Tuple[Dict[str, List[Dict]], RuleContext]:
+        """Evaluate health rules over one snapshot; state changes are planned, not applied"""
+        snapshot = self.load_snapshot(checks)
+        ctx = RuleContext(thresholds=self.rules.thresholds,
+                          has_subagent_table=snapshot['has_subagent_table'])
+        issues, self.rule_timings = self.rules.evaluate(snapshot['rows'], ctx, checks)
+        return issues, ctx
+
+    def apply_changes(self, changes: Dict[str, List[Tuple]]) -> None:
+        """Apply all planned state changes (health flags + task transitions) in a single write transaction"""
+        health = changes.get('agent_health') or []
+        transitions = changes.get('transitions') or []
+        if not health and not transitions:
+            return
+
+        if self.conn.in_transaction:
+            self.conn.commit()
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if health:
+                cursor.executemany('''
                     UPDATE agents 
                     SET health_status = ?, updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
-                ''', (new_health, agent['id']))
-                self.conn.commit()
-                
-                # Log the health change
-                print(f"🔄 Agent {agent['name']} health changed: {old_health} → {new_health}")
-            
-            agent['new_health'] = new_health
-            agent['old_health'] = old_health
-            
-            # Check if we should alert
-            should_alert = False
-            alert_reason = ""
-            
-            if new_health == 'offline' and old_health != 'offline':
-                should_alert = True
-                alert_reason = f"Agent {agent['name']} is OFFLINE (no heartbeat for {int(minutes_since)} minutes)"
-            elif new_health == 'stale' and old_health == 'healthy':
-                should_alert = True
-                alert_reason = f"Agent {agent['name']} is STALE (no heartbeat for {int(minutes_since)} minutes)"
-            
-            if should_alert:
-                # Check cooldown
-                if agent['last_alert_sent']:
-                    last_alert = datetime.fromisoformat(agent['last_alert_sent'].replace('Z', '+00:00'))
-                    if datetime.now() - last_alert < timedelta(minutes=ALERT_COOLDOWN):
-                        should_alert = False
-                
-                if should_alert:
-                    issues.append({
-                        'type': 'agent_health',
-                        'agent_id': agent['id'],
-                        'agent_name': agent['name'],
-                        'severity': 'critical' if new_health == 'offline' else 'warning',
-                        'message': alert_reason,
-                        'minutes_since_heartbeat': minutes_since
-                    })
-                    
-                    # Update last alert timestamp
-                    cursor.execute('''
-                        UPDATE agents 
-                        SET last_alert_sent = CURRENT_TIMESTAMP,
-                            last_alert_type = ?
-                        WHERE id = ?
-                    ''', (f"health_{new_health}", agent['id']))
-                    self.conn.commit()
-        
-        return issues
+                ''', health)
+            results = self.states.apply_many(transitions, commit=False)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.states.emit(results)
+
+    def _send_planned_notifications(self, changes: Dict[str, List[Tuple]]) -> None:
+        """Send notifications queued by rules (after the write transaction commits)"""
+        notifications = changes.get('notifications', [])
+        due = self.alerts.reconcile([key for _, key in notifications], ['auto_block'])
+        for message, key in notifications:
+            if key in due:
+                self._send_telegram_alert(message, f"{key[0]}_{key[1]}")
+
+    @staticmethod
+    def _alert_key(issue: Dict) -> Tuple[str, str]:
+        """Alert store key for an issue: (type:severity, entity)"""
+        if issue['type'] == 'long_running_session':
+            entity = f"{issue['agent_id']}-{issue['task_id']}"
+        else:
+            entity = issue.get('task_id') or issue.get('agent_id') or ''
+        return (f"{issue['type']}:{issue['severity']}", entity)
+
+    def _due_alerts(self, issues: List[Dict], checks: Optional[set] = None) -> List[Dict]:
+        """Record active issues in the alert store; return the ones due for an alert"""
+        checks = checks if checks is not None else set(CHECK_ALERT_TYPES)
+        alert_types = [t for check in checks for t in CHECK_ALERT_TYPES.get(check, ())]
+        due = self.alerts.reconcile([self._alert_key(i) for i in issues], alert_types)
+        return [i for i in issues if self._alert_key(i) in due]
+
+    def _run_checks(self, checks: set) -> List[Dict]:
+        issues, ctx = self.evaluate(checks)
+        self.apply_changes(ctx.changes)
+        self._send_planned_notifications(ctx.changes)
+        found = [issue for check in checks for issue in issues.get(check, [])]
+        self._due_alerts(found, checks)
+        return found
+
+    def check_agent_heartbeats(self) -> List[Dict]:
+        """Check all agents for stale/offline status based on heartbeat"""
+        return self._run_checks({'heartbeat'})
 
     def check_stuck_tasks(self) -> List[Dict]:
-        """Check for tasks stuck in progress without updates for > 2 hours"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                t.id,
-                t.title,
-                t.status,
-                t.progress,
-                t.started_at,
-                t.updated_at,
-                a.id as agent_id,
-                a.name as agent_name,
-                ROUND((strftime('%s', 'now') - strftime('%s', t.updated_at)) / 60.0, 1) as minutes_since_update,
-                ROUND((strftime('%s', 'now') - strftime('%s', t.started_at)) / 60.0, 1) as minutes_since_start
-            FROM tasks t
-            JOIN agents a ON t.assignee_id = a.id
-            WHERE t.status = 'in_progress'
-            AND t.updated_at < datetime('now', '-2 hours')
-            ORDER BY t.updated_at ASC
-        ''')
-        
-        stuck_tasks = [dict(row) for row in cursor.fetchall()]
-        issues = []
-        
-        for task in stuck_tasks:
-            minutes_since_update = task['minutes_since_update'] or 0
-            
-            issue = {
-                'type': 'stuck_task',
-                'task_id': task['id'],
-                'task_title': task['title'],
-                'agent_id': task['agent_id'],
-                'agent_name': task['agent_name'],
-                'severity': 'warning',
-                'message': f"Task {task['id']} stuck for {int(minutes_since_update)} minutes (assigned to {task['agent_name']})",
-                'minutes_since_update': minutes_since_update,
-                'progress': task['progress']
-            }
-            issues.append(issue)
-        
-        return issues
+        """Check for tasks stuck in progress without recent updates"""
+        return self._run_checks({'stuck'})
 
     def check_subagent_sessions(self) -> List[Dict]:
         """Check for long-running subagent sessions that might be stuck"""
-        cursor = self.conn.cursor()
-        
-        # Check if there's a subagent_sessions table or similar
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%subagent%'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        if not tables:
-            # No subagent tracking table, check task history for long-running actions
-            cursor.execute('''
-                SELECT 
-                    th.id,
-                    th.task_id,
-                    th.agent_id,
-                    th.action,
-                    th.timestamp,
-                    t.title as task_title,
-                    a.name as agent_name,
-                    ROUND((strftime('%s', 'now') - strftime('%s', th.timestamp)) / 60.0, 1) as minutes_since_action
-                FROM task_history th
-                JOIN tasks t ON th.task_id = t.id
-                JOIN agents a ON th.agent_id = a.id
-                WHERE th.action IN ('started', 'assigned')
-                AND th.timestamp < datetime('now', '-3 hours')
-                AND t.status = 'in_progress'
-                ORDER BY th.timestamp ASC
-            ''')
-            
-            old_actions = [dict(row) for row in cursor.fetchall()]
-            issues = []
-            
-            for action in old_actions:
-                minutes_since = action['minutes_since_action'] or 0
-                if minutes_since > 180:  # > 3 hours
-                    issues.append({
-                        'type': 'long_running_session',
-                        'task_id': action['task_id'],
-                        'agent_id': action['agent_id'],
-                        'agent_name': action['agent_name'],
-                        'severity': 'warning',
-                        'message': f"Long-running session: {action['agent_name']} working on {action['task_id']} for {int(minutes_since)} minutes",
-                        'minutes_since_action': minutes_since
-                    })
-            
-            return issues
-        
-        return []
+        return self._run_checks({'sessions'})
 
     def check_fix_loop_violations(self) -> List[Dict]:
-        """
-        Check for tasks that have exceeded the fix loop limit (10 loops)
-        Auto-stop tasks that have reached the limit to prevent infinite loops
-        """
-        cursor = self.conn.cursor()
-        
-        # Get tasks approaching or exceeding fix loop limit
-        cursor.execute('''
-            SELECT 
-                t.id,
-                t.title,
-                t.status,
-                t.fix_loop_count,
-                t.assignee_id,
-                a.name as agent_name,
-                t.blocked_reason
-            FROM tasks t
-            LEFT JOIN agents a ON t.assignee_id = a.id
-            WHERE t.fix_loop_count >= 8
-            AND t.status IN ('in_progress', 'todo', 'review')
-            ORDER BY t.fix_loop_count DESC
-        ''')
-        
-        tasks = [dict(row) for row in cursor.fetchall()]
-        issues = []
-        
-        for task in tasks:
-            fix_loops = task['fix_loop_count'] or 0
-            task_id = task['id']
-            agent_name = task['agent_name'] or 'Unknown'
-            
-            if fix_loops >= 10:
-                # Auto-stop: Block task and release agent
-                blocked_reason = f"🛑 AUTO-STOPPED after {fix_loops} fix loops\n\nThis task has exceeded the maximum allowed fix loops (10) to prevent infinite loops and excessive token consumption.\n\nTO RESUME:\n1. Investigate the root cause manually\n2. Use: python3 orchestrator.py resume-task {task_id} --agent <agent_id>\n   or: python3 team_db.py task unblock {task_id}\n3. This will reset the fix loop counter"
-                
-                # Update task status to blocked
-                cursor.execute('''
-                    UPDATE tasks 
-                    SET status = 'blocked', 
-                        blocked_reason = ?,
-                        updated_at = datetime('now', 'localtime')
-                    WHERE id = ?
-                ''', (blocked_reason, task_id))
-                
-                # Release the agent
-                if task['assignee_id']:
-                    cursor.execute('''
-                        UPDATE agents 
-                        SET status = 'idle',
-                            current_task_id = NULL,
-                            updated_at = datetime('now', 'localtime')
-                        WHERE id = ?
-                    ''', (task['assignee_id'],))
-                
-                # Log to task history
-                cursor.execute('''
-                    INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-                    VALUES (?, 'auto-stopped', ?, 'blocked', ?)
-                ''', (task_id, task['status'], f"Auto-stopped after {fix_loops} fix loops"))
-                
-                self.conn.commit()
-                
-                issues.append({
-                    'type': 'fix_loop_exceeded',
-                    'task_id': task_id,
-                    'agent_id': task['assignee_id'],
-                    'agent_name': agent_name,
-                    'severity': 'critical',
-                    'message': f"Task {task_id} AUTO-STOPPED after {fix_loops} fix loops",
-                    'fix_loops': fix_loops
-                })
-                
-            elif fix_loops >= 8:
-                # Warning: approaching limit
-                issues.append({
-                    'type': 'fix_loop_warning',
-                    'task_id': task_id,
-                    'agent_id': task['assignee_id'],
-                    'agent_name': agent_name,
-                    'severity': 'warning',
-                    'message': f"Task {task_id} approaching fix loop limit ({fix_loops}/10)",
-                    'fix_loops': fix_loops
-                })
-        
-        return issues
+        """Check for fix loop violations and auto-stop tasks at the limit"""
+        return self._run_checks({'fix_loops'})
 
     def run_health_check(self) -> Dict:
         """Run complete health check and return results"""
@@ -389,13 +220,16 @@ class HealthMonitor:
         # Ensure schema is up to date
         self.ensure_schema()
         
-        all_issues = []
+        # One snapshot, every rule evaluated in memory, one write transaction
+        issues, ctx = self.evaluate()
+        heartbeat_issues = issues.get('heartbeat', [])
+        stuck_tasks = issues.get('stuck', [])
+        session_issues = issues.get('sessions', [])
+        fix_loop_issues = issues.get('fix_loops', [])
+        all_issues = heartbeat_issues + stuck_tasks + session_issues + fix_loop_issues
         
         # Check 1: Agent heartbeats
         print("\n📡 Checking agent heartbeats...")
-        heartbeat_issues = self.check_agent_heartbeats()
-        all_issues.extend(heartbeat_issues)
-        
         if heartbeat_issues:
             for issue in heartbeat_issues:
                 emoji = "🔴" if issue['severity'] == 'critical' else "🟡"
@@ -405,9 +239,6 @@ class HealthMonitor:
         
         # Check 2: Stuck tasks
         print("\n⏱️ Checking for stuck tasks...")
-        stuck_tasks = self.check_stuck_tasks()
-        all_issues.extend(stuck_tasks)
-        
         if stuck_tasks:
             for issue in stuck_tasks:
                 print(f"  🟡 {issue['message']} (Progress: {issue['progress']}%)")
@@ -416,20 +247,14 @@ class HealthMonitor:
         
         # Check 3: Long-running subagent sessions
         print("\n👤 Checking subagent sessions...")
-        session_issues = self.check_subagent_sessions()
-        all_issues.extend(session_issues)
-        
         if session_issues:
             for issue in session_issues:
                 print(f"  🟡 {issue['message']}")
         else:
             print("  ✅ No long-running sessions detected")
         
-        # Check 4: Fix loop violations (auto-stop after 10 loops)
+        # Check 4: Fix loop violations (auto-stop at the limit)
         print("\n🔄 Checking fix loop violations...")
-        fix_loop_issues = self.check_fix_loop_violations()
-        all_issues.extend(fix_loop_issues)
-        
         if fix_loop_issues:
             for issue in fix_loop_issues:
                 emoji = "🛑" if issue['severity'] == 'critical' else "⚠️"
@@ -437,17 +262,27 @@ class HealthMonitor:
         else:
             print("  ✅ No fix loop violations")
         
+        # Apply every planned state change (incl. auto-response blocks) in one write transaction
+        self.apply_changes(ctx.changes)
+        for task_id, agent_name in ctx.auto_blocked:
+            print(f"  ✅ Task {task_id} auto-blocked, {agent_name} released")
+        
         # Send alerts for critical issues
         print("\n📤 Sending alerts...")
         critical_issues = [i for i in all_issues if i['severity'] == 'critical']
         warning_issues = [i for i in all_issues if i['severity'] == 'warning']
         
+        # Only new, re-opened or backed-off issues are alerted (one upsert batch)
+        due_issues = self._due_alerts(all_issues)
+        due_critical = [i for i in due_issues if i['severity'] == 'critical']
+        due_warning = [i for i in due_issues if i['severity'] == 'warning']
+        
         alerts_sent = 0
         
         # Group issues by type for consolidated alerts
-        if critical_issues:
+        if due_critical:
             message = "🔴 *CRITICAL: AI Team Health Issues*\n\n"
-            for issue in critical_issues:
+            for issue in due_critical:
                 message += f"• {issue['message']}\n"
             message += f"\nChecked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             
@@ -455,14 +290,14 @@ class HealthMonitor:
                 print("  ✅ Critical alert sent")
                 alerts_sent += 1
         
-        if warning_issues:
+        if due_warning:
             # Send warnings in batches to avoid spam
             message = "🟡 *WARNING: AI Team Health Issues*\n\n"
-            for issue in warning_issues[:5]:  # Limit to 5 warnings per alert
+            for issue in due_warning[:5]:  # Limit to 5 warnings per alert
                 message += f"• {issue['message']}\n"
-            if len(warning_issues) > 5:
-                message += f"\n...and {len(warning_issues) - 5} more warnings"
-            message += f"\nChecked at: {datetime.now().strftime('%Y-%m-%d %H:%S')}"
+            if len(due_warning) > 5:
+                message += f"\n...and {len(due_warning) - 5} more warnings"
+            message += f"\nChecked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             
             if self._send_telegram_alert(message, "warning_health"):
                 print("  ✅ Warning alert sent")
@@ -470,81 +305,38 @@ class HealthMonitor:
         
         if not critical_issues and not warning_issues:
             print("  ✅ No alerts needed - all systems healthy")
+        elif not due_issues:
+            print("  ✅ All issues already alerted (waiting for backoff)")
+        
+        self._send_planned_notifications(ctx.changes)
         
         print("\n" + "=" * 50)
         print(f"Health check complete: {len(critical_issues)} critical, {len(warning_issues)} warnings, {alerts_sent} alerts sent")
         
-        # Auto-response for stuck tasks (> 3 hours)
-        auto_resolved = self._auto_response(stuck_tasks)
-        
-        # Count fix loop auto-stops
-        fix_loop_auto_stopped = len([i for i in fix_loop_issues if i['type'] == 'fix_loop_exceeded'])
-        
         return {
             'timestamp': datetime.now().isoformat(),
             'critical_count': len(critical_issues),
             'warning_count': len(warning_issues),
             'alerts_sent': alerts_sent,
-            'auto_resolved': auto_resolved,
-            'fix_loop_auto_stopped': fix_loop_auto_stopped,
-            'issues': all_issues
+            'auto_resolved': len(ctx.auto_blocked),
+            'fix_loop_auto_stopped': len(ctx.auto_stopped),
+            'issues': all_issues,
+            'rule_timings': self.rule_timings
         }
 
     def _auto_response(self, stuck_tasks: List[Dict]) -> int:
-        """
-        Auto-response for stuck tasks based on Alert Response Workflow
-        - Task stuck > 3 hours: Auto-block and release agent
-        - Returns count of auto-resolved tasks
-        """
+        """Auto-block stuck tasks past the auto-block threshold and release their agents"""
+        changes = new_changes()
         resolved = 0
-        cursor = self.conn.cursor()
-        
         for task in stuck_tasks:
             minutes = task.get('minutes_since_update', 0)
-            
-            # Only auto-respond if stuck > 3 hours (180 minutes)
-            if minutes >= 180:
-                task_id = task['task_id']
-                agent_id = task['agent_id']
-                agent_name = task['agent_name']
-                
-                print(f"  🔄 Auto-resolving stuck task {task_id} (>3h)")
-                
-                # 1. Block the task
-                cursor.execute('''
-                    UPDATE tasks 
-                    SET status = 'blocked', 
-                        blocked_reason = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (f"Auto-blocked: Stuck for {int(minutes)} minutes", task_id))
-                
-                # 2. Release the agent (set to idle, clear current_task)
-                cursor.execute('''
-                    UPDATE agents 
-                    SET status = 'idle',
-                        current_task_id = NULL,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (agent_id,))
-                
-                # 3. Log the action
-                cursor.execute('''
-                    INSERT INTO task_history (task_id, agent_id, action, notes)
-                    VALUES (?, ?, 'blocked', ?)
-                ''', (task_id, agent_id, f"Auto-blocked by health monitor after {int(minutes)} minutes"))
-                
-                self.conn.commit()
-                
-                # 4. Send notification
-                message = f"🚫 *Auto-Blocked:* Task {task_id} blocked after {int(minutes)} minutes\nAgent {agent_name} released and available for new tasks"
-                self._send_telegram_alert(message, f"auto_block_{task_id}")
-                
+            if minutes >= THRESHOLDS['auto_block_minutes']:
+                plan_auto_block(task['task_id'], task['agent_id'], task['agent_name'], minutes, changes)
+                print(f"  ✅ Task {task['task_id']} auto-blocked, {task['agent_name']} released")
                 resolved += 1
-                print(f"  ✅ Task {task_id} auto-blocked, {agent_name} released")
-        
+        self.apply_changes(changes)
+        self._send_planned_notifications(changes)
         return resolved
-
     def get_health_status(self) -> Dict:
         """Get current health status summary"""
         cursor = self.conn.cursor()
@@ -585,19 +377,19 @@ class HealthMonitor:
             SELECT COUNT(*) 
             FROM tasks 
             WHERE status = 'in_progress' 
-            AND updated_at < datetime('now', '-2 hours')
-        ''')
+            AND updated_at < datetime('now', ?)
+        ''', (f"-{TASK_STUCK_THRESHOLD} minutes",))
         stuck_count = cursor.fetchone()[0]
         
         # Get fix loop status
         cursor.execute('''
             SELECT 
-                COUNT(CASE WHEN fix_loop_count >= 10 THEN 1 END) as auto_stopped,
-                COUNT(CASE WHEN fix_loop_count >= 8 AND fix_loop_count < 10 THEN 1 END) as warning,
-                COUNT(CASE WHEN fix_loop_count > 0 AND fix_loop_count < 8 THEN 1 END) as active
+                COUNT(CASE WHEN fix_loop_count >= ? THEN 1 END) as auto_stopped,
+                COUNT(CASE WHEN fix_loop_count >= ? AND fix_loop_count < ? THEN 1 END) as warning,
+                COUNT(CASE WHEN fix_loop_count > 0 AND fix_loop_count < ? THEN 1 END) as active
             FROM tasks
             WHERE fix_loop_count > 0
-        ''')
+        ''', (FIX_LOOP_LIMIT, FIX_LOOP_WARNING, FIX_LOOP_LIMIT, FIX_LOOP_WARNING))
         row = cursor.fetchone()
         fix_loop_status = {
             'auto_stopped': row[0] or 0,
@@ -606,16 +398,7 @@ class HealthMonitor:
         }
         
         # Get recent alerts
-        cursor.execute('''
-            SELECT 
-                name,
-                last_alert_sent,
-                last_alert_type
-            FROM agents
-            WHERE last_alert_sent > datetime('now', '-24 hours')
-            ORDER BY last_alert_sent DESC
-        ''')
-        recent_alerts = [dict(row) for row in cursor.fetchall()]
+        recent_alerts = self.alerts.recent(24)
         
         return {
             'timestamp': datetime.now().isoformat(),
@@ -643,18 +426,18 @@ class HealthMonitor:
         print(f"   🟡 Stale:    {status['summary']['stale']}")
         print(f"   🔴 Offline:  {status['summary']['offline']}")
         print(f"   ⚪ Unknown:  {status['summary']['unknown']}")
-        print(f"\n⏱️ Stuck Tasks (>2h no update): {status['stuck_tasks']}")
+        print(f"\n⏱️ Stuck Tasks (>{TASK_STUCK_THRESHOLD}m no update): {status['stuck_tasks']}")
         
         # Fix loop status
         fix_loops = status.get('fix_loops', {})
         if fix_loops.get('auto_stopped', 0) > 0 or fix_loops.get('warning', 0) > 0 or fix_loops.get('active', 0) > 0:
             print(f"\n🔄 Fix Loop Status:")
             if fix_loops.get('auto_stopped', 0) > 0:
-                print(f"   🚫 Auto-stopped (≥10 loops): {fix_loops['auto_stopped']}")
+                print(f"   🚫 Auto-stopped (≥{FIX_LOOP_LIMIT} loops): {fix_loops['auto_stopped']}")
             if fix_loops.get('warning', 0) > 0:
-                print(f"   ⚠️  Warning (8-9 loops): {fix_loops['warning']}")
+                print(f"   ⚠️  Warning ({FIX_LOOP_WARNING}-{FIX_LOOP_LIMIT - 1} loops): {fix_loops['warning']}")
             if fix_loops.get('active', 0) > 0:
-                print(f"   🔄 Active (1-7 loops): {fix_loops['active']}")
+                print(f"   🔄 Active (1-{FIX_LOOP_WARNING - 1} loops): {fix_loops['active']}")
         
         print("\n📋 Agent Details:")
         print("-" * 60)
@@ -686,7 +469,7 @@ class HealthMonitor:
             print("\n🚨 Recent Alerts (24h):")
             print("-" * 60)
             for alert in status['recent_alerts'][:5]:
-                print(f"   {alert['last_alert_sent']}: {alert['name']} - {alert['last_alert_type']}")
+                print(f"   {alert['last_alert']}: {alert['entity_id']} - {alert['alert_type']}")
         
         print("=" * 60)
 
@@ -698,7 +481,7 @@ def main():
     parser.add_argument('--check', action='store_true', help='Run health check once')
     parser.add_argument('--status', action='store_true', help='Show current health status')
     parser.add_argument('--daemon', action='store_true', help='Run as daemon (for cron)')
-    parser.add_argument('--auto-resolve', action='store_true', help='Auto-resolve stuck tasks (>3h)')
+    parser.add_argument('--auto-resolve', action='store_true', help='Auto-resolve stuck tasks past the auto-block threshold')
     parser.add_argument('--resolve-task', type=str, help='Manually resolve specific stuck task ID')
     parser.add_argument('--fix-loops', action='store_true', help='Show fix loop status for all tasks')
     
@@ -763,15 +546,15 @@ def main():
                     }.get(t['status'], '⬜')
                     
                     warning = ""
-                    if t['fix_loop_count'] >= 10:
+                    if t['fix_loop_count'] >= FIX_LOOP_LIMIT:
                         warning = " 🛑 AUTO-STOPPED"
-                    elif t['fix_loop_count'] >= 8:
+                    elif t['fix_loop_count'] >= FIX_LOOP_WARNING:
                         warning = " ⚠️ NEAR LIMIT"
                     
-                    print(f"  {status_emoji} {t['id']} | Loops: {t['fix_loop_count']}/10{warning}")
+                    print(f"  {status_emoji} {t['id']} | Loops: {t['fix_loop_count']}/{FIX_LOOP_LIMIT}{warning}")
                     print(f"     Title: {t['title'][:50]}...")
                     print(f"     Status: {t['status']} | Assignee: {t['assignee_name'] or 'Unassigned'}")
-                    if t['fix_loop_count'] >= 10:
+                    if t['fix_loop_count'] >= FIX_LOOP_LIMIT:
                         print(f"     To resume: python3 orchestrator.py resume-task {t['id']} --agent <agent_id>")
                     print()
             print("=" * 70)
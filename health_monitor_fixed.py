@@ -9,8 +9,12 @@ import sqlite3
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, List
 import time
 
+from health_rules import THRESHOLDS
+from alert_store import AlertStore
+
 os.environ['TZ'] = 'Asia/Bangkok'
 try:
     time.tzset()
@@ -23,26 +27,11 @@ class SmartHealthMonitor:
         self.db_path = db_path
         self.conn = sqlite3.connect(str(db_path))
         self.conn.row_factory = sqlite3.Row
-        self._ensure_alert_table()
-        
-    def _ensure_alert_table(self):
-        """Track which alerts have been sent"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alert_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                alert_type TEXT NOT NULL,
-                entity_id TEXT NOT NULL,
-                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_alert DATETIME DEFAULT CURRENT_TIMESTAMP,
-                resolved BOOLEAN DEFAULT FALSE,
-                UNIQUE(alert_type, entity_id)
-            )
-        ''')
-        self.conn.commit()
+        # Shared with HealthMonitor: dedup by (alert_type, entity_id) with backoff
+        self.alerts = AlertStore(self.conn)
         
     def check_long_running_sessions(self) -> List[Dict]:
-        """Find sessions running longer than 3 hours"""
+        """Find sessions running longer than the long-session threshold"""
         cursor = self.conn.cursor()
         cursor.execute('''
             SELECT 
@@ -55,58 +44,23 @@ class SmartHealthMonitor:
             FROM tasks t
             JOIN agents a ON t.assignee_id = a.id
             WHERE t.status = 'in_progress'
-            AND t.started_at < datetime('now', '-3 hours')
+            AND t.started_at < datetime('now', ?)
             ORDER BY t.started_at ASC
-        ''')
+        ''', (f"-{THRESHOLDS['long_session_minutes']} minutes",))
         return [dict(row) for row in cursor.fetchall()]
     
     def should_alert(self, alert_type: str, entity_id: str) -> bool:
-        """Check if we should send alert (not already sent for this issue)"""
-        cursor = self.conn.cursor()
-        
-        # Check if alert exists and is unresolved
-        cursor.execute('''
-            SELECT id, last_alert FROM alert_history
-            WHERE alert_type = ? AND entity_id = ? AND resolved = FALSE
-        ''', (alert_type, entity_id))
-        
-        row = cursor.fetchone()
-        if row:
-            # Alert already sent - update last_seen but don't alert again
-            cursor.execute('''
-                UPDATE alert_history SET last_alert = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (row[0],))
-            self.conn.commit()
-            return False  # Don't alert again
-        
-        # New issue - record it
-        cursor.execute('''
-            INSERT INTO alert_history (alert_type, entity_id)
-            VALUES (?, ?)
-        ''', (alert_type, entity_id))
-        self.conn.commit()
-        return True  # Should alert
+        """Check if we should send alert (new issue or re-alert backoff elapsed)"""
+        key = (alert_type, entity_id)
+        return key in self.alerts.reconcile([key], alert_types=[])
     
     def mark_resolved(self, alert_type: str, entity_id: str):
         """Mark alert as resolved"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE alert_history 
-            SET resolved = TRUE, last_alert = CURRENT_TIMESTAMP
-            WHERE alert_type = ? AND entity_id = ?
-        ''', (alert_type, entity_id))
-        self.conn.commit()
+        self.alerts.resolve(alert_type, entity_id)
     
     def cleanup_old_alerts(self, hours: int = 24):
         """Remove resolved alerts older than N hours"""
-        cursor = self.conn.cursor()
-        cursor.execute(f'''
-            DELETE FROM alert_history
-            WHERE resolved = TRUE
-            AND last_alert < datetime('now', '-{hours} hours')
-        ''')
-        self.conn.commit()
+        self.alerts.cleanup(hours)
     
     def run(self) -> Dict:
         """Run health check with smart alerting"""
@@ -118,10 +72,12 @@ class SmartHealthMonitor:
         alerts_to_send = []
         warnings = 0
         
-        for session in long_running:
-            entity_id = f"{session['agent_id']}-{session['task_id']}"
-            
-            if self.should_alert('long_running', entity_id):
+        # One batched reconcile: new/backed-off sessions alert, finished ones resolve
+        keys = {f"{session['agent_id']}-{session['task_id']}": session for session in long_running}
+        due = self.alerts.reconcile([('long_running', entity_id) for entity_id in keys], ['long_running'])
+        
+        for entity_id, session in keys.items():
+            if ('long_running', entity_id) in due:
                 alerts_to_send.append({
                     'agent': session['agent_name'],
                     'task': session['task_id'],
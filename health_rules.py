@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+AI Team Health Rules
+Declarative health rules: each rule declares the columns it needs, a predicate
+and an action. All rules are compiled into one combined SQL pass and evaluated
+over the loaded rows in memory, with per-rule timing.
+"""
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Health thresholds (minutes / loop counts). Override via environment.
+THRESHOLDS = {
+    'stale_minutes': int(os.getenv("AI_TEAM_HEALTH_STALE_MINUTES", "30")),
+    'offline_minutes': int(os.getenv("AI_TEAM_HEALTH_OFFLINE_MINUTES", "60")),
+    'stuck_minutes': int(os.getenv("AI_TEAM_HEALTH_STUCK_MINUTES", "120")),
+    'auto_block_minutes': int(os.getenv("AI_TEAM_HEALTH_AUTO_BLOCK_MINUTES", "180")),
+    'long_session_minutes': int(os.getenv("AI_TEAM_HEALTH_LONG_SESSION_MINUTES", "180")),
+    'alert_cooldown_minutes': int(os.getenv("AI_TEAM_HEALTH_ALERT_COOLDOWN_MINUTES", "30")),
+    'alert_backoff_max_minutes': int(os.getenv("AI_TEAM_HEALTH_ALERT_BACKOFF_MAX_MINUTES", "1440")),
+    'fix_loop_warning': int(os.getenv("AI_TEAM_FIX_LOOP_WARNING", "8")),
+    'fix_loop_limit': int(os.getenv("AI_TEAM_FIX_LOOP_LIMIT", "10")),
+    'flap_intervals_per_day': int(os.getenv("AI_TEAM_HEALTH_FLAP_INTERVALS", "6")),
+}
+
+FIX_LOOP_LIMIT = THRESHOLDS['fix_loop_limit']
+FIX_LOOP_WARNING = THRESHOLDS['fix_loop_warning']
+
+# Row sources the rules can read from. `where` may reference THRESHOLDS keys.
+SOURCES = {
+    'agents': {
+        'from': "agents a LEFT JOIN tasks t ON a.current_task_id = t.id",
+        'where': "1 = 1",
+        'order': "-strftime('%s', a.last_heartbeat)",
+    },
+    'tasks': {
+        'from': "tasks t LEFT JOIN agents a ON t.assignee_id = a.id",
+        'where': "t.status IN ('in_progress', 'todo', 'review')",
+        'order': "strftime('%s', t.updated_at)",
+    },
+    'history': {
+        'from': "task_history th JOIN tasks t ON th.task_id = t.id JOIN agents a ON th.agent_id = a.id",
+        'where': ("th.action IN ('started', 'assigned') AND t.status = 'in_progress' "
+                  "AND th.timestamp < datetime('now', '-{long_session_minutes} minutes')"),
+        'order': "strftime('%s', th.timestamp)",
+    },
+    # Up-intervals per agent over the last 24h from liveness_store.agent_liveness
+    'liveness': {
+        'from': ("(SELECT agent_id, COUNT(*) AS intervals FROM agent_liveness "
+                 "WHERE start_ts >= CAST(strftime('%s', 'now') AS INTEGER) - 86400 "
+                 "GROUP BY agent_id) l JOIN agents a ON a.id = l.agent_id"),
+        'where': "1 = 1",
+        'order': "-l.intervals",
+    },
+}
+
+
+def new_changes() -> Dict[str, List[Tuple]]:
+    """Empty change set; rule actions append parameter tuples / state-machine moves to it"""
+    return {
+        'agent_health': [],
+        'transitions': [],
+        'notifications': [],
+    }
+
+
+@dataclass
+class RuleContext:
+    """State shared by rule actions during one evaluation"""
+    thresholds: Dict
+    changes: Dict[str, List[Tuple]] = field(default_factory=new_changes)
+    has_subagent_table: bool = False
+    auto_stopped: set = field(default_factory=set)
+    auto_blocked: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class HealthRule:
+    """A health rule: the columns it reads, when it fires and what it does"""
+    name: str
+    check: str
+    source: str
+    columns: Dict[str, str]
+    predicate: Callable[[Dict, RuleContext], bool]
+    action: Callable[[Dict, RuleContext], Optional[Dict]]
+    enabled: bool = True
+
+
+class HealthRuleEngine:
+    """Compiles rules into one SQL pass and evaluates them over the result"""
+
+    def __init__(self, rules: Optional[List[HealthRule]] = None, thresholds: Optional[Dict] = None):
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        self.thresholds = dict(thresholds or THRESHOLDS)
+
+    def add_rule(self, rule: HealthRule):
+        self.rules.append(rule)
+
+    def active_rules(self, checks: Optional[set] = None) -> List[HealthRule]:
+        return [r for r in self.rules if r.enabled and (checks is None or r.check in checks)]
+
+    def compile(self, checks: Optional[set] = None) -> str:
+        """Build one UNION ALL query that projects every column any rule needs"""
+        rules = self.active_rules(checks)
+        aliases: List[str] = []
+        per_source: Dict[str, Dict[str, str]] = {}
+        for rule in rules:
+            if rule.source not in SOURCES:
+                raise ValueError(f"Rule {rule.name}: unknown source '{rule.source}'")
+            exprs = per_source.setdefault(rule.source, {})
+            for alias, expr in rule.columns.items():
+                if alias in exprs and exprs[alias] != expr:
+                    raise ValueError(f"Rule {rule.name}: column '{alias}' conflicts on source '{rule.source}'")
+                exprs[alias] = expr
+                if alias not in aliases:
+                    aliases.append(alias)
+
+        selects = []
+        for source, exprs in per_source.items():
+            spec = SOURCES[source]
+            projection = [f"'{source}' AS _source", f"{spec['order']} AS _order"]
+            projection += [f"{exprs.get(alias, 'NULL')} AS {alias}" for alias in aliases]
+            where = spec['where'].format(**self.thresholds)
+            selects.append(f"SELECT {', '.join(projection)} FROM {spec['from']} WHERE {where}")
+
+        if not selects:
+            return ""
+        return "\nUNION ALL\n".join(selects) + "\nORDER BY _source, _order"
+
+    def load(self, cursor, checks: Optional[set] = None) -> Dict[str, List[Dict]]:
+        """Run the compiled query and split rows by source"""
+        sql = self.compile(checks)
+        rows: Dict[str, List[Dict]] = {source: [] for source in SOURCES}
+        if not sql:
+            return rows
+        cursor.execute(sql)
+        names = [d[0] for d in cursor.description]
+        for values in cursor.fetchall():
+            row = dict(zip(names, values))
+            rows[row['_source']].append(row)
+        return rows
+
+    def evaluate(self, rows: Dict[str, List[Dict]], ctx: RuleContext,
+                 checks: Optional[set] = None) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+        """Evaluate rules in declaration order; returns issues per check and timings"""
+        issues: Dict[str, List[Dict]] = {}
+        timings = []
+        for rule in self.active_rules(checks):
+            started = time.perf_counter()
+            source_rows = rows.get(rule.source, [])
+            matched = [row for row in source_rows if rule.predicate(row, ctx)]
+            bucket = issues.setdefault(rule.check, [])
+            for row in matched:
+                issue = rule.action(row, ctx)
+                if issue:
+                    bucket.append(issue)
+            timings.append({
+                'rule': rule.name,
+                'rows': len(source_rows),
+                'matched': len(matched),
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+        return issues, timings
+
+
+# ========== Shared actions ==========
+
+def classify_health(row: Dict, th: Dict) -> str:
+    """Map minutes since last heartbeat to a health status"""
+    if row['last_heartbeat'] is None:
+        return 'unknown'
+    minutes = row['minutes_since_heartbeat'] or 9999
+    if minutes > th['offline_minutes']:
+        return 'offline'
+    if minutes > th['stale_minutes']:
+        return 'stale'
+    return 'healthy'
+
+
+def plan_auto_block(task_id: str, agent_id: str, agent_name: str, minutes: float,
+                    changes: Dict[str, List[Tuple]]):
+    """Queue block (agent released) + notification for a stuck task"""
+    changes['transitions'].append((task_id, 'block_release', {
+        'reason': f"Auto-blocked: Stuck for {int(minutes)} minutes",
+        'agent': agent_id,
+        'actor': agent_id,
+        'notes': f"Auto-blocked by health monitor after {int(minutes)} minutes",
+    }))
+    changes['notifications'].append((
+        f"🚫 *Auto-Blocked:* Task {task_id} blocked after {int(minutes)} minutes\nAgent {agent_name} released and available for new tasks",
+        ('auto_block', task_id)
+    ))
+
+
+# ========== Rule definitions ==========
+
+AGENT_COLUMNS = {
+    'agent_id': "a.id",
+    'agent_name': "a.name",
+    'last_heartbeat': "a.last_heartbeat",
+    'health_status': "a.health_status",
+    'minutes_since_heartbeat': "ROUND((strftime('%s', 'now') - strftime('%s', a.last_heartbeat)) / 60.0, 1)",
+}
+
+TASK_COLUMNS = {
+    'task_id': "t.id",
+    'task_title': "t.title",
+    'task_status': "t.status",
+    'progress': "t.progress",
+    'agent_id': "t.assignee_id",
+    'agent_name': "a.name",
+    'minutes_since_update': "ROUND((strftime('%s', 'now') - strftime('%s', t.updated_at)) / 60.0, 1)",
+}
+
+FIX_LOOP_COLUMNS = {
+    'task_id': "t.id",
+    'task_status': "t.status",
+    'agent_id': "t.assignee_id",
+    'agent_name': "a.name",
+    'fix_loop_count': "t.fix_loop_count",
+}
+
+LIVENESS_COLUMNS = {
+    'agent_id': "a.id",
+    'agent_name': "a.name",
+    'liveness_intervals': "l.intervals",
+}
+
+HISTORY_COLUMNS = {
+    'task_id': "th.task_id",
+    'agent_id': "th.agent_id",
+    'agent_name': "a.name",
+    'minutes_since_action': "ROUND((strftime('%s', 'now') - strftime('%s', th.timestamp)) / 60.0, 1)",
+}
+
+
+def _health_changed(row: Dict, ctx: RuleContext) -> bool:
+    return classify_health(row, ctx.thresholds) != (row['health_status'] or 'unknown')
+
+
+def _record_health_change(row: Dict, ctx: RuleContext) -> None:
+    old_health = row['health_status'] or 'unknown'
+    new_health = classify_health(row, ctx.thresholds)
+    ctx.changes['agent_health'].append((new_health, row['agent_id']))
+    print(f"🔄 Agent {row['agent_name']} health changed: {old_health} → {new_health}")
+
+
+def _agent_unhealthy(row: Dict, ctx: RuleContext) -> bool:
+    # Alert dedup/backoff is handled by alert_store.AlertStore
+    return classify_health(row, ctx.thresholds) in ('offline', 'stale')
+
+
+def _health_issue(row: Dict, ctx: RuleContext) -> Dict:
+    new_health = classify_health(row, ctx.thresholds)
+    minutes_since = row['minutes_since_heartbeat'] or 9999
+    return {
+        'type': 'agent_health',
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'],
+        'severity': 'critical' if new_health == 'offline' else 'warning',
+        'message': f"Agent {row['agent_name']} is {new_health.upper()} (no heartbeat for {int(minutes_since)} minutes)",
+        'minutes_since_heartbeat': minutes_since
+    }
+
+
+def _is_flapping(row: Dict, ctx: RuleContext) -> bool:
+    return (row['liveness_intervals'] or 0) >= ctx.thresholds['flap_intervals_per_day']
+
+
+def _flapping_issue(row: Dict, ctx: RuleContext) -> Dict:
+    reconnects = row['liveness_intervals'] - 1
+    return {
+        'type': 'agent_flapping',
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'],
+        'severity': 'warning',
+        'message': f"Agent {row['agent_name']} is FLAPPING ({reconnects} heartbeat gaps in 24h)",
+        'liveness_intervals': row['liveness_intervals']
+    }
+
+
+def _is_stuck(row: Dict, ctx: RuleContext) -> bool:
+    return (row['task_status'] == 'in_progress'
+            and row['agent_name'] is not None
+            and (row['minutes_since_update'] or 0) > ctx.thresholds['stuck_minutes'])
+
+
+def _stuck_issue(row: Dict, ctx: RuleContext) -> Dict:
+    minutes = row['minutes_since_update'] or 0
+    return {
+        'type': 'stuck_task',
+        'task_id': row['task_id'],
+        'task_title': row['task_title'],
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'],
+        'severity': 'warning',
+        'message': f"Task {row['task_id']} stuck for {int(minutes)} minutes (assigned to {row['agent_name']})",
+        'minutes_since_update': minutes,
+        'progress': row['progress']
+    }
+
+
+def _is_long_session(row: Dict, ctx: RuleContext) -> bool:
+    return (not ctx.has_subagent_table
+            and (row['minutes_since_action'] or 0) > ctx.thresholds['long_session_minutes'])
+
+
+def _long_session_issue(row: Dict, ctx: RuleContext) -> Dict:
+    minutes = row['minutes_since_action'] or 0
+    return {
+        'type': 'long_running_session',
+        'task_id': row['task_id'],
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'],
+        'severity': 'warning',
+        'message': f"Long-running session: {row['agent_name']} working on {row['task_id']} for {int(minutes)} minutes",
+        'minutes_since_action': minutes
+    }
+
+
+def _fix_loop_exceeded(row: Dict, ctx: RuleContext) -> bool:
+    return (row['fix_loop_count'] or 0) >= ctx.thresholds['fix_loop_limit']
+
+
+def _auto_stop(row: Dict, ctx: RuleContext) -> Dict:
+    fix_loops = row['fix_loop_count'] or 0
+    task_id = row['task_id']
+    limit = ctx.thresholds['fix_loop_limit']
+    blocked_reason = f"🛑 AUTO-STOPPED after {fix_loops} fix loops\n\nThis task has exceeded the maximum allowed fix loops ({limit}) to prevent infinite loops and excessive token consumption.\n\nTO RESUME:\n1. Investigate the root cause manually\n2. Use: python3 orchestrator.py resume-task {task_id} --agent <agent_id>\n   or: python3 team_db.py task unblock {task_id}\n3. This will reset the fix loop counter"
+    ctx.changes['transitions'].append((task_id, 'auto_stop', {
+        'reason': blocked_reason,
+        'agent': row['agent_id'],
+        'notes': f"Auto-stopped after {fix_loops} fix loops",
+    }))
+    ctx.auto_stopped.add(task_id)
+    return {
+        'type': 'fix_loop_exceeded',
+        'task_id': task_id,
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'] or 'Unknown',
+        'severity': 'critical',
+        'message': f"Task {task_id} AUTO-STOPPED after {fix_loops} fix loops",
+        'fix_loops': fix_loops
+    }
+
+
+def _fix_loop_near_limit(row: Dict, ctx: RuleContext) -> bool:
+    return ctx.thresholds['fix_loop_warning'] <= (row['fix_loop_count'] or 0) < ctx.thresholds['fix_loop_limit']
+
+
+def _fix_loop_warning(row: Dict, ctx: RuleContext) -> Dict:
+    fix_loops = row['fix_loop_count'] or 0
+    return {
+        'type': 'fix_loop_warning',
+        'task_id': row['task_id'],
+        'agent_id': row['agent_id'],
+        'agent_name': row['agent_name'] or 'Unknown',
+        'severity': 'warning',
+        'message': f"Task {row['task_id']} approaching fix loop limit ({fix_loops}/{ctx.thresholds['fix_loop_limit']})",
+        'fix_loops': fix_loops
+    }
+
+
+def _auto_block_due(row: Dict, ctx: RuleContext) -> bool:
+    return (_is_stuck(row, ctx)
+            and (row['minutes_since_update'] or 0) >= ctx.thresholds['auto_block_minutes']
+            and row['task_id'] not in ctx.auto_stopped)
+
+
+def _auto_block(row: Dict, ctx: RuleContext) -> None:
+    plan_auto_block(row['task_id'], row['agent_id'], row['agent_name'],
+                    row['minutes_since_update'] or 0, ctx.changes)
+    ctx.auto_blocked.append((row['task_id'], row['agent_name']))
+
+
+DEFAULT_RULES = [
+    HealthRule('agent_health_transition', 'heartbeat', 'agents', AGENT_COLUMNS,
+               _health_changed, _record_health_change),
+    HealthRule('agent_unhealthy', 'heartbeat', 'agents', AGENT_COLUMNS,
+               _agent_unhealthy, _health_issue),
+    HealthRule('agent_flapping', 'heartbeat', 'liveness', LIVENESS_COLUMNS,
+               _is_flapping, _flapping_issue),
+    HealthRule('stuck_task', 'stuck', 'tasks', TASK_COLUMNS,
+               _is_stuck, _stuck_issue),
+    HealthRule('long_running_session', 'sessions', 'history', HISTORY_COLUMNS,
+               _is_long_session, _long_session_issue),
+    HealthRule('fix_loop_exceeded', 'fix_loops', 'tasks', FIX_LOOP_COLUMNS,
+               _fix_loop_exceeded, _auto_stop),
+    HealthRule('fix_loop_warning', 'fix_loops', 'tasks', FIX_LOOP_COLUMNS,
+               _fix_loop_near_limit, _fix_loop_warning),
+    HealthRule('stuck_auto_block', 'auto_response', 'tasks', TASK_COLUMNS,
+               _auto_block_due, _auto_block),
+]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+AI Team Heartbeat Collector
+Accepts agent heartbeats at high rate (UNIX datagram socket or in-process),
+keeps only the latest beat per agent in memory and flushes them to the
+database in one batched UPDATE every few seconds.
+"""
+
+import atexit
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from liveness_store import LivenessStore, merge_beats
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+HEARTBEAT_SOCKET = os.getenv("AI_TEAM_HEARTBEAT_SOCKET", "/tmp/ai-team-heartbeat.sock")
+FLUSH_INTERVAL = float(os.getenv("AI_TEAM_HEARTBEAT_FLUSH_SECONDS", "5"))
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class HeartbeatCollector:
+    """Coalesces heartbeats per agent and flushes them in batches"""
+
+    def __init__(self, db_path: Path = DB_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.beats_received = 0
+        self.rows_flushed = 0
+        self.liveness = LivenessStore(db_path)
+
+    def beat(self, agent_id: str, timestamp: Optional[str] = None):
+        """Record a heartbeat; only the latest per agent is kept until flush"""
+        if not agent_id:
+            return
+        timestamp = timestamp or datetime.now().strftime(TS_FORMAT)
+        self.liveness.record(agent_id)
+        with self._lock:
+            self.beats_received += 1
+            if self._pending.get(agent_id, '') < timestamp:
+                self._pending[agent_id] = timestamp
+
+    def flush(self) -> int:
+        """Write all pending heartbeats in one transaction; returns rows flushed"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows = [(ts, ts, agent_id, ts) for agent_id, ts in pending.items()]
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.executemany('''
+                UPDATE agents
+                SET last_heartbeat = ?, updated_at = ?
+                WHERE id = ?
+                  AND (last_heartbeat IS NULL OR last_heartbeat < ?)
+            ''', rows)
+            # Same transaction: fold buffered beats into liveness intervals
+            self.liveness.compact(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            # Put beats back so the next flush retries them
+            with self._lock:
+                for agent_id, ts in pending.items():
+                    if self._pending.get(agent_id, '') < ts:
+                        self._pending[agent_id] = ts
+            print(f"[Heartbeat Error] Flush failed: {e}")
+            return 0
+        finally:
+            conn.close()
+
+        self.rows_flushed += len(rows)
+        return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="heartbeat-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flush thread and write anything still pending"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def serve(self, socket_path: str = HEARTBEAT_SOCKET):
+        """Receive heartbeats as datagrams ("<agent_id>" per packet) until interrupted"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(socket_path)
+        os.chmod(socket_path, 0o666)
+        self.start()
+        print(f"💓 Heartbeat collector listening on {socket_path} (flush every {self.flush_interval}s)")
+        try:
+            while True:
+                data = sock.recv(512)
+                for agent_id in data.decode('utf-8', 'ignore').split():
+                    self.beat(agent_id.strip())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.stop()
+            print(f"💓 Collector stopped: {self.beats_received} beats → {self.rows_flushed} row updates")
+
+
+def send_to_collector(agent_id: str, socket_path: str = HEARTBEAT_SOCKET) -> bool:
+    """Fire-and-forget heartbeat to a running collector; False if none is listening"""
+    if not agent_id or not os.path.exists(socket_path):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(agent_id.encode('utf-8'), socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def send_heartbeat(agent_id: str, db_path: Path = DB_PATH) -> bool:
+    """Send heartbeat via the collector, falling back to a direct UPDATE"""
+    if send_to_collector(agent_id):
+        return True
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    try:
+        cursor = conn.execute('''
+            UPDATE agents
+            SET last_heartbeat = datetime('now', 'localtime'), updated_at = datetime('now', 'localtime')
+            WHERE id = ?
+        ''', (agent_id,))
+        found = cursor.rowcount > 0
+        if found:
+            LivenessStore.ensure_schema(conn)
+            merge_beats(conn, {agent_id: [time.time()]})
+        conn.commit()
+        return found
+    finally:
+        conn.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Heartbeat Collector')
+    sub = parser.add_subparsers(dest='command')
+    serve = sub.add_parser('serve', help='Run the collector (UNIX datagram socket)')
+    serve.add_argument('--socket', default=HEARTBEAT_SOCKET, help='Socket path')
+    serve.add_argument('--interval', type=float, default=FLUSH_INTERVAL, help='Flush interval (seconds)')
+    beat = sub.add_parser('beat', help='Send a heartbeat for an agent')
+    beat.add_argument('agent_id', help='Agent ID')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        HeartbeatCollector(flush_interval=args.interval).serve(args.socket)
+    elif args.command == 'beat':
+        if send_heartbeat(args.agent_id):
+            print(f"💓 Heartbeat: {args.agent_id}")
+        else:
+            print(f"❌ Agent {args.agent_id} not found")
+            exit(1)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
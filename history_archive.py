@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+AI Team History Archive
+Moves old rows of append-only tables (task_history, audit log, notification_log,
+agent_communications) out of team.db in bounded chunks. Each chunk is stored
+column-major and zlib-compressed in a monthly archive DB (archive/history_YYYYMM.db),
+with a key index (task/agent) and time bounds so reads can skip chunks.
+read() merges live and archived rows so reports can still span archived periods.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+ARCHIVE_DIR = Path(__file__).parent / "archive"
+ARCHIVE_AFTER_DAYS = int(os.getenv("AI_TEAM_ARCHIVE_AFTER_DAYS", "30"))
+CHUNK_ROWS = int(os.getenv("AI_TEAM_ARCHIVE_CHUNK_ROWS", "500"))
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Archivable tables: timestamp column, key columns indexed for lookups, extra row filter.
+# task_history rows of open tasks stay live: the dashboard infers blocked lanes from them.
+SOURCES: Dict[str, Dict] = {
+    'task_history': {
+        'ts': 'timestamp',
+        'keys': ('task_id', 'agent_id'),
+        'where': "task_id NOT IN (SELECT id FROM tasks WHERE status NOT IN ('done', 'cancelled'))",
+    },
+    'audit_log': {'ts': 'timestamp', 'keys': ('task_id', 'agent_id'), 'where': None},
+    'notification_log': {'ts': 'sent_at', 'keys': ('task_id', 'agent_id'), 'where': None},
+    'agent_communications': {'ts': 'created_at', 'keys': ('task_id', 'from_agent_id', 'to_agent_id'), 'where': None},
+}
+AUDIT_PARTITION_GLOB = "audit_log_[0-9][0-9][0-9][0-9][0-9][0-9]"
+
+
+def archive_path(month: str, archive_dir: Path = ARCHIVE_DIR) -> Path:
+    """archive/history_YYYYMM.db for a 'YYYY-MM...' timestamp"""
+    return archive_dir / f"history_{month[:4]}{month[5:7]}.db"
+
+
+def _next_month(ts: str) -> str:
+    year, month = int(ts[:4]), int(ts[5:7])
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01 00:00:00"
+
+
+def encode_chunk(columns: List[str], rows: List[Tuple]) -> bytes:
+    """Column-major JSON, zlib-compressed (similar values sit together, so it packs well)"""
+    return zlib.compress(json.dumps([list(col) for col in zip(*rows)]).encode(), 9)
+
+
+def decode_chunk(columns: List[str], data: bytes) -> List[Dict]:
+    values = json.loads(zlib.decompress(data))
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+class HistoryArchive:
+    """Chunked archival of append-only tables with read-through queries"""
+
+    def __init__(self, db_path: Path = DB_PATH, archive_dir: Path = ARCHIVE_DIR,
+                 chunk_rows: int = CHUNK_ROWS):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.chunk_rows = chunk_rows
+        self.conn = sqlite3.connect(str(db_path), timeout=30)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def ensure_archive_schema(conn: sqlite3.Connection, schema: str = "main"):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.archived_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                min_id INTEGER NOT NULL,
+                max_id INTEGER NOT NULL,
+                min_ts TEXT,
+                max_ts TEXT,
+                row_count INTEGER NOT NULL,
+                columns TEXT NOT NULL,
+                data BLOB NOT NULL,
+                archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(source, min_id)
+            )
+        ''')
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.archived_keys (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                PRIMARY KEY (source, key, chunk_id)
+            ) WITHOUT ROWID
+        ''')
+
+    def _tables(self, source: str) -> List[str]:
+        """Physical tables behind a source (audit_log also has monthly partitions)"""
+        if source != 'audit_log':
+            return [source]
+        partitions = [row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+            (AUDIT_PARTITION_GLOB,))]
+        return ['audit_log'] + partitions
+
+    def _table_exists(self, table: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+    # ========== Archival ==========
+
+    def archive_table(self, source: str, table: str, cutoff: str) -> int:
+        """Move rows older than cutoff in chunks, one short transaction per chunk"""
+        spec = SOURCES[source]
+        ts_col = spec['ts']
+        extra = f" AND ({spec['where']})" if spec['where'] else ""
+        columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+        moved = 0
+        # Moved rows are deleted, so each pass simply picks the next oldest ones
+        while True:
+            oldest = self.conn.execute(f'''
+                SELECT MIN({ts_col}) FROM {table}
+                WHERE {ts_col} < ?{extra}
+            ''', (cutoff,)).fetchone()[0]
+            if oldest is None:
+                return moved
+            # One chunk never spans months, so it lands in a single archive file
+            bound = min(cutoff, _next_month(oldest))
+            rows = self.conn.execute(f'''
+                SELECT {", ".join(columns)} FROM {table}
+                WHERE {ts_col} < ?{extra}
+                ORDER BY id
+                LIMIT ?
+            ''', (bound, self.chunk_rows)).fetchall()
+            if not rows:
+                return moved
+            moved += self._move_chunk(source, table, columns, rows, archive_path(oldest, self.archive_dir))
+
+    def _move_chunk(self, source: str, table: str, columns: List[str], rows: List[Tuple], path: Path) -> int:
+        id_idx = columns.index('id')
+        ts_idx = columns.index(SOURCES[source]['ts'])
+        ids = [row[id_idx] for row in rows]
+        stamps = [row[ts_idx] for row in rows if row[ts_idx]]
+        keys = {
+            str(row[columns.index(k)]) for k in SOURCES[source]['keys'] if k in columns
+            for row in rows if row[columns.index(k)] is not None
+        }
+        # Partition tables keep their own id sequence, so the table name is part of the source key
+        source_key = table if table.startswith('audit_log') else source
+
+        path.parent.mkdir(exist_ok=True)
+        self.conn.execute("ATTACH DATABASE ? AS arc", (str(path),))
+        try:
+            self.ensure_archive_schema(self.conn, "arc")
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self.conn.execute('''
+                    INSERT OR IGNORE INTO arc.archived_chunks
+                        (source, min_id, max_id, min_ts, max_ts, row_count, columns, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (source_key, min(ids), max(ids), min(stamps, default=None), max(stamps, default=None),
+                      len(rows), json.dumps(columns), encode_chunk(columns, rows)))
+                if cursor.rowcount:
+                    chunk_id = cursor.lastrowid
+                    self.conn.executemany('''
+                        INSERT OR IGNORE INTO arc.archived_keys (source, key, chunk_id) VALUES (?, ?, ?)
+                    ''', [(source, key, chunk_id) for key in keys])
+                # Already archived by an interrupted run: the delete below finishes the move
+                placeholders = ",".join(["?"] * len(ids))
+                self.conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        finally:
+            self.conn.execute("DETACH DATABASE arc")
+        return len(rows)
+
+    def archive(self, days: int = ARCHIVE_AFTER_DAYS, sources: Optional[List[str]] = None) -> Dict[str, int]:
+        """Archive rows older than N days from each source; returns rows moved per source"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime(TS_FORMAT)
+        result = {}
+        for source in sources or list(SOURCES):
+            moved = 0
+            for table in self._tables(source):
+                if self._table_exists(table):
+                    moved += self.archive_table(source, table, cutoff)
+            result[source] = moved
+        return result
+
+    # ========== Read-through ==========
+
+    def _archive_files(self, start: Optional[str], end: Optional[str]) -> Iterator[Path]:
+        if not self.archive_dir.exists():
+            return
+        low = archive_path(start, self.archive_dir).name if start else None
+        high = archive_path(end, self.archive_dir).name if end else None
+        for path in sorted(self.archive_dir.glob("history_[0-9]*.db")):
+            if (low is None or path.name >= low) and (high is None or path.name <= high):
+                yield path
+
+    def read_archived(self, source: str, start: str = None, end: str = None, key: str = None) -> List[Dict]:
+        """Archived rows of a source in [start, end], optionally for one task/agent key"""
+        ts_col = SOURCES[source]['ts']
+        rows: List[Dict] = []
+        for path in self._archive_files(start, end):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                sql = '''
+                    SELECT c.columns, c.data FROM archived_chunks c
+                    WHERE (c.source = ? OR c.source GLOB ?)
+                      AND (? IS NULL OR c.max_ts >= ?)
+                      AND (? IS NULL OR c.min_ts <= ?)
+                '''
+                params = [source, f"{source}_*", start, start, end, end]
+                if key is not None:
+                    sql += " AND c.id IN (SELECT chunk_id FROM archived_keys WHERE source = ? AND key = ?)"
+                    params += [source, key]
+                for columns_json, data in conn.execute(sql, params):
+                    columns = json.loads(columns_json)
+                    for row in decode_chunk(columns, data):
+                        ts = row.get(ts_col)
+                        if start and (ts is None or ts < start):
+                            continue
+                        if end and (ts is None or ts > end):
+                            continue
+                        if key is not None and key not in {str(row.get(k)) for k in SOURCES[source]['keys']}:
+                            continue
+                        rows.append(row)
+            finally:
+                conn.close()
+        return rows
+
+    def read(self, source: str, start: str = None, end: str = None, task_id: str = None,
+             agent_id: str = None) -> List[Dict]:
+        """Live + archived rows of a source, oldest first"""
+        spec = SOURCES[source]
+        ts_col = spec['ts']
+        where, params = [], []
+        if start:
+            where.append(f"{ts_col} >= ?")
+            params.append(start)
+        if end:
+            where.append(f"{ts_col} <= ?")
+            params.append(end)
+        if task_id:
+            where.append("task_id = ?")
+            params.append(task_id)
+        if agent_id:
+            agent_cols = [k for k in spec['keys'] if 'agent_id' in k]
+            where.append("(" + " OR ".join(f"{k} = ?" for k in agent_cols) + ")")
+            params.extend([agent_id] * len(agent_cols))
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        self.conn.row_factory = sqlite3.Row
+        try:
+            rows = [
+                dict(row)
+                for table in self._tables(source) if self._table_exists(table)
+                for row in self.conn.execute(f"SELECT * FROM {table} {clause}", params)
+            ]
+        finally:
+            self.conn.row_factory = None
+
+        archived = self.read_archived(source, start, end, key=task_id or agent_id)
+        if task_id and agent_id:
+            archived = [r for r in archived if agent_id in {str(r.get(k)) for k in spec['keys']}]
+        rows.extend(archived)
+        rows.sort(key=lambda r: (r.get(ts_col) or '', r.get('id') or 0))
+        return rows
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per archive file: chunks, rows and size on disk"""
+        result = {}
+        for path in self._archive_files(None, None):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                chunks, rows = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM archived_chunks").fetchone()
+            finally:
+                conn.close()
+            result[path.name] = {'chunks': chunks, 'rows': rows, 'bytes': path.stat().st_size}
+        return result
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team History Archive')
+    parser.add_argument('--run', action='store_true', help='Archive old rows')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='Archive rows older than N days')
+    parser.add_argument('--source', choices=list(SOURCES), action='append', help='Limit to a source table')
+    parser.add_argument('--task', help='Show full (live + archived) history for a task')
+    args = parser.parse_args()
+
+    with HistoryArchive() as archive:
+        if args.run:
+            for source, moved in archive.archive(args.days, args.source).items():
+                print(f"📦 {source}: archived {moved} rows")
+        elif args.task:
+            for row in archive.read('task_history', task_id=args.task):
+                print(f"  {row['timestamp']} | {row['action']} | {row.get('old_status')} → {row.get('new_status')} | {row.get('notes') or ''}")
+        else:
+            stats = archive.stats()
+            print(f"🗄️  Archive files: {len(stats)}")
+            for name, info in stats.items():
+                print(f"  {name}: {info['rows']} rows in {info['chunks']} chunks ({info['bytes'] // 1024} KB)")
+
+
+if __name__ == '__main__':
+    main()
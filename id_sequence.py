@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+AI Team ID Sequences
+Daily counters for PREFIX-YYYYMMDD-NNN identifiers (tasks T-, missions M-).
+Each (prefix, day) is one row in id_sequences bumped inside BEGIN IMMEDIATE,
+so concurrent creators get disjoint numbers with one indexed UPDATE and no
+retries, and a bulk creator can reserve a contiguous block in one step.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+
+# prefix -> (table, id column) holding IDs issued before the sequence existed;
+# read once per day to seed the counter so numbering continues without clashes
+SEEDS: Dict[str, Tuple[str, str]] = {
+    'T': ('tasks', 'id'),
+    'M': ('orchestrator_missions', 'id'),
+}
+
+
+class IdSequence:
+    """Per (prefix, day) counters; reserve() is atomic and O(1)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS id_sequences (
+                prefix TEXT NOT NULL,
+                day TEXT NOT NULL,
+                last_value INTEGER NOT NULL,
+                PRIMARY KEY (prefix, day)
+            ) WITHOUT ROWID
+        ''')
+
+    def _seed(self, prefix: str, day: str) -> int:
+        """Highest number already used today by IDs created outside the sequence"""
+        source = SEEDS.get(prefix)
+        if not source:
+            return 0
+        table, column = source
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            return 0
+        stem = f"{prefix}-{day}-"
+        # Range on the primary key instead of LIKE so the index is used
+        row = self.conn.execute(f'''
+            SELECT MAX(CAST(SUBSTR({column}, ?) AS INTEGER)) FROM {table}
+            WHERE {column} >= ? AND {column} < ?
+        ''', (len(stem) + 1, stem, stem[:-1] + '.')).fetchone()
+        return row[0] or 0
+
+    def reserve(self, prefix: str, count: int = 1, day: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Reserve `count` consecutive numbers for prefix/day (default today).
+        Returns (day, first number). Runs in its own IMMEDIATE transaction unless
+        the caller already has one open, in which case it joins it.
+        """
+        if count < 1:
+            raise ValueError("count must be >= 1")
+        day = day or datetime.now().strftime('%Y%m%d')
+        own = not self.conn.in_transaction
+        if own:
+            self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute('''
+                UPDATE id_sequences SET last_value = last_value + ?
+                WHERE prefix = ? AND day = ?
+                RETURNING last_value
+            ''', (count, prefix, day)).fetchone()
+            if row is None:
+                # First ID of the day: seed once from existing rows
+                last = self._seed(prefix, day) + count
+                self.conn.execute('''
+                    INSERT INTO id_sequences (prefix, day, last_value) VALUES (?, ?, ?)
+                ''', (prefix, day, last))
+            else:
+                last = row[0]
+            if own:
+                self.conn.commit()
+        except Exception:
+            if own:
+                self.conn.rollback()
+            raise
+        return day, last - count + 1
+
+    def next_ids(self, prefix: str, count: int = 1, width: int = 3) -> List[str]:
+        """`count` fresh IDs like T-20260202-007, contiguous and in order"""
+        day, first = self.reserve(prefix, count)
+        return [f"{prefix}-{day}-{n:0{width}d}" for n in range(first, first + count)]
+
+    def next_id(self, prefix: str, width: int = 3) -> str:
+        return self.next_ids(prefix, 1, width)[0]
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+AI Team Learnings Store
+Agent learnings as rows (agent_learnings) instead of a text blob: each learning
+is deduplicated by a normalized content hash and ranked by recency and usage.
+Consolidation from completed tasks, pruning and the agent_context.learnings
+summary are each a single set-based statement over all agents.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+TOP_K = int(os.getenv("AI_TEAM_LEARNINGS_TOP_K", "20"))
+KEEP_PER_AGENT = int(os.getenv("AI_TEAM_LEARNINGS_KEEP", "200"))
+# Days after which a learning's recency weight halves
+HALF_LIFE_DAYS = float(os.getenv("AI_TEAM_LEARNINGS_HALF_LIFE_DAYS", "14"))
+
+_PREFIX = re.compile(r'^\s*(?:[-*•]\s*)?(?:\[\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2})?\]\s*)?(?:[-*•]\s*)?')
+
+# Recency (hyperbolic decay) scaled by usage; higher is better
+SCORE_SQL = f'''
+    (1.0 + use_count) / (1.0 + (julianday('now', 'localtime') - julianday(COALESCE(last_used_at, last_seen_at))) / {HALF_LIFE_DAYS})
+'''
+
+
+def normalize_learning(text: str) -> str:
+    """Strip list markers / timestamp prefixes, collapse whitespace, lowercase"""
+    return ' '.join(_PREFIX.sub('', text or '').split()).lower()
+
+
+def learning_hash(text: str) -> str:
+    return hashlib.sha1(normalize_learning(text).encode('utf-8')).hexdigest()
+
+
+class LearningStore:
+    """Deduplicated, ranked agent learnings with set-based maintenance"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        conn.create_function('learning_hash', 1, learning_hash, deterministic=True)
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        cursor = self.conn.cursor()
+        created = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'agent_learnings'").fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS agent_learnings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                source TEXT DEFAULT 'manual',
+                task_id TEXT,
+                created_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                last_seen_at DATETIME DEFAULT (datetime('now', 'localtime')),
+                use_count INTEGER DEFAULT 0,
+                last_used_at DATETIME,
+                UNIQUE(agent_id, content_hash)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_agent_learnings_agent_seen
+            ON agent_learnings(agent_id, last_seen_at)
+        ''')
+        if created:
+            self._backfill_from_context()
+        self.conn.commit()
+
+    def _backfill_from_context(self):
+        """One-time import of the old newline-separated agent_context.learnings text"""
+        rows = []
+        for agent_id, text, updated in self.conn.execute('''
+                SELECT agent_id, learnings, last_updated FROM agent_context
+                WHERE learnings IS NOT NULL AND learnings != ''
+            '''):
+            for line in text.split('\n'):
+                stamp = re.match(r'^\s*\[(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2})', line)
+                content = _PREFIX.sub('', line).strip()
+                if content:
+                    # Undated lines take the context's last update time
+                    seen = f"{stamp.group(1).replace('T', ' ')}:00" if stamp else updated
+                    rows.append((agent_id, content, learning_hash(content), seen, seen))
+        self.conn.executemany('''
+            INSERT INTO agent_learnings (agent_id, content, content_hash, source, created_at, last_seen_at)
+            VALUES (?, ?, ?, 'legacy', COALESCE(?, datetime('now', 'localtime')), COALESCE(?, datetime('now', 'localtime')))
+            ON CONFLICT(agent_id, content_hash) DO NOTHING
+        ''', rows)
+
+    # ========== Writes ==========
+
+    def add(self, agent_id: str, content: str, source: str = 'manual', task_id: Optional[str] = None) -> bool:
+        """Insert a learning, or refresh last_seen_at if the same learning exists; False if empty"""
+        content = _PREFIX.sub('', content or '').strip()
+        if not content:
+            return False
+        self.conn.execute('''
+            INSERT INTO agent_learnings (agent_id, content, content_hash, source, task_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(agent_id, content_hash) DO UPDATE SET
+                last_seen_at = datetime('now', 'localtime'),
+                task_id = COALESCE(excluded.task_id, agent_learnings.task_id)
+        ''', (agent_id, content, learning_hash(content), source, task_id))
+        return True
+
+    def consolidate_completed_tasks(self, days: int = 7) -> int:
+        """Record a learning per recently completed task, for all agents in one statement"""
+        cursor = self.conn.execute(f'''
+            INSERT INTO agent_learnings (agent_id, content, content_hash, source, task_id, created_at, last_seen_at)
+            SELECT t.assignee_id, 'Completed: ' || t.title, learning_hash('Completed: ' || t.title),
+                   'task', t.id, t.completed_at, t.completed_at
+            FROM tasks t
+            JOIN agent_context ac ON ac.agent_id = t.assignee_id
+            WHERE t.status = 'done'
+              AND t.completed_at > datetime('now', '-{int(days)} days')
+            ON CONFLICT(agent_id, content_hash) DO UPDATE SET
+                last_seen_at = excluded.last_seen_at
+            WHERE excluded.last_seen_at > agent_learnings.last_seen_at
+        ''')
+        return cursor.rowcount
+
+    def prune(self, keep: int = KEEP_PER_AGENT) -> int:
+        """Drop everything below the top `keep` learnings of each agent"""
+        cursor = self.conn.execute(f'''
+            DELETE FROM agent_learnings WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY agent_id ORDER BY {SCORE_SQL} DESC, id DESC) AS rn
+                    FROM agent_learnings
+                ) WHERE rn > ?
+            )
+        ''', (keep,))
+        return cursor.rowcount
+
+    def refresh_context(self, agent_ids: Optional[Iterable[str]] = None, k: int = TOP_K) -> int:
+        """Rewrite agent_context.learnings as the rendered top-K (for prompt builders reading the column)"""
+        where, params = "", []
+        if agent_ids is not None:
+            agent_ids = list(agent_ids)
+            if not agent_ids:
+                return 0
+            where = f"WHERE agent_id IN ({','.join(['?'] * len(agent_ids))})"
+            params = agent_ids
+        cursor = self.conn.execute(f'''
+            UPDATE agent_context
+            SET learnings = COALESCE((
+                    SELECT group_concat(line, char(10)) FROM (
+                        SELECT '[' || substr(l.created_at, 1, 16) || '] ' || l.content AS line
+                        FROM agent_learnings l
+                        WHERE l.agent_id = agent_context.agent_id
+                        ORDER BY {SCORE_SQL} DESC, l.id DESC
+                        LIMIT {int(k)}
+                    )
+                ), ''),
+                last_updated = datetime('now', 'localtime')
+            {where}
+        ''', params)
+        return cursor.rowcount
+
+    # ========== Reads ==========
+
+    def top(self, agent_id: str, k: int = TOP_K, mark_used: bool = False) -> List[Dict]:
+        """Best-ranked learnings of one agent; mark_used counts them as used in a prompt"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = [dict(r) for r in cursor.execute(f'''
+            SELECT id, content, source, task_id, created_at, last_seen_at, use_count,
+                   {SCORE_SQL} AS score
+            FROM agent_learnings
+            WHERE agent_id = ?
+            ORDER BY score DESC, id DESC
+            LIMIT ?
+        ''', (agent_id, k))]
+        if mark_used:
+            self.mark_used([r['id'] for r in rows])
+        return rows
+
+    def mark_used(self, ids: Iterable[int]):
+        """Count learnings as used in a prompt (raises their rank)"""
+        ids = list(ids)
+        if not ids:
+            return
+        self.conn.execute(f'''
+            UPDATE agent_learnings
+            SET use_count = use_count + 1, last_used_at = datetime('now', 'localtime')
+            WHERE id IN ({','.join('?' * len(ids))})
+        ''', ids)
+        self.conn.commit()
+
+    def top_all(self, k: int = TOP_K) -> Dict[str, List[str]]:
+        """Top-K learning texts for every agent in one query"""
+        result: Dict[str, List[str]] = {}
+        for agent_id, content in self.conn.execute(f'''
+            SELECT agent_id, content FROM (
+                SELECT agent_id, content,
+                       ROW_NUMBER() OVER (PARTITION BY agent_id ORDER BY {SCORE_SQL} DESC, id DESC) AS rn
+                FROM agent_learnings
+            ) WHERE rn <= ?
+            ORDER BY agent_id, rn
+        ''', (k,)):
+            result.setdefault(agent_id, []).append(content)
+        return result
+
+
+def render_learnings(rows: List[Dict]) -> str:
+    return '\n'.join(f"- {r['content']}" for r in rows)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Learnings Store')
+    parser.add_argument('agent_id', nargs='?', help='Show top learnings for an agent')
+    parser.add_argument('-k', type=int, default=TOP_K, help='Number of learnings')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        store = LearningStore(conn)
+        if args.agent_id:
+            rows = store.top(args.agent_id, args.k)
+            print(f"🧠 Top {len(rows)} learnings for {args.agent_id}")
+            for r in rows:
+                print(f"  [{r['score']:.2f}] {r['content'][:100]} (used {r['use_count']}x)")
+        else:
+            for agent_id, items in sorted(store.top_all(args.k).items()):
+                print(f"🧠 {agent_id}: {len(items)} learnings")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+AI Team Liveness Store
+Append-only agent liveness history. Heartbeats land in a per-agent ring
+buffer (array-backed) and are periodically compacted into SQLite as
+run-length "up intervals": consecutive beats closer than the tolerance
+extend one interval, a longer silence starts a new one. Uptime %, gap
+histograms and flap counts over days are then cheap aggregate queries.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from health_rules import THRESHOLDS
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+RING_CAPACITY = 256
+# Beats closer than this belong to the same up-interval (seconds)
+TOLERANCE_SECONDS = THRESHOLDS['stale_minutes'] * 60
+# Gap histogram bucket upper bounds (minutes)
+GAP_BUCKETS = (5, 15, 30, 60, 240, 1440)
+
+
+class RingBuffer:
+    """Fixed-size array of beat timestamps (epoch seconds) for one agent"""
+
+    __slots__ = ('values', 'head', 'count')
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.values = array('d', bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+    def append(self, ts: float):
+        self.values[self.head] = ts
+        self.head = (self.head + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+    def drain(self) -> List[float]:
+        """Return buffered beats oldest-first and empty the buffer"""
+        capacity = len(self.values)
+        start = (self.head - self.count) % capacity
+        beats = [self.values[(start + i) % capacity] for i in range(self.count)]
+        self.count = 0
+        return sorted(beats)
+
+
+class LivenessStore:
+    """Ring-buffered heartbeats with compaction into agent_liveness intervals"""
+
+    def __init__(self, db_path: Path = DB_PATH, tolerance_seconds: int = TOLERANCE_SECONDS,
+                 capacity: int = RING_CAPACITY):
+        self.db_path = db_path
+        self.tolerance = tolerance_seconds
+        self.capacity = capacity
+        self._buffers: Dict[str, RingBuffer] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS agent_liveness (
+                agent_id TEXT NOT NULL,
+                start_ts INTEGER NOT NULL,
+                last_beat_ts INTEGER NOT NULL,
+                beats INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (agent_id, start_ts)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_agent_liveness_last_beat
+            ON agent_liveness(last_beat_ts)
+        ''')
+
+    def record(self, agent_id: str, ts: Optional[float] = None):
+        """Buffer a heartbeat (cheap, in memory)"""
+        if not agent_id:
+            return
+        with self._lock:
+            buf = self._buffers.get(agent_id)
+            if buf is None:
+                buf = self._buffers[agent_id] = RingBuffer(self.capacity)
+            buf.append(ts if ts is not None else time.time())
+
+    def compact(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """Merge buffered beats into agent_liveness in one transaction; returns beats written"""
+        with self._lock:
+            drained = {agent_id: buf.drain() for agent_id, buf in self._buffers.items() if buf.count}
+        if not drained:
+            return 0
+
+        own_conn = conn is None
+        conn = conn or sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            self.ensure_schema(conn)
+            written = merge_beats(conn, drained, self.tolerance)
+            conn.commit()
+            return written
+        finally:
+            if own_conn:
+                conn.close()
+
+
+def merge_beats(conn: sqlite3.Connection, beats_by_agent: Dict[str, List[float]],
+                tolerance: int = TOLERANCE_SECONDS) -> int:
+    """Fold sorted beats into each agent's open interval (caller commits)"""
+    agent_ids = list(beats_by_agent)
+    placeholders = ",".join(["?"] * len(agent_ids))
+    open_intervals = {
+        row[0]: [row[1], row[2], row[3]]
+        for row in conn.execute(f'''
+            SELECT agent_id, start_ts, last_beat_ts, beats
+            FROM agent_liveness l
+            WHERE agent_id IN ({placeholders})
+              AND start_ts = (SELECT MAX(start_ts) FROM agent_liveness WHERE agent_id = l.agent_id)
+        ''', agent_ids)
+    }
+
+    upserts: List[Tuple] = []
+    written = 0
+    for agent_id, beats in beats_by_agent.items():
+        current = open_intervals.get(agent_id)
+        for ts in beats:
+            ts = int(ts)
+            written += 1
+            if current and ts < current[1]:
+                continue  # late/duplicate beat inside a known interval
+            if current and ts - current[1] <= tolerance:
+                current[1] = ts
+                current[2] += 1
+            else:
+                if current:
+                    upserts.append((agent_id, *current))
+                current = [ts, ts, 1]
+        if current:
+            upserts.append((agent_id, *current))
+
+    conn.executemany('''
+        INSERT INTO agent_liveness (agent_id, start_ts, last_beat_ts, beats)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(agent_id, start_ts) DO UPDATE SET
+            last_beat_ts = excluded.last_beat_ts,
+            beats = excluded.beats
+    ''', upserts)
+    return written
+
+
+def uptime(conn: sqlite3.Connection, days: float = 1, agent_id: Optional[str] = None,
+           now: Optional[float] = None, tolerance: int = TOLERANCE_SECONDS) -> Dict[str, float]:
+    """Uptime % per agent over the last N days (an interval covers last beat + tolerance)"""
+    now = int(now or time.time())
+    window_start = now - int(days * 86400)
+    sql = '''
+        SELECT agent_id,
+               SUM(MAX(0, MIN(last_beat_ts + ?, ?) - MAX(start_ts, ?))) AS up_seconds
+        FROM agent_liveness
+        WHERE last_beat_ts + ? >= ? AND start_ts <= ?
+    '''
+    params: List = [tolerance, now, window_start, tolerance, window_start, now]
+    if agent_id:
+        sql += " AND agent_id = ?"
+        params.append(agent_id)
+    sql += " GROUP BY agent_id"
+    span = max(now - window_start, 1)
+    return {row[0]: round(100.0 * (row[1] or 0) / span, 2) for row in conn.execute(sql, params)}
+
+
+def gap_histogram(conn: sqlite3.Connection, days: float = 1, agent_id: Optional[str] = None,
+                  now: Optional[float] = None, buckets: Iterable[int] = GAP_BUCKETS) -> Dict[str, Dict[str, int]]:
+    """Count silences between up-intervals per agent, bucketed by length (minutes)"""
+    now = int(now or time.time())
+    window_start = now - int(days * 86400)
+    sql = '''
+        SELECT agent_id, (start_ts - prev_beat) / 60.0 AS gap_minutes
+        FROM (
+            SELECT agent_id, start_ts,
+                   LAG(last_beat_ts) OVER (PARTITION BY agent_id ORDER BY start_ts) AS prev_beat
+            FROM agent_liveness
+            WHERE last_beat_ts >= ?
+        )
+        WHERE prev_beat IS NOT NULL AND start_ts >= ?
+    '''
+    params: List = [window_start, window_start]
+    if agent_id:
+        sql = sql.replace("WHERE last_beat_ts >= ?", "WHERE last_beat_ts >= ? AND agent_id = ?")
+        params.insert(1, agent_id)
+
+    bounds = sorted(buckets)
+    labels = [f"<{b}m" for b in bounds] + [f">={bounds[-1]}m"]
+    result: Dict[str, Dict[str, int]] = {}
+    for row_agent, gap in conn.execute(sql, params):
+        hist = result.setdefault(row_agent, {label: 0 for label in labels})
+        index = next((i for i, b in enumerate(bounds) if gap < b), len(bounds))
+        hist[labels[index]] += 1
+    return result
+
+
+def flap_counts(conn: sqlite3.Connection, days: float = 1, now: Optional[float] = None) -> Dict[str, int]:
+    """Number of up-intervals started per agent in the window (1 = steady, many = flapping)"""
+    now = int(now or time.time())
+    window_start = now - int(days * 86400)
+    return {
+        row[0]: row[1]
+        for row in conn.execute('''
+            SELECT agent_id, COUNT(*) FROM agent_liveness
+            WHERE start_ts >= ?
+            GROUP BY agent_id
+        ''', (window_start,))
+    }
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Liveness Store')
+    parser.add_argument('--days', type=float, default=1, help='Window in days')
+    parser.add_argument('--agent', help='Limit to one agent')
+    parser.add_argument('--gaps', action='store_true', help='Show gap histogram')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        LivenessStore.ensure_schema(conn)
+        if args.gaps:
+            print(f"⏸️  Heartbeat gaps ({args.days:g}d)")
+            for agent_id, hist in sorted(gap_histogram(conn, args.days, args.agent).items()):
+                cells = "  ".join(f"{label}:{n}" for label, n in hist.items())
+                print(f"  {agent_id:<14} {cells}")
+        else:
+            flaps = flap_counts(conn, args.days)
+            print(f"📈 Uptime ({args.days:g}d)")
+            for agent_id, pct in sorted(uptime(conn, args.days, args.agent).items()):
+                print(f"  {agent_id:<14} {pct:6.2f}%  intervals: {flaps.get(agent_id, 0)}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
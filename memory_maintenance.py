@@ -11,6 +11,11 @@ from pathlib import Path
 from typing import List, Dict
 import time
 
+from db_maintenance import DBMaintenance
+from history_archive import HistoryArchive
+from learnings_store import LearningStore
+from task_state import TaskStateMachine
+
 os.environ['TZ'] = 'Asia/Bangkok'
 try:
     time.tzset()
@@ -49,121 +54,51 @@ class MemoryMaintenance:
         ''')
         
         stale_agents = [dict(row) for row in cursor.fetchall()]
-        reset_count = 0
-        
+        if not stale_agents:
+            return 0
+
+        # Reset agents to idle and move their tasks back to the queue - one commit for all
+        cursor.executemany('''
+            UPDATE agents
+            SET status = 'idle', current_task_id = NULL, last_heartbeat = datetime('now')
+            WHERE id = ?
+        ''', [(agent['id'],) for agent in stale_agents])
+        TaskStateMachine(self.conn).apply_many([
+            (agent['current_task_id'], ('reset_stale', 'wait_review'),
+             {'agent': agent['id'], 'actor': agent['id'], 'notes': 'Reset: agent stale, task returned to queue'})
+            for agent in stale_agents if agent['current_task_id']
+        ])
+
         for agent in stale_agents:
             print(f"  🔄 Resetting {agent['name']} (stale)")
-            
-            # Reset agent to idle
-            cursor.execute('''
-                UPDATE agents 
-                SET status = 'idle', current_task_id = NULL, last_heartbeat = datetime('now')
-                WHERE id = ?
-            ''', (agent['id'],))
-            
-            # Move task back to todo if exists
-            if agent['current_task_id']:
-                cursor.execute('''
-                    UPDATE tasks 
-                    SET status = 'todo', assignee_id = NULL, updated_at = datetime('now')
-                    WHERE id = ?
-                ''', (agent['current_task_id'],))
-                
-                cursor.execute('''
-                    INSERT INTO task_history (task_id, agent_id, action, notes)
-                    VALUES (?, ?, 'updated', 'Reset: agent stale, task returned to todo')
-                ''', (agent['current_task_id'], agent['id']))
-            
-            reset_count += 1
             self.actions.append(f"Reset {agent['name']}: stale agent")
-        
-        self.conn.commit()
-        return reset_count
+
+        return len(stale_agents)
 
     def update_agent_learnings(self) -> int:
-        """Update agent contexts with learnings from recent completed tasks"""
-        cursor = self.conn.cursor()
-        
-        # Get agents with recent completed tasks
-        cursor.execute('''
-            SELECT DISTINCT a.id, a.name
-            FROM agents a
-            JOIN tasks t ON a.id = t.assignee_id
-            WHERE t.status = 'done'
-            AND t.completed_at > datetime('now', '-7 days')
-        ''')
+        """Record learnings from recent completed tasks (deduplicated) and refresh agent contexts"""
+        store = LearningStore(self.conn)
+        added = store.consolidate_completed_tasks(days=7)
+        pruned = store.prune()
+        update_count = store.refresh_context() if added or pruned else 0
+        self.conn.commit()
         
-        agents = [dict(row) for row in cursor.fetchall()]
-        update_count = 0
-        
-        for agent in agents:
-            # Get recent completed tasks
-            cursor.execute('''
-                SELECT title, expected_outcome, notes
-                FROM tasks
-                WHERE assignee_id = ? AND status = 'done'
-                AND completed_at > datetime('now', '-7 days')
-                ORDER BY completed_at DESC
-                LIMIT 5
-            ''', (agent['id'],))
-            
-            tasks = cursor.fetchall()
-            if not tasks:
-                continue
-            
-            # Generate learning summary
-            learnings = []
-            for task in tasks:
-                title = task[0]
-                learnings.append(f"- Completed: {title}")
-            
-            new_learning = "\n".join(learnings)
-            
-            # Get existing learnings
-            cursor.execute('''
-                SELECT learnings FROM agent_context WHERE agent_id = ?
-            ''', (agent['id'],))
-            row = cursor.fetchone()
-            existing = row[0] if row else ""
-            
-            # Merge learnings (keep recent 20 items)
-            combined = f"{new_learning}\n{existing}" if existing else new_learning
-            lines = combined.split('\n')
-            # Keep only non-empty lines
-            lines = [l for l in lines if l.strip()]
-            # Keep last 20
-            lines = lines[:20]
-            updated = '\n'.join(lines)
-            
-            # Update agent context
-            cursor.execute('''
-                UPDATE agent_context 
-                SET learnings = ?, last_updated = datetime('now')
-                WHERE agent_id = ?
-            ''', (updated, agent['id']))
-            
-            update_count += 1
-            self.actions.append(f"Updated learnings for {agent['name']}")
+        if added:
+            self.actions.append(f"Recorded {added} task learnings ({update_count} agent contexts refreshed)")
         
-        self.conn.commit()
         return update_count
 
     def archive_old_history(self) -> int:
-        """Archive task history older than 30 days"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM task_history
-            WHERE timestamp < datetime('now', '-30 days')
-        ''')
+        """Move history older than 30 days to compressed archive DBs (still readable via HistoryArchive.read)"""
+        with HistoryArchive(self.db_path) as archive:
+            moved = archive.archive(days=30)
         
-        deleted = cursor.rowcount
-        self.conn.commit()
+        archived = sum(moved.values())
+        if archived > 0:
+            detail = ", ".join(f"{source}: {count}" for source, count in moved.items() if count)
+            self.actions.append(f"Archived {archived} old history records ({detail})")
         
-        if deleted > 0:
-            self.actions.append(f"Archived {deleted} old history records")
-        
-        return deleted
+        return archived
 
     def run(self) -> Dict:
         """Run full maintenance"""
@@ -185,6 +120,15 @@ class MemoryMaintenance:
         archived = self.archive_old_history()
         print(f"   Archived {archived} records")
         
+        # 4. Database housekeeping (heavy steps only in quiet windows)
+        print("\n4️⃣ Database maintenance...")
+        with DBMaintenance(self.db_path) as maint:
+            db_steps = maint.run()
+        for step, detail in db_steps.items():
+            print(f"   {step}: {detail}")
+            if step != 'optimize':
+                self.actions.append(f"DB {step}: {detail}")
+        
         print("\n" + "=" * 50)
         
         if self.actions:
@@ -198,6 +142,7 @@ class MemoryMaintenance:
             'stale_reset': stale_reset,
             'learnings_updated': learnings_updated,
             'archived': archived,
+            'db_maintenance': db_steps,
             'actions': self.actions
         }
 
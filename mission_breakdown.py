@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+AI Team Mission Breakdown
+Parallel planning for orchestrator missions: several planning agents (e.g. PM
+for stories, architect for technical tasks) are spawned at once, each writes a
+JSON proposal, and the proposals are merged in one pass. Near-duplicate titles
+are folded together (token index for candidates, then difflib similarity),
+dependencies given by key or title are resolved to the merged tasks, and the
+result goes in with one create_tasks_bulk call plus one batch of edges.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from agent_runtime import spawn_agent
+from context_retrieval import retrieve_cached
+from mission_tracker import MissionTracker
+from prompt_builder import PromptTemplate
+from task_dag import TaskDAG
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+PROPOSALS_DIR = Path(__file__).parent / "missions"
+LOG_DIR = Path(__file__).parent / "logs"
+# Titles at or above this similarity are the same task
+SIMILARITY = float(os.getenv("AI_TEAM_BREAKDOWN_SIMILARITY", "0.82"))
+PLANNER_TIMEOUT = int(os.getenv("AI_TEAM_BREAKDOWN_TIMEOUT", "1800"))
+
+# planner agent -> what its share of the breakdown covers
+PLANNER_FOCUS: Dict[str, str] = {
+    'pm': 'user stories and product scope: what users need, in delivery order',
+    'analyst': 'requirements, open questions and research needed before building',
+    'architect': 'technical tasks: design, data model, APIs, infrastructure and integration',
+    'ux-designer': 'UX/UI work: flows, screens and design review',
+    'qa': 'test planning and verification tasks for each deliverable',
+    'tech-writer': 'documentation and release notes',
+}
+DEFAULT_PLANNERS = [p.strip() for p in os.getenv("AI_TEAM_BREAKDOWN_PLANNERS", "pm,architect").split(',') if p.strip()]
+
+PRIORITY_RANK = {'critical': 1, 'high': 2, 'normal': 3, 'low': 4}
+# Proposal keys -> create_tasks_bulk fields
+PROPOSAL_ALIASES = {
+    'assignee': 'assignee_id', 'assign': 'assignee_id', 'desc': 'description',
+    'acceptance': 'acceptance_criteria', 'estimate': 'estimated_hours', 'hours': 'estimated_hours',
+    'expected-outcome': 'expected_outcome', 'depends-on': 'depends_on', 'dependencies': 'depends_on',
+}
+MERGE_FIELDS = ('description', 'expected_outcome', 'prerequisites', 'acceptance_criteria',
+                'assignee_id', 'estimated_hours')
+TITLE_STOPWORDS = {'a', 'an', 'the', 'and', 'for', 'of', 'to', 'in', 'on', 'with', 'task'}
+
+PLANNER_MESSAGE = PromptTemplate('planner_message', """# 🧭 MISSION BREAKDOWN ({agent_id})
+
+**Mission ID:** {mission_id}
+**Type:** {goal_type}
+**Title:** {title}
+**Description:** {description}
+**Expected Outcome:** {expected_outcome}
+
+## Your Role
+{context}
+
+## Your Focus
+Propose only tasks about {focus}. Other planners cover the rest in parallel;
+overlapping tasks are merged automatically, so do not coordinate by chat.
+
+## Output (required)
+Write a JSON file to:
+`{proposal_path}`
+
+```json
+{{"tasks": [
+  {{"key": "short-id", "title": "Action-oriented title",
+    "description": "...", "expected_outcome": "Specific deliverable",
+    "prerequisites": "- [ ] ...", "acceptance_criteria": "- [ ] ...",
+    "priority": "normal", "estimated_hours": 2, "assignee": "dev",
+    "depends_on": ["other-key or exact title of another task"]}}
+]}}
+```
+
+- 3-10 tasks, each small enough for one agent session
+- `depends_on` may name your own keys or tasks you expect other planners to propose (by title)
+- Do NOT create tasks in the database; the orchestrator imports the merged plan
+
+**Write the file and stop.**
+""")
+
+
+def proposal_dir(mission_id: str) -> Path:
+    return PROPOSALS_DIR / mission_id
+
+
+def title_tokens(title: str) -> Set[str]:
+    return {w for w in re.findall(r'\w+', (title or '').lower(), re.UNICODE) if w not in TITLE_STOPWORDS}
+
+
+def title_similarity(a: str, b: str) -> float:
+    """Max of token-set Jaccard and character-level ratio over normalized titles"""
+    ta, tb = title_tokens(a), title_tokens(b)
+    if not ta or not tb:
+        return 0.0
+    jaccard = len(ta & tb) / len(ta | tb)
+    ratio = SequenceMatcher(None, ' '.join(sorted(ta)), ' '.join(sorted(tb))).ratio()
+    return max(jaccard, ratio)
+
+
+def normalize_proposal(agent_id: str, item: Dict, index: int) -> Dict:
+    task = {}
+    for key, value in item.items():
+        key = PROPOSAL_ALIASES.get(key.strip().lower(), key.strip().lower())
+        task[key] = value.strip() if isinstance(value, str) else value
+    depends = task.get('depends_on') or []
+    task['depends_on'] = [depends] if isinstance(depends, str) else list(depends)
+    task['key'] = str(task.get('key') or index)
+    task['sources'] = [f"{agent_id}:{task['key']}"]
+    task['agent'] = agent_id
+    if task.get('estimated_hours') not in (None, ''):
+        task['estimated_hours'] = float(task['estimated_hours'])
+    return task
+
+
+def load_proposals(mission_id: str, order: List[str] = ()) -> Dict[str, List[Dict]]:
+    """planner -> normalized proposed tasks from <agent>.json files, planners in `order` first"""
+    proposals = {}
+    directory = proposal_dir(mission_id)
+    if not directory.is_dir():
+        return proposals
+    rank = {agent: i for i, agent in enumerate(order)}
+    paths = [p for p in directory.glob('*.json') if p.name != 'pipeline.json']
+    for path in sorted(paths, key=lambda p: (rank.get(p.stem, len(rank)), p.stem)):
+        raw = json.loads(path.read_text(encoding='utf-8'))
+        items = raw.get('tasks', []) if isinstance(raw, dict) else raw
+        proposals[path.stem] = [normalize_proposal(path.stem, item, i) for i, item in enumerate(items, 1)]
+    return proposals
+
+
+class _Merger:
+    """Canonical task list with a token -> task index for similarity candidates"""
+
+    def __init__(self, threshold: float = SIMILARITY):
+        self.threshold = threshold
+        self.tasks: List[Dict] = []
+        self.by_token: Dict[str, List[int]] = {}
+        self.by_key: Dict[Tuple[str, str], int] = {}
+
+    def find(self, title: str) -> Optional[int]:
+        candidates = {i for token in title_tokens(title) for i in self.by_token.get(token, ())}
+        best, best_score = None, self.threshold
+        for i in candidates:
+            score = title_similarity(title, self.tasks[i]['title'])
+            if score >= best_score:
+                best, best_score = i, score
+        return best
+
+    def add(self, task: Dict) -> Tuple[int, bool]:
+        """Returns (canonical index, merged into an existing task?)"""
+        i = self.find(task['title'])
+        if i is None:
+            i = len(self.tasks)
+            self.tasks.append(task)
+            for token in title_tokens(task['title']):
+                self.by_token.setdefault(token, []).append(i)
+            merged = False
+        else:
+            kept = self.tasks[i]
+            for field in MERGE_FIELDS:
+                if not kept.get(field) and task.get(field):
+                    kept[field] = task[field]
+            rank = PRIORITY_RANK.get(task.get('priority'), 3)
+            if rank < PRIORITY_RANK.get(kept.get('priority'), 3):
+                kept['priority'] = task['priority']
+            kept['depends_on'] = kept.get('depends_on', []) + task.get('depends_on', [])
+            kept['sources'] = kept.get('sources', []) + task.get('sources', [])
+            merged = True
+        if task.get('agent'):
+            self.by_key[(task['agent'], task['key'])] = i
+        return i, merged
+
+    def resolve(self, agent: str, ref: str) -> Optional[int]:
+        """A depends_on entry: own key, another planner's key, then title"""
+        ref = str(ref).strip()
+        if (agent, ref) in self.by_key:
+            return self.by_key[(agent, ref)]
+        others = [i for (a, k), i in self.by_key.items() if k == ref]
+        if len(set(others)) == 1:
+            return others[0]
+        return self.find(ref)
+
+
+def merge_proposals(proposals: Dict[str, List[Dict]], existing: List[Tuple[str, str]] = (),
+                    threshold: float = SIMILARITY) -> Tuple[List[Dict], List[Tuple[int, int]], Dict]:
+    """
+    Fold proposals (planner order = precedence) into one task list.
+    `existing` (task_id, title) pairs already in the mission are seeded first, so
+    re-running the merge does not duplicate them and new tasks can depend on them.
+    Returns (tasks, edges as (dependent index, upstream index), stats).
+    """
+    merger = _Merger(threshold)
+    for task_id, title in existing:
+        merger.add({'title': title, 'task_id': task_id, 'key': task_id, 'sources': [task_id]})
+    stats = {'proposed': 0, 'duplicates': 0, 'existing': 0, 'unresolved': [], 'cycles': []}
+    for agent in proposals:
+        for task in proposals[agent]:
+            stats['proposed'] += 1
+            i, merged = merger.add(task)
+            if merged:
+                stats['duplicates'] += 1
+                if merger.tasks[i].get('task_id'):
+                    stats['existing'] += 1
+
+    # Resolve dependencies against the merged list; skip self-edges and cycles
+    upstream: Dict[int, Set[int]] = {}
+    edges = []
+
+    def reaches(start: int, target: int) -> bool:
+        stack, seen = [start], set()
+        while stack:
+            node = stack.pop()
+            if node == target:
+                return True
+            for nxt in upstream.get(node, ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return False
+
+    for i, task in enumerate(merger.tasks):
+        agents = [s.split(':', 1)[0] for s in task.get('sources', []) if ':' in s]
+        for ref in task.get('depends_on', []):
+            j = next((r for r in (merger.resolve(a, ref) for a in agents or ['']) if r is not None), None)
+            if j is None:
+                stats['unresolved'].append(f"{task['title']} → {ref}")
+                continue
+            if j == i or j in upstream.get(i, ()):
+                continue
+            if reaches(j, i):
+                stats['cycles'].append(f"{task['title']} → {merger.tasks[j]['title']}")
+                continue
+            upstream.setdefault(i, set()).add(j)
+            edges.append((i, j))
+    return merger.tasks, edges, stats
+
+
+def planner_prompt(conn: sqlite3.Connection, mission: Dict, agent_id: str, proposal_path: Path) -> str:
+    relevant = retrieve_cached(conn, agent_id, {
+        'id': mission['id'], 'title': mission['title'],
+        'description': mission.get('description'), 'expected_outcome': mission.get('expected_outcome'),
+    })
+    return PLANNER_MESSAGE.render(
+        mission_id=mission['id'],
+        goal_type=mission['goal_type'],
+        title=mission['title'],
+        description=mission.get('description') or 'N/A',
+        expected_outcome=mission.get('expected_outcome') or 'N/A',
+        agent_id=agent_id,
+        context=relevant['context'] or 'N/A',
+        focus=PLANNER_FOCUS.get(agent_id, 'the tasks your role owns'),
+        proposal_path=str(proposal_path),
+    )
+
+
+class MissionBreakdown:
+    """Fan-out planning and fan-in import for one database"""
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self.db_path = db_path
+
+    def spawn_planners(self, mission_id: str, planners: List[str], project_id: str,
+                       working_dir: str) -> Dict[str, Tuple[bool, str]]:
+        """Start every planner at once; records the pipeline manifest for the merge step"""
+        directory = proposal_dir(mission_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / 'pipeline.json').write_text(json.dumps({
+            'planners': planners, 'project_id': project_id, 'working_dir': working_dir,
+            'spawned_at': datetime.now().isoformat(timespec='seconds'),
+        }, indent=2), encoding='utf-8')
+
+        conn = sqlite3.connect(str(self.db_path))
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM orchestrator_missions WHERE id = ?", (mission_id,)).fetchone()
+            if not row:
+                raise ValueError(f"Mission {mission_id} not found")
+            mission = dict(row)
+            # Prompts are built up front (DB reads stay on this thread), spawns run concurrently
+            jobs = {agent: planner_prompt(conn, mission, agent, directory / f"{agent}.json") for agent in planners}
+        finally:
+            conn.close()
+
+        LOG_DIR.mkdir(exist_ok=True)
+        stamp = int(time.time())
+
+        def start(agent: str) -> Tuple[bool, str]:
+            return spawn_agent(
+                agent_id=agent,
+                task_id=mission_id,
+                working_dir=working_dir,
+                message=jobs[agent],
+                log_path=LOG_DIR / f"breakdown_{mission_id}_{agent}_{stamp}.log",
+                timeout_seconds=PLANNER_TIMEOUT,
+                label=f"{agent}-{mission_id}-plan",
+            )
+
+        with ThreadPoolExecutor(max_workers=max(len(planners), 1)) as pool:
+            return dict(zip(planners, pool.map(start, planners)))
+
+    def manifest(self, mission_id: str) -> Dict:
+        path = proposal_dir(mission_id) / 'pipeline.json'
+        return json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+
+    def wait_for_proposals(self, mission_id: str, timeout: int = 0, poll: int = 10) -> List[str]:
+        """Block until every planner in the manifest has written its file (or timeout); returns missing"""
+        planners = self.manifest(mission_id).get('planners', [])
+        deadline = time.monotonic() + timeout
+        while True:
+            missing = [p for p in planners if not (proposal_dir(mission_id) / f"{p}.json").exists()]
+            if not missing or time.monotonic() >= deadline:
+                return missing
+            time.sleep(poll)
+
+    def merge(self, mission_id: str, project_id: str = None, working_dir: str = None,
+              dry_run: bool = False, notify: bool = True) -> Dict:
+        """Merge all proposals and bulk-create the tasks and dependencies for the mission"""
+        from team_db import AITeamDB
+
+        manifest = self.manifest(mission_id)
+        project_id = project_id or manifest.get('project_id')
+        working_dir = working_dir or manifest.get('working_dir')
+        proposals = load_proposals(mission_id, manifest.get('planners', []))
+
+        with AITeamDB(self.db_path) as db:
+            tracker = MissionTracker(db.conn)
+            existing = [(row[0], row[1]) for row in db.conn.execute('''
+                SELECT t.id, t.title FROM mission_tasks mt JOIN tasks t ON t.id = mt.task_id
+                WHERE mt.mission_id = ?
+            ''', (mission_id,))]
+            tasks, edges, stats = merge_proposals(proposals, existing)
+            new = [i for i, t in enumerate(tasks) if not t.get('task_id')]
+            upstream_titles: Dict[int, List[str]] = {}
+            for i, j in edges:
+                upstream_titles.setdefault(i, []).append(tasks[j]['title'])
+
+            rows = []
+            for i in new:
+                t = tasks[i]
+                # Dependencies double as the checklist when the planner gave none
+                prerequisites = t.get('prerequisites') or '\n'.join(
+                    f"- [ ] {title} done" for title in upstream_titles.get(i, [])) \
+                    or f"- [ ] Mission {mission_id} brief reviewed"
+                rows.append({
+                    'title': t['title'], 'description': t.get('description') or '',
+                    'assignee_id': t.get('assignee_id'), 'project_id': t.get('project_id') or project_id,
+                    'priority': t.get('priority') or 'normal', 'estimated_hours': t.get('estimated_hours'),
+                    'prerequisites': prerequisites, 'acceptance_criteria': t.get('acceptance_criteria'),
+                    'expected_outcome': t.get('expected_outcome'), 'working_dir': t.get('working_dir') or working_dir,
+                    'mission_id': mission_id,
+                })
+            stats.update({'planners': list(proposals), 'tasks': len(rows), 'edges': len(edges), 'task_ids': []})
+            if dry_run:
+                db.validate_bulk_tasks(rows)
+                return stats
+
+            task_ids = db.create_tasks_bulk(rows, notify=notify)
+            ids = {i: task_id for i, task_id in zip(new, task_ids)}
+            ids.update({i: t['task_id'] for i, t in enumerate(tasks) if t.get('task_id')})
+            dag = TaskDAG(db.conn)
+            for i, j in edges:
+                try:
+                    dag.add_dependency(ids[i], ids[j], commit=False)
+                except ValueError as e:
+                    # Only possible through edges outside this mission
+                    stats['cycles'].append(str(e))
+            db.conn.execute('''
+                UPDATE orchestrator_missions
+                SET status = 'executing', started_at = COALESCE(started_at, datetime('now', 'localtime'))
+                WHERE id = ? AND status IN ('planning', 'ready')
+            ''', (mission_id,))
+            db.conn.commit()
+            stats['task_ids'] = task_ids
+            stats['rollup'] = tracker.rollup(mission_id)
+            return stats
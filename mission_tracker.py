@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+AI Team Mission Tracker
+Links orchestrator missions to the tasks created for them (mission_tasks) and
+keeps one rollup row per mission (task counts by status, estimated and
+progress-weighted hours) up to date with triggers, so mission views read a
+single row instead of scanning tasks. The critical path through a mission's
+dependencies is recomputed lazily, only for missions whose tasks or edges
+changed since the last read.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from task_dag import DEFAULT_ESTIMATE_HOURS, TaskDAG, ensure_schema as ensure_dag_schema
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+
+# task status -> rollup counter column (statuses not listed only count in total_tasks)
+STATUS_COLUMNS: Dict[str, str] = {
+    'backlog': 'backlog_tasks',
+    'todo': 'todo_tasks',
+    'in_progress': 'in_progress_tasks',
+    'review': 'review_tasks',
+    'reviewing': 'review_tasks',
+    'blocked': 'blocked_tasks',
+    'done': 'done_tasks',
+    'cancelled': 'cancelled_tasks',
+}
+COUNT_COLUMNS = sorted(set(STATUS_COLUMNS.values()))
+
+
+def _hours(r: str) -> str:
+    return f"COALESCE({r}.estimated_hours, {DEFAULT_ESTIMATE_HOURS!r})"
+
+
+def _weighted(r: str) -> str:
+    """Hours of the task already delivered: all when done, else by its progress %"""
+    return (f"{_hours(r)} * (CASE WHEN {r}.status = 'done' THEN 1.0 "
+            f"ELSE MIN(MAX(COALESCE({r}.progress, 0), 0), 100) / 100.0 END)")
+
+
+def _contribution(r: str, sign: str) -> Dict[str, str]:
+    """Per-column terms one task row (alias r) adds (+) or removes (-) from a rollup"""
+    terms = {'total_tasks': f"{sign} 1",
+             'total_hours': f"{sign} {_hours(r)}",
+             'progress_hours': f"{sign} {_weighted(r)}"}
+    for column in COUNT_COLUMNS:
+        statuses = ', '.join(f"'{s}'" for s, c in STATUS_COLUMNS.items() if c == column)
+        terms[column] = f"{sign} ({r}.status IN ({statuses}))"
+    return terms
+
+
+def _delta_set(*contributions: Dict[str, str]) -> str:
+    """SET clause applying the given contributions to every rollup column"""
+    parts = []
+    for column in contributions[0]:
+        terms = ' '.join(c[column] for c in contributions)
+        parts.append(f"{column} = {column} {terms}")
+    parts.append("path_stale = 1")
+    parts.append("updated_at = datetime('now', 'localtime')")
+    return ',\n                '.join(parts)
+
+
+class MissionTracker:
+    """mission_tasks links plus trigger-maintained per-mission rollups"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        existing = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        if 'tr_mission_task_deleted' in existing:
+            return
+        # unmet_dependencies/edge index used by the critical path refresh
+        ensure_dag_schema(self.conn)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS mission_tasks (
+                mission_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (mission_id, task_id),
+                FOREIGN KEY (mission_id) REFERENCES orchestrator_missions(id) ON DELETE CASCADE,
+                FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mission_tasks_task ON mission_tasks(task_id)")
+        counts = ',\n'.join(f"                {c} INTEGER NOT NULL DEFAULT 0" for c in COUNT_COLUMNS)
+        self.conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS mission_rollups (
+                mission_id TEXT PRIMARY KEY,
+                total_tasks INTEGER NOT NULL DEFAULT 0,
+{counts},
+                total_hours REAL NOT NULL DEFAULT 0,
+                progress_hours REAL NOT NULL DEFAULT 0,
+                path_hours REAL,
+                critical_path TEXT,
+                path_stale INTEGER NOT NULL DEFAULT 1,
+                updated_at DATETIME,
+                FOREIGN KEY (mission_id) REFERENCES orchestrator_missions(id) ON DELETE CASCADE
+            )
+        ''')
+        plus, minus = _contribution('t', '+'), _contribution('t', '-')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tr_mission_task_linked
+            AFTER INSERT ON mission_tasks
+            BEGIN
+                INSERT OR IGNORE INTO mission_rollups (mission_id) VALUES (NEW.mission_id);
+                UPDATE mission_rollups SET
+                {_delta_set(plus)}
+                FROM tasks t
+                WHERE t.id = NEW.task_id AND mission_rollups.mission_id = NEW.mission_id;
+            END
+        ''')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tr_mission_task_unlinked
+            AFTER DELETE ON mission_tasks
+            BEGIN
+                UPDATE mission_rollups SET
+                {_delta_set(minus)}
+                FROM tasks t
+                WHERE t.id = OLD.task_id AND mission_rollups.mission_id = OLD.mission_id;
+            END
+        ''')
+        # One task change adjusts each of its missions by (new - old)
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tr_mission_task_changed
+            AFTER UPDATE OF status, estimated_hours, progress ON tasks
+            WHEN EXISTS (SELECT 1 FROM mission_tasks WHERE task_id = NEW.id)
+            BEGIN
+                UPDATE mission_rollups SET
+                {_delta_set(_contribution('OLD', '-'), _contribution('NEW', '+'))}
+                WHERE mission_id IN (SELECT mission_id FROM mission_tasks WHERE task_id = NEW.id);
+            END
+        ''')
+        # Subtract the deleted row, then drop its links (the unlink trigger finds no task row)
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tr_mission_task_deleted
+            AFTER DELETE ON tasks
+            WHEN EXISTS (SELECT 1 FROM mission_tasks WHERE task_id = OLD.id)
+            BEGIN
+                UPDATE mission_rollups SET
+                {_delta_set(_contribution('OLD', '-'))}
+                WHERE mission_id IN (SELECT mission_id FROM mission_tasks WHERE task_id = OLD.id);
+                DELETE FROM mission_tasks WHERE task_id = OLD.id;
+            END
+        ''')
+        for event, alias in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+            self.conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS tr_mission_dependency_{event.lower()}
+                AFTER {event} ON task_dependencies
+                BEGIN
+                    UPDATE mission_rollups SET path_stale = 1
+                    WHERE mission_id IN (SELECT mission_id FROM mission_tasks WHERE task_id = {alias}.task_id);
+                END
+            ''')
+        self.conn.commit()
+
+    # ========== Links ==========
+
+    def unknown_missions(self, mission_ids: Iterable[str]) -> List[str]:
+        ids = sorted({m for m in mission_ids if m})
+        if not ids:
+            return []
+        known = {row[0] for row in self.conn.execute(
+            f"SELECT id FROM orchestrator_missions WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        return [m for m in ids if m not in known]
+
+    def link(self, mission_id: str, task_ids: Iterable[str], commit: bool = True) -> int:
+        """Attach tasks to a mission (idempotent); the rollup follows via triggers"""
+        if self.unknown_missions([mission_id]):
+            raise ValueError(f"unknown mission {mission_id}")
+        cursor = self.conn.executemany(
+            "INSERT OR IGNORE INTO mission_tasks (mission_id, task_id) VALUES (?, ?)",
+            [(mission_id, t) for t in task_ids])
+        if commit:
+            self.conn.commit()
+        return cursor.rowcount
+
+    def unlink(self, mission_id: str, task_ids: Iterable[str], commit: bool = True) -> int:
+        cursor = self.conn.executemany(
+            "DELETE FROM mission_tasks WHERE mission_id = ? AND task_id = ?",
+            [(mission_id, t) for t in task_ids])
+        if commit:
+            self.conn.commit()
+        return cursor.rowcount
+
+    def task_ids(self, mission_id: str) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT task_id FROM mission_tasks WHERE mission_id = ? ORDER BY task_id", (mission_id,))]
+
+    # ========== Rollups ==========
+
+    def refresh_paths(self, mission_ids: Optional[Iterable[str]] = None) -> int:
+        """Recompute critical paths for stale rollups (one DAG load for all of them)"""
+        sql = "SELECT mission_id FROM mission_rollups WHERE path_stale = 1"
+        params: List[str] = []
+        if mission_ids is not None:
+            ids = list(mission_ids)
+            if not ids:
+                return 0
+            sql += f" AND mission_id IN ({','.join('?' * len(ids))})"
+            params = ids
+        stale = [row[0] for row in self.conn.execute(sql, params)]
+        if not stale:
+            return 0
+        dag = TaskDAG(self.conn)
+        updates = []
+        for mission_id in stale:
+            path, hours = dag.critical_path(set(self.task_ids(mission_id)))
+            updates.append((hours, json.dumps(path), mission_id))
+        self.conn.executemany('''
+            UPDATE mission_rollups SET path_hours = ?, critical_path = ?, path_stale = 0
+            WHERE mission_id = ?
+        ''', updates)
+        self.conn.commit()
+        return len(updates)
+
+    def rollups(self, mission_ids: Optional[List[str]] = None, statuses: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Missions with their rollups (zeros for missions without tasks), newest first.
+        Adds progress_pct (hour-weighted), critical_path (list) and eta.
+        """
+        where, params = [], []
+        if mission_ids is not None:
+            where.append(f"m.id IN ({','.join('?' * len(mission_ids))})")
+            params += mission_ids
+        if statuses:
+            where.append(f"m.status IN ({','.join('?' * len(statuses))})")
+            params += statuses
+        sql = f'''
+            SELECT m.id, m.goal_type, m.title, m.status, m.created_at, r.mission_id AS has_rollup
+            FROM orchestrator_missions m
+            LEFT JOIN mission_rollups r ON r.mission_id = m.id
+            {('WHERE ' + ' AND '.join(where)) if where else ''}
+            ORDER BY m.created_at DESC
+        '''
+        cursor = self.conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        missions = [dict(zip(names, row)) for row in cursor.fetchall()]
+        self.refresh_paths([m['id'] for m in missions if m['has_rollup']])
+        rollups = {}
+        ids = [m['id'] for m in missions if m['has_rollup']]
+        if ids:
+            cursor = self.conn.execute(
+                f"SELECT * FROM mission_rollups WHERE mission_id IN ({','.join('?' * len(ids))})", ids)
+            names = [d[0] for d in cursor.description]
+            rollups = {row[0]: dict(zip(names, row)) for row in cursor.fetchall()}
+        now = datetime.now()
+        for m in missions:
+            del m['has_rollup']
+            r = rollups.get(m['id'], {})
+            for column in ['total_tasks'] + COUNT_COLUMNS:
+                m[column] = r.get(column, 0)
+            m['total_hours'] = round(r.get('total_hours') or 0.0, 2)
+            m['progress_hours'] = round(r.get('progress_hours') or 0.0, 2)
+            m['progress_pct'] = round(100.0 * m['progress_hours'] / m['total_hours']) if m['total_hours'] else 0
+            m['path_hours'] = r.get('path_hours') or 0.0
+            m['critical_path'] = json.loads(r['critical_path']) if r.get('critical_path') else []
+            remaining = m['total_tasks'] - m['done_tasks'] - m['cancelled_tasks']
+            m['eta'] = (now + timedelta(hours=m['path_hours'])).strftime('%Y-%m-%d %H:%M') \
+                if remaining > 0 and m['path_hours'] else None
+        return missions
+
+    def rollup(self, mission_id: str) -> Optional[Dict]:
+        found = self.rollups([mission_id])
+        return found[0] if found else None
+
+    def rebuild(self) -> int:
+        """Recompute every rollup from mission_tasks (repair after bulk edits with triggers off)"""
+        self.conn.execute("DELETE FROM mission_rollups")
+        self.conn.execute('''
+            INSERT INTO mission_rollups (mission_id)
+            SELECT DISTINCT mission_id FROM mission_tasks
+        ''')
+        sums = ', '.join(f"{column} = (SELECT COALESCE(SUM(0 {term}), 0) FROM mission_tasks mt "
+                         f"JOIN tasks t ON t.id = mt.task_id WHERE mt.mission_id = mission_rollups.mission_id)"
+                         for column, term in _contribution('t', '+').items())
+        cursor = self.conn.execute(f"UPDATE mission_rollups SET {sums}, path_stale = 1, "
+                                   f"updated_at = datetime('now', 'localtime')")
+        self.conn.commit()
+        return cursor.rowcount
+
+
+def format_progress(m: Dict) -> str:
+    """One-line summary: done/total, weighted %, open work by status, ETA"""
+    parts = [f"{m['done_tasks']}/{m['total_tasks']} done ({m['progress_pct']}%)"]
+    for column, label in (('in_progress_tasks', 'in progress'), ('review_tasks', 'in review'),
+                          ('blocked_tasks', 'blocked'), ('todo_tasks', 'todo'), ('backlog_tasks', 'backlog')):
+        if m[column]:
+            parts.append(f"{m[column]} {label}")
+    if m['eta']:
+        parts.append(f"ETA {m['eta']} ({m['path_hours']:.1f}h critical path)")
+    return ', '.join(parts)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Mission Tracker')
+    sub = parser.add_subparsers(dest='command')
+    link = sub.add_parser('link', help='Attach tasks to a mission')
+    link.add_argument('mission_id')
+    link.add_argument('task_ids', nargs='+')
+    unlink = sub.add_parser('unlink', help='Detach tasks from a mission')
+    unlink.add_argument('mission_id')
+    unlink.add_argument('task_ids', nargs='+')
+    show = sub.add_parser('show', help='Mission rollups')
+    show.add_argument('mission_id', nargs='*')
+    sub.add_parser('rebuild', help='Recompute all rollups from mission_tasks')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        tracker = MissionTracker(conn)
+        if args.command == 'link':
+            try:
+                print(f"✅ {tracker.link(args.mission_id, args.task_ids)} tasks linked to {args.mission_id}")
+            except ValueError as e:
+                print(f"❌ {e}")
+        elif args.command == 'unlink':
+            print(f"✅ {tracker.unlink(args.mission_id, args.task_ids)} tasks unlinked")
+        elif args.command == 'show':
+            for m in tracker.rollups(args.mission_id or None):
+                print(f"🎯 {m['id']} [{m['status']}] {m['title']}")
+                print(f"   {format_progress(m)}")
+        elif args.command == 'rebuild':
+            print(f"✅ {tracker.rebuild()} mission rollups rebuilt")
+        else:
+            parser.print_help()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -399,6 +399,26 @@ class NotificationManager:
             message, task_id, agent_id, event.value, level
         )
         
+    def notify_digest(self, event: NotificationEvent, items: List[Dict],
+                      entity_type: str = 'global', entity_id: str = 'default',
+                      max_lines: int = 20) -> bool:
+        """
+        One message for many tasks of the same event (e.g. a bulk create)
+        items: dicts with task_id, task_title and optional assignee
+        """
+        if not items or not self.should_notify(event, entity_type, entity_id):
+            return False
+        level = self.get_settings(entity_type, entity_id).get('level', 'normal')
+        emoji = self.EVENT_EMOJI.get(event, "📌")
+        lines = [f"{emoji} {event.value.upper()} × {len(items)} tasks"]
+        for item in items[:max_lines]:
+            title = self.strip_html(item.get('task_title')) or ''
+            assignee = item.get('assignee') or 'Unassigned'
+            lines.append(f"   {item['task_id']} → {assignee} | {title}")
+        if len(items) > max_lines:
+            lines.append(f"   … and {len(items) - max_lines} more")
+        return self.send_notification('\n'.join(lines), None, None, event.value, level)
+
     def get_notification_log(self, task_id: str = None, 
                              limit: int = 50) -> List[Dict]:
         """Get notification log entries"""
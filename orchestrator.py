@@ -15,6 +15,11 @@ from typing import List, Dict, Optional, Tuple
 
 # Import notification system
 from notifications import NotificationManager, NotificationEvent
+from health_rules import THRESHOLDS, FIX_LOOP_LIMIT, FIX_LOOP_WARNING
+from id_sequence import IdSequence
+from mission_breakdown import DEFAULT_PLANNERS, MissionBreakdown, proposal_dir
+from mission_tracker import MissionTracker, format_progress
+from task_state import TaskStateMachine
 import time
 
 os.environ['TZ'] = 'Asia/Bangkok'
@@ -34,7 +39,9 @@ class AITeamOrchestrator:
         self.conn = sqlite3.connect(str(db_path))
         self.conn.row_factory = sqlite3.Row
         self.running_missions = []
+        self.missions = MissionTracker(self.conn)
         self.notifier = NotificationManager(db_path, TELEGRAM_CHANNEL)
+        self.states = TaskStateMachine(self.conn, self.notifier)
         
     def close(self):
         self.notifier.close()
@@ -47,17 +54,21 @@ class AITeamOrchestrator:
         self.close()
 
     def receive_goal(self, goal_type: str, title: str, description: str, 
-                     expected_outcome: str, assignee: str = None) -> str:
+                     expected_outcome: str, assignee: str = None,
+                     planners: List[str] = None, project_id: str = None,
+                     working_dir: str = None) -> str:
         """
         Receive a high-level goal from user
         Types: 'feature', 'bugfix', 'documentation', 'analysis', 'refactor'
+        With planners, the breakdown fans out to all of them at once (pipeline mode);
+        merge_breakdown() then imports their merged proposals.
         """
         print(f"\n🎯 ORCHESTRATOR: Received {goal_type} goal")
         print(f"   Title: {title}")
         print(f"   Expected: {expected_outcome}")
         
         # Create mission record
-        mission_id = f"M-{datetime.now().strftime('%Y%m%d')}-{self._get_next_mission_number():03d}"
+        mission_id = IdSequence(self.conn).next_id('M')
         
         cursor = self.conn.cursor()
         cursor.execute('''
@@ -68,6 +79,11 @@ class AITeamOrchestrator:
         
         self.conn.commit()
         
+        if planners:
+            print(f"   Mission ID: {mission_id}")
+            self._spawn_planning_pipeline(mission_id, planners, project_id, working_dir)
+            return mission_id
+        
         # Auto-assign to orchestrator or specified assignee
         orchestrator = assignee or 'architect'  # Default to architect for planning
         
@@ -144,13 +160,17 @@ Check agent_context table for:
 
 ## Commands to Use
 ```bash
-# Create task
+# Create task (--mission links it to this mission's progress tracking)
 python3 team_db.py task create "Task Title" \
   --project PROJ-001 \
+  --mission {mission_id} \
   --expected-outcome "What success looks like" \
   --prerequisites "- [ ] Dependency done" \
   --acceptance "- [ ] Criteria met"
 
+# Task waits for other tasks to be done
+python3 team_db.py task depend <task_id> <upstream_task_id>
+
 # Assign to agent
 python3 team_db.py task assign <task_id> <agent_id>
 
@@ -185,6 +205,52 @@ python3 team_db.py agent list
         print(f"   View: python3 orchestrator.py show-mission {mission_id}")
         print(f"   Execute: python3 orchestrator.py execute-mission {mission_id}")
 
+    def _spawn_planning_pipeline(self, mission_id: str, planners: List[str],
+                                 project_id: str, working_dir: str):
+        """Spawn all planning agents concurrently; each writes a proposal file"""
+        results = MissionBreakdown(self.db_path).spawn_planners(mission_id, planners, project_id, working_dir)
+        started = [agent for agent, (ok, _) in results.items() if ok]
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE orchestrator_missions 
+            SET orchestration_plan = ?, orchestrator_agent = ?
+            WHERE id = ?
+        ''', (f"Parallel breakdown by {', '.join(planners)}; proposals in {proposal_dir(mission_id)}",
+              ','.join(planners), mission_id))
+        self.conn.commit()
+        
+        print(f"\n🧭 PARALLEL BREAKDOWN: {len(started)}/{len(planners)} planners started")
+        for agent, (ok, details) in results.items():
+            print(f"   {'✅' if ok else '❌'} {agent}: {details}")
+        print(f"   Merge: python3 orchestrator.py merge-breakdown {mission_id} --wait 900")
+
+    def merge_breakdown(self, mission_id: str, wait: int = 0, project_id: str = None,
+                        working_dir: str = None, dry_run: bool = False) -> Optional[Dict]:
+        """Merge planner proposals (waiting up to `wait` seconds) and create the tasks"""
+        pipeline = MissionBreakdown(self.db_path)
+        missing = pipeline.wait_for_proposals(mission_id, wait)
+        if missing:
+            print(f"⚠️  No proposal yet from: {', '.join(missing)}")
+        try:
+            stats = pipeline.merge(mission_id, project_id, working_dir, dry_run=dry_run)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+        
+        print(f"\n🧩 BREAKDOWN {'CHECK' if dry_run else 'MERGED'}: {mission_id}")
+        print(f"   Planners: {', '.join(stats['planners']) or 'none'}")
+        print(f"   Proposed: {stats['proposed']} → {stats['tasks']} new tasks "
+              f"({stats['duplicates']} duplicates folded, {stats['existing']} already in mission)")
+        print(f"   Dependencies: {stats['edges']}")
+        for item in stats['unresolved']:
+            print(f"   ⚠️  Unresolved dependency: {item}")
+        for item in stats['cycles']:
+            print(f"   ⚠️  Skipped (cycle): {item}")
+        if stats['task_ids']:
+            print(f"   Tasks: {stats['task_ids'][0]} … {stats['task_ids'][-1]}")
+        return stats
+
     def show_mission(self, mission_id: str):
         """Display mission details and orchestration plan"""
         cursor = self.conn.cursor()
@@ -203,6 +269,12 @@ python3 team_db.py agent list
         print(f"   Title: {mission['title']}")
         print(f"   Status: {mission['status']}")
         print(f"   Created: {mission['created_at']}")
+
+        rollup = self.missions.rollup(mission_id)
+        if rollup and rollup['total_tasks']:
+            print(f"   Progress: {format_progress(rollup)}")
+            if rollup['critical_path']:
+                print(f"   Critical path: {' → '.join(rollup['critical_path'])}")
         
         if mission['orchestration_plan']:
             print(f"\n📋 ORCHESTRATION PLAN:")
@@ -211,31 +283,18 @@ python3 team_db.py agent list
             print("=" * 60)
 
     def list_missions(self, status: str = None):
-        """List all missions"""
-        cursor = self.conn.cursor()
-        
-        if status:
-            cursor.execute('''
-                SELECT id, goal_type, title, status, created_at 
-                FROM orchestrator_missions WHERE status = ?
-                ORDER BY created_at DESC
-            ''', (status,))
-        else:
-            cursor.execute('''
-                SELECT id, goal_type, title, status, created_at 
-                FROM orchestrator_missions 
-                ORDER BY created_at DESC
-            ''')
-        
-        missions = [dict(row) for row in cursor.fetchall()]
+        """List all missions with their task rollups"""
+        missions = self.missions.rollups(statuses=[status] if status else None)
         
         print(f"\n🎯 ORCHESTRATOR MISSIONS ({len(missions)} total)")
-        print("-" * 70)
-        print(f"{'ID':<15} {'Type':<12} {'Status':<12} {'Title':<30}")
-        print("-" * 70)
+        print("-" * 90)
+        print(f"{'ID':<15} {'Type':<12} {'Status':<12} {'Tasks':<8} {'Done':<6} {'Title':<30}")
+        print("-" * 90)
         
         for m in missions:
-            print(f"{m['id']:<15} {m['goal_type']:<12} {m['status']:<12} {m['title'][:28]:<30}")
+            tasks = f"{m['done_tasks']}/{m['total_tasks']}"
+            print(f"{m['id']:<15} {m['goal_type']:<12} {m['status']:<12} {tasks:<8} "
+                  f"{str(m['progress_pct']) + '%':<6} {m['title'][:28]:<30}")
 
     def monitor_execution(self):
         """Monitor all active missions and agent progress"""
@@ -244,20 +303,15 @@ python3 team_db.py agent list
         print("\n🔍 ORCHESTRATOR MONITOR")
         print("=" * 70)
         
-        # Get active missions
-        cursor.execute('''
-            SELECT * FROM orchestrator_missions 
-            WHERE status IN ('planning', 'executing', 'reviewing')
-        ''')
-        missions = [dict(row) for row in cursor.fetchall()]
+        # Active missions with precomputed task rollups
+        missions = self.missions.rollups(statuses=['planning', 'executing', 'reviewing'])
         
         print(f"\n📊 Active Missions: {len(missions)}")
         for m in missions:
             print(f"\n   {m['id']}: {m['title']}")
             print(f"   Status: {m['status']}")
-            
-            # Count related tasks
-            # (Would need mission_tasks table for full tracking)
+            if m['total_tasks']:
+                print(f"   Tasks: {format_progress(m)}")
         
         # Get active agents
         cursor.execute('''
@@ -276,8 +330,8 @@ python3 team_db.py agent list
         cursor.execute('''
             SELECT COUNT(*) FROM tasks 
             WHERE status = 'in_progress' 
-            AND updated_at < datetime('now', '-2 hours')
-        ''')
+            AND updated_at < datetime('now', ?)
+        ''', (f"-{THRESHOLDS['stuck_minutes']} minutes",))
         stuck = cursor.fetchone()[0]
         
         if stuck > 0:
@@ -298,16 +352,16 @@ python3 team_db.py agent list
             print(f"\n🔄 Fix Loop Status:")
             for t in fix_loop_tasks:
                 warning = ""
-                if t['fix_loop_count'] >= 10:
+                if t['fix_loop_count'] >= FIX_LOOP_LIMIT:
                     warning = " 🛑 AUTO-STOPPED"
-                elif t['fix_loop_count'] >= 7:
+                elif t['fix_loop_count'] >= FIX_LOOP_WARNING:
                     warning = " ⚠️ NEAR LIMIT"
-                print(f"   {t['id']}: {t['fix_loop_count']}/10{warning} - {t['assignee_name'] or 'Unassigned'}")
+                print(f"   {t['id']}: {t['fix_loop_count']}/{FIX_LOOP_LIMIT}{warning} - {t['assignee_name'] or 'Unassigned'}")
         
         print("\n" + "=" * 70)
 
     def handle_failure(self, task_id: str, failure_reason: str):
-        """Handle failed task - reassign or escalate with auto-stop at 10 fix loops"""
+        """Handle failed task - reassign or escalate with auto-stop at FIX_LOOP_LIMIT fix loops"""
         print(f"\n🚨 HANDLING FAILURE: {task_id}")
         print(f"   Reason: {failure_reason}")
         
@@ -329,14 +383,14 @@ python3 team_db.py agent list
         # Check retry count
         fix_loops = task.get('fix_loop_count', 0)
         
-        if fix_loops >= 9:  # This will be the 10th loop (9+1)
-            # Auto-stop: Block task after 10 fix loops
+        if fix_loops + 1 >= FIX_LOOP_LIMIT:  # This will be the last allowed loop
+            # Auto-stop: Block task after FIX_LOOP_LIMIT fix loops
             new_count = fix_loops + 1
             blocked_reason = f"""🛑 AUTO-STOPPED after {new_count} fix loops
 
 Original failure: {failure_reason}
 
-This task has exceeded the maximum allowed fix loops (10) to prevent infinite loops and excessive token consumption.
+This task has exceeded the maximum allowed fix loops ({FIX_LOOP_LIMIT}) to prevent infinite loops and excessive token consumption.
 
 TO RESUME:
 1. Investigate the root cause manually
@@ -344,49 +398,16 @@ TO RESUME:
    or: python3 team_db.py task unblock {task_id}
 3. This will reset the fix loop counter and allow the agent to continue
 """
-            print(f"   🛑 Fix loops exceeded ({new_count}/10). Auto-stopping task.")
+            print(f"   🛑 Fix loops exceeded ({new_count}/{FIX_LOOP_LIMIT}). Auto-stopping task.")
             
-            cursor.execute('''
-                UPDATE tasks 
-                SET status = 'blocked', 
-                    blocked_reason = ?,
-                    fix_loop_count = ?,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (blocked_reason, new_count, task_id))
-            
-            # Update agent status
-            cursor.execute('''
-                UPDATE agents 
-                SET status = 'blocked', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = (SELECT assignee_id FROM tasks WHERE id = ?)
-            ''', (task_id,))
-            
-            # Log to task history
-            cursor.execute('''
-                INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-                VALUES (?, 'auto-stopped', 'in_progress', 'blocked', ?)
-            ''', (task_id, f"Auto-stopped after {new_count} fix loops: {failure_reason}"))
-            
-            self.conn.commit()
-            
-            # Send notification using NotificationManager
-            self.notifier.notify(
-                event=NotificationEvent.AUTO_STOP,
-                task_id=task_id,
-                task_title=task.get('title', 'Unknown'),
-                agent_id=task.get('assignee_id'),
-                agent_name=task.get('assignee_name', 'Unknown'),
-                entity_type='agent',
-                entity_id=task.get('assignee_id', 'unknown'),
-                fix_loops=new_count
-            )
+            # Task blocked, agent released, AUTO_STOP notification - one transaction
+            self.states.apply(task_id, 'auto_stop', reason=blocked_reason, fix_loops=new_count,
+                              notes=f"Auto-stopped after {new_count} fix loops: {failure_reason}")
             
             # Also send detailed message via legacy notification
             self._notify(
                 f"🚫 TASK AUTO-STOPPED: {task_id}\n"
-                f"Task exceeded 10 fix loops and was automatically stopped.\n"
+                f"Task exceeded {FIX_LOOP_LIMIT} fix loops and was automatically stopped.\n"
                 f"Assignee: {task.get('assignee_name', 'Unknown')}\n"
                 f"To resume: python3 orchestrator.py resume-task {task_id} --agent <agent_id>"
             )
@@ -394,7 +415,7 @@ TO RESUME:
         else:
             # Increment and continue
             new_count = fix_loops + 1
-            print(f"   🔄 Retry {new_count}/10")
+            print(f"   🔄 Retry {new_count}/{FIX_LOOP_LIMIT}")
             
             cursor.execute('''
                 UPDATE tasks 
@@ -402,11 +423,11 @@ TO RESUME:
                 WHERE id = ?
             ''', (new_count, task_id))
             
-            # Log the retry
+            # Log the retry (no status change)
             cursor.execute('''
-                INSERT INTO task_history (task_id, action, notes)
-                VALUES (?, 'fix-loop', ?)
-            ''', (task_id, f"Fix loop {new_count}/10: {failure_reason}"))
+                INSERT INTO task_history (task_id, action, old_status, new_status, notes)
+                VALUES (?, 'updated', ?, ?, ?)
+            ''', (task_id, task['status'], task['status'], f"Fix loop {new_count}/{FIX_LOOP_LIMIT}: {failure_reason}"))
             
             self.conn.commit()
     
@@ -437,7 +458,7 @@ TO RESUME:
             return False
         
         # Check if it was auto-stopped (has high fix_loop_count)
-        if task.get('fix_loop_count', 0) < 10:
+        if task.get('fix_loop_count', 0) < FIX_LOOP_LIMIT:
             print(f"⚠️  Task {task_id} was not auto-stopped (fix loops: {task.get('fix_loop_count', 0)})")
             print(f"   Use: python3 team_db.py task unblock {task_id}")
             return False
@@ -449,39 +470,19 @@ TO RESUME:
             print(f"   Use: python3 orchestrator.py resume-task {task_id} --agent <agent_id>")
             return False
         
-        # Reset fix loops and unblock
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'in_progress',
-                fix_loop_count = 0,
-                blocked_reason = NULL,
-                started_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime'),
-                assignee_id = ?
-            WHERE id = ?
-        ''', (resume_agent, task_id))
-        
-        # Update agent status
-        cursor.execute('''
-            UPDATE agents 
-            SET status = 'active', current_task_id = ?,
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id, resume_agent))
-        
-        # Log the resume
+        # Reset fix loops and unblock; a different agent is assigned and started in the same commit
         resume_note = f"Resumed after auto-stop. {reason}".strip()
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'resumed', 'blocked', 'in_progress', ?, ?)
-        ''', (task_id, resume_agent, resume_note))
-        
-        self.conn.commit()
+        moves = [(task_id, 'unblock', {'agent': resume_agent, 'actor': resume_agent, 'notes': resume_note})]
+        if resume_agent != task.get('assignee_id'):
+            moves += [(task_id, 'assign', {'agent': resume_agent, 'actor': resume_agent,
+                                           'notes': f"Assigned to {resume_agent} on resume"}),
+                      (task_id, 'start', {'agent': resume_agent, 'actor': resume_agent})]
+        results = self.states.apply_many(moves)
         
         print(f"✅ Task {task_id} resumed")
         print(f"   Agent: {resume_agent}")
         print(f"   Fix loops reset to: 0")
-        print(f"   Status: in_progress")
+        print(f"   Status: {results[-1]['new_status'] if results else task['status']}")
         
         # Notify
         self._notify(
@@ -528,10 +529,10 @@ TO RESUME:
             print(f"   Title: {task['title']}")
             print(f"   Status: {task['status']}")
             print(f"   Assignee: {task['assignee_name'] or 'Unassigned'}")
-            print(f"   Fix Loops: {task['fix_loop_count']}/10")
+            print(f"   Fix Loops: {task['fix_loop_count']}/{FIX_LOOP_LIMIT}")
             
-            remaining = 10 - task['fix_loop_count']
-            if task['fix_loop_count'] >= 10:
+            remaining = FIX_LOOP_LIMIT - task['fix_loop_count']
+            if task['fix_loop_count'] >= FIX_LOOP_LIMIT:
                 print(f"   ⚠️  Task AUTO-STOPPED - Manual intervention required")
                 print(f"   To resume: python3 orchestrator.py resume-task {task_id} --agent <agent_id>")
             elif remaining <= 3:
@@ -564,26 +565,16 @@ TO RESUME:
                 }.get(t['status'], '⬜')
                 
                 warning = ""
-                if t['fix_loop_count'] >= 10:
+                if t['fix_loop_count'] >= FIX_LOOP_LIMIT:
                     warning = " 🛑 AUTO-STOPPED"
-                elif t['fix_loop_count'] >= 7:
+                elif t['fix_loop_count'] >= FIX_LOOP_WARNING:
                     warning = " ⚠️ "
                 
-                print(f"{status_emoji} {t['id']} | Loops: {t['fix_loop_count']}/10{warning}")
+                print(f"{status_emoji} {t['id']} | Loops: {t['fix_loop_count']}/{FIX_LOOP_LIMIT}{warning}")
                 print(f"   {t['title'][:50]}...")
                 print(f"   Status: {t['status']} | Assignee: {t['assignee_name'] or 'Unassigned'}")
                 print()
 
-    def _get_next_mission_number(self) -> int:
-        """Get next mission sequence number"""
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime('%Y%m%d')
-        cursor.execute('''
-            SELECT COUNT(*) FROM orchestrator_missions 
-            WHERE id LIKE ?
-        ''', (f'M-{today}-%',))
-        return cursor.fetchone()[0] + 1
-
 
 def main():
     import argparse
@@ -597,6 +588,20 @@ def main():
     goal.add_argument('--desc', default='', help='Description')
     goal.add_argument('--outcome', required=True, help='Expected outcome')
     goal.add_argument('--assignee', help='Orchestrator agent (default: architect)')
+    goal.add_argument('--parallel', action='store_true',
+                      help=f"Fan the breakdown out to several planners (default: {','.join(DEFAULT_PLANNERS)})")
+    goal.add_argument('--planners', help='Comma-separated planner agents (implies --parallel)')
+    goal.add_argument('--project', help='Project for the created tasks (parallel mode)')
+    goal.add_argument('--working-dir', help='Working directory for the created tasks (parallel mode)')
+    goal.add_argument('--wait', type=int, default=0, help='Seconds to wait for proposals, then merge (parallel mode)')
+    
+    # Merge parallel breakdown
+    merge = subparsers.add_parser('merge-breakdown', help='Merge planner proposals into mission tasks')
+    merge.add_argument('mission_id', help='Mission ID')
+    merge.add_argument('--wait', type=int, default=0, help='Seconds to wait for missing proposals')
+    merge.add_argument('--project', help='Project override (default: from the pipeline)')
+    merge.add_argument('--working-dir', help='Working directory override (default: from the pipeline)')
+    merge.add_argument('--dry-run', action='store_true', help='Validate the merged plan, create nothing')
     
     # List missions
     list_cmd = subparsers.add_parser('list', help='List missions')
@@ -628,11 +633,22 @@ def main():
     
     with AITeamOrchestrator() as orch:
         if args.command == 'goal':
+            planners = None
+            if args.planners or args.parallel:
+                planners = [p.strip() for p in (args.planners or '').split(',') if p.strip()] or DEFAULT_PLANNERS
+                if not args.project or not args.working_dir:
+                    parser.error('--project and --working-dir are required in parallel mode')
             mission_id = orch.receive_goal(
                 args.type, args.title, args.desc, 
-                args.outcome, args.assignee
+                args.outcome, args.assignee,
+                planners=planners, project_id=args.project, working_dir=args.working_dir
             )
             print(f"\n✅ Mission created: {mission_id}")
+            if planners and args.wait:
+                orch.merge_breakdown(mission_id, args.wait)
+            
+        elif args.command == 'merge-breakdown':
+            orch.merge_breakdown(args.mission_id, args.wait, args.project, args.working_dir, args.dry_run)
             
         elif args.command == 'list':
             orch.list_missions(args.status)
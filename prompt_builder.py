@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+AI Team Prompt Builder
+Spawn/review prompts as templates compiled once: a str.format-style template is
+turned into a generated f-string function at import time (same speed as the
+hand-written f-strings it replaces, with field names checked up front). Renders
+are memoized per (template, task, agent): a re-dispatch whose inputs did not
+change returns the cached prompt, and any changed input (e.g. new review
+feedback) re-renders it. Template files under agents/templates/ are read once
+and re-read only when they change on disk.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from string import Formatter
+from typing import Dict, Hashable, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+TEMPLATES_DIR = Path(__file__).parent / "agents" / "templates"
+RENDER_CACHE_SIZE = int(os.getenv("AI_TEAM_PROMPT_CACHE_SIZE", "2048"))
+
+
+class PromptTemplate:
+    """A str.format-style template with plain `{name}` fields, compiled to a function"""
+
+    def __init__(self, name: str, text: str, cache_size: int = RENDER_CACHE_SIZE):
+        self.name = name
+        namespace: Dict[str, object] = {}
+        pieces, fields = [], []
+        for i, (literal, field, spec, conversion) in enumerate(Formatter().parse(text)):
+            if literal:
+                namespace[f'_l{i}'] = literal
+                pieces.append(f'{{_l{i}}}')
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"{name}: unsupported prompt field {{{field}}}")
+            if field not in fields:
+                fields.append(field)
+            pieces.append(f'{{{field}}}')
+        self.fields: Tuple[str, ...] = tuple(fields)
+        exec(f"def _render({', '.join(self.fields)}):\n    return f'{''.join(pieces)}'", namespace)
+        self._render = namespace['_render']
+        self._cache: "OrderedDict[Hashable, Tuple[Tuple, str]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, cache_key: Optional[Hashable] = None, **values) -> str:
+        """
+        Render with the given field values. With a cache_key (e.g. (task_id, agent_id))
+        the last render for that key is reused while all values are unchanged.
+        """
+        if cache_key is None:
+            return self._render(**values)
+        current = tuple(values[f] for f in self.fields)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None and cached[0] == current:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return cached[1]
+        text = self._render(**values)
+        with self._lock:
+            self.misses += 1
+            self._cache[cache_key] = (current, text)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+# ========== Template files ==========
+
+_file_cache: Dict[Path, Tuple[int, int, str]] = {}
+_file_lock = threading.Lock()
+
+
+def read_template_file(path: Path) -> Optional[str]:
+    """File contents, re-read only when its mtime/size changes; None if missing"""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        with _file_lock:
+            _file_cache.pop(path, None)
+        return None
+    with _file_lock:
+        cached = _file_cache.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+    text = path.read_text()
+    with _file_lock:
+        _file_cache[path] = (st.st_mtime_ns, st.st_size, text)
+    return text
+
+
+def load_task_template(template_name: str) -> Optional[str]:
+    """agents/templates/template-<name>.md (cached)"""
+    return read_template_file(TEMPLATES_DIR / f"template-{template_name}.md")
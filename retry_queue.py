@@ -1,28 +1,126 @@
 #!/usr/bin/env python3
 """
 AI Team Retry Queue
-Queue failed operations for retry with exponential backoff
+Queue failed operations for retry with jittered exponential backoff.
+Workers claim items with a time-limited lease, so several processes can
+drain the queue in parallel; per-operation concurrency limits cap how many
+items of one kind run at once, and exhausted items move to a dead-letter
+table. Operations are handled in-process through a handler registry.
 """
 
-import sqlite3
 import json
+import os
+import random
+import sqlite3
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
 
 DB_PATH = Path(__file__).parent / "team.db"
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+BASE_BACKOFF_SECONDS = int(os.getenv("AI_TEAM_RETRY_BASE_SECONDS", "300"))
+MAX_BACKOFF_SECONDS = int(os.getenv("AI_TEAM_RETRY_MAX_SECONDS", "3600"))
+LEASE_SECONDS = int(os.getenv("AI_TEAM_RETRY_LEASE_SECONDS", "300"))
+WORKERS = int(os.getenv("AI_TEAM_RETRY_WORKERS", "8"))
+DEFAULT_CONCURRENCY = int(os.getenv("AI_TEAM_RETRY_CONCURRENCY", "4"))
+CLAIM_BATCH = 200
+
+Handler = Callable[[dict], bool]
+
+
+# ========== Handler Registry ==========
+
+HANDLERS: Dict[str, Handler] = {}
+CONCURRENCY: Dict[str, int] = {}
+
+
+def register_handler(operation: str, concurrency: int = DEFAULT_CONCURRENCY):
+    """Decorator: register an in-process handler (payload -> bool) for an operation"""
+    def decorator(func: Handler) -> Handler:
+        HANDLERS[operation] = func
+        CONCURRENCY[operation] = max(1, concurrency)
+        return func
+    return decorator
+
+
+@register_handler('spawn', concurrency=int(os.getenv("AI_TEAM_RETRY_SPAWN_CONCURRENCY", "2")))
+def retry_spawn(payload: dict) -> bool:
+    """Retry spawn operation through the configured agent runtime"""
+    from agent_runtime import spawn_agent
+
+    agent_id = payload.get('agent_id') or payload.get('agentId')
+    task_id = payload.get('task_id') or payload.get('taskId') or 'retry'
+    message = payload.get('message') or payload.get('task') or ''
+    if not agent_id or not message:
+        raise ValueError("spawn payload needs agent_id and message")
+
+    log_dir = Path(__file__).parent / "logs"
+    log_dir.mkdir(exist_ok=True)
+    ok, details = spawn_agent(
+        agent_id=agent_id,
+        task_id=task_id,
+        working_dir=payload.get('working_dir', '/Users/ngs/clawd'),
+        message=message,
+        log_path=log_dir / f"retry_spawn_{task_id}_{int(time.time())}.log",
+        timeout_seconds=int(payload.get('timeout_seconds', 3600)),
+        label=payload.get('label'),
+    )
+    if not ok:
+        raise RuntimeError(details)
+    return True
+
+
+@register_handler('report')
+def retry_report(payload: dict) -> bool:
+    """Retry report operation"""
+    # Import here to avoid circular dependency
+    from agent_reporter import report_status, report_progress, report_complete
+
+    action = payload.get('action')
+    if action == 'status':
+        report_status(payload['agent'], payload['status'], payload.get('message', ''))
+    elif action == 'progress':
+        report_progress(payload['task'], payload['progress'], payload.get('message', ''))
+    elif action == 'complete':
+        report_complete(payload['agent'], payload['task'], payload.get('message', ''))
+    else:
+        raise ValueError(f"unknown report action: {action}")
+    return True
+
+
+def backoff_seconds(retry_count: int, base: int = BASE_BACKOFF_SECONDS,
+                    cap: int = MAX_BACKOFF_SECONDS) -> float:
+    """Exponential backoff with equal jitter: half fixed, half random"""
+    delay = min(cap, base * (2 ** max(retry_count, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
 
 class RetryQueue:
     """Manage retry queue for failed operations"""
-    
-    def __init__(self):
-        self.db_path = DB_PATH
+
+    def __init__(self, db_path: Path = DB_PATH, worker_id: Optional[str] = None,
+                 lease_seconds: int = LEASE_SECONDS):
+        self.db_path = db_path
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
         self.init_table()
-    
+
     def init_table(self):
-        """Create retry queue table if not exists"""
-        conn = sqlite3.connect(str(self.db_path), timeout=10)
-        cursor = conn.cursor()
+        """Create retry queue tables, adding lease/priority columns to older ones"""
+        cursor = self.conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS retry_queue (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -33,197 +131,284 @@ class RetryQueue:
                 next_retry_at DATETIME,
                 last_error TEXT,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pending'
+                status TEXT DEFAULT 'pending',
+                priority INTEGER DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at DATETIME
             )
         ''')
-        conn.commit()
-        conn.close()
-    
-    def add(self, operation: str, payload: dict, max_retries: int = 3):
-        """Add operation to retry queue"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        next_retry_at = datetime.now() + timedelta(minutes=5)  # First retry in 5 min
-        
+        cursor.execute("PRAGMA table_info(retry_queue)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'priority' not in columns:
+            cursor.execute("ALTER TABLE retry_queue ADD COLUMN priority INTEGER DEFAULT 0")
+        if 'lease_owner' not in columns:
+            cursor.execute("ALTER TABLE retry_queue ADD COLUMN lease_owner TEXT")
+        if 'lease_expires_at' not in columns:
+            cursor.execute("ALTER TABLE retry_queue ADD COLUMN lease_expires_at DATETIME")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_retry_queue_ready
+            ON retry_queue(status, next_retry_at)
+        ''')
         cursor.execute('''
-            INSERT INTO retry_queue (operation, payload, max_retries, next_retry_at)
-            VALUES (?, ?, ?, ?)
-        ''', (operation, json.dumps(payload), max_retries, next_retry_at))
-        
-        conn.commit()
+            CREATE TABLE IF NOT EXISTS retry_dead_letter (
+                id INTEGER PRIMARY KEY,
+                operation TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                retry_count INTEGER,
+                last_error TEXT,
+                created_at DATETIME,
+                failed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self.conn.commit()
+
+    def add(self, operation: str, payload: dict, max_retries: int = 3, priority: int = 0,
+            delay_seconds: Optional[float] = None):
+        """Add operation to retry queue"""
+        delay = backoff_seconds(0) if delay_seconds is None else delay_seconds
+        next_retry_at = (datetime.now() + timedelta(seconds=delay)).strftime(TS_FORMAT)
+        with self._lock:
+            cursor = self.conn.execute('''
+                INSERT INTO retry_queue (operation, payload, max_retries, next_retry_at, priority)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (operation, json.dumps(payload), max_retries, next_retry_at, priority))
+            self.conn.commit()
         queue_id = cursor.lastrowid
-        conn.close()
-        
         print(f"✅ Added to retry queue: {operation} (ID: {queue_id})")
         return queue_id
-    
+
     def get_pending(self):
-        """Get all pending items ready for retry"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        """Get all pending items ready for retry (read-only, no lease)"""
+        now = datetime.now().strftime(TS_FORMAT)
+        cursor = self.conn.execute('''
             SELECT id, operation, payload, retry_count, max_retries
             FROM retry_queue
             WHERE status = 'pending'
-            AND next_retry_at <= datetime('now')
-            ORDER BY created_at ASC
-        ''')
-        
-        items = cursor.fetchall()
-        conn.close()
-        return items
-    
+            AND next_retry_at <= ?
+            ORDER BY priority DESC, next_retry_at ASC
+        ''', (now,))
+        return cursor.fetchall()
+
+    # ========== Leases ==========
+
+    def claim(self, limit: int = CLAIM_BATCH) -> List[Tuple]:
+        """
+        Lease up to `limit` ready items (pending and due, or running with an
+        expired lease), respecting per-operation concurrency across all workers.
+        """
+        now = datetime.now()
+        now_str = now.strftime(TS_FORMAT)
+        expires = (now + timedelta(seconds=self.lease_seconds)).strftime(TS_FORMAT)
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                running = dict(cursor.execute('''
+                    SELECT operation, COUNT(*) FROM retry_queue
+                    WHERE status = 'running' AND lease_expires_at > ?
+                    GROUP BY operation
+                ''', (now_str,)).fetchall())
+                # Top-N per operation so one saturated operation cannot starve the others
+                per_operation = max([DEFAULT_CONCURRENCY, *CONCURRENCY.values()])
+                candidates = cursor.execute('''
+                    SELECT id, operation, payload, retry_count, max_retries
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (
+                            PARTITION BY operation ORDER BY priority DESC, next_retry_at ASC
+                        ) AS rn
+                        FROM retry_queue
+                        WHERE (status = 'pending' AND next_retry_at <= ?)
+                           OR (status = 'running' AND lease_expires_at <= ?)
+                    )
+                    WHERE rn <= ?
+                    ORDER BY priority DESC, next_retry_at ASC
+                ''', (now_str, now_str, per_operation)).fetchall()
+
+                claimed = []
+                for item in candidates:
+                    operation = item[1]
+                    capacity = CONCURRENCY.get(operation, DEFAULT_CONCURRENCY)
+                    if running.get(operation, 0) >= capacity:
+                        continue
+                    running[operation] = running.get(operation, 0) + 1
+                    claimed.append(item)
+                    if len(claimed) >= limit:
+                        break
+
+                cursor.executemany('''
+                    UPDATE retry_queue
+                    SET status = 'running', lease_owner = ?, lease_expires_at = ?
+                    WHERE id = ?
+                ''', [(self.worker_id, expires, item[0]) for item in claimed])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return claimed
+
+    def complete(self, results: List[Tuple]):
+        """Record (item, success, error) outcomes for leased items in one transaction"""
+        now = datetime.now()
+        now_str = now.strftime(TS_FORMAT)
+        done, retry, dead = [], [], []
+        for item, success, error in results:
+            queue_id, _operation, _payload, retry_count, max_retries = item
+            if success:
+                done.append((queue_id, self.worker_id))
+            elif retry_count + 1 >= max_retries:
+                dead.append((error, queue_id, self.worker_id))
+            else:
+                next_at = (now + timedelta(seconds=backoff_seconds(retry_count + 1))).strftime(TS_FORMAT)
+                retry.append((error, next_at, queue_id, self.worker_id))
+
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # lease_owner guard: a worker whose lease expired must not overwrite the new owner
+                cursor.executemany('''
+                    UPDATE retry_queue
+                    SET status = 'completed', lease_owner = NULL, lease_expires_at = NULL
+                    WHERE id = ? AND lease_owner = ?
+                ''', done)
+                cursor.executemany('''
+                    UPDATE retry_queue
+                    SET retry_count = retry_count + 1, last_error = ?, next_retry_at = ?,
+                        status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+                    WHERE id = ? AND lease_owner = ?
+                ''', retry)
+                cursor.executemany('''
+                    INSERT INTO retry_dead_letter (id, operation, payload, retry_count, last_error, created_at, failed_at)
+                    SELECT id, operation, payload, retry_count + 1, ?1, created_at, ?4
+                    FROM retry_queue WHERE id = ?2 AND lease_owner = ?3
+                ''', [row + (now_str,) for row in dead])
+                cursor.executemany('''
+                    DELETE FROM retry_queue WHERE id = ? AND lease_owner = ?
+                ''', [row[1:] for row in dead])
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return len(done), len(retry), len(dead)
+
+    def _lease_one(self, queue_id: int) -> Optional[Tuple]:
+        with self._lock:
+            self.conn.execute('''
+                UPDATE retry_queue SET lease_owner = ? WHERE id = ?
+            ''', (self.worker_id, queue_id))
+            self.conn.commit()
+            return self.conn.execute('''
+                SELECT id, operation, payload, retry_count, max_retries
+                FROM retry_queue WHERE id = ?
+            ''', (queue_id,)).fetchone()
+
     def mark_success(self, queue_id: int):
         """Mark item as successfully processed"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE retry_queue 
-            SET status = 'completed'
-            WHERE id = ?
-        ''', (queue_id,))
-        
-        conn.commit()
-        conn.close()
+        item = self._lease_one(queue_id)
+        if item:
+            self.complete([(item, True, None)])
         print(f"✅ Retry succeeded: {queue_id}")
-    
+
     def mark_failed(self, queue_id: int, error: str):
-        """Mark item as failed, schedule next retry"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        # Exponential backoff: 5min, 10min, 20min
-        cursor.execute('''
-            UPDATE retry_queue 
-            SET retry_count = retry_count + 1,
-                last_error = ?,
-                next_retry_at = datetime('now', '+' || (5 * (retry_count + 1)) || ' minutes'),
-                status = CASE 
-                    WHEN retry_count + 1 >= max_retries THEN 'failed'
-                    ELSE 'pending'
-                END
-            WHERE id = ?
-        ''', (error, queue_id))
-        
-        conn.commit()
-        conn.close()
+        """Mark item as failed, schedule next retry or dead-letter it"""
+        item = self._lease_one(queue_id)
+        if item:
+            self.complete([(item, False, error)])
         print(f"⚠️  Retry failed: {queue_id} - {error}")
-    
-    def process_queue(self):
-        """Process all pending items"""
-        items = self.get_pending()
-        
-        if not items:
-            print("✅ No pending retry items")
-            return 0
-        
-        print(f"🔄 Processing {len(items)} retry items...")
-        
-        processed = 0
-        for item in items:
-            queue_id, operation, payload_json, retry_count, max_retries = item
-            payload = json.loads(payload_json)
-            
-            print(f"  Processing {operation} (retry {retry_count + 1}/{max_retries})")
-            
-            try:
-                if operation == 'spawn':
-                    success = self.retry_spawn(payload)
-                elif operation == 'report':
-                    success = self.retry_report(payload)
-                else:
-                    print(f"    ❌ Unknown operation: {operation}")
-                    continue
-                
-                if success:
-                    self.mark_success(queue_id)
-                    processed += 1
-                else:
-                    self.mark_failed(queue_id, "Operation returned false")
-                    
-            except Exception as e:
-                self.mark_failed(queue_id, str(e))
-        
-        return processed
-    
-    def retry_spawn(self, payload: dict) -> bool:
-        """Retry spawn operation"""
-        import subprocess
-        import json as json_lib
-        
-        try:
-            result = subprocess.run(
-                ['curl', '-s', '-X', 'POST',
-                 'http://localhost:3000/api/sessions/spawn',
-                 '-H', 'Content-Type: application/json',
-                 '-d', json_lib.dumps(payload)],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode == 0:
-                response = json_lib.loads(result.stdout)
-                return 'childSessionKey' in response
-            return False
-        except Exception as e:
-            print(f"    Spawn retry failed: {e}")
-            return False
-    
-    def retry_report(self, payload: dict) -> bool:
-        """Retry report operation"""
+
+    # ========== Processing ==========
+
+    @staticmethod
+    def _run(item: Tuple) -> Tuple:
+        operation, payload_json = item[1], item[2]
+        handler = HANDLERS.get(operation)
+        if handler is None:
+            return item, False, f"Unknown operation: {operation}"
         try:
-            # Import here to avoid circular dependency
-            from agent_reporter import report_status, report_progress, report_complete
-            
-            action = payload.get('action')
-            if action == 'status':
-                report_status(payload['agent'], payload['status'], payload.get('message', ''))
-            elif action == 'progress':
-                report_progress(payload['task'], payload['progress'], payload.get('message', ''))
-            elif action == 'complete':
-                report_complete(payload['agent'], payload['task'], payload.get('message', ''))
-            
-            return True
+            if handler(json.loads(payload_json)):
+                return item, True, None
+            return item, False, "Operation returned false"
         except Exception as e:
-            print(f"    Report retry failed: {e}")
-            return False
-    
+            return item, False, str(e)
+
+    def process_queue(self, workers: int = WORKERS, max_items: Optional[int] = None):
+        """Claim and run ready items on a worker pool until none are left"""
+        processed = failed = dead = 0
+        claimed_total = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="retry") as pool:
+            while max_items is None or claimed_total < max_items:
+                limit = CLAIM_BATCH if max_items is None else min(CLAIM_BATCH, max_items - claimed_total)
+                items = self.claim(limit)
+                if not items:
+                    break
+                claimed_total += len(items)
+                results = list(pool.map(self._run, items))
+                ok, retry, gone = self.complete(results)
+                processed += ok
+                failed += retry
+                dead += gone
+                for item, success, error in results:
+                    if not success:
+                        print(f"  ⚠️  {item[1]} #{item[0]} (retry {item[3] + 1}/{item[4]}): {error}")
+
+        if not claimed_total:
+            print("✅ No pending retry items")
+        else:
+            print(f"🔄 Retry pass: {processed} succeeded, {failed} rescheduled, {dead} dead-lettered")
+        return processed
+
     def get_stats(self):
         """Get queue statistics"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT status, COUNT(*) 
-            FROM retry_queue 
+        cursor = self.conn.execute('''
+            SELECT status, COUNT(*)
+            FROM retry_queue
             GROUP BY status
         ''')
-        
         stats = dict(cursor.fetchall())
-        conn.close()
+        stats['dead_letter'] = self.conn.execute("SELECT COUNT(*) FROM retry_dead_letter").fetchone()[0]
         return stats
 
+    def requeue_dead(self, dead_id: Optional[int] = None) -> int:
+        """Move dead-lettered items (one, or all) back into the queue"""
+        where, params = ("WHERE id = ?", (dead_id,)) if dead_id else ("", ())
+        now = datetime.now().strftime(TS_FORMAT)
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+                INSERT INTO retry_queue (operation, payload, max_retries, next_retry_at, last_error)
+                SELECT operation, payload, 3, ?, last_error FROM retry_dead_letter {where}
+            ''', (now,) + params)
+            moved = cursor.rowcount
+            cursor.execute(f"DELETE FROM retry_dead_letter {where}", params)
+            self.conn.commit()
+        return moved
+
+    def close(self):
+        self.conn.close()
+
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='AI Team Retry Queue')
     parser.add_argument('--process', action='store_true', help='Process retry queue')
     parser.add_argument('--stats', action='store_true', help='Show queue stats')
-    
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Worker threads')
+    parser.add_argument('--requeue-dead', type=int, nargs='?', const=0, help='Requeue dead-lettered items (ID or all)')
+
     args = parser.parse_args()
-    
+
     queue = RetryQueue()
-    
+
     if args.stats:
         stats = queue.get_stats()
         print("Retry Queue Stats:")
         for status, count in stats.items():
             print(f"  {status}: {count}")
+    elif args.requeue_dead is not None:
+        print(f"♻️  Requeued {queue.requeue_dead(args.requeue_dead or None)} dead-lettered items")
     else:
-        queue.process_queue()
+        queue.process_queue(workers=args.workers)
+    queue.close()
 
 if __name__ == '__main__':
     main()
@@ -5,14 +5,22 @@ Auto-approve or auto-reject tasks in review based on evidence.
 """
 
 import argparse
+import math
 import os
-import re
 import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from agent_runtime import spawn_agent, get_runtime
+from checklist_store import ChecklistStore
+from prompt_builder import PromptTemplate
+from task_state import TaskStateMachine
 
 DB_PATH = Path(__file__).parent / "team.db"
 LOG_DIR = Path(__file__).parent / "logs"
@@ -20,6 +28,49 @@ REVIEW_MINUTES = int(os.getenv("AI_TEAM_REVIEW_MINUTES", "10"))
 REJECT_GRACE_MINUTES = int(os.getenv("AI_TEAM_REVIEW_REJECT_GRACE_MINUTES", "60"))
 REVIEWER_STALE_MINUTES = int(os.getenv("AI_TEAM_REVIEWER_STALE_MINUTES", "20"))
 DEFAULT_REVIEWER = "qa"
+# Reviewer sessions started in parallel per pass
+SPAWN_WORKERS = int(os.getenv("AI_TEAM_REVIEW_SPAWN_WORKERS", "4"))
+# Concurrent reviews per reviewer: "2" for everyone, "2,qa=3,qa-4=1" with per-reviewer overrides
+REVIEWER_CAPACITY = os.getenv("AI_TEAM_REVIEWER_CAPACITY", "1")
+# Pull the next queued review as soon as a reviewer approves/rejects (0 = wait for the next pass)
+REVIEW_STEAL = os.getenv("AI_TEAM_REVIEW_STEAL", "1").strip() != "0"
+
+# Review queue: priority, then tasks already bounced by fix loops, then oldest in review
+QUEUE_ORDER = '''
+    CASE priority WHEN 'critical' THEN 1 WHEN 'high' THEN 2 WHEN 'low' THEN 4 ELSE 3 END,
+    COALESCE(fix_loop_count, 0) DESC,
+    COALESCE(review_at, updated_at),
+    id
+'''
+# A reviewer holds up to its capacity in review_assignments; agents.current_task_id shows the latest
+RELEASE_SQL = (
+    "DELETE FROM review_assignments WHERE reviewer_id = ?",
+    '''
+    UPDATE agents
+    SET status = 'idle',
+        current_task_id = NULL,
+        updated_at = datetime('now', 'localtime')
+    WHERE id = ?
+    ''',
+)
+# Binds only while the reviewer is still under capacity (re-binding a task moves it)
+ASSIGN_SQL = '''
+    INSERT INTO review_assignments (task_id, reviewer_id)
+    SELECT :task_id, :reviewer
+    WHERE (SELECT COUNT(*) FROM review_assignments
+           WHERE reviewer_id = :reviewer AND task_id != :task_id) < :capacity
+    ON CONFLICT(task_id) DO UPDATE SET
+        reviewer_id = excluded.reviewer_id,
+        assigned_at = excluded.assigned_at
+'''
+BIND_SQL = '''
+    UPDATE agents
+    SET status = 'active',
+        current_task_id = :task_id,
+        last_heartbeat = datetime('now', 'localtime'),
+        updated_at = datetime('now', 'localtime')
+    WHERE id = :reviewer
+'''
 
 
 def parse_dt(value: Optional[str]) -> Optional[datetime]:
@@ -88,108 +139,136 @@ def has_recent_working_memory(agent_id: str, task_id: str) -> bool:
     return ok
 
 
-def checklist_unchecked(text: Optional[str]) -> list:
-    items = []
-    for line in (text or "").splitlines():
-        m = re.match(r'^\s*[-*]\s+\[(x| )\]\s+(.*)$', line, re.IGNORECASE)
-        if not m:
-            continue
-        checked = m.group(1).lower() == 'x'
-        label = m.group(2).strip()
-        if not checked:
-            items.append(label)
-    return items
-
-
-def _is_human_only_prereq(label: str) -> bool:
-    if not label:
-        return False
-    s = label.lower()
-    return ("@human" in s) or ("human-only" in s) or ("🔒" in label) or s.startswith("human:")
-
-
-def reviewer_status(reviewer_id: str):
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('SELECT status, current_task_id, last_heartbeat FROM agents WHERE id = ?', (reviewer_id,))
-    row = cursor.fetchone()
-    conn.close()
-    if not row:
-        return None, None, None
-    return row[0], row[1], parse_dt(row[2])
-
-
-def release_reviewer(reviewer_id: str):
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE agents
-        SET status = 'idle',
-            current_task_id = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (reviewer_id,))
-    conn.commit()
-    conn.close()
-
-
-def get_reviewer_ids() -> list:
+def get_reviewer_ids(conn: Optional[sqlite3.Connection] = None) -> list:
     env = os.getenv("AI_TEAM_REVIEWERS", "").strip()
     if env:
         return [r.strip() for r in env.split(",") if r.strip()]
 
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(str(DB_PATH))
+    rows = [r[0] for r in conn.execute('''
         SELECT id FROM agents
         WHERE lower(id) LIKE 'qa%' OR lower(role) LIKE '%qa%' OR lower(role) LIKE '%review%'
         ORDER BY id
-    ''')
-    rows = [r[0] for r in cursor.fetchall()]
-    conn.close()
+    ''')]
+    if own:
+        conn.close()
     return rows or [DEFAULT_REVIEWER]
 
-def order_reviewers_for_assignment(reviewer_ids: list) -> list:
-    """
-    Prefer reviewers that have been idle longest (older heartbeat first),
-    so load is spread across qa/qa-2/qa-3/qa-4 instead of always first id.
-    """
-    if not reviewer_ids:
-        return []
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    placeholders = ",".join(["?"] * len(reviewer_ids))
-    cursor.execute(
-        f"SELECT id, COALESCE(last_heartbeat, '1970-01-01 00:00:00') FROM agents WHERE id IN ({placeholders})",
-        reviewer_ids,
-    )
-    hb = {row[0]: row[1] for row in cursor.fetchall()}
-    conn.close()
-    return sorted(reviewer_ids, key=lambda rid: (hb.get(rid, "1970-01-01 00:00:00"), rid))
 
+def parse_capacity(spec: str = REVIEWER_CAPACITY) -> Tuple[int, Dict[str, int]]:
+    """'2,qa=3' -> (2, {'qa': 3}); bad entries are ignored, capacity is at least 1"""
+    default, overrides = 1, {}
+    for part in (p.strip() for p in (spec or "").split(",")):
+        rid, _, value = part.rpartition("=")
+        try:
+            n = max(1, int(value))
+        except ValueError:
+            continue
+        if rid:
+            overrides[rid.strip()] = n
+        else:
+            default = n
+    return default, overrides
 
-def assign_reviewer(reviewer_id: str, task_id: str) -> None:
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE agents
-        SET status = 'active',
-            current_task_id = ?,
-            last_heartbeat = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (task_id, reviewer_id))
+
+def ensure_review_schema(conn: sqlite3.Connection):
+    """review_assignments: (task, reviewer) pairs, cleared when the task leaves reviewing"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    if 'tr_reviewer_keeps_reviews' in existing:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS review_assignments (
+            task_id TEXT PRIMARY KEY,
+            reviewer_id TEXT NOT NULL,
+            assigned_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_assignments_reviewer ON review_assignments(reviewer_id)")
+    # Approve / reject / wait_review / block all end the review
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_review_assignment_done
+        AFTER UPDATE OF status ON tasks
+        WHEN OLD.status = 'reviewing' AND NEW.status != 'reviewing'
+        BEGIN
+            DELETE FROM review_assignments WHERE task_id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_review_assignment_task_deleted
+        AFTER DELETE ON tasks
+        BEGIN
+            DELETE FROM review_assignments WHERE task_id = OLD.id;
+        END
+    ''')
+    # Releasing a reviewer from one review (task_state) keeps it active on the others
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_reviewer_keeps_reviews
+        AFTER UPDATE OF status ON agents
+        WHEN NEW.status = 'idle' AND EXISTS (SELECT 1 FROM review_assignments WHERE reviewer_id = NEW.id)
+        BEGIN
+            UPDATE agents
+            SET status = 'active',
+                current_task_id = (SELECT task_id FROM review_assignments WHERE reviewer_id = NEW.id
+                                   ORDER BY assigned_at DESC, task_id DESC LIMIT 1)
+            WHERE id = NEW.id;
+        END
+    ''')
     conn.commit()
-    conn.close()
 
 
-def build_review_message(task: sqlite3.Row, reviewer_id: str) -> str:
-    working_dir = task['working_dir'] or '/Users/ngs/clawd'
-    base_dir = str(Path(__file__).parent)
-    return f"""## Review Task (Code Review Required)
+class ReviewerPool:
+    """
+    Reviewer load for one pass: reviews held vs capacity. take() prefers the
+    task's prior reviewer while it has room, else the least loaded (relative to
+    capacity), idle longest - so a busy reviewer's sticky tasks go to whoever is free.
+    """
+
+    def __init__(self, reviewers: Dict[str, Dict], assignments: Dict[str, str],
+                 capacity: Tuple[int, Dict[str, int]] = None, only: Optional[str] = None):
+        default, overrides = capacity or parse_capacity()
+        self.capacity = {rid: overrides.get(rid, default) for rid in reviewers}
+        self.heartbeat = {rid: r['heartbeat'] for rid, r in reviewers.items()}
+        self.load = {rid: 0 for rid in reviewers}
+        for rid in assignments.values():
+            if rid in self.load:
+                self.load[rid] += 1
+        # Offline/blocked reviewers (or everyone but `only`) take nothing new
+        self.eligible = {rid for rid, r in reviewers.items()
+                         if r['status'] in ('idle', 'active') and (only is None or rid == only)}
+
+    def free(self, rid: str) -> int:
+        return self.capacity.get(rid, 0) - self.load.get(rid, 0) if rid in self.eligible else 0
+
+    def order(self) -> List[str]:
+        return sorted((rid for rid in self.eligible if self.free(rid) > 0),
+                      key=lambda rid: (self.load[rid] / self.capacity[rid], self.heartbeat[rid] or datetime.min, rid))
+
+    def take(self, prior: Optional[str] = None, now: Optional[datetime] = None) -> Optional[str]:
+        if prior and self.free(prior) > 0:
+            rid = prior
+        else:
+            ranked = self.order()
+            rid = ranked[0] if ranked else None
+        if rid:
+            self.load[rid] += 1
+            self.heartbeat[rid] = now or datetime.now()
+        return rid
+
+    def release(self, rid: str):
+        """Stale reviewer: all its reviews dropped; first in line again (its session is respawned)"""
+        self.load[rid] = 0
+        self.heartbeat[rid] = None
+
+    def spare(self) -> int:
+        return sum(self.free(rid) for rid in self.eligible)
+
+
+REVIEW_MESSAGE = PromptTemplate('review_message', """## Review Task (Code Review Required)
 
 **Reviewer:** {reviewer_id}
-**Task:** {task['id']} - {task['title']}
+**Task:** {task_id} - {title}
 
 ### 📁 WORKING DIRECTORY (REQUIRED)
 **You MUST work in:** `{working_dir}`
@@ -198,10 +277,10 @@ cd {working_dir}
 ```
 
 ### What to Review
-- **Description:** {task['description'] or 'N/A'}
-- **Expected Outcome:** {task['expected_outcome'] or 'N/A'}
-- **Acceptance Criteria:** {task['acceptance_criteria'] or 'N/A'}
-- **Prerequisites:** {task['prerequisites'] or 'N/A'}
+- **Description:** {description}
+- **Expected Outcome:** {expected_outcome}
+- **Acceptance Criteria:** {acceptance_criteria}
+- **Prerequisites:** {prerequisites}
 
 ### Required Review Steps
 1. Inspect changes (preferred):
@@ -214,7 +293,7 @@ cd {working_dir}
 3. Run tests **only if clearly specified** in README/task or obvious test command exists.
 4. **Mark Acceptance Criteria checklist items 1-by-1 (required for approval)**:
 ```bash
-python3 {base_dir}/team_db.py task check {task['id']} --field acceptance --index <n> --done
+python3 {base_dir}/team_db.py task check {task_id} --field acceptance --index <n> --done
 ```
 
 ### Deliverable: Review Report
@@ -227,19 +306,33 @@ Provide a concise report with:
 ### Decision (required)
 Approve:
 ```bash
-python3 {base_dir}/team_db.py task approve {task['id']} --reviewer {reviewer_id}
+python3 {base_dir}/team_db.py task approve {task_id} --reviewer {reviewer_id}
 ```
 
 Reject (must include reason):
 ```bash
-python3 {base_dir}/team_db.py task reject {task['id']} --reviewer {reviewer_id} --reason \"<what to fix>\"
+python3 {base_dir}/team_db.py task reject {task_id} --reviewer {reviewer_id} --reason \"<what to fix>\"
 ```
-"""
+""")
 
 
-def spawn_review_agent(task: sqlite3.Row, reviewer_id: str) -> bool:
-    import time
+def build_review_message(task: sqlite3.Row, reviewer_id: str) -> str:
+    return REVIEW_MESSAGE.render(
+        cache_key=(task['id'], reviewer_id),
+        reviewer_id=reviewer_id,
+        task_id=task['id'],
+        title=task['title'],
+        working_dir=task['working_dir'] or '/Users/ngs/clawd',
+        base_dir=str(Path(__file__).parent),
+        description=task['description'] or 'N/A',
+        expected_outcome=task['expected_outcome'] or 'N/A',
+        acceptance_criteria=task['acceptance_criteria'] or 'N/A',
+        prerequisites=task['prerequisites'] or 'N/A',
+    )
+
 
+def spawn_review_agent(task: sqlite3.Row, reviewer_id: str) -> bool:
+    """Start the reviewer session (runtime is recorded by the caller's batch)"""
     message = build_review_message(task, reviewer_id)
     log_dir = LOG_DIR
     log_dir.mkdir(exist_ok=True)
@@ -254,18 +347,6 @@ def spawn_review_agent(task: sqlite3.Row, reviewer_id: str) -> bool:
         timeout_seconds=3600,
         label=f"{reviewer_id}-{task['id']}",
     )
-    if ok:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE tasks
-            SET runtime = ?,
-                runtime_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (get_runtime(), task["id"]))
-        conn.commit()
-        conn.close()
     return ok
 
 def reconcile_completed_tasks(verbose: bool = False) -> None:
@@ -304,344 +385,406 @@ def reconcile_completed_tasks(verbose: bool = False) -> None:
     conn.close()
     if candidate_ids:
         try:
-            from sprint_status_sync import update_story_status
-            for tid in candidate_ids:
-                update_story_status(tid, 'review')
+            from sprint_status_sync import update_story_statuses
+            update_story_statuses(candidate_ids, 'review')
         except Exception:
             pass
     if verbose and moved:
         print(f"Reconciled {moved} completed tasks -> review")
 
 
-def auto_reject(task_id: str, reason: str):
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'todo',
-            started_at = NULL,
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            fix_loop_count = COALESCE(fix_loop_count, 0) + 1,
-            review_feedback = ?,
-            review_feedback_at = datetime('now', 'localtime'),
-            todo_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (reason, task_id))
-
-    cursor.execute('''
-        INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-        VALUES (?, 'updated', 'review', 'todo', ?)
-    ''', (task_id, reason))
-    conn.commit()
-    conn.close()
-    try:
-        from sprint_status_sync import update_story_status
-        update_story_status(task_id, 'todo')
-    except Exception:
-        pass
-
-
-def soft_return_to_todo(task_id: str, reason: str):
+def load_review_snapshot() -> Dict:
     """
-    Return task to TODO without increasing fix loop.
-    Used for transient/system issues (e.g. stale working memory) to avoid false auto-stop.
+    Everything the planner reads, from one connection: review tasks (reviewing
+    first, then the review queue in QUEUE_ORDER), their open prerequisites,
+    reviewer rows, who holds each review and each task's prior reviewer.
     """
     conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("SELECT status FROM tasks WHERE id = ?", (task_id,))
-    row = cursor.fetchone()
-    if not row:
+    conn.row_factory = sqlite3.Row
+    try:
+        ensure_review_schema(conn)
+        tasks = conn.execute(f'''
+            SELECT id, title, description, expected_outcome, acceptance_criteria, prerequisites,
+                   assignee_id, working_dir, progress, completed_at, started_at, updated_at, status,
+                   priority, fix_loop_count, review_at
+            FROM tasks
+            WHERE status IN ('review', 'reviewing')
+            ORDER BY status DESC, {QUEUE_ORDER}
+        ''').fetchall()
+        snapshot = {'tasks': tasks, 'open_prereqs': {}, 'reviewers': {}, 'assignments': {}, 'prior': {}}
+        if not tasks:
+            return snapshot
+        # Review gate for all of them at once: unchecked prerequisites per task
+        snapshot['open_prereqs'] = ChecklistStore(conn).open_items(('review', 'reviewing'), 'prerequisites')
+
+        reviewer_ids = get_reviewer_ids(conn)
+        rows = conn.execute(
+            f"SELECT id, status, current_task_id, last_heartbeat FROM agents WHERE id IN ({','.join('?' * len(reviewer_ids))})",
+            reviewer_ids).fetchall()
+        snapshot['reviewers'] = {
+            row['id']: {'status': row['status'], 'current_task_id': row['current_task_id'],
+                        'heartbeat': parse_dt(row['last_heartbeat'])}
+            for row in rows
+        }
+        # Reviews held; reviewers bound before review_assignments existed count via current_task_id
+        reviewing = {t['id'] for t in tasks if t['status'] == 'reviewing'}
+        for rid, r in snapshot['reviewers'].items():
+            if r['current_task_id'] in reviewing:
+                snapshot['assignments'][r['current_task_id']] = rid
+        for row in conn.execute("SELECT task_id, reviewer_id FROM review_assignments"):
+            if row['task_id'] in reviewing and row['reviewer_id'] in snapshot['reviewers']:
+                snapshot['assignments'][row['task_id']] = row['reviewer_id']
+        # Last reviewer that acted on each task (sticky assignment)
+        task_ids = [t['id'] for t in tasks]
+        for row in conn.execute(f'''
+            SELECT task_id, agent_id FROM task_history
+            WHERE task_id IN ({','.join('?' * len(task_ids))})
+              AND agent_id IN ({','.join('?' * len(reviewer_ids))})
+            ORDER BY id
+        ''', task_ids + reviewer_ids):
+            snapshot['prior'][row['task_id']] = row['agent_id']
+        return snapshot
+    finally:
         conn.close()
-        return
-    old_status = row[0] or "review"
 
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'todo',
-            started_at = NULL,
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            review_feedback = ?,
-            review_feedback_at = datetime('now', 'localtime'),
-            todo_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (reason, task_id))
 
-    cursor.execute('''
-        UPDATE agents
-        SET status = 'idle',
-            current_task_id = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE current_task_id = ?
-    ''', (task_id,))
+def collect_evidence(task: sqlite3.Row) -> List[str]:
+    evidence = []
+    if (task['progress'] or 0) >= 100:
+        evidence.append("progress=100")
+    if task['completed_at']:
+        evidence.append("completed_at")
+    if has_log_completion(task['id']):
+        evidence.append("log")
+    if has_recent_file_changes(task['working_dir'], parse_dt(task['started_at']) or parse_dt(task['updated_at'])):
+        evidence.append("files")
+    return evidence
 
-    cursor.execute('''
-        INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-        VALUES (?, 'backlogged', ?, 'todo', 'auto-review', ?)
-    ''', (task_id, old_status, reason))
 
-    conn.commit()
-    conn.close()
-    try:
-        from sprint_status_sync import update_story_status
-        update_story_status(task_id, 'todo')
-    except Exception:
-        pass
+@dataclass
+class ReviewPlan:
+    """Every write of one review pass, decided in memory before anything is applied"""
+    transitions: List[Tuple] = field(default_factory=list)       # state-machine moves
+    release: List[str] = field(default_factory=list)             # reviewers to free
+    assign: List[Tuple[str, str]] = field(default_factory=list)  # (reviewer, task_id) to bind and spawn
+    notes: List[str] = field(default_factory=list)               # verbose log lines
 
 
-def mark_info_needed(task_id: str, reason: str):
-    """Mark task as waiting for human input (does not count as a fix loop)."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("SELECT status FROM tasks WHERE id = ?", (task_id,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return
-    old_status = row[0] or "review"
+def plan_reviews(snapshot: Dict, now: Optional[datetime] = None, only: Optional[str] = None) -> ReviewPlan:
+    """
+    Decide every task's next step against the snapshot, walking the review queue
+    in priority order. Reviewers come from a ReviewerPool (capacity per reviewer,
+    sticky to the prior reviewer while it has room, else least loaded). With
+    `only`, just that reviewer's free slots are filled from the queue head.
+    """
+    now = now or datetime.now()
+    plan = ReviewPlan()
+    reviewers = snapshot['reviewers']
+    bound = snapshot['assignments']
+    pool = ReviewerPool(reviewers, bound, only=only)
+    released = set()
+    queued = 0
+
+    for task in snapshot['tasks']:
+        task_id = task['id']
+        status = task['status'] or 'review'
+        if only and (status != 'review' or not pool.spare()):
+            continue
 
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'info_needed',
-            blocked_reason = ?,
-            blocked_at = datetime('now', 'localtime'),
-            review_feedback = ?,
-            review_feedback_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ?
-    ''', (reason, reason, task_id))
+        # Review gate: prerequisites must be checked before any review starts.
+        open_items = snapshot['open_prereqs'].get(task_id, [])
+        if open_items:
+            human_unmet = [i['text'] for i in open_items if i['human_only']]
+            if human_unmet:
+                reason = "Info needed (HUMAN-only prerequisites unchecked) -> " + "; ".join(human_unmet)
+                plan.transitions.append((task_id, 'info_needed',
+                                         {'reason': reason, 'feedback': reason, 'actor': 'auto-review'}))
+            else:
+                reason = "Review gate failed: prerequisites unchecked -> " + "; ".join(i['text'] for i in open_items)
+                plan.transitions.append((task_id, 'soft_return', {'reason': reason, 'actor': 'auto-review'}))
+            plan.notes.append(f"REQUEUE {task_id} ({reason})")
+            continue
 
-    cursor.execute('''
-        UPDATE agents
-        SET status = 'idle',
-            current_task_id = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE current_task_id = ?
-    ''', (task_id,))
+        if status == 'review':
+            evidence = collect_evidence(task)
+            if not evidence:
+                # No evidence yet: wait until grace period before auto-reject
+                base_time = parse_dt(task['completed_at']) or parse_dt(task['updated_at'])
+                if base_time and (now - base_time) >= timedelta(minutes=REJECT_GRACE_MINUTES):
+                    reason = "Auto-review failed: no evidence of completion"
+                    plan.transitions.append((task_id, 'fix_loop', {'reason': reason}))
+                    plan.notes.append(f"REJECT {task_id} ({reason})")
+                continue
 
-    cursor.execute('''
-        INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-        VALUES (?, 'updated', ?, 'info_needed', 'auto-review', ?)
-    ''', (task_id, old_status, reason))
+            reviewer_id = pool.take(snapshot['prior'].get(task_id), now)
+            if not reviewer_id:
+                queued += 1
+                plan.notes.append(f"WAIT {task_id} (queued #{queued}, reviewers at capacity)")
+                continue
+            plan.transitions.append((task_id, 'start_review', {'notes': "Auto-review started"}))
+            plan.assign.append((reviewer_id, task_id))
+            plan.notes.append(f"REVIEWING {task_id} ({', '.join(evidence)}) -> spawn {reviewer_id}")
+            continue
 
-    conn.commit()
-    conn.close()
+        # status == reviewing: ensure a reviewer is actually assigned
+        assigned_reviewer = bound.get(task_id)
+        if assigned_reviewer in released:
+            assigned_reviewer = None
+        heartbeat = reviewers[assigned_reviewer]['heartbeat'] if assigned_reviewer else None
+        if assigned_reviewer and heartbeat:
+            age = now - heartbeat
+            if age < timedelta(minutes=-5) or age >= timedelta(minutes=REVIEWER_STALE_MINUTES):
+                mins = int(age.total_seconds() // 60)
+                kind = "clock-skew" if mins < 0 else "stale"
+                plan.notes.append(f"REVIEWING {task_id} ({kind} reviewer {assigned_reviewer}, {mins}m) -> release")
+                plan.release.append(assigned_reviewer)
+                # All its reviews are handed out again; it is first in line for a fresh session
+                pool.release(assigned_reviewer)
+                released.add(assigned_reviewer)
+                assigned_reviewer = None
 
+        if not assigned_reviewer:
+            # assign a reviewer with a free slot to continue
+            assigned_reviewer = pool.take(snapshot['prior'].get(task_id), now)
+            if not assigned_reviewer:
+                plan.transitions.append((task_id, 'wait_review', {'notes': "No active reviewer; returned to waiting review"}))
+                plan.notes.append(f"WAIT {task_id} (no active reviewer)")
+                continue
+            plan.assign.append((assigned_reviewer, task_id))
+            plan.notes.append(f"REVIEWING {task_id} (reassigned -> {assigned_reviewer})")
+            continue
 
-def mark_reviewing(task_id: str, note: str = "Auto-review started"):
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'reviewing',
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            reviewing_at = datetime('now', 'localtime'),
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ? AND status = 'review'
-    ''', (task_id,))
-    if cursor.rowcount > 0:
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'updated', 'review', 'reviewing', ?)
-        ''', (task_id, note))
-    conn.commit()
-    conn.close()
+        plan.notes.append(f"REVIEWING {task_id} (active reviewer: {assigned_reviewer})")
+    return plan
+
+
+def apply_review_plan(plan: ReviewPlan) -> List[Tuple[str, str]]:
+    """
+    Apply the plan in one transaction. Reviewers are bound only while still under
+    capacity and their task still moved as planned; returns the (reviewer, task_id) to spawn.
+    """
+    default, overrides = parse_capacity()
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    states = TaskStateMachine(conn)
     try:
-        from sprint_status_sync import update_story_status
-        update_story_status(task_id, 'reviewing')
+        ensure_review_schema(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        for sql in RELEASE_SQL:
+            conn.executemany(sql, [(rid,) for rid in plan.release])
+        results = states.apply_many(plan.transitions, commit=False)
+        starting = {move[0] for move in plan.transitions if move[1] == 'start_review'}
+        started = {r['task_id'] for r in results if r['transition'] == 'start_review'}
+        spawns = []
+        for rid, task_id in plan.assign:
+            if task_id in starting and task_id not in started:
+                continue
+            params = {'task_id': task_id, 'reviewer': rid, 'capacity': overrides.get(rid, default)}
+            if conn.execute(ASSIGN_SQL, params).rowcount:
+                conn.execute(BIND_SQL, params)
+                spawns.append((rid, task_id))
+        conn.commit()
     except Exception:
-        pass
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    states.emit(results)
+    return spawns
 
-def mark_waiting_review(task_id: str, note: str = "No active reviewer; returned to waiting review"):
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE tasks
-        SET status = 'review',
-            blocked_reason = NULL,
-            blocked_at = NULL,
-            updated_at = datetime('now', 'localtime')
-        WHERE id = ? AND status = 'reviewing'
-    ''', (task_id,))
-    if cursor.rowcount > 0:
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'updated', 'reviewing', 'review', ?)
-        ''', (task_id, note))
-    conn.commit()
-    conn.close()
+
+def spawn_reviews(spawns: List[Tuple[str, str]], tasks: Dict[str, sqlite3.Row]) -> List[Tuple[str, str]]:
+    """
+    Start all reviewer sessions concurrently, then record runtimes and undo the
+    failed ones (reviewer freed, task back to waiting review) in one transaction.
+    Returns the failed (reviewer, task_id).
+    """
+    if not spawns:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(SPAWN_WORKERS, len(spawns)))) as pool:
+        oks = list(pool.map(lambda s: spawn_review_agent(tasks[s[1]], s[0]), spawns))
+    failed = [s for s, ok in zip(spawns, oks) if not ok]
+
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    states = TaskStateMachine(conn)
     try:
-        from sprint_status_sync import update_story_status
-        update_story_status(task_id, 'review')
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany('''
+            UPDATE tasks
+            SET runtime = ?,
+                runtime_at = datetime('now', 'localtime'),
+                updated_at = datetime('now', 'localtime')
+            WHERE id = ?
+        ''', [(get_runtime(), task_id) for (rid, task_id), ok in zip(spawns, oks) if ok])
+        # Leaving reviewing drops the assignment; the reviewer stays active on its other reviews
+        results = states.apply_many([
+            (task_id, 'wait_review', {'notes': "Reviewer spawn failed; returned to waiting review"})
+            for _, task_id in failed
+        ], commit=False)
+        conn.executemany(RELEASE_SQL[1] + " AND current_task_id = ?", failed)
+        conn.commit()
     except Exception:
-        pass
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    states.emit(results)
+    return failed
 
 
-def review_tasks(dry_run: bool = False, verbose: bool = False):
+def review_tasks(dry_run: bool = False, verbose: bool = False, only: Optional[str] = None):
     if not dry_run:
         reconcile_completed_tasks(verbose=verbose)
 
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, title, description, expected_outcome, acceptance_criteria, prerequisites,
-               assignee_id, working_dir, progress, completed_at, started_at, updated_at, status
-        FROM tasks
-        WHERE status IN ('review', 'reviewing')
-    ''')
-    tasks = cursor.fetchall()
-    conn.close()
-
-    if not tasks:
+    snapshot = load_review_snapshot()
+    if not snapshot['tasks']:
         if verbose:
             print("No review tasks.")
         return
 
-    reviewers = get_reviewer_ids()
-    assignment_order = order_reviewers_for_assignment(reviewers)
-    now = datetime.now()
-    for task in tasks:
-        task_id = task['id']
-        progress = task['progress'] or 0
-        completed_at = parse_dt(task['completed_at'])
-        started_at = parse_dt(task['started_at'])
-        updated_at = parse_dt(task['updated_at'])
-        working_dir = task['working_dir']
-        status = task['status'] or 'review'
-        assignee_id = task['assignee_id']
-        prerequisites = task['prerequisites']
+    plan = plan_reviews(snapshot, only=only)
+    if verbose:
+        for line in plan.notes:
+            print(line)
+    if dry_run:
+        return
 
-        # Review gate: prerequisites must be checked before any review starts.
-        unmet_prereq = checklist_unchecked(prerequisites)
-        if unmet_prereq:
-            human_unmet = [p for p in unmet_prereq if _is_human_only_prereq(p)]
-            if human_unmet:
-                reason = "Info needed (HUMAN-only prerequisites unchecked) -> " + "; ".join(human_unmet)
-            else:
-                reason = "Review gate failed: prerequisites unchecked -> " + "; ".join(unmet_prereq)
-            if verbose:
-                print(f"REQUEUE {task_id} ({reason})")
-            if not dry_run:
-                if human_unmet:
-                    mark_info_needed(task_id, reason)
-                else:
-                    soft_return_to_todo(task_id, reason)
-            continue
+    spawns = apply_review_plan(plan)
+    failed = spawn_reviews(spawns, {t['id']: t for t in snapshot['tasks']})
+    if verbose:
+        for rid, task_id in failed:
+            print(f"WAIT {task_id} (spawn failed for {rid})")
 
-        evidence = []
-        if progress >= 100:
-            evidence.append("progress=100")
-        if completed_at:
-            evidence.append("completed_at")
-        if has_log_completion(task_id):
-            evidence.append("log")
-        if has_recent_file_changes(working_dir, started_at or updated_at):
-            evidence.append("files")
 
-        if status == 'review':
-            if evidence:
-                reviewer_id = None
-                reviewer_state = None
-                reviewer_task = None
-
-                # Prefer reviewer already assigned to this task
-                for rid in reviewers:
-                    reviewer_state, reviewer_task, _ = reviewer_status(rid)
-                    if reviewer_task == task_id:
-                        reviewer_id = rid
-                        break
-
-                # Otherwise, pick first idle reviewer
-                if not reviewer_id:
-                    for rid in assignment_order:
-                        reviewer_state, reviewer_task, _ = reviewer_status(rid)
-                        if reviewer_state == 'idle' and not reviewer_task:
-                            reviewer_id = rid
-                            break
-
-                if not dry_run and reviewer_id:
-                    if verbose:
-                        print(f"REVIEWING {task_id} ({', '.join(evidence)}) -> spawn {reviewer_id}")
-                    mark_reviewing(task_id)
-                    if reviewer_state == 'idle':
-                        assign_reviewer(reviewer_id, task_id)
-                        if not spawn_review_agent(task, reviewer_id):
-                            release_reviewer(reviewer_id)
-                            mark_waiting_review(task_id, "Reviewer spawn failed; returned to waiting review")
-                            if verbose:
-                                print(f"WAIT {task_id} (spawn failed for {reviewer_id})")
-                            continue
-                else:
-                    if verbose:
-                        print(f"WAIT {task_id} (reviewer unavailable)")
-            else:
-                # No evidence yet: wait until grace period before auto-reject
-                base_time = completed_at or updated_at
-                if base_time and (now - base_time) >= timedelta(minutes=REJECT_GRACE_MINUTES):
-                    reason = "Auto-review failed: no evidence of completion"
-                    if verbose:
-                        print(f"REJECT {task_id} ({reason})")
-                    if not dry_run:
-                        auto_reject(task_id, reason)
-            continue
+def request_steal(reviewer_id: str) -> bool:
+    """
+    A reviewer just finished a review: fill its free slots from the queue head
+    in a detached pass, instead of leaving it idle until the next cron run.
+    """
+    if not REVIEW_STEAL or not reviewer_id or reviewer_id not in get_reviewer_ids():
+        return False
+    try:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--steal", reviewer_id],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        return True
+    except Exception:
+        return False
 
-        # status == reviewing: ensure a reviewer is actually assigned
-        assigned_reviewer = None
-        assigned_heartbeat = None
-        for rid in reviewers:
-            state, current, heartbeat = reviewer_status(rid)
-            if current == task_id:
-                assigned_reviewer = rid
-                assigned_heartbeat = heartbeat
-                break
-
-        if assigned_reviewer and assigned_heartbeat:
-            age = now - assigned_heartbeat
-            if age < timedelta(minutes=-5) or age >= timedelta(minutes=REVIEWER_STALE_MINUTES):
-                if verbose:
-                    mins = int(age.total_seconds() // 60)
-                    if mins < 0:
-                        print(f"REVIEWING {task_id} (clock-skew reviewer {assigned_reviewer}, {mins}m) -> release")
-                    else:
-                        print(f"REVIEWING {task_id} (stale reviewer {assigned_reviewer}, {mins}m) -> release")
-                if not dry_run:
-                    release_reviewer(assigned_reviewer)
-                assigned_reviewer = None
 
-        if not assigned_reviewer:
-            # assign an idle reviewer to continue
-            for rid in assignment_order:
-                state, current, _ = reviewer_status(rid)
-                if state == 'idle' and not current:
-                    assigned_reviewer = rid
-                    if not dry_run:
-                        assign_reviewer(rid, task_id)
-                        spawn_review_agent(task, rid)
-                    if verbose:
-                        print(f"REVIEWING {task_id} (reassigned -> {rid})")
-                    break
-        if not assigned_reviewer:
-            if not dry_run:
-                mark_waiting_review(task_id)
-            if verbose:
-                print(f"WAIT {task_id} (no active reviewer)")
-            continue
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
 
-        if verbose:
-            print(f"REVIEWING {task_id} (active reviewer: {assigned_reviewer})")
+
+def review_metrics(days: int = 7) -> Dict:
+    """
+    Queue depth and wait times now, plus the last `days` of throughput, to size
+    the QA pool: review slots needed = arrivals per hour x hours per review.
+    """
+    now = datetime.now()
+    default, overrides = parse_capacity()
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+    try:
+        ensure_review_schema(conn)
+        queue = conn.execute(f'''
+            SELECT id, priority, fix_loop_count, COALESCE(review_at, updated_at) AS since
+            FROM tasks
+            WHERE status = 'review'
+            ORDER BY {QUEUE_ORDER}
+        ''').fetchall()
+        reviewing = conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'reviewing'").fetchone()[0]
+        load = dict(conn.execute('''
+            SELECT ra.reviewer_id, COUNT(*) FROM review_assignments ra
+            JOIN tasks t ON t.id = ra.task_id AND t.status = 'reviewing'
+            GROUP BY ra.reviewer_id
+        ''').fetchall())
+        finished = conn.execute('''
+            SELECT review_at, reviewing_at, done_at FROM tasks
+            WHERE status = 'done' AND done_at >= datetime('now', 'localtime', ?)
+              AND review_at IS NOT NULL AND reviewing_at IS NOT NULL
+        ''', (f"-{days} days",)).fetchall()
+        arrivals = conn.execute('''
+            SELECT COUNT(*) FROM task_history
+            WHERE new_status = 'review' AND COALESCE(old_status, '') != 'reviewing'
+              AND timestamp >= datetime('now', ?)
+        ''', (f"-{days} days",)).fetchone()[0]
+        reviewer_ids = get_reviewer_ids(conn)
+    finally:
+        conn.close()
+
+    def minutes(start: Optional[str], end: Optional[datetime]) -> Optional[float]:
+        start = parse_dt(start)
+        return (end - start).total_seconds() / 60 if start and end else None
+
+    waiting = [m for m in (minutes(row['since'], now) for row in queue) if m is not None]
+    queue_wait = [m for m in (minutes(r['review_at'], parse_dt(r['reviewing_at'])) for r in finished) if m is not None and m >= 0]
+    review_time = [m for m in (minutes(r['reviewing_at'], parse_dt(r['done_at'])) for r in finished) if m is not None and m >= 0]
+
+    by_priority: Dict[str, int] = {}
+    for row in queue:
+        by_priority[row['priority'] or 'normal'] = by_priority.get(row['priority'] or 'normal', 0) + 1
+    reviewers = {rid: {'load': load.get(rid, 0), 'capacity': overrides.get(rid, default)} for rid in reviewer_ids}
+    slots = sum(r['capacity'] for r in reviewers.values())
+    arrivals_per_hour = arrivals / (days * 24)
+    avg_review = sum(review_time) / len(review_time) if review_time else 0.0
+    slots_needed = arrivals_per_hour * avg_review / 60
+    return {
+        'queue_depth': len(queue),
+        'queue_by_priority': by_priority,
+        'reviewing': reviewing,
+        'wait_minutes': {'avg': sum(waiting) / len(waiting) if waiting else 0.0,
+                         'p90': percentile(waiting, 90), 'max': max(waiting, default=0.0)},
+        'reviewers': reviewers,
+        'slots': slots,
+        'utilization': sum(r['load'] for r in reviewers.values()) / slots if slots else 0.0,
+        'history_days': days,
+        'reviews_finished': len(finished),
+        'queue_wait_minutes': {'avg': sum(queue_wait) / len(queue_wait) if queue_wait else 0.0,
+                               'p90': percentile(queue_wait, 90)},
+        'review_minutes_avg': avg_review,
+        'arrivals_per_hour': arrivals_per_hour,
+        'slots_needed': slots_needed,
+        'reviewers_needed': math.ceil(slots_needed / default) if slots_needed else 0,
+    }
+
+
+def print_metrics(days: int = 7):
+    m = review_metrics(days)
+    print("📊 Review Queue")
+    print(f"   Waiting: {m['queue_depth']}"
+          + (f" ({', '.join(f'{p}: {n}' for p, n in m['queue_by_priority'].items())})" if m['queue_by_priority'] else ""))
+    print(f"   Reviewing: {m['reviewing']}")
+    w = m['wait_minutes']
+    print(f"   Wait now: avg {w['avg']:.0f}m, p90 {w['p90']:.0f}m, max {w['max']:.0f}m")
+    print(f"\n👥 Reviewers ({m['slots']} slots, {m['utilization']:.0%} used)")
+    for rid, r in m['reviewers'].items():
+        print(f"   {rid}: {r['load']}/{r['capacity']}")
+    q = m['queue_wait_minutes']
+    print(f"\n📈 Last {m['history_days']} days ({m['reviews_finished']} reviews finished)")
+    print(f"   Queue wait: avg {q['avg']:.0f}m, p90 {q['p90']:.0f}m")
+    print(f"   Review time: avg {m['review_minutes_avg']:.0f}m")
+    print(f"   Arrivals: {m['arrivals_per_hour']:.2f}/h -> {m['slots_needed']:.1f} slots busy on average"
+          f" (~{m['reviewers_needed']} reviewer(s) at default capacity)")
 
 
 def main():
     parser = argparse.ArgumentParser(description="AI Team Review Manager")
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--steal", metavar="REVIEWER", help="Fill this reviewer's free slots from the queue head")
+    parser.add_argument("--metrics", action="store_true", help="Show queue depth, wait times and reviewer load")
+    parser.add_argument("--days", type=int, default=7, help="History window for --metrics")
     args = parser.parse_args()
-    review_tasks(dry_run=args.dry_run, verbose=args.verbose)
+    if args.metrics:
+        print_metrics(args.days)
+        return
+    review_tasks(dry_run=args.dry_run, verbose=args.verbose, only=args.steal)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+AI Team Search Index
+One FTS5 index over tasks, task history notes, agent learnings, agent
+communications and working memory, kept in sync by triggers. Each source row
+maps to a fixed FTS rowid (kind << 40 | source rowid), so triggers update in
+place and kind filters are rowid ranges. Results are BM25-ranked with snippets.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+KIND_SHIFT = 40
+
+# kind -> source table and SQL expressions over a row alias {r} that feed the index
+SOURCES: Dict[str, Dict] = {
+    'task': {
+        'code': 1, 'table': 'tasks',
+        'title': "{r}.title",
+        'body': "COALESCE({r}.description, '') || ' ' || COALESCE({r}.expected_outcome, '') || ' ' || "
+                "COALESCE({r}.acceptance_criteria, '') || ' ' || COALESCE({r}.review_feedback, '') || ' ' || "
+                "COALESCE({r}.notes, '') || ' ' || COALESCE({r}.blocked_reason, '')",
+        'ref': "{r}.id", 'agent': "{r}.assignee_id", 'task': "{r}.id",
+        'ts': "COALESCE({r}.updated_at, {r}.created_at)",
+    },
+    'history': {
+        'code': 2, 'table': 'task_history',
+        'title': "{r}.action", 'body': "{r}.notes",
+        'ref': "{r}.id", 'agent': "{r}.agent_id", 'task': "{r}.task_id", 'ts': "{r}.timestamp",
+        'when': "{r}.notes IS NOT NULL AND {r}.notes != ''",
+    },
+    'learning': {
+        'code': 3, 'table': 'agent_learnings',
+        'title': "{r}.source", 'body': "{r}.content",
+        'ref': "{r}.id", 'agent': "{r}.agent_id", 'task': "{r}.task_id", 'ts': "{r}.last_seen_at",
+    },
+    'message': {
+        'code': 4, 'table': 'agent_communications',
+        'title': "{r}.message_type", 'body': "{r}.message",
+        'ref': "{r}.id", 'agent': "{r}.from_agent_id", 'task': "{r}.task_id", 'ts': "{r}.created_at",
+    },
+    'memory': {
+        'code': 5, 'table': 'agent_working_memory',
+        'title': "'working memory'",
+        'body': "COALESCE({r}.working_notes, '') || ' ' || COALESCE({r}.blockers, '') || ' ' || COALESCE({r}.next_steps, '')",
+        'ref': "{r}.id", 'agent': "{r}.agent_id", 'task': "{r}.current_task_id", 'ts': "{r}.last_updated",
+    },
+}
+
+
+def _row_sql(kind: str, alias: str) -> str:
+    """Index column values for one source row under the given alias (new/old/table)"""
+    spec = SOURCES[kind]
+    exprs = [f"({spec['code']} << {KIND_SHIFT}) + {{r}}.rowid", spec['title'], spec['body'],
+             f"'{kind}'", spec['ref'], spec['agent'], spec['task'], spec['ts']]
+    return ", ".join(e.format(r=alias) for e in exprs)
+
+
+def to_match_query(text: str, any_term: bool = False) -> str:
+    """Turn free text into a safe FTS5 query: quoted terms, last one as prefix"""
+    terms = [t for t in re.findall(r'\w+', text or '', re.UNICODE)]
+    if not terms:
+        return ''
+    quoted = [f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*']
+    return (" OR " if any_term else " ").join(quoted)
+
+
+class SearchIndex:
+    """FTS5 search over the team database with trigger-maintained sync"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        """Create the index and any missing per-source triggers (backfilling those sources)"""
+        existing = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        if 'search_fts' not in existing:
+            self.conn.execute('''
+                CREATE VIRTUAL TABLE search_fts USING fts5(
+                    title, body,
+                    kind UNINDEXED, ref UNINDEXED, agent_id UNINDEXED, task_id UNINDEXED, ts UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            ''')
+        created = False
+        for kind, spec in SOURCES.items():
+            table = spec['table']
+            if table not in existing or f"search_{table}_ai" in existing:
+                continue
+            self._create_triggers(kind)
+            self._backfill(kind)
+            created = True
+        if created:
+            self.conn.commit()
+
+    def _create_triggers(self, kind: str):
+        spec = SOURCES[kind]
+        table = spec['table']
+        rowid = f"({spec['code']} << {KIND_SHIFT}) + {{alias}}.rowid"
+        insert = (f"INSERT INTO search_fts (rowid, title, body, kind, ref, agent_id, task_id, ts) "
+                  f"SELECT {{values}} WHERE {{when}};")
+        delete = f"DELETE FROM search_fts WHERE rowid = {rowid};"
+        new_when = spec.get('when', '1').format(r='new')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN
+                {insert.format(values=_row_sql(kind, 'new'), when=new_when)}
+            END
+        ''')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN
+                {delete.format(alias='old')}
+            END
+        ''')
+        self.conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE ON {table} BEGIN
+                {delete.format(alias='old')}
+                {insert.format(values=_row_sql(kind, 'new'), when=new_when)}
+            END
+        ''')
+
+    def _backfill(self, kind: str):
+        spec = SOURCES[kind]
+        low = spec['code'] << KIND_SHIFT
+        self.conn.execute("DELETE FROM search_fts WHERE rowid >= ? AND rowid < ?", (low, low + (1 << KIND_SHIFT)))
+        when = spec.get('when', '1').format(r='r')
+        self.conn.execute(f'''
+            INSERT INTO search_fts (rowid, title, body, kind, ref, agent_id, task_id, ts)
+            SELECT {_row_sql(kind, 'r')} FROM {spec['table']} r WHERE {when}
+        ''')
+
+    def rebuild(self) -> Dict[str, int]:
+        """Re-index every source from scratch; returns rows per kind"""
+        counts = {}
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for kind, spec in SOURCES.items():
+            if spec['table'] in tables:
+                self._backfill(kind)
+                low = spec['code'] << KIND_SHIFT
+                counts[kind] = self.conn.execute(
+                    "SELECT COUNT(*) FROM search_fts WHERE rowid >= ? AND rowid < ?",
+                    (low, low + (1 << KIND_SHIFT))).fetchone()[0]
+        self.conn.execute("INSERT INTO search_fts (search_fts) VALUES ('optimize')")
+        self.conn.commit()
+        return counts
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, agent_id: str = None,
+               task_id: str = None, since: str = None, limit: int = 20, raw: bool = False,
+               any_term: bool = False, highlight: Tuple[str, str] = ('[', ']')) -> List[Dict]:
+        """
+        BM25-ranked matches (title weighted 2x) with highlighted snippets.
+        `query` is free text unless raw=True (then FTS5 syntax is passed through).
+        """
+        match = query if raw else to_match_query(query, any_term)
+        if not match:
+            return []
+        where, params = ["search_fts MATCH ?"], [match]
+        if kinds:
+            ranges = []
+            for kind in kinds:
+                low = SOURCES[kind]['code'] << KIND_SHIFT
+                ranges.append("(rowid >= ? AND rowid < ?)")
+                params += [low, low + (1 << KIND_SHIFT)]
+            where.append("(" + " OR ".join(ranges) + ")")
+        if agent_id:
+            where.append("agent_id = ?")
+            params.append(agent_id)
+        if task_id:
+            where.append("task_id = ?")
+            params.append(task_id)
+        if since:
+            where.append("ts >= ?")
+            params.append(since)
+        params = [highlight[0], highlight[1]] + params + [limit]
+
+        cursor = self.conn.execute(f'''
+            SELECT kind, ref, title, agent_id, task_id, ts,
+                   snippet(search_fts, 1, ?, ?, '…', 12) AS snippet,
+                   bm25(search_fts, 2.0, 1.0) AS score
+            FROM search_fts
+            WHERE {' AND '.join(where)}
+            ORDER BY score
+            LIMIT ?
+        ''', params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Search Index')
+    parser.add_argument('query', nargs='?', help='Search text')
+    parser.add_argument('--kind', action='append', choices=list(SOURCES), help='Limit to a source kind')
+    parser.add_argument('--agent', help='Filter by agent')
+    parser.add_argument('--task', help='Filter by task')
+    parser.add_argument('--limit', type=int, default=20, help='Max results')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the index')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        index = SearchIndex(conn)
+        if args.rebuild:
+            for kind, count in index.rebuild().items():
+                print(f"🔎 {kind}: {count} rows indexed")
+        elif args.query:
+            for hit in index.search(args.query, args.kind, args.agent, args.task, limit=args.limit):
+                print(f"  [{hit['kind']}] {hit['ref']} | {hit['title'] or ''} | {hit['snippet']}")
+        else:
+            parser.print_help()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,6 @@ Prevents duplicate spawns and handles sessions properly
 """
 
 import os
-import re
 import sqlite3
 import time
 from datetime import datetime, timedelta
@@ -21,6 +20,9 @@ DB_PATH = Path(__file__).parent / "team.db"
 
 # Import audit logger
 from audit_log import AuditLogger
+from context_retrieval import retrieve_context
+from prompt_builder import PromptTemplate
+from task_dag import READY_SQL, ensure_schema as ensure_dag_schema
 from agent_runtime import get_active_sessions, get_runtime, spawn_agent
 
 audit = AuditLogger()
@@ -39,14 +41,16 @@ def update_task_runtime(task_id: str, runtime: str) -> None:
     conn.close()
 
 def get_tasks_to_spawn(task_id: Optional[str] = None) -> List[Dict]:
-    """Get tasks that need spawning (assigned, todo, not being worked on)"""
+    """Get tasks that need spawning (assigned, todo, dependencies done, not being worked on)"""
     conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
+    ensure_dag_schema(conn)
     cursor = conn.cursor()
     
-    # Get assigned todo tasks
-    where_clause = '''
+    # Get assigned todo tasks whose upstream tasks are all done
+    where_clause = f'''
         WHERE t.status = 'todo'
+          AND {READY_SQL}
           AND t.assignee_id IS NOT NULL
           AND t.assignee_id != ''
           AND (t.updated_at IS NULL OR t.updated_at < datetime('now', 'localtime', '-15 seconds'))  -- small debounce after assign
@@ -96,8 +100,10 @@ def was_recently_spawned(task_id: str, minutes: int = 10) -> bool:
     conn.close()
     return result is not None
 
-def get_agent_context(agent_id: str) -> Dict:
-    """Get agent context from database"""
+def get_agent_context(agent_id: str, task: Optional[Dict] = None) -> Dict:
+    """Get agent context from database (only the parts relevant to `task` when given)"""
+    if task is not None:
+        return retrieve_context(agent_id, task, db_path=DB_PATH)
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
     cursor.execute('''
@@ -133,14 +139,10 @@ def get_busy_agents() -> Dict[str, str]:
         busy[agent_id] = reason
     return busy
 
-def build_task_message(task: Dict, agent_context: Dict) -> str:
-    """Build task message with STRICT no-HTML rules"""
-    working_dir = task.get('working_dir', '/Users/ngs/clawd')
-    base_dir = str(Path(__file__).parent)
-    return f"""## 🚨 CRITICAL: NO HTML ALLOWED 🚨
+TASK_MESSAGE = PromptTemplate('task_message', """## 🚨 CRITICAL: NO HTML ALLOWED 🚨
 
-**You are {task['agent_name']} ({task['agent_role']})**
-**Task:** {task['id']} - {task['title']}
+**You are {agent_name} ({agent_role})**
+**Task:** {task_id} - {title}
 
 ### 📁 WORKING DIRECTORY (REQUIRED)
 **You MUST work in:** `{working_dir}`
@@ -160,45 +162,48 @@ cd {working_dir}
 - ❌ ANY HTML tags
 
 ### Your Context
-{agent_context['context']}
+{context}
 
 ### Your Learnings
-{agent_context['learnings']}
+{learnings}
+
+### Related Past Work
+{related}
 
 ### Task Details
-- **Description:** {task.get('description') or 'N/A'}
-- **Priority:** {task['priority']}
-- **Expected Outcome:** {task.get('expected_outcome') or 'N/A'}
+- **Description:** {description}
+- **Priority:** {priority}
+- **Expected Outcome:** {expected_outcome}
 
 ### ✅ Prerequisites (must check 1-by-1 BEFORE starting)
-{task.get('prerequisites') or 'N/A'}
+{prerequisites}
 
 If prerequisites are a checklist, mark each item:
 ```bash
-python3 {base_dir}/team_db.py task check {task['id']} --field prerequisites --index <n> --done
+python3 {base_dir}/team_db.py task check {task_id} --field prerequisites --index <n> --done
 ```
 **HUMAN-only prerequisites** are marked with `@human` / `HUMAN:` / `🔒`.
 Do **NOT** check those as an agent. Instead, return task to todo with a clear request for the missing info.
 
 If any prerequisite is NOT met, stop work and send back to todo with clear reason:
 ```bash
-python3 {base_dir}/team_db.py task requeue {task['id']} --reason "Prerequisite not met: <reason (include exact detail)>"
+python3 {base_dir}/team_db.py task requeue {task_id} --reason "Prerequisite not met: <reason (include exact detail)>"
 ```
 
 ### ✅ Acceptance Criteria (review will require all checked)
-{task.get('acceptance_criteria') or 'N/A'}
+{acceptance_criteria}
 
 ### 📌 Last Review Feedback (if any)
-{task.get('review_feedback') or 'N/A'}
+{review_feedback}
 
-**Feedback Time:** {task.get('review_feedback_at') or 'N/A'}
+**Feedback Time:** {review_feedback_at}
 
 ### 📝 MANDATORY MEMORY UPDATES (ทุก 30 นาที)
 
 **ต้องอัพเดต working memory ทุก 30 นาที:**
 ```bash
-python3 {base_dir}/agent_memory_writer.py working {task['assignee_id']} \
-  --task {task['id']} \
+python3 {base_dir}/agent_memory_writer.py working {assignee_id} \
+  --task {task_id} \
   --notes "สิ่งที่กำลังทำตอนนี้" \
   --blockers "ติดปัญหาอะไร (ถ้ามี)" \
   --next "จะทำอะไรต่อไป"
@@ -206,16 +211,16 @@ python3 {base_dir}/agent_memory_writer.py working {task['assignee_id']} \
 
 **ก่อนจบงาน ต้อง add learning:**
 ```bash
-python3 {base_dir}/agent_memory_writer.py learn {task['assignee_id']} \
+python3 {base_dir}/agent_memory_writer.py learn {assignee_id} \
   "สิ่งที่เรียนรู้จากงานนี้"
 ```
 
 ### 📋 Instructions
-1. Start: `python3 {base_dir}/team_db.py task start {task['id']}`
+1. Start: `python3 {base_dir}/team_db.py task start {task_id}`
 2. **อัพเดต working memory ทุก 30 นาที** (บังคับ)
-3. Update progress: `python3 {base_dir}/team_db.py task progress {task['id']} \u003cpct\u003e`
+3. Update progress: `python3 {base_dir}/team_db.py task progress {task_id} \u003cpct\u003e`
 4. **Add learning ก่อนจบ** (บังคับ)
-5. Done: `python3 {base_dir}/team_db.py task done {task['id']}`
+5. Done: `python3 {base_dir}/team_db.py task done {task_id}`
 
 **⚠️ ถ้าไม่อัพเดต memory งานจะไม่ผ่าน review!**
 
@@ -225,14 +230,38 @@ python3 {base_dir}/agent_memory_writer.py learn {task['assignee_id']} \
 
 ```bash
 # รายงานความคืบหน้า
-python3 {base_dir}/agent_reporter.py progress --agent {task['assignee_id']} \
-  --task {task['id']} --progress <pct> --message "สรุปความคืบหน้า"
+python3 {base_dir}/agent_reporter.py progress --agent {assignee_id} \
+  --task {task_id} --progress <pct> --message "สรุปความคืบหน้า"
 
 # รายงานเสร็จงาน
-python3 {base_dir}/agent_reporter.py complete --agent {task['assignee_id']} \
-  --task {task['id']} --message "สรุปผลลัพธ์"
+python3 {base_dir}/agent_reporter.py complete --agent {assignee_id} \
+  --task {task_id} --message "สรุปผลลัพธ์"
 ```
-"""
+""")
+
+
+def build_task_message(task: Dict, agent_context: Dict) -> str:
+    """Build task message with STRICT no-HTML rules"""
+    return TASK_MESSAGE.render(
+        cache_key=(task['id'], task['assignee_id']),
+        agent_name=task['agent_name'],
+        agent_role=task['agent_role'],
+        task_id=task['id'],
+        title=task['title'],
+        assignee_id=task['assignee_id'],
+        priority=task['priority'],
+        working_dir=task.get('working_dir', '/Users/ngs/clawd'),
+        base_dir=str(Path(__file__).parent),
+        context=agent_context['context'],
+        learnings=agent_context['learnings'],
+        related=agent_context.get('related') or 'N/A',
+        description=task.get('description') or 'N/A',
+        expected_outcome=task.get('expected_outcome') or 'N/A',
+        prerequisites=task.get('prerequisites') or 'N/A',
+        acceptance_criteria=task.get('acceptance_criteria') or 'N/A',
+        review_feedback=task.get('review_feedback') or 'N/A',
+        review_feedback_at=task.get('review_feedback_at') or 'N/A',
+    )
 
 def log_spawn(task_id: str, agent_id: str):
     """Log that task was spawned and bind current_task_id for visibility."""
@@ -272,21 +301,6 @@ def log_spawn(task_id: str, agent_id: str):
     audit.log_status_change(agent_id, old_status, old_status, 'Task spawned (waiting for start)')
 
 
-def checklist_unchecked(text: str):
-    items = []
-    if not text:
-        return items
-    for line in text.splitlines():
-        m = re.match(r'^\s*[-*]\s+\[(x| )\]\s+(.*)$', line, re.IGNORECASE)
-        if not m:
-            continue
-        checked = m.group(1).lower() == 'x'
-        label = (m.group(2) or '').strip()
-        if not checked and label:
-            items.append(label)
-    return items
-
-
 def set_prereq_feedback(task_id: str, reason: str):
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
@@ -429,7 +443,7 @@ def main():
         # Spawn
         print(f"🚀 {task_id}: Spawning {task['agent_name']}")
         
-        agent_ctx = get_agent_context(task['assignee_id'])
+        agent_ctx = get_agent_context(task['assignee_id'], task)
         task_message = build_task_message(task, agent_ctx)
         
         # Actually spawn the subagent
@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
 """
 Sync task status -> sprint-status.yaml (nurse-ai).
+Status changes are queued and written in debounced batches: a worker keeps the
+YAML parsed into a story_id -> value offset index (re-parsed only when the file
+changes on disk), applies all pending statuses as line splices, and replaces
+the file atomically under a lock. Short-lived CLI processes flush at exit.
+Story IDs are computed once per task into tasks.story_id.
 """
+import atexit
+import os
 import re
 import sqlite3
+import tempfile
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: rely on the atomic replace alone
+    fcntl = None
 
 DB_PATH = Path(__file__).parent / "team.db"
 DEFAULT_SPRINT_STATUS = Path("/Users/ngs/Herd/nurse-ai/_bmad-output/implementation-artifacts/sprint-status.yaml")
+# Seconds to wait for more changes before writing (long-running processes)
+DEBOUNCE_SECONDS = float(os.getenv("AI_TEAM_SPRINT_SYNC_DEBOUNCE", "2"))
 
 STATUS_MAP = {
     "backlog": "backlog",
@@ -19,61 +35,212 @@ STATUS_MAP = {
     "done": "done",
 }
 
+TITLE_STORY_RE = re.compile(r"^([0-9A-Za-z][0-9A-Za-z\-\.]+):")
+STORY_FILE_RE = re.compile(r"Story file:\s*(.+/stories/([^/]+)\.md)")
+STORY_ID_RE = re.compile(r"\bStory ID\b\s*[:\-]\s*([0-9A-Za-z][0-9A-Za-z\-\.]+)", re.I)
+# "  <key>: <value>  # comment" -> key and the value span
+YAML_ENTRY_RE = re.compile(r"^\s*([^\s:#][^:#]*?)\s*:\s*([^\s#]+)")
+
 
-def _extract_story_id(title: str, description: str) -> Optional[str]:
+def extract_story_id(title: str, description: str) -> Optional[str]:
     title = title or ""
     description = description or ""
 
-    m = re.match(r"^([0-9A-Za-z][0-9A-Za-z\-\.]+):", title)
+    m = TITLE_STORY_RE.match(title)
     if m:
         return m.group(1)
 
-    m = re.search(r"Story file:\s*(.+/stories/([^/]+)\.md)", description)
+    m = STORY_FILE_RE.search(description)
     if m:
         return m.group(2)
 
-    m = re.search(r"\bStory ID\b\s*[:\-]\s*([0-9A-Za-z][0-9A-Za-z\-\.]+)", description, re.I)
+    m = STORY_ID_RE.search(description)
     if m:
         return m.group(1)
 
     return None
 
 
+def ensure_story_column(conn: sqlite3.Connection):
+    """tasks.story_id: '' = no story, NULL = not computed yet (reset when title/description change)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    if 'story_id' in columns:
+        return
+    conn.execute("ALTER TABLE tasks ADD COLUMN story_id TEXT")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_tasks_story_id_reset
+        AFTER UPDATE OF title, description ON tasks
+        WHEN NEW.title IS NOT OLD.title OR NEW.description IS NOT OLD.description
+        BEGIN
+            UPDATE tasks SET story_id = NULL WHERE id = NEW.id;
+        END
+    ''')
+    conn.commit()
+
+
+def story_ids_for(conn: sqlite3.Connection, task_ids: List[str]) -> Dict[str, Tuple[Optional[str], str]]:
+    """task_id -> (story_id or None, db status); fills tasks.story_id for rows not computed yet"""
+    ensure_story_column(conn)
+    rows = conn.execute(
+        f"SELECT id, story_id, title, description, status FROM tasks WHERE id IN ({','.join('?' * len(task_ids))})",
+        task_ids).fetchall()
+    result, computed = {}, []
+    for task_id, story_id, title, description, status in rows:
+        if story_id is None:
+            story_id = extract_story_id(title, description) or ''
+            computed.append((story_id, task_id))
+        result[task_id] = (story_id or None, status)
+    if computed:
+        conn.executemany("UPDATE tasks SET story_id = ? WHERE id = ?", computed)
+        conn.commit()
+    return result
+
+
+class SprintStatusWorker:
+    """Pending story statuses for one sprint-status.yaml, flushed in one atomic write"""
+
+    def __init__(self, path: Path, debounce: float = DEBOUNCE_SECONDS):
+        self.path = path
+        self.debounce = debounce
+        self.pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Serializes flushes (debounce timer vs. exit/explicit flush) in this process
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        # (mtime_ns, size) of the parsed file, its lines and story -> (line, value start, value end)
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lines: List[str] = []
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+
+    def queue(self, changes: Dict[str, str]):
+        """Record story -> status (latest wins) and (re)arm the debounce timer"""
+        if not changes:
+            return
+        with self._lock:
+            self.pending.update(changes)
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _load(self):
+        st = self.path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        self._lines = self.path.read_text(encoding="utf-8").splitlines(keepends=True)
+        self._index = {}
+        for n, line in enumerate(self._lines):
+            m = YAML_ENTRY_RE.match(line)
+            if m:
+                self._index.setdefault(m.group(1), (n, m.start(2), m.end(2)))
+        self._stamp = stamp
+
+    def flush(self) -> int:
+        """Write all pending statuses now; returns stories changed"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            pending, self.pending = self.pending, {}
+        if not pending or not self.path.exists():
+            return 0
+        with self._flush_lock:
+            return self._write(pending)
+
+    def _write(self, pending: Dict[str, str]) -> int:
+        """Apply pending statuses through the offset index and replace the file (under the file lock)"""
+        lock_file = None
+        try:
+            if fcntl:
+                lock_file = open(self.path.with_name(f".{self.path.name}.lock"), "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._load()
+            changed = 0
+            for story_id, status in pending.items():
+                entry = self._index.get(story_id)
+                if not entry:
+                    continue
+                n, start, end = entry
+                line = self._lines[n]
+                if line[start:end] == status:
+                    continue
+                self._lines[n] = line[:start] + status + line[end:]
+                self._index[story_id] = (n, start, start + len(status))
+                changed += 1
+            if changed:
+                fd, tmp = tempfile.mkstemp(dir=str(self.path.parent), prefix=f".{self.path.name}.")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write("".join(self._lines))
+                    os.chmod(tmp, self.path.stat().st_mode & 0o777)
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    os.unlink(tmp)
+                    self._stamp = None
+                    raise
+                st = self.path.stat()
+                self._stamp = (st.st_mtime_ns, st.st_size)
+            return changed
+        finally:
+            if lock_file:
+                lock_file.close()
+
+
+_workers: Dict[Path, SprintStatusWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(sprint_status_path: Path = DEFAULT_SPRINT_STATUS) -> SprintStatusWorker:
+    with _workers_lock:
+        worker = _workers.get(sprint_status_path)
+        if worker is None:
+            worker = _workers[sprint_status_path] = SprintStatusWorker(sprint_status_path)
+        return worker
+
+
+def flush_all() -> int:
+    """Write every pending batch (registered at exit for short-lived CLI processes)"""
+    with _workers_lock:
+        workers = list(_workers.values())
+    changed = 0
+    for worker in workers:
+        try:
+            changed += worker.flush()
+        except OSError:
+            pass
+    return changed
+
+
+atexit.register(flush_all)
+
+
 def update_story_status(task_id: str, status: Optional[str] = None, sprint_status_path: Path = DEFAULT_SPRINT_STATUS) -> bool:
-    """Update sprint-status.yaml for a task's story id. Returns True if updated."""
-    if not sprint_status_path.exists():
-        return False
+    """Queue the task's story status for the next batched write. Returns True if queued."""
+    return update_story_statuses([task_id], status, sprint_status_path) > 0
 
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("SELECT title, description, status FROM tasks WHERE id = ?", (task_id,))
-    row = cur.fetchone()
-    con.close()
-    if not row:
-        return False
-
-    title, description, db_status = row[0], row[1], row[2]
-    story_id = _extract_story_id(title, description)
-    if not story_id:
-        return False
-
-    status_key = status or db_status
-    new_status = STATUS_MAP.get((status_key or "").lower())
-    if not new_status:
-        return False
 
-    text = sprint_status_path.read_text(encoding="utf-8")
-    pattern = re.compile(rf"^(\s*{re.escape(story_id)}\s*:\s*)([^\s#]+)(.*)$", re.M)
-    m = pattern.search(text)
-    if not m:
-        return False
+def update_story_statuses(task_ids: Iterable[str], status: Optional[str] = None,
+                          sprint_status_path: Path = DEFAULT_SPRINT_STATUS) -> int:
+    """Batch form: one DB query, changes queued for the debounced writer. Returns stories queued."""
+    task_ids = list(task_ids)
+    if not task_ids or not sprint_status_path.exists():
+        return 0
 
-    updated = pattern.sub(lambda mm: f"{mm.group(1)}{new_status}{mm.group(3)}", text, count=1)
-    if updated == text:
-        return False
+    con = sqlite3.connect(DB_PATH)
+    try:
+        stories = story_ids_for(con, task_ids)
+    finally:
+        con.close()
 
-    sprint_status_path.write_text(updated, encoding="utf-8")
-    return True
+    changes = {}
+    for story_id, db_status in stories.values():
+        new_status = STATUS_MAP.get((status or db_status or "").lower())
+        if story_id and new_status:
+            changes[story_id] = new_status
+    get_worker(sprint_status_path).queue(changes)
+    return len(changes)
 
 
 def normalize_ready_status(sprint_status_path: Path = DEFAULT_SPRINT_STATUS) -> int:
@@ -90,8 +257,8 @@ def normalize_ready_status(sprint_status_path: Path = DEFAULT_SPRINT_STATUS) ->
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
-        print("Usage: sprint_status_sync.py <task_id>")
+        print("Usage: sprint_status_sync.py <task_id> [<task_id> ...]")
         raise SystemExit(1)
-    tid = sys.argv[1]
-    changed = update_story_status(tid)
-    print("updated" if changed else "no-change")
+    update_story_statuses(sys.argv[1:])
+    changed = flush_all()
+    print(f"updated {changed}" if changed else "no-change")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+AI Team Task DAG
+Dependency graph over task_dependencies (task_id depends on depends_on_task_id).
+Readiness is kept incrementally in tasks.unmet_dependencies by triggers: a
+task reaching done decrements only its direct dependents, so "ready" is a
+plain `unmet_dependencies = 0` filter for assignment and spawning. TaskDAG
+loads the adjacency index in memory for cycle checks, critical path and
+earliest-start estimates.
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+# Hours assumed for tasks without an estimate when computing paths
+DEFAULT_ESTIMATE_HOURS = float(os.getenv("AI_TEAM_DAG_DEFAULT_HOURS", "1"))
+
+# SQL fragment for dispatch queries (tasks aliased as t)
+READY_SQL = "COALESCE(t.unmet_dependencies, 0) = 0"
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """unmet_dependencies column, reverse-edge index and the triggers that maintain the counter"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    added = 'unmet_dependencies' not in columns
+    if added:
+        conn.execute("ALTER TABLE tasks ADD COLUMN unmet_dependencies INTEGER DEFAULT 0")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_task_dependencies_upstream
+        ON task_dependencies(depends_on_task_id)
+    ''')
+    # New edge to an unfinished (or unknown) upstream task
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_dag_dependency_added
+        AFTER INSERT ON task_dependencies
+        WHEN (SELECT status FROM tasks WHERE id = NEW.depends_on_task_id) IS NOT 'done'
+        BEGIN
+            UPDATE tasks SET unmet_dependencies = COALESCE(unmet_dependencies, 0) + 1
+            WHERE id = NEW.task_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_dag_dependency_removed
+        AFTER DELETE ON task_dependencies
+        WHEN (SELECT status FROM tasks WHERE id = OLD.depends_on_task_id) IS NOT 'done'
+        BEGIN
+            UPDATE tasks SET unmet_dependencies = MAX(COALESCE(unmet_dependencies, 0) - 1, 0)
+            WHERE id = OLD.task_id;
+        END
+    ''')
+    # Upstream reaches done: only its direct dependents are touched
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_dag_upstream_done
+        AFTER UPDATE OF status ON tasks
+        WHEN NEW.status = 'done' AND OLD.status IS NOT 'done'
+        BEGIN
+            UPDATE tasks SET unmet_dependencies = MAX(COALESCE(unmet_dependencies, 0) - 1, 0)
+            WHERE id IN (SELECT task_id FROM task_dependencies WHERE depends_on_task_id = NEW.id);
+        END
+    ''')
+    # Reopened upstream blocks its dependents again
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_dag_upstream_reopened
+        AFTER UPDATE OF status ON tasks
+        WHEN OLD.status = 'done' AND NEW.status IS NOT 'done'
+        BEGIN
+            UPDATE tasks SET unmet_dependencies = COALESCE(unmet_dependencies, 0) + 1
+            WHERE id IN (SELECT task_id FROM task_dependencies WHERE depends_on_task_id = NEW.id);
+        END
+    ''')
+    # Deleted tasks drop their edges (FK cascades are off by default in SQLite)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tr_dag_task_deleted
+        AFTER DELETE ON tasks
+        BEGIN
+            DELETE FROM task_dependencies WHERE depends_on_task_id = OLD.id OR task_id = OLD.id;
+        END
+    ''')
+    if added:
+        recount(conn)
+    conn.commit()
+
+
+def recount(conn: sqlite3.Connection) -> int:
+    """Recompute every counter from the edges (backfill / repair); returns rows changed"""
+    cursor = conn.execute('''
+        UPDATE tasks SET unmet_dependencies = (
+            SELECT COUNT(*) FROM task_dependencies d
+            LEFT JOIN tasks u ON u.id = d.depends_on_task_id
+            WHERE d.task_id = tasks.id AND u.status IS NOT 'done'
+        )
+        WHERE COALESCE(unmet_dependencies, 0) != (
+            SELECT COUNT(*) FROM task_dependencies d
+            LEFT JOIN tasks u ON u.id = d.depends_on_task_id
+            WHERE d.task_id = tasks.id AND u.status IS NOT 'done'
+        )
+    ''')
+    return cursor.rowcount
+
+
+class TaskDAG:
+    """In-memory adjacency index over task_dependencies plus the tasks it touches"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        ensure_schema(conn)
+        self.load()
+
+    def load(self):
+        """(Re)build the index: one query for edges, one for task state"""
+        self.deps: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+        for task_id, upstream in self.conn.execute(
+                "SELECT task_id, depends_on_task_id FROM task_dependencies"):
+            self.deps.setdefault(task_id, set()).add(upstream)
+            self.dependents.setdefault(upstream, set()).add(task_id)
+        self.tasks: Dict[str, Dict] = {}
+        for task_id, status, hours, title in self.conn.execute(
+                "SELECT id, status, estimated_hours, title FROM tasks"):
+            self.tasks[task_id] = {'status': status, 'hours': hours, 'title': title}
+        self.unmet: Dict[str, int] = {
+            t: sum(1 for u in ups if self._status(u) != 'done') for t, ups in self.deps.items()
+        }
+        self.ready: Set[str] = {
+            t for t, info in self.tasks.items()
+            if info['status'] == 'todo' and self.unmet.get(t, 0) == 0
+        }
+
+    def _status(self, task_id: str) -> Optional[str]:
+        info = self.tasks.get(task_id)
+        return info['status'] if info else None
+
+    # ========== Edges ==========
+
+    def would_cycle(self, task_id: str, depends_on: str) -> bool:
+        """True if task_id is already upstream of depends_on (the new edge would close a loop)"""
+        if task_id == depends_on:
+            return True
+        stack, seen = [depends_on], set()
+        while stack:
+            node = stack.pop()
+            for upstream in self.deps.get(node, ()):
+                if upstream == task_id:
+                    return True
+                if upstream not in seen:
+                    seen.add(upstream)
+                    stack.append(upstream)
+        return False
+
+    def add_dependency(self, task_id: str, depends_on: str, commit: bool = True):
+        """Add an edge; ValueError on unknown tasks or a cycle"""
+        self.add_dependencies([(task_id, depends_on)], commit)
+
+    def add_dependencies(self, edges: List[Tuple[str, str]], commit: bool = True) -> int:
+        """Add many edges (all validated, then one executemany); returns edges added"""
+        new = []
+        try:
+            for task_id, depends_on in edges:
+                for t in (task_id, depends_on):
+                    if t not in self.tasks:
+                        raise ValueError(f"unknown task {t}")
+                if depends_on in self.deps.get(task_id, ()):
+                    continue
+                if self.would_cycle(task_id, depends_on):
+                    raise ValueError(f"{task_id} → {depends_on} would create a dependency cycle")
+                # Later edges in the batch are checked against earlier ones
+                self._link(task_id, depends_on)
+                new.append((task_id, depends_on))
+            self.conn.executemany('''
+                INSERT OR IGNORE INTO task_dependencies (task_id, depends_on_task_id) VALUES (?, ?)
+            ''', new)
+            if commit:
+                self.conn.commit()
+        except (ValueError, sqlite3.Error):
+            for task_id, depends_on in new:
+                self._unlink(task_id, depends_on)
+            raise
+        return len(new)
+
+    def remove_dependency(self, task_id: str, depends_on: str, commit: bool = True) -> bool:
+        cursor = self.conn.execute('''
+            DELETE FROM task_dependencies WHERE task_id = ? AND depends_on_task_id = ?
+        ''', (task_id, depends_on))
+        if commit:
+            self.conn.commit()
+        if cursor.rowcount:
+            self._unlink(task_id, depends_on)
+        return cursor.rowcount > 0
+
+    def _link(self, task_id: str, depends_on: str):
+        self.deps.setdefault(task_id, set()).add(depends_on)
+        self.dependents.setdefault(depends_on, set()).add(task_id)
+        if self._status(depends_on) != 'done':
+            self.unmet[task_id] = self.unmet.get(task_id, 0) + 1
+            self.ready.discard(task_id)
+
+    def _unlink(self, task_id: str, depends_on: str):
+        self.deps.get(task_id, set()).discard(depends_on)
+        self.dependents.get(depends_on, set()).discard(task_id)
+        if self._status(depends_on) != 'done':
+            self.unmet[task_id] = max(self.unmet.get(task_id, 0) - 1, 0)
+            self._refresh_ready(task_id)
+
+    # ========== Transitions ==========
+
+    def _refresh_ready(self, task_id: str):
+        if self._status(task_id) == 'todo' and self.unmet.get(task_id, 0) == 0:
+            self.ready.add(task_id)
+        else:
+            self.ready.discard(task_id)
+
+    def set_status(self, task_id: str, status: str) -> Set[str]:
+        """
+        Mirror a status change in the index (the DB counter is kept by triggers).
+        Cost is the task's out-degree. Returns dependents that just became ready.
+        """
+        info = self.tasks.setdefault(task_id, {'status': None, 'hours': None, 'title': None})
+        old, info['status'] = info['status'], status
+        unblocked = set()
+        if (old == 'done') != (status == 'done'):
+            delta = -1 if status == 'done' else 1
+            for dependent in self.dependents.get(task_id, ()):
+                self.unmet[dependent] = max(self.unmet.get(dependent, 0) + delta, 0)
+                was_ready = dependent in self.ready
+                self._refresh_ready(dependent)
+                if not was_ready and dependent in self.ready:
+                    unblocked.add(dependent)
+        self._refresh_ready(task_id)
+        return unblocked
+
+    def blockers(self, task_id: str) -> List[str]:
+        """Direct upstream tasks that are not done yet"""
+        return sorted(u for u in self.deps.get(task_id, ()) if self._status(u) != 'done')
+
+    # ========== Analysis ==========
+
+    def find_cycles(self) -> List[List[str]]:
+        """Cycles among existing edges (iterative DFS); empty when the graph is a DAG"""
+        WHITE, GREY, BLACK = 0, 1, 2
+        color: Dict[str, int] = {}
+        cycles = []
+        for root in list(self.deps):
+            if color.get(root, WHITE) != WHITE:
+                continue
+            path, stack = [], [(root, iter(sorted(self.deps.get(root, ()))))]
+            color[root] = GREY
+            path.append(root)
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    color[node] = BLACK
+                    path.pop()
+                    stack.pop()
+                elif color.get(child, WHITE) == GREY:
+                    cycles.append(path[path.index(child):] + [child])
+                elif color.get(child, WHITE) == WHITE:
+                    color[child] = GREY
+                    path.append(child)
+                    stack.append((child, iter(sorted(self.deps.get(child, ())))))
+        return cycles
+
+    def _remaining_hours(self, task_id: str) -> float:
+        info = self.tasks.get(task_id)
+        if not info or info['status'] == 'done':
+            return 0.0
+        return float(info['hours'] or DEFAULT_ESTIMATE_HOURS)
+
+    def schedule(self, task_ids: Optional[Set[str]] = None) -> Dict[str, Dict]:
+        """
+        Earliest start/finish (hours from now) per unfinished task, assuming
+        unlimited agents. Restricted to task_ids (and their upstream) if given.
+        """
+        if task_ids is None:
+            nodes = {t for t, info in self.tasks.items() if info['status'] != 'done'}
+        else:
+            nodes, stack = set(), list(task_ids)
+            while stack:
+                node = stack.pop()
+                if node in nodes:
+                    continue
+                nodes.add(node)
+                stack.extend(self.deps.get(node, ()))
+        # Kahn's order over the sub-graph
+        indegree = {n: sum(1 for u in self.deps.get(n, ()) if u in nodes) for n in nodes}
+        queue = [n for n, d in indegree.items() if d == 0]
+        plan: Dict[str, Dict] = {}
+        while queue:
+            node = queue.pop()
+            start = max((plan[u]['finish'] for u in self.deps.get(node, ()) if u in plan), default=0.0)
+            via = max((u for u in self.deps.get(node, ()) if u in plan),
+                      key=lambda u: plan[u]['finish'], default=None)
+            plan[node] = {'start': start, 'finish': start + self._remaining_hours(node), 'via': via}
+            for dependent in self.dependents.get(node, ()):
+                if dependent in indegree:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        queue.append(dependent)
+        # Nodes left out are on a cycle and cannot be scheduled
+        return plan
+
+    def critical_path(self, task_ids: Optional[Set[str]] = None) -> Tuple[List[str], float]:
+        """Longest chain of unfinished work (by estimated hours) and its length"""
+        plan = self.schedule(task_ids)
+        if not plan:
+            return [], 0.0
+        node = max(plan, key=lambda n: plan[n]['finish'])
+        total = plan[node]['finish']
+        path = []
+        while node is not None:
+            path.append(node)
+            node = plan[node]['via']
+        return list(reversed(path)), total
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Task DAG')
+    sub = parser.add_subparsers(dest='command')
+    add = sub.add_parser('add', help='Task depends on other tasks')
+    add.add_argument('task_id')
+    add.add_argument('depends_on', nargs='+')
+    rm = sub.add_parser('remove', help='Remove a dependency')
+    rm.add_argument('task_id')
+    rm.add_argument('depends_on')
+    show = sub.add_parser('show', help='Dependencies of a task')
+    show.add_argument('task_id')
+    sub.add_parser('ready', help='Todo tasks whose dependencies are done')
+    sub.add_parser('check', help='Detect cycles and repair counters')
+    cp = sub.add_parser('critical-path', help='Longest chain of unfinished work')
+    cp.add_argument('task_id', nargs='*', help='Limit to these tasks and their upstream')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        dag = TaskDAG(conn)
+        if args.command == 'add':
+            try:
+                n = dag.add_dependencies([(args.task_id, d) for d in args.depends_on])
+                print(f"✅ {args.task_id}: {n} dependencies added, blocked by {dag.blockers(args.task_id) or 'nothing'}")
+            except ValueError as e:
+                print(f"❌ {e}")
+        elif args.command == 'remove':
+            ok = dag.remove_dependency(args.task_id, args.depends_on)
+            print("✅ Removed" if ok else "⚠️  No such dependency")
+        elif args.command == 'show':
+            print(f"🔗 {args.task_id}")
+            print(f"   Depends on: {', '.join(sorted(dag.deps.get(args.task_id, ()))) or '-'}")
+            print(f"   Blocked by: {', '.join(dag.blockers(args.task_id)) or '-'}")
+            print(f"   Unblocks:   {', '.join(sorted(dag.dependents.get(args.task_id, ()))) or '-'}")
+            plan = dag.schedule({args.task_id}).get(args.task_id)
+            if plan:
+                print(f"   Earliest start: +{plan['start']:.1f}h, finish: +{plan['finish']:.1f}h")
+        elif args.command == 'ready':
+            for task_id in sorted(dag.ready):
+                print(f"  🟢 {task_id} {dag.tasks[task_id]['title']}")
+        elif args.command == 'check':
+            cycles = dag.find_cycles()
+            for cycle in cycles:
+                print(f"  🔁 Cycle: {' → '.join(cycle)}")
+            fixed = recount(conn)
+            conn.commit()
+            print(f"✅ {len(cycles)} cycles, {fixed} counters repaired")
+        elif args.command == 'critical-path':
+            path, hours = dag.critical_path(set(args.task_id) or None)
+            print(f"🛤️  Critical path: {hours:.1f}h")
+            for task_id in path:
+                print(f"  {task_id} {dag.tasks.get(task_id, {}).get('title') or ''}")
+        else:
+            parser.print_help()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
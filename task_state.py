@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+AI Team Task State Machine
+One transition table for every task status change. A transition declares the
+statuses it may leave, its target, the extra task columns it writes, its effect
+on agent rows, the task_history action and the notification event. Each one
+executes as a fixed set of statements (same SQL text every time, so sqlite's
+statement cache keeps them prepared) - task row, agent rows and history in one
+transaction. apply_many() runs any number of transitions under a single
+BEGIN IMMEDIATE / COMMIT; sprint-status sync and notifications go out after
+the commit.
+"""
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+os.environ['TZ'] = 'Asia/Bangkok'
+try:
+    time.tzset()
+except AttributeError:
+    pass
+
+DB_PATH = Path(__file__).parent / "team.db"
+NOW = "datetime('now', 'localtime')"
+
+# Every status a task can be worked from (done / cancelled are final)
+ACTIVE = ('backlog', 'todo', 'in_progress', 'review', 'reviewing', 'blocked', 'info_needed')
+
+CLEAR_BLOCK = ("blocked_reason = NULL", "blocked_at = NULL")
+FEEDBACK = ("review_feedback = :reason", f"review_feedback_at = {NOW}")
+BACK_TO_TODO = ("started_at = NULL", f"todo_at = {NOW}") + CLEAR_BLOCK
+CLEAR_STAGES = ("completed_at = NULL", "review_at = NULL", "reviewing_at = NULL", "done_at = NULL")
+DURATION = "ROUND((strftime('%s', 'now') - strftime('%s', started_at)) / 60)"
+
+# Agent-row effects; parameters as in TaskStateMachine._run
+AGENT_EFFECTS = {
+    # Agents working this task go idle; so does the task's agent unless it already moved on
+    'release': (f'''
+        UPDATE agents SET status = 'idle', current_task_id = NULL, updated_at = {NOW}
+        WHERE current_task_id = :task_id OR (id = :agent AND current_task_id IS NULL)
+    ''',),
+    # The reviewer, or any QA agent still bound to the task when none is named
+    'release_reviewer': (f'''
+        UPDATE agents SET status = 'idle', current_task_id = NULL, updated_at = {NOW}
+        WHERE id = :reviewer
+           OR (:reviewer IS NULL AND current_task_id = :task_id AND lower(role) LIKE '%qa%')
+    ''',),
+    'block': (f"UPDATE agents SET status = 'blocked', updated_at = {NOW} WHERE id = :agent",),
+    'bind': (f'''
+        UPDATE agents SET total_tasks_assigned = total_tasks_assigned + 1,
+                          current_task_id = :task_id, updated_at = {NOW}
+        WHERE id = :agent
+    ''',),
+    'activate': (f'''
+        UPDATE agents SET status = 'active', current_task_id = :task_id,
+                          last_heartbeat = {NOW}, updated_at = {NOW}
+        WHERE id = :agent
+    ''',),
+    'credit': (f'''
+        UPDATE agents SET total_tasks_completed = total_tasks_completed + 1, updated_at = {NOW}
+        WHERE id = :agent
+    ''',),
+    # Seed working memory so the review gate does not fail on the first cycle
+    'working_memory': (f'''
+        UPDATE agent_working_memory
+        SET current_task_id = :task_id,
+            working_notes = CASE
+                WHEN working_notes IS NULL OR trim(working_notes) = '' THEN 'Auto-init: task started'
+                ELSE working_notes
+            END,
+            blockers = COALESCE(blockers, ''),
+            next_steps = CASE
+                WHEN next_steps IS NULL OR trim(next_steps) = '' THEN 'Begin work and post first progress update'
+                ELSE next_steps
+            END,
+            last_updated = {NOW}
+        WHERE agent_id = :agent
+    ''', f'''
+        INSERT INTO agent_working_memory
+        (agent_id, current_task_id, working_notes, blockers, next_steps, last_updated)
+        SELECT :agent, :task_id, 'Auto-init: task started', '', 'Begin work and post first progress update', {NOW}
+        WHERE :agent IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM agent_working_memory WHERE agent_id = :agent)
+    '''),
+}
+
+
+@dataclass(frozen=True)
+class Transition:
+    target: str
+    history: str                                # task_history.action
+    sources: Optional[Tuple[str, ...]] = ACTIVE  # None = from any status
+    sets: Tuple[str, ...] = ()                  # extra SET clauses (named parameters)
+    agent: Tuple[str, ...] = ()                 # AGENT_EFFECTS keys
+    event: Optional[str] = None                 # NotificationEvent value
+    scope: str = 'global'                       # notification settings entity ('agent' = per agent)
+
+
+TRANSITIONS: Dict[str, Transition] = {
+    'assign': Transition('todo', 'assigned', sets=("assignee_id = :agent",) + BACK_TO_TODO,
+                         agent=('bind',), event='assign', scope='agent'),
+    'start': Transition('in_progress', 'started', ('backlog', 'todo', 'in_progress', 'info_needed'),
+                        sets=(f"started_at = {NOW}", f"in_progress_at = {NOW}") + CLEAR_BLOCK,
+                        agent=('activate', 'working_memory'), event='start'),
+    'review': Transition('review', 'updated', ('in_progress',),
+                         sets=CLEAR_BLOCK + (f"review_at = {NOW}",), event='review'),
+    'complete': Transition('review', 'completed', ('in_progress',),
+                           sets=CLEAR_BLOCK + ("progress = MAX(COALESCE(progress, 0), 95)",
+                                               f"completed_at = {NOW}", f"review_at = {NOW}",
+                                               f"actual_duration_minutes = {DURATION}"),
+                           agent=('release',), event='review'),
+    'start_review': Transition('reviewing', 'updated', ('review',),
+                               sets=CLEAR_BLOCK + (f"reviewing_at = {NOW}",)),
+    'wait_review': Transition('review', 'updated', ('reviewing',), sets=CLEAR_BLOCK),
+    'approve': Transition('done', 'approved', ('review', 'reviewing'),
+                          sets=CLEAR_BLOCK + ("progress = 100", f"completed_at = {NOW}", f"done_at = {NOW}",
+                                              "review_feedback = NULL", "review_feedback_at = NULL",
+                                              f"actual_duration_minutes = COALESCE(actual_duration_minutes, {DURATION})"),
+                          agent=('credit', 'release_reviewer'), event='complete'),
+    'reject_review': Transition('todo', 'rejected', ('review', 'reviewing'),
+                                sets=BACK_TO_TODO + FEEDBACK + ("priority = 'high'", "progress = 0",
+                                                                "fix_loop_count = :fix_loops"),
+                                agent=('release', 'release_reviewer'), event='block'),
+    # Automatic review failure: one fix loop, agent left alone
+    'fix_loop': Transition('todo', 'updated', ('review', 'reviewing'),
+                           sets=BACK_TO_TODO + FEEDBACK + ("fix_loop_count = COALESCE(fix_loop_count, 0) + 1",)),
+    'auto_stop': Transition('blocked', 'auto_stopped', ('todo', 'in_progress', 'review', 'reviewing'),
+                            sets=("blocked_reason = :reason", f"blocked_at = {NOW}",
+                                  "fix_loop_count = COALESCE(:fix_loops, fix_loop_count)"),
+                            agent=('release',), event='auto_stop'),
+    # Validation failure: back to todo (high priority), progress kept
+    'reject': Transition('todo', 'rejected', sets=BACK_TO_TODO + CLEAR_STAGES + FEEDBACK + ("priority = 'high'",),
+                         agent=('release',)),
+    'requeue': Transition('todo', 'rejected',
+                          sets=BACK_TO_TODO + CLEAR_STAGES + FEEDBACK + ("priority = 'high'", "progress = 0",
+                                                                         "in_progress_at = NULL"),
+                          agent=('release',)),
+    'reopen': Transition('todo', 'updated', ('done',),
+                         sets=BACK_TO_TODO + CLEAR_STAGES + FEEDBACK + ("priority = 'high'", "progress = 0",
+                                                                        "in_progress_at = NULL"),
+                         agent=('release',), event='block'),
+    # Transient/system issue: back to todo without counting a fix loop
+    'soft_return': Transition('todo', 'updated', sets=BACK_TO_TODO + FEEDBACK, agent=('release',)),
+    'reset_stale': Transition('todo', 'updated', ('in_progress',), sets=BACK_TO_TODO, agent=('release',)),
+    'info_needed': Transition('info_needed', 'updated',
+                              sets=("blocked_reason = :reason", f"blocked_at = {NOW}",
+                                    "review_feedback = COALESCE(:feedback, review_feedback)",
+                                    f"review_feedback_at = CASE WHEN :feedback IS NULL THEN review_feedback_at ELSE {NOW} END"),
+                              agent=('release',), event='block'),
+    'block': Transition('blocked', 'blocked', sets=("blocked_reason = :reason", f"blocked_at = {NOW}"),
+                        agent=('block',), event='block'),
+    # Task blocked, agent freed for other work
+    'block_release': Transition('blocked', 'blocked', sets=("blocked_reason = :reason", f"blocked_at = {NOW}"),
+                                agent=('release',), event='block'),
+    'unblock': Transition('in_progress', 'unblocked', ('blocked',),
+                          sets=CLEAR_BLOCK + (f"started_at = {NOW}", f"in_progress_at = {NOW}", "fix_loop_count = 0"),
+                          agent=('activate',), event='unblock'),
+    'backlog': Transition('backlog', 'backlogged',
+                          sets=("blocked_reason = :reason", "started_at = NULL", f"backlog_at = {NOW}"),
+                          event='backlog'),
+}
+
+# Named parameters every statement may reference
+PARAMS = ('task_id', 'old_status', 'agent', 'reviewer', 'actor', 'reason', 'notes', 'feedback', 'fix_loops')
+
+
+def _compile(t: Transition) -> Tuple[str, ...]:
+    sets = ", ".join((f"status = '{t.target}'",) + t.sets + (f"updated_at = {NOW}",))
+    statements = [f"UPDATE tasks SET {sets} WHERE id = :task_id AND status IS :old_status"]
+    for effect in t.agent:
+        statements += AGENT_EFFECTS[effect]
+    statements.append(f'''
+        INSERT INTO task_history (task_id, agent_id, action, old_status, new_status, notes)
+        VALUES (:task_id, :actor, '{t.history}', :old_status, '{t.target}', :notes)
+    ''')
+    return tuple(statements)
+
+
+STATEMENTS = {name: _compile(t) for name, t in TRANSITIONS.items()}
+
+
+class TaskStateMachine:
+    """Applies TRANSITIONS atomically; optional notifier for their events"""
+
+    def __init__(self, conn: sqlite3.Connection, notifier=None):
+        self.conn = conn
+        self.notifier = notifier
+
+    @staticmethod
+    def allowed(status: str, name: str) -> bool:
+        sources = TRANSITIONS[name].sources
+        return sources is None or status in sources
+
+    def _run(self, task_id: str, names: Union[str, Sequence[str]], params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Execute the first of `names` allowed from the task's current status (in
+        the open transaction). None if the task is missing or none applies.
+        """
+        names = (names,) if isinstance(names, str) else tuple(names)
+        unknown = [n for n in names if n not in TRANSITIONS]
+        if unknown:
+            raise ValueError(f"Unknown transition: {', '.join(unknown)}")
+        row = self.conn.execute("SELECT title, status, assignee_id FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        title, status, assignee = row[0], row[1], row[2]
+        name = next((n for n in names if self.allowed(status, n)), None)
+        if name is None:
+            return None
+        params = params or {}
+        values = {key: params.get(key) for key in PARAMS}
+        values.update(task_id=task_id, old_status=status, agent=params.get('agent') or assignee)
+        if values['notes'] is None:
+            values['notes'] = values['reason']
+        for sql in STATEMENTS[name]:
+            self.conn.execute(sql, values)
+        return {
+            'task_id': task_id,
+            'transition': name,
+            'title': title,
+            'old_status': status,
+            'new_status': TRANSITIONS[name].target,
+            'agent': values['agent'],
+            'notice': params.get('notice') or values['reason'],
+            'fix_loops': values['fix_loops'],
+        }
+
+    def apply(self, task_id: str, name: Union[str, Sequence[str]], commit: bool = True, **params) -> Optional[Dict]:
+        """One transition (see apply_many). Returns its result, or None if not applicable."""
+        results = self.apply_many([(task_id, name, params)], commit=commit)
+        return results[0] if results else None
+
+    def apply_many(self, moves: Iterable[Tuple], commit: bool = True) -> List[Dict]:
+        """
+        Apply (task_id, transition[, params]) moves in order. With commit=True they
+        run in one BEGIN IMMEDIATE transaction (joining writes already pending on
+        the connection), are committed together and their events emitted; with
+        commit=False they join the caller's transaction and the caller commits
+        and calls emit(). Moves that do not apply are skipped.
+        """
+        if commit and not self.conn.in_transaction:
+            self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            results = []
+            for move in moves:
+                result = self._run(*move)
+                if result:
+                    results.append(result)
+            if commit:
+                self.conn.commit()
+        except Exception:
+            if commit:
+                self.conn.rollback()
+            raise
+        if commit:
+            self.emit(results)
+        return results
+
+    def emit(self, results: List[Dict]):
+        """Post-commit events: batched sprint-status sync, then notifications"""
+        by_status: Dict[str, List[str]] = {}
+        for r in results:
+            by_status.setdefault(r['new_status'], []).append(r['task_id'])
+        try:
+            from sprint_status_sync import update_story_statuses
+            for status, task_ids in by_status.items():
+                update_story_statuses(task_ids, status)
+        except Exception:
+            pass
+
+        if not self.notifier:
+            return
+        from notifications import NotificationEvent
+        for r in results:
+            t = TRANSITIONS[r['transition']]
+            if not t.event:
+                continue
+            extra = {'fix_loops': r['fix_loops']} if r['fix_loops'] is not None else {}
+            if t.scope == 'agent' and r['agent']:
+                extra.update(entity_type='agent', entity_id=r['agent'])
+            self.notifier.notify(
+                event=NotificationEvent(t.event),
+                task_id=r['task_id'],
+                task_title=r['title'],
+                agent_id=r['agent'],
+                agent_name=r['agent'],
+                reason=r['notice'],
+                **extra
+            )
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='AI Team Task State Machine')
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('table', help='Show the transition table')
+    apply = sub.add_parser('apply', help='Apply a transition to one or more tasks (one commit)')
+    apply.add_argument('transition', choices=sorted(TRANSITIONS))
+    apply.add_argument('task_ids', nargs='+')
+    apply.add_argument('--reason', default=None)
+    apply.add_argument('--agent', default=None)
+    apply.add_argument('--actor', default='system')
+    args = parser.parse_args()
+
+    if args.command == 'table':
+        for name, t in TRANSITIONS.items():
+            sources = '|'.join(t.sources) if t.sources else '*'
+            effects = ', '.join(t.agent) or '-'
+            print(f"  {name:<14} {sources:<56} -> {t.target:<12} agents: {effects:<30} history: {t.history}")
+        return
+
+    if args.command == 'apply':
+        conn = sqlite3.connect(str(DB_PATH), timeout=10)
+        try:
+            params = {'reason': args.reason, 'agent': args.agent, 'actor': args.actor}
+            results = TaskStateMachine(conn).apply_many([(task_id, args.transition, params) for task_id in args.task_ids])
+        finally:
+            conn.close()
+        applied = {r['task_id'] for r in results}
+        for r in results:
+            print(f"✅ {r['task_id']}: {r['old_status']} -> {r['new_status']}")
+        for task_id in args.task_ids:
+            if task_id not in applied:
+                print(f"⚠️ {task_id}: {args.transition} not allowed (or task not found)")
+        return
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
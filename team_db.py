@@ -5,8 +5,8 @@ Manage tasks, agents, and projects for the AI Team
 """
 
 import os
-import re
 import sqlite3
+import csv
 import json
 import argparse
 import subprocess
@@ -17,7 +17,20 @@ from typing import Optional, List, Dict
 
 # Import health monitor and notifications
 from health_monitor import HealthMonitor
+from health_rules import FIX_LOOP_LIMIT
+from heartbeat_collector import send_to_collector
+from history_archive import HistoryArchive
+from checklist_store import ChecklistStore
+from id_sequence import IdSequence
+from learnings_store import LearningStore
+from liveness_store import LivenessStore, merge_beats
+from mission_tracker import MissionTracker
 from notifications import NotificationManager, NotificationEvent, send_telegram_notification
+from prompt_builder import load_task_template
+from search_index import SOURCES as SEARCH_KINDS, SearchIndex
+from sprint_status_sync import ensure_story_column, extract_story_id
+from task_dag import TaskDAG
+from task_state import TaskStateMachine
 import time
 
 # Set timezone to Bangkok (+7)
@@ -36,6 +49,9 @@ class AITeamDB:
         self.conn = sqlite3.connect(str(db_path))
         self.conn.row_factory = sqlite3.Row
         self.notifier = NotificationManager(db_path, TELEGRAM_CHANNEL)
+        self.checklists = ChecklistStore(self.conn)
+        self.states = TaskStateMachine(self.conn, self.notifier)
+        ensure_story_column(self.conn)
         
     def close(self):
         self.notifier.close()
@@ -44,266 +60,34 @@ class AITeamDB:
     def __enter__(self):
         return self
 
-    # ========== Checklist Helpers ==========
-    @staticmethod
-    def _parse_checklist(text: str) -> List[Dict]:
-        items = []
-        if not text:
-            return items
-        for idx, line in enumerate(text.splitlines()):
-            m = re.match(r'^\s*[-*]\s+\[(x| )\]\s+(.*)$', line, re.IGNORECASE)
-            if not m:
-                continue
-            items.append({
-                'index': len(items) + 1,
-                'checked': m.group(1).lower() == 'x',
-                'text': m.group(2).strip(),
-                'line_idx': idx,
-                'line': line
-            })
-        return items
-
-    @staticmethod
-    def _is_human_only_check_item(label: str) -> bool:
-        """Marker for prerequisites that only a human can satisfy/check."""
-        if not label:
-            return False
-        s = label.lower()
-        return ("@human" in s) or ("human-only" in s) or ("🔒" in label) or s.startswith("human:")
-
-    @classmethod
-    def _checklist_unchecked(cls, text: str) -> List[str]:
-        return [i['text'] for i in cls._parse_checklist(text) if not i['checked']]
-
-    @classmethod
-    def _update_checklist(cls, text: str, index: int, checked: bool) -> str:
-        if not text:
-            raise ValueError("Checklist text is empty")
-        lines = text.splitlines()
-        items = cls._parse_checklist(text)
-        if index < 1 or index > len(items):
-            raise ValueError(f"Checklist index out of range: {index}")
-        item = items[index - 1]
-        new_box = "[x]" if checked else "[ ]"
-        lines[item['line_idx']] = re.sub(r'\[[xX ]\]', new_box, item['line'], count=1)
-        return "\n".join(lines)
-
     def _block_task_only(self, task_id: str, reason: str) -> bool:
         """Block task without blocking agent (for true blocked situations)."""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT title, status, assignee_id FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        task_title = row[0]
-        old_status = row[1]
-        assignee = row[2]
+        return self.states.apply(task_id, 'block_release', reason=reason) is not None
 
-        cursor.execute('''
-            UPDATE tasks
-            SET status = 'blocked',
-                blocked_reason = ?,
-                blocked_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'blocked', ?, 'blocked', ?)
-        ''', (task_id, old_status, reason))
-
-        # Ensure agent not stuck on this task
-        if assignee:
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (assignee,))
-
-        self.conn.commit()
-
-        self.notifier.notify(
-            event=NotificationEvent.BLOCK,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee,
-            reason=reason
-        )
-
-        return cursor.rowcount > 0
-
-    def _reject_to_todo(self, task_id: str, reason: str, old_status: str = None, assignee: str = None) -> bool:
+    def _reject_to_todo(self, task_id: str, reason: str, assignee: str = None) -> bool:
         """
         Reject task back to todo without using blocked status.
         Use for validation failures (e.g. unchecked prerequisites).
         """
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT status, assignee_id FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        prev_status = old_status or row[0] or 'todo'
-        task_assignee = assignee or row[1]
-
-        cursor.execute('''
-            UPDATE tasks
-            SET status = 'todo',
-                priority = 'high',
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                started_at = NULL,
-                completed_at = NULL,
-                review_at = NULL,
-                reviewing_at = NULL,
-                done_at = NULL,
-                review_feedback = ?,
-                review_feedback_at = datetime('now', 'localtime'),
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-
-        if task_assignee:
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle',
-                    current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (task_assignee,))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'rejected', ?, 'todo', ?)
-        ''', (task_id, prev_status, reason))
-
-        self.conn.commit()
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'todo')
-        except Exception:
-            pass
-        return True
+        return self.states.apply(task_id, 'reject', reason=reason, agent=assignee) is not None
 
     def requeue_to_todo(self, task_id: str, reason: str, actor: str = "system") -> bool:
         """Return task to todo with detailed reason (no blocked)."""
         if not reason:
             reason = "No reason provided"
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT status, assignee_id FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        old_status = row[0] or "todo"
-        assignee = row[1]
-
-        cursor.execute('''
-            UPDATE tasks
-            SET status = 'todo',
-                priority = 'high',
-                progress = 0,
-                started_at = NULL,
-                in_progress_at = NULL,
-                completed_at = NULL,
-                review_at = NULL,
-                reviewing_at = NULL,
-                done_at = NULL,
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                review_feedback = ?,
-                review_feedback_at = datetime('now', 'localtime'),
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-
-        # Release any agent bound to this task
-        cursor.execute('''
-            UPDATE agents
-            SET status = 'idle',
-                current_task_id = NULL,
-                updated_at = datetime('now', 'localtime')
-            WHERE current_task_id = ?
-        ''', (task_id,))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'rejected', ?, 'todo', ?, ?)
-        ''', (task_id, old_status, actor, reason))
-
-        self.conn.commit()
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'todo')
-        except Exception:
-            pass
-        return True
+        return self.states.apply(task_id, 'requeue', reason=reason, actor=actor) is not None
 
     def reopen_task(self, task_id: str, reason: str, actor: str = "system") -> bool:
         """Reopen a done task back to todo (priority high)."""
         if not reason:
             reason = "Reopened for further work"
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT title, status, assignee_id FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
+        row = self.conn.execute('SELECT status FROM tasks WHERE id = ?', (task_id,)).fetchone()
         if not row:
             return False
-        task_title, status, assignee = row[0], row[1] or 'todo', row[2]
-        if status != 'done':
-            raise ValueError(f"Task {task_id} is not done (current: {status})")
-
-        cursor.execute('''
-            UPDATE tasks
-            SET status = 'todo',
-                priority = 'high',
-                progress = 0,
-                started_at = NULL,
-                in_progress_at = NULL,
-                completed_at = NULL,
-                review_at = NULL,
-                reviewing_at = NULL,
-                done_at = NULL,
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                review_feedback = ?,
-                review_feedback_at = datetime('now', 'localtime'),
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-
-        cursor.execute('''
-            UPDATE agents
-            SET status = 'idle',
-                current_task_id = NULL,
-                updated_at = datetime('now', 'localtime')
-            WHERE current_task_id = ?
-        ''', (task_id,))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'updated', 'done', 'todo', ?, ?)
-        ''', (task_id, actor, reason))
-
-        self.conn.commit()
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'todo')
-        except Exception:
-            pass
-
-        self.notifier.notify(
-            event=NotificationEvent.BLOCK,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee,
-            reason=f"Reopened -> todo. {reason}"
-        )
-        return True
+        if row[0] != 'done':
+            raise ValueError(f"Task {task_id} is not done (current: {row[0] or 'todo'})")
+        return self.states.apply(task_id, 'reopen', reason=reason, actor=actor,
+                                 notice=f"Reopened -> todo. {reason}") is not None
 
     def checklist_update(self, task_id: str, field: str, index: int, checked: bool = True, actor: str = "agent") -> bool:
         """Update checklist item in prerequisites/acceptance_criteria."""
@@ -315,18 +99,11 @@ class AITeamDB:
             return False
         text, status, blocked_reason = row
         if field == 'prerequisites' and checked:
-            items = self._parse_checklist(text or '')
+            items = self.checklists.items(task_id, column)
             if 1 <= index <= len(items):
-                label = items[index - 1].get('text') or ''
-                if self._is_human_only_check_item(label) and (actor or '').lower() != 'human':
+                if items[index - 1]['human_only'] and (actor or '').lower() != 'human':
                     raise ValueError("This prerequisite is HUMAN-only. Use --actor human to check it.")
-        updated = self._update_checklist(text or '', index, checked)
-        cursor.execute(f'''
-            UPDATE tasks
-            SET {column} = ?,
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (updated, task_id))
+        self.checklists.set_checked(task_id, column, index, checked)
 
         cursor.execute('''
             INSERT INTO task_history (task_id, action, notes)
@@ -335,7 +112,7 @@ class AITeamDB:
 
         # Auto-unblock if prerequisites now fully checked
         if field == 'prerequisites' and status == 'blocked' and blocked_reason:
-            unchecked = self._checklist_unchecked(updated)
+            _, unchecked = self.checklists.gate(task_id, 'prerequisites')
             if not unchecked:
                 cursor.execute('''
                     UPDATE tasks
@@ -358,13 +135,12 @@ class AITeamDB:
 
     # ========== Tasks ==========
     
-    def create_task(self, title: str, description: str = "", 
-                    assignee_id: str = None, project_id: str = None,
-                    priority: str = "normal", estimated_hours: float = None,
-                    due_date: str = None, prerequisites: str = None,
-                    acceptance_criteria: str = None, expected_outcome: str = None,
-                    working_dir: str = None) -> str:
-        """Create a new task"""
+    TASK_PRIORITIES = ('critical', 'high', 'normal', 'low')
+
+    @staticmethod
+    def _validate_new_task(project_id: str, working_dir: str, expected_outcome: str,
+                           prerequisites: str, acceptance_criteria: str):
+        """Task quality rules shared by create_task and create_tasks_bulk (raises ValueError)"""
         # MANDATORY: Every task must have a project
         if not project_id:
             raise ValueError("project_id is required - every task must belong to a project")
@@ -384,25 +160,41 @@ class AITeamDB:
             raise ValueError("prerequisites is REQUIRED - list what must be ready first")
         if not acceptance_criteria:
             raise ValueError("acceptance_criteria is REQUIRED - define how to verify completion")
+
+    def create_task(self, title: str, description: str = "", 
+                    assignee_id: str = None, project_id: str = None,
+                    priority: str = "normal", estimated_hours: float = None,
+                    due_date: str = None, prerequisites: str = None,
+                    acceptance_criteria: str = None, expected_outcome: str = None,
+                    working_dir: str = None, mission_id: str = None) -> str:
+        """Create a new task (optionally as part of an orchestrator mission)"""
+        self._validate_new_task(project_id, working_dir, expected_outcome,
+                                prerequisites, acceptance_criteria)
+        tracker = MissionTracker(self.conn) if mission_id else None
+        if tracker and tracker.unknown_missions([mission_id]):
+            raise ValueError(f"Mission {mission_id} not found")
         
-        task_id = f"T-{datetime.now().strftime('%Y%m%d')}-{self._get_next_task_number():03d}"
+        task_id = IdSequence(self.conn).next_id('T')
         
         cursor = self.conn.cursor()
         cursor.execute('''
             INSERT INTO tasks (id, title, description, assignee_id, project_id,
                              priority, estimated_hours, due_date, status,
                              prerequisites, acceptance_criteria, expected_outcome, working_dir,
-                             created_at, todo_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'todo', ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'))
+                             story_id, created_at, todo_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'todo', ?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'))
         ''', (task_id, title, description, assignee_id, project_id,
               priority, estimated_hours, due_date, prerequisites,
-              acceptance_criteria, expected_outcome, working_dir))
+              acceptance_criteria, expected_outcome, working_dir,
+              extract_story_id(title, description) or ''))
         
         # Log the creation
         cursor.execute('''
             INSERT INTO task_history (task_id, action, notes)
             VALUES (?, 'created', ?)
         ''', (task_id, f"Task created with priority {priority}"))
+        if tracker:
+            tracker.link(mission_id, [task_id], commit=False)
         
         self.conn.commit()
 
@@ -422,6 +214,103 @@ class AITeamDB:
         )
         
         return task_id
+
+    BULK_TASK_FIELDS = ('title', 'description', 'assignee_id', 'project_id', 'priority',
+                        'estimated_hours', 'due_date', 'prerequisites', 'acceptance_criteria',
+                        'expected_outcome', 'working_dir', 'mission_id')
+
+    def validate_bulk_tasks(self, tasks: List[Dict]) -> List[Dict]:
+        """Normalize and validate rows for create_tasks_bulk; raises ValueError listing every bad row"""
+        rows, errors = [], []
+        for i, task in enumerate(tasks, 1):
+            unknown = set(task) - set(self.BULK_TASK_FIELDS)
+            values = {f: task.get(f) for f in self.BULK_TASK_FIELDS}
+            values['description'] = values['description'] or ''
+            values['priority'] = values['priority'] or 'normal'
+            try:
+                if unknown:
+                    raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+                if not values['title']:
+                    raise ValueError("title is required")
+                if values['priority'] not in self.TASK_PRIORITIES:
+                    raise ValueError(f"priority must be one of {', '.join(self.TASK_PRIORITIES)}")
+                self._validate_new_task(values['project_id'], values['working_dir'], values['expected_outcome'],
+                                        values['prerequisites'], values['acceptance_criteria'])
+            except ValueError as e:
+                errors.append(f"#{i} {values['title'] or ''}: {e}")
+                continue
+            rows.append(values)
+        assignees = {r['assignee_id'] for r in rows if r['assignee_id']}
+        if assignees:
+            known = {row[0] for row in self.conn.execute(
+                f"SELECT id FROM agents WHERE id IN ({','.join('?' * len(assignees))})", list(assignees))}
+            for r in rows:
+                if r['assignee_id'] and r['assignee_id'] not in known:
+                    errors.append(f"{r['title']}: unknown assignee {r['assignee_id']}")
+        missions = {r['mission_id'] for r in rows if r['mission_id']}
+        if missions:
+            for mission_id in MissionTracker(self.conn).unknown_missions(missions):
+                errors.append(f"unknown mission {mission_id}")
+        if errors:
+            raise ValueError("Invalid tasks:\n" + "\n".join(errors))
+        return rows
+
+    def create_tasks_bulk(self, tasks: List[Dict], notify: bool = True) -> List[str]:
+        """
+        Create many tasks at once: all rows are validated first (nothing is written
+        if any fails), IDs are one contiguous block reserved from id_sequences, rows
+        and history go in with executemany in one transaction, then one sprint sync
+        and one digest notification. Same fields and rules as create_task.
+        """
+        rows = self.validate_bulk_tasks(tasks)
+        if not rows:
+            return []
+
+        # One reservation for the whole block; inserts then commit together
+        task_ids = IdSequence(self.conn).next_ids('T', len(rows))
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO tasks (id, title, description, assignee_id, project_id,
+                                 priority, estimated_hours, due_date, status,
+                                 prerequisites, acceptance_criteria, expected_outcome, working_dir,
+                                 story_id, created_at, todo_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'todo', ?, ?, ?, ?, ?, datetime('now', 'localtime'), datetime('now', 'localtime'))
+            ''', [(task_id, r['title'], r['description'], r['assignee_id'], r['project_id'],
+                   r['priority'], r['estimated_hours'], r['due_date'], r['prerequisites'],
+                   r['acceptance_criteria'], r['expected_outcome'], r['working_dir'],
+                   extract_story_id(r['title'], r['description']) or '')
+                  for task_id, r in zip(task_ids, rows)])
+            cursor.executemany('''
+                INSERT INTO task_history (task_id, action, notes)
+                VALUES (?, 'created', ?)
+            ''', [(task_id, f"Task created with priority {r['priority']} (bulk)")
+                  for task_id, r in zip(task_ids, rows)])
+            by_mission: Dict[str, List[str]] = {}
+            for task_id, r in zip(task_ids, rows):
+                if r['mission_id']:
+                    by_mission.setdefault(r['mission_id'], []).append(task_id)
+            if by_mission:
+                tracker = MissionTracker(self.conn)
+                for mission_id, ids in by_mission.items():
+                    tracker.link(mission_id, ids, commit=False)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        try:
+            from sprint_status_sync import update_story_statuses
+            update_story_statuses(task_ids, 'todo')
+        except Exception:
+            pass
+
+        if notify:
+            self.notifier.notify_digest(NotificationEvent.CREATE, [
+                {'task_id': task_id, 'task_title': r['title'], 'assignee': r['assignee_id']}
+                for task_id, r in zip(task_ids, rows)
+            ])
+        return task_ids
     
     def assign_task(self, task_id: str, agent_id: str) -> bool:
         """Assign task to an agent"""
@@ -433,56 +322,19 @@ class AITeamDB:
         if not row:
             return False
         
-        task_title = row[0]
         prerequisites = row[2] or ''
 
         if prerequisites.strip():
-            items = self._parse_checklist(prerequisites)
-            if not items:
+            total, _ = self.checklists.gate(task_id, 'prerequisites')
+            if not total:
                 reason = "Prerequisites must be a checklist (- [ ] item)."
-                self._reject_to_todo(task_id, reason, old_status='todo', assignee=agent_id)
+                self._reject_to_todo(task_id, reason, assignee=agent_id)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
         
-        # Update task - reset started_at when reassigning so fresh start time on next start
-        cursor.execute('''
-            UPDATE tasks
-            SET assignee_id = ?, status = 'todo', started_at = NULL,
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (agent_id, task_id))
-        
-        # Update agent stats
-        cursor.execute('''
-            UPDATE agents SET total_tasks_assigned = total_tasks_assigned + 1,
-                            current_task_id = ?,
-                            updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id, agent_id))
-        
-        # Log history
-        cursor.execute('''
-            INSERT INTO task_history (task_id, agent_id, action, notes)
-            VALUES (?, ?, 'assigned', ?)
-        ''', (task_id, agent_id, f"Assigned to {agent_id}"))
-        
-        self.conn.commit()
-        
-        # Send Telegram notification (AC: Notification on task assigned)
-        self.notifier.notify(
-            event=NotificationEvent.ASSIGN,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=agent_id,
-            agent_name=agent_id,
-            entity_type='agent',
-            entity_id=agent_id
-        )
-        
-        return cursor.rowcount > 0
+        # Task back to todo (fresh start time on next start), agent bound; notifies per-agent
+        return self.states.apply(task_id, 'assign', agent=agent_id, actor=agent_id,
+                                 notes=f"Assigned to {agent_id}") is not None
     
     def start_task(self, task_id: str, agent_id: str = None) -> bool:
         """Start working on a task"""
@@ -494,81 +346,23 @@ class AITeamDB:
         if not row:
             return False
         
-        task_title = row[0]
-        assignee = agent_id or row[1] or "Unknown"
+        assignee = agent_id or row[1]
         old_status = row[2] or "todo"
         prerequisites = row[3] or ''
 
         if prerequisites.strip():
-            items = self._parse_checklist(prerequisites)
-            if not items:
+            total, _ = self.checklists.gate(task_id, 'prerequisites')
+            if not total:
                 reason = "Prerequisites must be a checklist (- [ ] item)."
-                self._reject_to_todo(task_id, reason, old_status=old_status, assignee=assignee)
+                self._reject_to_todo(task_id, reason, assignee=assignee)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
         
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'in_progress', started_at = datetime('now', 'localtime'),
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                in_progress_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id,))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status)
-            VALUES (?, 'started', ?, 'in_progress')
-        ''', (task_id, old_status))
-
-        # Update agent status to active when task officially starts
-        if assignee and assignee != "Unknown":
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'active',
-                    current_task_id = ?,
-                    last_heartbeat = datetime('now', 'localtime'),
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (task_id, assignee))
-
-        # Auto-bootstrap working memory so review gate does not fail on first cycle.
-        if assignee and assignee != "Unknown":
-            cursor.execute('''
-                UPDATE agent_working_memory
-                SET current_task_id = ?,
-                    working_notes = CASE
-                        WHEN working_notes IS NULL OR trim(working_notes) = '' THEN 'Auto-init: task started'
-                        ELSE working_notes
-                    END,
-                    blockers = COALESCE(blockers, ''),
-                    next_steps = CASE
-                        WHEN next_steps IS NULL OR trim(next_steps) = '' THEN 'Begin work and post first progress update'
-                        ELSE next_steps
-                    END,
-                    last_updated = datetime('now', 'localtime')
-                WHERE agent_id = ?
-            ''', (task_id, assignee))
-            if cursor.rowcount == 0:
-                cursor.execute('''
-                    INSERT INTO agent_working_memory
-                    (agent_id, current_task_id, working_notes, blockers, next_steps, last_updated)
-                    VALUES (?, ?, 'Auto-init: task started', '', 'Begin work and post first progress update', datetime('now', 'localtime'))
-                ''', (assignee, task_id))
-        
-        self.conn.commit()
-        
-        # Send Telegram notification using NotificationManager
-        self.notifier.notify(
-            event=NotificationEvent.START,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee
-        )
-        
-        return cursor.rowcount > 0
+        # Task in_progress, agent active, working memory seeded so the review gate passes the first cycle
+        if self.states.apply(task_id, 'start', agent=assignee) is None:
+            print(f"⚠️ Task {task_id} cannot be started from {old_status}")
+            return False
+        return True
     
     def send_to_review(self, task_id: str) -> bool:
         """Send task to review (in_progress -> review)"""
@@ -587,50 +381,19 @@ class AITeamDB:
         
         prerequisites = row[2] or ''
         if prerequisites.strip():
-            items = self._parse_checklist(prerequisites)
-            if not items:
+            total, unchecked = self.checklists.gate(task_id, 'prerequisites')
+            if not total:
                 reason = "Prerequisites must be a checklist (- [ ] item)."
-                self._reject_to_todo(task_id, reason, old_status=old_status)
+                self._reject_to_todo(task_id, reason)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
-            unchecked = [i['text'] for i in items if not i['checked']]
             if unchecked:
                 reason = "Cannot send to review: prerequisites not checked -> " + "; ".join(unchecked)
-                self._reject_to_todo(task_id, reason, old_status=old_status)
+                self._reject_to_todo(task_id, reason)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
         
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'review',
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                review_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id,))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status)
-            VALUES (?, 'updated', 'in_progress', 'review')
-        ''', (task_id,))
-        
-        self.conn.commit()
-
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'review')
-        except Exception:
-            pass
-        
-        # Send Telegram notification using NotificationManager
-        self.notifier.notify(
-            event=NotificationEvent.REVIEW,
-            task_id=task_id,
-            task_title=row[0]
-        )
-        
-        return cursor.rowcount > 0
+        return self.states.apply(task_id, 'review') is not None
     
     def update_progress(self, task_id: str, progress: int, notes: str = "") -> bool:
         """Update task progress (0-100) - sends notification at milestone intervals"""
@@ -689,7 +452,6 @@ class AITeamDB:
         if not row:
             return False
         
-        task_title = row[0]
         assignee = row[2]
         current_status = row[3]
         prerequisites = row[4] or ''
@@ -705,105 +467,58 @@ class AITeamDB:
 
         if not row[1]:
             reason = "Cannot complete task: missing started_at (task was never started)"
-            self._reject_to_todo(task_id, reason, old_status=current_status, assignee=assignee)
+            self._reject_to_todo(task_id, reason, assignee=assignee)
             print(f"⚠️ Task {task_id} rejected: {reason}")
             return False
 
         if prerequisites.strip():
-            items = self._parse_checklist(prerequisites)
-            if not items:
+            total, unchecked = self.checklists.gate(task_id, 'prerequisites')
+            if not total:
                 reason = "Prerequisites must be a checklist (- [ ] item)."
-                self._reject_to_todo(task_id, reason, old_status=current_status, assignee=assignee)
+                self._reject_to_todo(task_id, reason, assignee=assignee)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
-            unchecked = [i['text'] for i in items if not i['checked']]
             if unchecked:
                 reason = "Cannot complete task: prerequisites not checked -> " + "; ".join(unchecked)
-                self._reject_to_todo(task_id, reason, old_status=current_status, assignee=assignee)
+                self._reject_to_todo(task_id, reason, assignee=assignee)
                 print(f"⚠️ Task {task_id} rejected: {reason}")
                 return False
         
-        # Calculate actual duration if started_at exists
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'review', progress = 95, 
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                actual_duration_minutes = ROUND((strftime('%s', 'now') - strftime('%s', started_at)) / 60),
-                review_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id,))
-        
-        # Release agent (they're done, waiting for review)
-        cursor.execute('''
-            UPDATE agents 
-            SET current_task_id = NULL, status = 'idle',
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (assignee,))
-        
-        # Update agent stats
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status)
-            VALUES (?, 'completed', ?, 'review')
-        ''', (task_id, current_status))
-        
-        self.conn.commit()
-
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'review')
-        except Exception:
-            pass
-        
-        # Send Telegram notification - task ready for review
-        self.notifier.notify(
-            event=NotificationEvent.REVIEW,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee
-        )
-        
-        return cursor.rowcount > 0
+        # To review with the duration recorded; agent released while it waits for a reviewer
+        return self.states.apply(task_id, 'complete', agent=assignee) is not None
     
     def approve_review(self, task_id: str, reviewer_id: str = None) -> bool:
         """Approve reviewed task - moves from review to done"""
         cursor = self.conn.cursor()
         
         # Get task info
-        cursor.execute('SELECT title, status, assignee_id, started_at, acceptance_criteria, prerequisites FROM tasks WHERE id = ?', (task_id,))
+        cursor.execute('SELECT status, assignee_id, acceptance_criteria, prerequisites FROM tasks WHERE id = ?', (task_id,))
         row = cursor.fetchone()
         if not row:
             return False
         
-        if row[1] not in ('review', 'reviewing'):
+        if row[0] not in ('review', 'reviewing'):
             print(f"⚠️ Task {task_id} must be in review status to approve")
             return False
         
-        task_title = row[0]
-        original_assignee = row[2]
-        started_at = row[3]
-        acceptance = row[4] or ''
-        prerequisites = row[5] or ''
+        original_assignee = row[1]
+        acceptance = row[2] or ''
+        prerequisites = row[3] or ''
 
         if prerequisites.strip():
-            items = self._parse_checklist(prerequisites)
-            if not items:
+            total, unchecked_prereq = self.checklists.gate(task_id, 'prerequisites')
+            if not total:
                 print(f"⚠️ Cannot approve {task_id}: Prerequisites must be a checklist (- [ ] item).")
                 return False
-            unchecked_prereq = [i['text'] for i in items if not i['checked']]
             if unchecked_prereq:
                 print(f"⚠️ Cannot approve {task_id}: Prerequisites unchecked -> {', '.join(unchecked_prereq)}")
                 return False
 
         if acceptance.strip():
-            items = self._parse_checklist(acceptance)
-            if not items:
+            total, unchecked = self.checklists.gate(task_id, 'acceptance_criteria')
+            if not total:
                 print(f"⚠️ Cannot approve {task_id}: Acceptance Criteria must be a checklist (- [ ] item).")
                 return False
-            unchecked = [i['text'] for i in items if not i['checked']]
             if unchecked:
                 print(f"⚠️ Cannot approve {task_id}: Acceptance Criteria unchecked -> {', '.join(unchecked)}")
                 return False
@@ -835,103 +550,29 @@ class AITeamDB:
             print(f"⚠️ Warning: Agent {original_assignee} may not have added learning for this task")
             # Don't block approval, just warn
         
-        # Calculate actual duration if not already set and started_at exists
-        duration_calc = ""
-        duration_params = []
-        if started_at:
-            duration_calc = """
-                , actual_duration_minutes = COALESCE(
-                    actual_duration_minutes, 
-                    ROUND((strftime('%s', 'now') - strftime('%s', started_at)) / 60)
-                )
-            """
-        
-        # Move to done
-        cursor.execute(f'''
-            UPDATE tasks 
-            SET status = 'done', progress = 100, completed_at = datetime('now', 'localtime'),
-                done_at = datetime('now', 'localtime'),
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                review_feedback = NULL,
-                review_feedback_at = NULL,
-                updated_at = datetime('now', 'localtime')
-                {duration_calc}
-            WHERE id = ?
-        ''', (task_id,))
-        
-        # Update original agent's completed count
-        if original_assignee:
-            cursor.execute('''
-                UPDATE agents 
-                SET total_tasks_completed = total_tasks_completed + 1,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (original_assignee,))
-
-        # Release reviewer if provided
-        if reviewer_id:
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (reviewer_id,))
-        else:
-            # Fallback: release any QA reviewer still bound to this task
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE current_task_id = ?
-                  AND lower(role) LIKE '%qa%'
-            ''', (task_id,))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'approved', ?, 'done', ?, ?)
-        ''', (task_id, row[1], reviewer_id, f"Approved by {reviewer_id or 'unknown'}"))
-        
-        self.conn.commit()
-
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'done')
-        except Exception:
-            pass
-        
-        # Send completion notification
-        self.notifier.notify(
-            event=NotificationEvent.COMPLETE,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=original_assignee,
-            agent_name=original_assignee
-        )
-        
-        return cursor.rowcount > 0
+        # Done (duration kept if already recorded), assignee credited, reviewer released
+        return self.states.apply(task_id, 'approve', reviewer=reviewer_id, actor=reviewer_id,
+                                 notes=f"Approved by {reviewer_id or 'unknown'}") is not None
     
     def reject_review(self, task_id: str, reviewer_id: str = None, reason: str = None) -> bool:
         """Reject reviewed task - moves from review back to in_progress
-        Increments fix_loop_count and auto-stops if >= 10 loops
+        Increments fix_loop_count and auto-stops at FIX_LOOP_LIMIT loops
         """
         if not reason:
             reason = "No review reason provided"
         cursor = self.conn.cursor()
         
         # Get task info
-        cursor.execute('SELECT title, status, assignee_id, fix_loop_count FROM tasks WHERE id = ?', (task_id,))
+        cursor.execute('SELECT status, fix_loop_count FROM tasks WHERE id = ?', (task_id,))
         row = cursor.fetchone()
         if not row:
             return False
         
-        if row[1] not in ('review', 'reviewing'):
+        if row[0] not in ('review', 'reviewing'):
             print(f"⚠️ Task {task_id} must be in review status to reject")
             return False
         
-        task_title = row[0]
-        original_assignee = row[2]
-        current_loop_count = row[3] or 0
+        current_loop_count = row[1] or 0
         reason_l = (reason or "").lower()
 
         # Do NOT count fix loops for administrative/system validation rejections.
@@ -945,163 +586,40 @@ class AITeamDB:
 
         new_loop_count = current_loop_count + (0 if no_loop_reject else 1)
         
-        # Check if we've hit the auto-stop limit (10 loops)
-        if (not no_loop_reject) and new_loop_count >= 10:
+        # Check if we've hit the auto-stop limit (FIX_LOOP_LIMIT loops)
+        if (not no_loop_reject) and new_loop_count >= FIX_LOOP_LIMIT:
             print(f"🛑 AUTO-STOP: Task {task_id} has reached {new_loop_count} fix loops!")
             print(f"   Blocking task - manual intervention required.")
             
             # Block the task instead of returning to in_progress
             auto_stop_reason = f"AUTO-STOP: Rejected {new_loop_count} times. {reason or 'Manual review required.'}"
-            cursor.execute('''
-                UPDATE tasks 
-                SET status = 'blocked', blocked_reason = ?, fix_loop_count = ?,
-                    blocked_at = datetime('now', 'localtime'),
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (auto_stop_reason, new_loop_count, task_id))
-            
-            cursor.execute('''
-                INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-                VALUES (?, 'auto_stopped', ?, 'blocked', ?, ?)
-            ''', (task_id, row[1], reviewer_id, f"Auto-stopped after {new_loop_count} fix loops. {reason or ''}"))
-            
-            self.conn.commit()
-            
-            # Send auto-stop notification
-            self.notifier.notify(
-                event=NotificationEvent.AUTO_STOP,
-                task_id=task_id,
-                task_title=task_title,
-                agent_id=original_assignee,
-                agent_name=original_assignee,
-                reason=f"Rejected {new_loop_count} times"
-            )
-            
+            self.states.apply(task_id, 'auto_stop', reason=auto_stop_reason, fix_loops=new_loop_count,
+                              actor=reviewer_id, notice=f"Rejected {new_loop_count} times",
+                              notes=f"Auto-stopped after {new_loop_count} fix loops. {reason or ''}")
             return True
         
-        # Reject - return to todo with higher priority for quick rework
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'todo', progress = 0, fix_loop_count = ?,
-                priority = 'high',
-                started_at = NULL,
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                review_feedback = ?,
-                review_feedback_at = datetime('now', 'localtime'),
-                todo_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (new_loop_count, reason, task_id))
-        
-        # Set original assignee idle so spawn manager can pick it up
-        if original_assignee:
-            cursor.execute('''
-                UPDATE agents 
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (original_assignee,))
-
-        # Release reviewer if provided
-        if reviewer_id:
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE id = ?
-            ''', (reviewer_id,))
+        # Reject - return to todo with higher priority for quick rework; assignee and reviewer released
+        if no_loop_reject:
+            notes = f"Returned by {reviewer_id or 'unknown'} -> todo (priority high). No fix loop counted. {reason or ''}"
+            notice = f"Returned to todo (no loop). {reason or ''}"
         else:
-            # Fallback: release any QA reviewer still bound to this task
-            cursor.execute('''
-                UPDATE agents
-                SET status = 'idle', current_task_id = NULL,
-                    updated_at = datetime('now', 'localtime')
-                WHERE current_task_id = ?
-                  AND lower(role) LIKE '%qa%'
-            ''', (task_id,))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'rejected', ?, 'todo', ?, ?)
-        ''', (task_id, row[1], reviewer_id,
-              (f"Returned by {reviewer_id or 'unknown'} -> todo (priority high). No fix loop counted. {reason or ''}"
-               if no_loop_reject
-               else f"Rejected by {reviewer_id or 'unknown'} -> todo (priority high). Loop {new_loop_count}. {reason or ''}")))
-        
-        self.conn.commit()
-
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'todo')
-        except Exception:
-            pass
+            notes = f"Rejected by {reviewer_id or 'unknown'} -> todo (priority high). Loop {new_loop_count}. {reason or ''}"
+            notice = f"Rejected (loop {new_loop_count}/{FIX_LOOP_LIMIT}). {reason or ''}"
+        result = self.states.apply(task_id, 'reject_review', reason=reason, fix_loops=new_loop_count,
+                                   reviewer=reviewer_id, actor=reviewer_id, notes=notes, notice=notice)
         
         if no_loop_reject:
             print(f"↩️ Task {task_id} returned -> todo (priority high) (no fix loop counted)")
         else:
-            print(f"🔄 Task {task_id} rejected -> todo (priority high) (fix loop {new_loop_count}/10)")
+            print(f"🔄 Task {task_id} rejected -> todo (priority high) (fix loop {new_loop_count}/{FIX_LOOP_LIMIT})")
         if reason:
             print(f"   Reason: {reason}")
         
-        # Send notification
-        self.notifier.notify(
-            event=NotificationEvent.BLOCK,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=original_assignee,
-            agent_name=original_assignee,
-            reason=(f"Rejected (loop {new_loop_count}/10). {reason or ''}" if not no_loop_reject else f"Returned to todo (no loop). {reason or ''}")
-        )
-        
-        return cursor.rowcount > 0
+        return result is not None
     
     def block_task(self, task_id: str, reason: str) -> bool:
         """Block a task with reason"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'blocked', blocked_reason = ?,
-                blocked_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-        
-        cursor.execute('''
-            UPDATE agents 
-            SET status = 'blocked', updated_at = datetime('now', 'localtime')
-            WHERE id = (SELECT assignee_id FROM tasks WHERE id = ?)
-        ''', (task_id,))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, notes)
-            VALUES (?, 'blocked', ?)
-        ''', (task_id, reason))
-        
-        self.conn.commit()
-        
-        # Send Telegram notification using NotificationManager (AC: Notification on task blocked)
-        # Get task title
-        cursor.execute('SELECT title FROM tasks WHERE id = ?', (task_id,))
-        title_row = cursor.fetchone()
-        task_title = title_row[0] if title_row else None
-        
-        # Get assignee
-        cursor.execute('SELECT assignee_id FROM tasks WHERE id = ?', (task_id,))
-        assignee_row = cursor.fetchone()
-        assignee = assignee_row[0] if assignee_row else None
-        
-        self.notifier.notify(
-            event=NotificationEvent.BLOCK,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee,
-            reason=reason
-        )
-        
-        return cursor.rowcount > 0
+        return self.states.apply(task_id, 'block', reason=reason) is not None
 
     def info_needed_task(self, task_id: str, details: str, actor: str = "system") -> bool:
         """
@@ -1110,144 +628,20 @@ class AITeamDB:
         """
         if not details:
             details = "Information required"
-        reason = f"Info needed: {details}"
-        cursor = self.conn.cursor()
-
-        cursor.execute('SELECT title, status, assignee_id FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        task_title, old_status, assignee = row[0], row[1] or 'todo', row[2]
-
-        cursor.execute('''
-            UPDATE tasks
-            SET status = 'info_needed',
-                blocked_reason = ?,
-                blocked_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-
-        # Release any agent bound to this task so the pool can keep working.
-        cursor.execute('''
-            UPDATE agents
-            SET status = 'idle',
-                current_task_id = NULL,
-                updated_at = datetime('now', 'localtime')
-            WHERE current_task_id = ?
-        ''', (task_id,))
-
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, agent_id, notes)
-            VALUES (?, 'updated', ?, 'info_needed', ?, ?)
-        ''', (task_id, old_status, actor, reason))
-
-        self.conn.commit()
-
-        # Notify (same channel as block, but does not block the agent account)
-        self.notifier.notify(
-            event=NotificationEvent.BLOCK,
-            task_id=task_id,
-            task_title=task_title,
-            agent_id=assignee,
-            agent_name=assignee,
-            reason=reason
-        )
-
-        return True
+        # Any agent bound to the task is released so the pool can keep working
+        return self.states.apply(task_id, 'info_needed', reason=f"Info needed: {details}", actor=actor) is not None
     
     def unblock_task(self, task_id: str, agent_id: str = None) -> bool:
         """Unblock a task and resume (blocked -> in_progress)"""
-        cursor = self.conn.cursor()
-        
-        # Get task info before updating
-        cursor.execute('SELECT title, assignee_id, status FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        
-        if row[2] != 'blocked':
+        result = self.states.apply(task_id, 'unblock', agent=agent_id, notes='Fix loop counter reset to 0')
+        if result is None:
             print(f"⚠️ Task {task_id} is not blocked")
             return False
-        
-        assignee = agent_id or row[1] or "Unknown"
-        
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'in_progress', started_at = datetime('now', 'localtime'), 
-                in_progress_at = datetime('now', 'localtime'),
-                blocked_reason = NULL,
-                blocked_at = NULL,
-                fix_loop_count = 0, updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (task_id,))
-        
-        cursor.execute('''
-            UPDATE agents 
-            SET status = 'active', updated_at = datetime('now', 'localtime')
-            WHERE id = (SELECT assignee_id FROM tasks WHERE id = ?)
-        ''', (task_id,))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'unblocked', 'blocked', 'in_progress', 'Fix loop counter reset to 0')
-        ''', (task_id,))
-        
-        self.conn.commit()
-        
-        # Send Telegram notification using NotificationManager
-        self.notifier.notify(
-            event=NotificationEvent.UNBLOCK,
-            task_id=task_id,
-            task_title=row[0],
-            agent_id=assignee,
-            agent_name=assignee
-        )
-        
-        return cursor.rowcount > 0
+        return True
     
     def backlog_task(self, task_id: str, reason: str = "Waiting for requirements/resources") -> bool:
         """Move task to backlog (waiting for requirements/resources)"""
-        cursor = self.conn.cursor()
-        
-        # Get task info before updating
-        cursor.execute('SELECT title, status FROM tasks WHERE id = ?', (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        
-        old_status = row[1]
-        
-        cursor.execute('''
-            UPDATE tasks 
-            SET status = 'backlog', blocked_reason = ?, started_at = NULL,
-                backlog_at = datetime('now', 'localtime'),
-                updated_at = datetime('now', 'localtime')
-            WHERE id = ?
-        ''', (reason, task_id))
-        
-        cursor.execute('''
-            INSERT INTO task_history (task_id, action, old_status, new_status, notes)
-            VALUES (?, 'backlogged', ?, 'backlog', ?)
-        ''', (task_id, old_status, reason))
-        
-        self.conn.commit()
-
-        try:
-            from sprint_status_sync import update_story_status
-            update_story_status(task_id, 'backlog')
-        except Exception:
-            pass
-        
-        # Send Telegram notification using NotificationManager
-        self.notifier.notify(
-            event=NotificationEvent.BACKLOG,
-            task_id=task_id,
-            task_title=row[0],
-            reason=reason
-        )
-        
-        return cursor.rowcount > 0
+        return self.states.apply(task_id, 'backlog', reason=reason) is not None
     
     def get_tasks(self, status: str = None, assignee: str = None) -> List[Dict]:
         """Get tasks with optional filters"""
@@ -1285,15 +679,21 @@ class AITeamDB:
         return [dict(row) for row in cursor.fetchall()]
     
     def update_agent_heartbeat(self, agent_id: str) -> bool:
-        """Update agent heartbeat timestamp"""
+        """Update agent heartbeat timestamp (coalesced via heartbeat collector if running)"""
+        if send_to_collector(agent_id):
+            return True
         cursor = self.conn.cursor()
         cursor.execute('''
             UPDATE agents 
             SET last_heartbeat = datetime('now', 'localtime'), updated_at = datetime('now', 'localtime')
             WHERE id = ?
         ''', (agent_id,))
+        found = cursor.rowcount > 0
+        if found:
+            LivenessStore.ensure_schema(self.conn)
+            merge_beats(self.conn, {agent_id: [time.time()]})
         self.conn.commit()
-        return cursor.rowcount > 0
+        return found
     
     # ========== Dashboard ==========
     
@@ -1612,16 +1012,6 @@ class AITeamDB:
             'duration_formatted': self.format_duration(row[2])
         }
     
-    def _get_next_task_number(self) -> int:
-        """Get next task number for today"""
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime('%Y%m%d')
-        cursor.execute("""
-            SELECT COALESCE(MAX(CAST(SUBSTR(id, 12) AS INTEGER)), 0) FROM tasks 
-            WHERE id LIKE ?
-        """, (f'T-{today}-%',))
-        return cursor.fetchone()[0] + 1
-    
     def _get_tasks_completed_today(self) -> List[Dict]:
         """Get tasks completed today"""
         cursor = self.conn.cursor()
@@ -1718,6 +1108,16 @@ class AITeamDB:
             'recent': recent
         }
 
+    def get_task_history(self, task_id: str) -> List[Dict]:
+        """Full task history, including rows moved to the archive"""
+        with HistoryArchive(self.db_path) as archive:
+            return archive.read('task_history', task_id=task_id)
+
+    def search(self, query: str, kinds: List[str] = None, agent_id: str = None,
+               task_id: str = None, limit: int = 20) -> List[Dict]:
+        """Ranked full-text search over tasks, history notes, learnings, messages and working memory"""
+        return SearchIndex(self.conn).search(query, kinds, agent_id, task_id, limit=limit)
+
     def get_task_duration_details(self, task_id: str) -> dict:
         """Get detailed duration info for a task including estimated vs actual comparison"""
         cursor = self.conn.cursor()
@@ -1922,6 +1322,15 @@ class AITeamDB:
             }
         return None
 
+    def add_agent_learning(self, agent_id: str, learning: str, task_id: str = None) -> bool:
+        """Add a deduplicated learning and refresh the agent's learnings summary"""
+        store = LearningStore(self.conn)
+        if not store.add(agent_id, learning, task_id=task_id):
+            return False
+        store.refresh_context([agent_id])
+        self.conn.commit()
+        return True
+
     def update_agent_context(self, agent_id: str, field: str, content: str) -> bool:
         """Update agent context field"""
         cursor = self.conn.cursor()
@@ -2070,11 +1479,8 @@ class AITeamDB:
 
 
 def load_template(template_name: str) -> str:
-    """Load a template file from agents/templates/"""
-    template_path = Path(__file__).parent / "agents" / "templates" / f"template-{template_name}.md"
-    if template_path.exists():
-        return template_path.read_text()
-    return None
+    """Load a template file from agents/templates/ (cached until the file changes)"""
+    return load_task_template(template_name)
 
 def list_templates() -> List[str]:
     """List available templates"""
@@ -2088,6 +1494,48 @@ def list_templates() -> List[str]:
         templates.append(name)
     return sorted(templates)
 
+# Import column aliases -> create_tasks_bulk fields (matches the `task create` flags)
+IMPORT_FIELD_ALIASES = {
+    'desc': 'description', 'assign': 'assignee_id', 'assignee': 'assignee_id',
+    'project': 'project_id', 'due': 'due_date', 'acceptance': 'acceptance_criteria',
+    'expected-outcome': 'expected_outcome', 'working-dir': 'working_dir', 'estimate': 'estimated_hours',
+    'mission': 'mission_id',
+}
+
+def load_task_rows(path: Path, fmt: str = None) -> List[Dict]:
+    """Read tasks for `task import` from a JSON list (or {"tasks": [...]}) or a CSV with a header row"""
+    fmt = fmt or ('csv' if path.suffix.lower() == '.csv' else 'json')
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            raw = list(csv.DictReader(f))
+    else:
+        raw = json.loads(path.read_text(encoding='utf-8'))
+        if isinstance(raw, dict):
+            raw = raw.get('tasks', [])
+    rows = []
+    for item in raw:
+        row = {}
+        for key, value in item.items():
+            key = IMPORT_FIELD_ALIASES.get(key.strip().lower(), key.strip().lower())
+            if isinstance(value, str):
+                # CSV cells can carry checklists as literal "\n"
+                value = value.replace('\\n', '\n').strip() or None
+            row[key] = value
+        if row.get('estimated_hours') is not None:
+            row['estimated_hours'] = float(row['estimated_hours'])
+        rows.append(row)
+    return rows
+
+
+def request_review_steal(reviewer_id: Optional[str]):
+    """Reviewer freed a slot: let it pull the next queued review right away"""
+    try:
+        from review_manager import request_steal
+        request_steal(reviewer_id)
+    except Exception:
+        pass
+
+
 def main():
     parser = argparse.ArgumentParser(description='AI Team Database Manager')
     subparsers = parser.add_subparsers(dest='command', help='Commands')
@@ -2109,6 +1557,7 @@ def main():
     create.add_argument('--expected-outcome', help='Clear description of expected outcome')
     create.add_argument('--working-dir', required=True, help='Working directory path (REQUIRED) - where the agent should execute commands')
     create.add_argument('--template', help='Use template (prd, tech-spec, qa-testplan, feature-dev, bug-fix)')
+    create.add_argument('--mission', help='Orchestrator mission this task belongs to (M-...)')
     
     # Template commands
     template_parser = task_sub.add_parser('template', help='List or use task templates')
@@ -2162,7 +1611,7 @@ def main():
     approve.add_argument('task_id', help='Task ID')
     approve.add_argument('--reviewer', help='Reviewer agent ID')
     
-    reject = task_sub.add_parser('reject', help='Reject reviewed task (review -> in_progress). Auto-stops after 10 loops.')
+    reject = task_sub.add_parser('reject', help=f'Reject reviewed task (review -> in_progress). Auto-stops after {FIX_LOOP_LIMIT} loops.')
     reject.add_argument('task_id', help='Task ID')
     reject.add_argument('--reviewer', help='Reviewer agent ID')
     reject.add_argument('--reason', help='Reason for rejection (what needs to be fixed)')
@@ -2196,6 +1645,25 @@ def main():
     duration_cmd.add_argument('task_id', help='Task ID')
     duration_cmd.add_argument('--recalc', action='store_true', help='Recalculate duration for completed tasks')
 
+    history_cmd = task_sub.add_parser('history', help='Show task history (including archived entries)')
+    history_cmd.add_argument('task_id', help='Task ID')
+
+    import_cmd = task_sub.add_parser('import', help='Create many tasks from a JSON or CSV file (one transaction)')
+    import_cmd.add_argument('file', help='JSON list of tasks or CSV with a header row (fields as in task create)')
+    import_cmd.add_argument('--format', choices=['json', 'csv'], help='File format (default: by extension)')
+    import_cmd.add_argument('--project', help='Default project ID for rows without one')
+    import_cmd.add_argument('--working-dir', help='Default working directory for rows without one')
+    import_cmd.add_argument('--assign', help='Default assignee for rows without one')
+    import_cmd.add_argument('--priority', choices=['critical', 'high', 'normal', 'low'], help='Default priority')
+    import_cmd.add_argument('--mission', help='Default orchestrator mission for rows without one')
+    import_cmd.add_argument('--dry-run', action='store_true', help='Validate only, create nothing')
+    import_cmd.add_argument('--no-notify', action='store_true', help='Skip the digest notification')
+
+    depend_cmd = task_sub.add_parser('depend', help='Make a task wait for other tasks (rejects cycles)')
+    depend_cmd.add_argument('task_id', help='Task ID')
+    depend_cmd.add_argument('depends_on', nargs='*', help='Upstream task IDs (none: show dependencies)')
+    depend_cmd.add_argument('--remove', action='store_true', help='Remove the given dependencies instead')
+
     estimate_cmd = task_sub.add_parser('estimate', help='Set or update estimated hours for a task')
     estimate_cmd.add_argument('task_id', help='Task ID')
     estimate_cmd.add_argument('hours', type=float, help='Estimated hours (e.g., 2.5 for 2 hours 30 minutes)')
@@ -2266,6 +1734,15 @@ def main():
     comm_task = comm_sub.add_parser('task', help='Show task messages')
     comm_task.add_argument('task_id', help='Task ID')
     
+    # Search command
+    search_parser = subparsers.add_parser('search', help='Full-text search across tasks, history, learnings and messages')
+    search_parser.add_argument('query', help='Search text (last word matches as a prefix)')
+    search_parser.add_argument('--kind', action='append', choices=list(SEARCH_KINDS),
+                               help='Limit to a source kind (repeatable)')
+    search_parser.add_argument('--agent', help='Filter by agent ID')
+    search_parser.add_argument('--task', help='Filter by task ID')
+    search_parser.add_argument('--limit', type=int, default=20, help='Number of results')
+    
     # Dashboard commands
     dash_parser = subparsers.add_parser('dashboard', help='Dashboard')
     dash_parser.add_argument('--export', choices=['json', 'markdown'],
@@ -2335,9 +1812,12 @@ def main():
                     prerequisites=prerequisites,
                     acceptance_criteria=acceptance,
                     expected_outcome=goal,
-                    working_dir=args.working_dir
+                    working_dir=args.working_dir,
+                    mission_id=args.mission
                 )
                 print(f"✅ Task created: {task_id}")
+                if args.mission:
+                    print(f"   Mission: {args.mission}")
                 print(f"   Working Dir: {args.working_dir}")
                 if prerequisites:
                     print(f"   Prerequisites: {len(prerequisites.split(chr(10)))} items")
@@ -2351,11 +1831,11 @@ def main():
                     templates = list_templates()
                     print(f"\n📄 Available Templates ({len(templates)}):\n")
                     for t in templates:
-                        template_file = Path(__file__).parent / "agents" / "templates" / f"template-{t}.md"
                         # Get first line as description
                         desc = ""
-                        if template_file.exists():
-                            first_line = template_file.read_text().split('\n')[0]
+                        content = load_template(t)
+                        if content:
+                            first_line = content.split('\n')[0]
                             desc = first_line.replace('#', '').strip() if first_line.startswith('#') else ""
                         print(f"  • {t:<12} {desc}")
                     print(f"\nUsage: ./team_db.py task create --template <name> ...")
@@ -2405,11 +1885,12 @@ def main():
             elif args.task_action == 'approve':
                 if db.approve_review(args.task_id, args.reviewer):
                     print(f"✅ Task {args.task_id} approved and marked as done")
+                    request_review_steal(args.reviewer)
             
             elif args.task_action == 'reject':
                 if db.reject_review(args.task_id, args.reviewer, args.reason):
                     # Message printed by reject_review function
-                    pass
+                    request_review_steal(args.reviewer)
 
             elif args.task_action == 'requeue':
                 if db.requeue_to_todo(args.task_id, args.reason, actor='system'):
@@ -2556,6 +2037,56 @@ def main():
                         print(f"   👤 Agent: {details['assignee_name'] or details['assignee_id']}")
                     print()
 
+            elif args.task_action == 'history':
+                history = db.get_task_history(args.task_id)
+                print(f"\n📜 History for {args.task_id} ({len(history)} entries)\n")
+                for h in history:
+                    transition = f" {h['old_status']} → {h['new_status']}" if h.get('new_status') else ""
+                    print(f"  {h['timestamp']} | {h['action']}{transition} | {h.get('agent_id') or '-'}")
+                    if h.get('notes'):
+                        print(f"     {h['notes'][:100]}")
+
+            elif args.task_action == 'import':
+                try:
+                    rows = load_task_rows(Path(args.file), args.format)
+                except (OSError, ValueError, csv.Error) as e:
+                    print(f"❌ Cannot read {args.file}: {e}")
+                    sys.exit(1)
+                defaults = {'project_id': args.project, 'working_dir': args.working_dir,
+                            'assignee_id': args.assign, 'priority': args.priority,
+                            'mission_id': args.mission}
+                for row in rows:
+                    for field, value in defaults.items():
+                        if value and not row.get(field):
+                            row[field] = value
+                try:
+                    if args.dry_run:
+                        db.validate_bulk_tasks(rows)
+                        print(f"✅ {len(rows)} tasks valid (dry run, nothing created)")
+                    else:
+                        task_ids = db.create_tasks_bulk(rows, notify=not args.no_notify)
+                        print(f"✅ Imported {len(task_ids)} tasks: {task_ids[0]} … {task_ids[-1]}" if task_ids
+                              else "⚠️  No tasks in file")
+                except ValueError as e:
+                    print(f"❌ {e}")
+                    sys.exit(1)
+
+            elif args.task_action == 'depend':
+                dag = TaskDAG(db.conn)
+                try:
+                    if args.remove:
+                        for upstream in args.depends_on:
+                            dag.remove_dependency(args.task_id, upstream)
+                    elif args.depends_on:
+                        dag.add_dependencies([(args.task_id, u) for u in args.depends_on])
+                except ValueError as e:
+                    print(f"❌ {e}")
+                else:
+                    deps = sorted(dag.deps.get(args.task_id, ()))
+                    blockers = dag.blockers(args.task_id)
+                    print(f"🔗 {args.task_id} depends on: {', '.join(deps) or '-'}")
+                    print(f"   Waiting for: {', '.join(blockers) or '- (ready)'}")
+
             elif args.task_action == 'estimate':
                 if db.update_task_estimate(args.task_id, args.hours):
                     print(f"✅ Task {args.task_id} estimated hours set to {args.hours}h")
@@ -2616,10 +2147,7 @@ def main():
                 elif args.context_action == 'learn':
                     ctx = db.get_agent_context(args.agent_id)
                     if ctx:
-                        new_learning = f"- {args.learning}"
-                        existing = ctx.get('learnings', '')
-                        updated = f"{existing}\n{new_learning}" if existing else new_learning
-                        if db.update_agent_context(args.agent_id, 'learnings', updated):
+                        if db.add_agent_learning(args.agent_id, args.learning):
                             print(f"✅ Added learning to {args.agent_id}")
                     else:
                         print(f"⚠️ Agent {args.agent_id} not found")
@@ -2683,6 +2211,15 @@ def main():
                     for m in messages:
                         print(f"[{m['from_name']}] {m['message'][:80]}")
         
+        elif args.command == 'search':
+            hits = db.search(args.query, args.kind, args.agent, args.task, args.limit)
+            print(f"\n🔎 {len(hits)} results for '{args.query}'\n")
+            for h in hits:
+                task = f" ({h['task_id']})" if h['task_id'] and h['task_id'] != h['ref'] else ""
+                print(f"[{h['kind']}] {h['ref']}{task} {h['title'] or ''}")
+                print(f"   {h['snippet']}")
+                print(f"   🕐 {h['ts']} {h['agent_id'] or ''}\n")
+        
         elif args.command == 'dashboard':
             stats = db.get_dashboard_stats()
             print("\n📊 Dashboard Stats:\n")
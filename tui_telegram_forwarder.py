@@ -12,6 +12,9 @@ import re
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from audit_log import AuditLogger
+from search_index import SearchIndex
+
 DB_PATH = Path(__file__).parent / "team.db"
 LAST_CHECK_FILE = Path(__file__).parent / ".last_tui_forward"
 TELEGRAM_CHAT_ID = "1268858185"
@@ -102,18 +105,16 @@ def check_agent_reports():
     # First check session transcripts for direct agent messages
     forwarded += check_session_transcripts()
     
-    # Check working_memory for completion notes
-    cursor.execute('''
+    # Check working_memory for completion notes (token match via the search index)
+    matched = [hit['ref'] for hit in SearchIndex(conn).search(
+        'complet* OR done OR finish*', kinds=['memory'], raw=True, limit=500)]
+    cursor.execute(f'''
         SELECT agent_id, current_task_id, working_notes, blockers, next_steps, last_updated
         FROM agent_working_memory
         WHERE last_updated > datetime('now', '-5 minutes')
-          AND (working_notes LIKE '%completed%' 
-               OR working_notes LIKE '%done%'
-               OR working_notes LIKE '%finished%'
-               OR blockers != ''
-               OR next_steps LIKE '%completed%')
+          AND (id IN ({','.join('?' * len(matched)) or 'NULL'}) OR blockers != '')
         ORDER BY last_updated DESC
-    ''')
+    ''', matched)
     
     for row in cursor.fetchall():
         # Only forward if there's actual content
@@ -150,16 +151,14 @@ def check_agent_reports():
             forwarded += 1
             print(f"  ✅ Forwarded {row['action']} from {row['agent_id']}")
     
-    # Check audit log for spawn/complete events
-    cursor.execute('''
-        SELECT event_type, agent_id, task_id, timestamp, details
-        FROM audit_log
-        WHERE timestamp > datetime('now', '-5 minutes')
-          AND event_type IN ('AGENT_SPAWN', 'TASK_COMPLETE', 'AGENT_COMPLETE', 'STATUS_CHANGE')
-        ORDER BY timestamp DESC
-    ''')
+    # Check audit log for spawn/complete events (only the current partition is read)
+    audit_events = AuditLogger().query(
+        start=datetime.now() - timedelta(minutes=5),
+        event_types=['AGENT_SPAWN', 'TASK_COMPLETE', 'AGENT_COMPLETE', 'STATUS_CHANGE'],
+        limit=500,
+    )
     
-    for row in cursor.fetchall():
+    for row in audit_events:
         if row['event_type'] == 'AGENT_SPAWN':
             message = f"🚀 Started working on task {row['task_id']}"
         elif row['event_type'] in ('TASK_COMPLETE', 'AGENT_COMPLETE'):
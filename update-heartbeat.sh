@@ -9,6 +9,8 @@ set -e
 
 # Configuration
 DB_PATH="${HOME}/clawd/projects/ai-team/team.db"
+# heartbeat_collector.py socket (beats are coalesced and flushed in batches)
+HEARTBEAT_SOCKET="${AI_TEAM_HEARTBEAT_SOCKET:-/tmp/ai-team-heartbeat.sock}"
 
 # Colors for terminal output
 RED='\033[0;31m'
@@ -39,6 +41,14 @@ fi
 # Heartbeat Functions
 # ====================
 
+# Send a beat to the collector if one is listening (no sqlite3 fork, no write lock)
+send_to_collector() {
+    local agent_id="$1"
+    [[ -S "$HEARTBEAT_SOCKET" ]] || return 1
+    command -v nc &> /dev/null || return 1
+    printf '%s' "$agent_id" | nc -U -u -w0 "$HEARTBEAT_SOCKET" 2>/dev/null
+}
+
 # Update heartbeat for a specific agent
 update_heartbeat() {
     local agent_id="$1"
@@ -49,6 +59,11 @@ update_heartbeat() {
         return 1
     fi
     
+    if send_to_collector "$agent_id"; then
+        log_success "Heartbeat queued for $agent_id at $timestamp"
+        return 0
+    fi
+    
     # Update the heartbeat
     sqlite3 "$DB_PATH" << EOF
 UPDATE agents 
@@ -125,7 +140,8 @@ start_periodic_heartbeat() {
     (
         while true; do
             local ts=$(date '+%Y-%m-%d %H:%M:%S')
-            sqlite3 "$DB_PATH" "UPDATE agents SET last_heartbeat = '$ts', updated_at = '$ts' WHERE id = '$agent_id';" 2>/dev/null
+            send_to_collector "$agent_id" || \
+                sqlite3 "$DB_PATH" "UPDATE agents SET last_heartbeat = '$ts', updated_at = '$ts' WHERE id = '$agent_id';" 2>/dev/null
             sleep $((interval_minutes * 60))
         done
     ) &
@@ -284,6 +300,9 @@ Examples:
 Database:
   $DB_PATH
 
+Heartbeat collector (optional, coalesces beats):
+  python3 heartbeat_collector.py serve   # socket: $HEARTBEAT_SOCKET
+
 EOF
             ;;
     esac
@@ -7,6 +7,8 @@ Validate all tasks have required fields
 import sqlite3
 from pathlib import Path
 
+from checklist_store import ChecklistStore
+
 DB_PATH = Path(__file__).parent / "team.db"
 
 def validate_tasks():
@@ -27,6 +29,10 @@ def validate_tasks():
     
     tasks = [dict(row) for row in cursor.fetchall()]
     incomplete = []
+    # Text present but no "- [ ] item" lines (compiled rows, one query)
+    malformed = {}
+    for task_id, field in ChecklistStore(conn).malformed([t['id'] for t in tasks]):
+        malformed.setdefault(task_id, []).append(f"{field} (not a checklist)")
     
     for task in tasks:
         missing = []
@@ -38,6 +44,7 @@ def validate_tasks():
             missing.append('acceptance_criteria')
         if not task.get('working_dir'):
             missing.append('working_dir')
+        missing += malformed.get(task['id'], [])
         
         if missing:
             incomplete.append({